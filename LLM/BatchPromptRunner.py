@@ -0,0 +1,432 @@
+"""
+JSONL 批量提示词运行器(离线评测、数据回填)
+
+- 逐行读取输入 JSONL，不把整个文件加载到内存；读取速度受并发数限制(有界队列)
+- 固定数量的 worker 协程共享一个异步客户端并发请求，同时在途的请求数不超过 --concurrency
+- 结果按完成顺序逐行写入输出 JSONL，失败的请求写入 <输出>.errors.jsonl
+- 已完成的 id 追加写入检查点文件(每行一个 id)，与结果行一起刷盘；启动时同时从输出文件中已有的结果
+  重建已完成集合，进程在两次写入之间被杀也不会重复处理，同一个 id 只会写入一次结果；
+  失败的请求不记入检查点，下次运行时自动重试
+- 定期输出进度：完成数、吞吐、token 累计
+
+输入的每一行是一个 JSON 对象:
+- 带 messages 字段时直接作为对话消息发送
+- 带 prompt 字段时作为一条 user 消息发送
+- 否则用 --template 按字段格式化，例如仓库里的 requests.jsonl:
+      --template "{title}\\n\\n{body}" --id-field request_id
+- 可选的 model / temperature / max_tokens 字段覆盖命令行参数
+
+在仓库根目录运行:
+    python -m LLM.BatchPromptRunner input.jsonl output.jsonl --provider deepseek --concurrency 32
+    python -m LLM.BatchPromptRunner requests.jsonl answers.jsonl --id-field request_id --template "{title}\\n\\n{body}"
+    python -m LLM.BatchPromptRunner --mock --generate 2000 --concurrency 64   # 本地模拟服务器演示
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import random
+import argparse
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+from LLM.StreamMetrics import percentile
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class LatencyReservoir:
+    """
+    固定大小的时延样本池(蓄水池抽样)，用于长时间运行时估计分位数
+
+    样本数超过 size 后，第 n 个样本以 size/n 的概率替换池中随机一个，内存不随请求数增长。
+    """
+
+    def __init__(self, size: int = 4096, seed: Optional[int] = None):
+        self.size = size
+        self.count = 0
+        self.samples: List[float] = []
+        self._random = random.Random(seed)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+            return
+        index = self._random.randrange(self.count)
+        if index < self.size:
+            self.samples[index] = value
+
+    def percentile(self, q: float) -> Optional[float]:
+        return percentile(sorted(self.samples), q)
+
+    def __len__(self) -> int:
+        return self.count
+
+
+@dataclass
+class BatchStats:
+    """运行过程中的累计统计"""
+    started_at: float = field(default_factory=time.perf_counter)
+    read: int = 0
+    skipped: int = 0
+    invalid: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latencies: LatencyReservoir = field(default_factory=LatencyReservoir)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def progress(self) -> str:
+        elapsed = max(self.elapsed, 1e-9)
+        done = self.succeeded + self.failed
+        return (f"完成 {self.succeeded} 失败 {self.failed} 跳过 {self.skipped} | "
+                f"{done / elapsed:.1f} 条/s | tokens 输入 {self.prompt_tokens} 输出 {self.completion_tokens} "
+                f"({self.completion_tokens / elapsed:.0f} 输出tokens/s)")
+
+    def summary(self) -> Dict[str, Any]:
+        def ms(q):
+            value = self.latencies.percentile(q)
+            return None if value is None else round(value * 1000, 1)
+
+        elapsed = max(self.elapsed, 1e-9)
+        return {
+            "read": self.read,
+            "skipped": self.skipped,
+            "invalid": self.invalid,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "elapsed_s": round(elapsed, 2),
+            "requests_per_s": round((self.succeeded + self.failed) / elapsed, 2),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_p50_ms": ms(50),
+            "latency_p95_ms": ms(95),
+        }
+
+
+class DoneCheckpoint:
+    """
+    已完成 id 的检查点：追加写入的文本文件，每行一个 id
+
+    结果行先写入输出文件再记录 id，两者都逐行刷盘。进程恰好在两次写入之间被杀时，
+    检查点会少一个 id，因此打开时还会从输出文件中已有的结果行恢复 id(output_path)，
+    并截掉被杀时只写了一半的最后一行，保证续跑后每个 id 只有一行结果。
+    """
+
+    def __init__(self, path: str, output_path: Optional[str] = None, id_key: str = "id"):
+        self.path = path
+        self._done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._done.update(line.rstrip("\n") for line in f if line.strip())
+        recovered = self._recover(output_path, id_key) if output_path else []
+        self._file: TextIO = open(path, "a", encoding="utf-8")
+        if recovered:
+            logger.info(f"从输出文件补回 {len(recovered)} 个未记入检查点的 id")
+            for request_id in recovered:
+                self.add(request_id)
+
+    def _recover(self, output_path: str, id_key: str) -> List[str]:
+        """读取输出文件中的 id，返回检查点里缺少的部分；末尾不完整的行会被截掉"""
+        if not os.path.exists(output_path):
+            return []
+        missing: Dict[str, None] = {}
+        with open(output_path, "rb+") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    f.truncate(offset)
+                    logger.warning(f"输出文件末尾有不完整的行，已截断: {output_path}")
+                    break
+                offset += len(line)
+                try:
+                    request_id = str(json.loads(line)[id_key])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if request_id not in self._done and request_id not in missing:
+                    missing[request_id] = None
+        return list(missing)
+
+    def __contains__(self, request_id: str) -> bool:
+        return request_id in self._done
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def add(self, request_id: str) -> bool:
+        """记录完成的 id 并立即刷盘，已记录过时返回 False"""
+        if request_id in self._done:
+            return False
+        self._done.add(request_id)
+        self._file.write(request_id + "\n")
+        self._file.flush()
+        return True
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+def iter_jsonl(path: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """逐行读取 JSONL，返回 (行号, 记录, 错误信息)，空行跳过"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, None, f"JSON 解析失败: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "每一行必须是 JSON 对象"
+                continue
+            yield line_no, record, None
+
+
+def build_messages(record: Dict[str, Any], template: Optional[str] = None,
+                   system_prompt: Optional[str] = None) -> List[Dict[str, Any]]:
+    """把一条输入记录转换为对话消息"""
+    if record.get("messages"):
+        messages = list(record["messages"])
+    else:
+        if "prompt" in record:
+            content = str(record["prompt"])
+        elif template:
+            content = template.format(**record)
+        else:
+            raise ValueError("记录中既没有 messages 也没有 prompt，请通过 --template 指定提示词模板")
+        messages = [{"role": "user", "content": content}]
+    if system_prompt and messages[0].get("role") != "system":
+        messages.insert(0, {"role": "system", "content": system_prompt})
+    return messages
+
+
+def _describe_error(e: Exception) -> str:
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    prefix = f"HTTP {status} " if status else ""
+    return f"{prefix}{type(e).__name__}: {e}"
+
+
+class BatchPromptRunner:
+    """
+    可断点续跑的批量提示词运行器
+
+    runner = BatchPromptRunner("deepseek", model="deepseek-chat", concurrency=32)
+    stats = asyncio.run(runner.run("input.jsonl", "output.jsonl"))
+    """
+
+    def __init__(self,
+                 provider: str = "deepseek",
+                 model: Optional[str] = None,
+                 concurrency: int = 16,
+                 id_field: str = "id",
+                 template: Optional[str] = None,
+                 system_prompt: Optional[str] = None,
+                 temperature: Optional[float] = None,
+                 max_tokens: Optional[int] = None,
+                 report_interval: float = 5.0,
+                 limit: Optional[int] = None):
+        from LLM.ClientFactory import get_provider
+
+        self.provider = provider
+        self.model = model or get_provider(provider).model
+        self.concurrency = concurrency
+        self.id_field = id_field
+        self.template = template
+        self.system_prompt = system_prompt
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.report_interval = report_interval
+        self.limit = limit
+
+    def _request_id(self, line_no: int, record: Dict[str, Any]) -> str:
+        value = record.get(self.id_field)
+        return str(value) if value is not None else f"line-{line_no}"
+
+    async def _produce(self, input_path: str, queue: asyncio.Queue, checkpoint: DoneCheckpoint,
+                       errors: TextIO, stats: BatchStats, inflight: Set[str]) -> None:
+        """读取输入文件并放入有界队列，队列满时阻塞；内存中只保留在途的 id，不保留记录内容"""
+        queued = 0
+        try:
+            for line_no, record, error in iter_jsonl(input_path):
+                stats.read += 1
+                if error:
+                    stats.invalid += 1
+                    errors.write(json.dumps({"id": f"line-{line_no}", "line": line_no, "error": error},
+                                            ensure_ascii=False) + "\n")
+                    continue
+                request_id = self._request_id(line_no, record)
+                # 输入中重复的 id：已完成或仍在途时跳过
+                if request_id in checkpoint or request_id in inflight:
+                    stats.skipped += 1
+                    continue
+                inflight.add(request_id)
+                await queue.put((request_id, record))
+                queued += 1
+                if self.limit is not None and queued >= self.limit:
+                    break
+        finally:
+            for _ in range(self.concurrency):
+                await queue.put(_STOP)
+
+    async def _call(self, client, record: Dict[str, Any]) -> Dict[str, Any]:
+        params: Dict[str, Any] = {
+            "model": record.get("model") or self.model,
+            "messages": build_messages(record, self.template, self.system_prompt),
+        }
+        temperature = record.get("temperature", self.temperature)
+        max_tokens = record.get("max_tokens", self.max_tokens)
+        if temperature is not None:
+            params["temperature"] = temperature
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        response = await client.chat.completions.create(**params)
+        choice = response.choices[0] if response.choices else None
+        usage = response.usage
+        return {
+            "model": getattr(response, "model", None) or params["model"],
+            "content": choice.message.content if choice else None,
+            "finish_reason": choice.finish_reason if choice else None,
+            "usage": {
+                "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+                "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            } if usage else None,
+        }
+
+    async def _work(self, client, queue: asyncio.Queue, output: TextIO, errors: TextIO,
+                    checkpoint: DoneCheckpoint, stats: BatchStats, inflight: Set[str]) -> None:
+        while True:
+            item = await queue.get()
+            if item is _STOP:
+                return
+            request_id, record = item
+            start = time.perf_counter()
+            try:
+                result = await self._call(client, record)
+            except Exception as e:
+                inflight.discard(request_id)
+                stats.failed += 1
+                error = _describe_error(e)
+                logger.warning(f"请求 {request_id} 失败: {error}")
+                errors.write(json.dumps({"id": request_id, "error": error}, ensure_ascii=False) + "\n")
+                continue
+            inflight.discard(request_id)
+            if request_id in checkpoint:
+                continue
+            latency = time.perf_counter() - start
+            stats.succeeded += 1
+            stats.latencies.add(latency)
+            if result["usage"]:
+                stats.prompt_tokens += result["usage"]["prompt_tokens"]
+                stats.completion_tokens += result["usage"]["completion_tokens"]
+            # 单线程事件循环里 write 不会交错；先写结果再记检查点
+            output.write(json.dumps(dict(id=request_id, latency_ms=round(latency * 1000, 1), **result),
+                                    ensure_ascii=False) + "\n")
+            output.flush()
+            checkpoint.add(request_id)
+
+    async def _report(self, stats: BatchStats) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            logger.info(stats.progress())
+
+    async def run(self, input_path: str, output_path: str, checkpoint_path: Optional[str] = None) -> BatchStats:
+        """运行整个批次，返回统计信息；可重复调用以继续上次未完成的部分"""
+        from LLM.ClientFactory import get_async_openai_client
+
+        checkpoint = DoneCheckpoint(checkpoint_path or output_path + ".done", output_path)
+        if len(checkpoint):
+            logger.info(f"从检查点恢复：已完成 {len(checkpoint)} 条")
+        stats = BatchStats()
+        client = get_async_openai_client(self.provider)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        inflight: Set[str] = set()
+        with open(output_path, "a", encoding="utf-8") as output, \
+                open(output_path + ".errors.jsonl", "a", encoding="utf-8") as errors:
+            reporter = asyncio.create_task(self._report(stats))
+            try:
+                await asyncio.gather(
+                    self._produce(input_path, queue, checkpoint, errors, stats, inflight),
+                    *(self._work(client, queue, output, errors, checkpoint, stats, inflight)
+                      for _ in range(self.concurrency)),
+                )
+            finally:
+                reporter.cancel()
+                checkpoint.close()
+        logger.info(stats.progress())
+        return stats
+
+
+def _write_sample_input(path: str, count: int) -> None:
+    cities = ["北京", "上海", "广州", "长沙", "深圳", "杭州"]
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({"id": f"q{i}", "prompt": f"{cities[i % len(cities)]}第{i}天适合穿什么？"},
+                               ensure_ascii=False) + "\n")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="可断点续跑的 JSONL 批量提示词运行器")
+    parser.add_argument("input", nargs="?", help="输入 JSONL 文件")
+    parser.add_argument("output", nargs="?", help="输出 JSONL 文件(追加写入)")
+    parser.add_argument("--provider", default="deepseek", help="ClientFactory 中的提供方名称")
+    parser.add_argument("--model", help="默认使用提供方的默认模型")
+    parser.add_argument("--concurrency", type=int, default=16, help="同时在途的请求数")
+    parser.add_argument("--id-field", default="id", help="作为请求 id 的字段，缺失时使用行号")
+    parser.add_argument("--template", help="记录中没有 messages/prompt 时使用的提示词模板，如 \"{title}\\n{body}\"")
+    parser.add_argument("--system", help="系统提示词")
+    parser.add_argument("--temperature", type=float)
+    parser.add_argument("--max-tokens", type=int)
+    parser.add_argument("--checkpoint", help="检查点文件，默认 <output>.done")
+    parser.add_argument("--limit", type=int, help="本次最多发送多少条请求")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="进度输出间隔(秒)")
+    parser.add_argument("--mock", action="store_true", help="启动本地模拟服务器并使用 deepseek 提供方")
+    parser.add_argument("--generate", type=int, default=0, help="配合 --mock：生成 N 条示例输入")
+    args = parser.parse_args()
+
+    server = None
+    if args.mock:
+        from LLM.MockServer import MockLLMConfig, MockLLMServer
+
+        server = MockLLMServer(MockLLMConfig(latency=0.05, token_rate=500)).start()
+        os.environ["DEEPSEEK_BASE_URL"] = server.base_url
+        os.environ["DEEPSEEK_API_KEY"] = "mock-key"
+        args.provider = "deepseek"
+        args.input = args.input or "batch_input.jsonl"
+        args.output = args.output or "batch_output.jsonl"
+        if args.generate:
+            _write_sample_input(args.input, args.generate)
+    else:
+        from LLM.ClientFactory import load_env
+
+        load_env()
+    if not args.input or not args.output:
+        parser.error("需要指定 input 和 output(或使用 --mock)")
+
+    runner = BatchPromptRunner(args.provider, args.model, args.concurrency, args.id_field, args.template,
+                               args.system, args.temperature, args.max_tokens, args.report_interval, args.limit)
+    try:
+        stats = asyncio.run(runner.run(args.input, args.output, args.checkpoint))
+    except KeyboardInterrupt:
+        print("已中断，重新运行同一命令即可从检查点继续", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        if server is not None:
+            server.stop()
+    print(json.dumps(stats.summary(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
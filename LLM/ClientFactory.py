@@ -0,0 +1,408 @@
+import os
+import inspect
+import logging
+import threading
+import importlib.util
+import weakref
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    """OpenAI 兼容服务提供方配置，base_url 和 api_key 可通过环境变量覆盖"""
+    name: str
+    default_base_url: Optional[str]
+    api_key_env: str
+    base_url_env: str
+    default_model: Optional[str] = None
+    model_env: Optional[str] = None
+
+    @property
+    def base_url(self) -> Optional[str]:
+        base_url = os.getenv(self.base_url_env) or self.default_base_url
+        if base_url and base_url.rstrip("/").endswith("/chat/completions"):
+            # One-API 的环境变量保存的是完整的接口地址，OpenAI 客户端需要的是前缀
+            base_url = base_url.rstrip("/")[:-len("/chat/completions")]
+        return base_url
+
+    @property
+    def chat_completions_url(self) -> str:
+        return (self.base_url or "").rstrip("/") + "/chat/completions"
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return os.getenv(self.api_key_env)
+
+    @property
+    def model(self) -> Optional[str]:
+        if self.model_env:
+            return os.getenv(self.model_env) or self.default_model
+        return self.default_model
+
+
+PROVIDERS: Dict[str, ProviderConfig] = {
+    "gemini": ProviderConfig("gemini", "https://api.gemini.dev/v1",
+                             "GEMINI_API_KEY", "GEMINI_BASE_URL", "gemini-2.5-flash"),
+    "openrouter": ProviderConfig("openrouter", "https://openrouter.ai/api/v1",
+                                 "OPENROUTER_API_KEY", "OPENROUTER_BASE_URL", "x-ai/grok-4.1-fast"),
+    "deepseek": ProviderConfig("deepseek", "https://api.deepseek.com",
+                               "DEEPSEEK_API_KEY", "DEEPSEEK_BASE_URL", "deepseek-chat"),
+    "oneapi": ProviderConfig("oneapi", None,
+                             "ONE_API_KEY", "ONE_API_BASE_URL", None, "ONE_API_MODEL"),
+}
+
+
+def get_provider(name: str) -> ProviderConfig:
+    """按名称获取提供方配置"""
+    try:
+        return PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"未知的服务提供方: {name}，可选: {', '.join(PROVIDERS)}")
+
+
+def _env_number(name: str, default, cast=float):
+    value = os.getenv(name)
+    return cast(value) if value else default
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """连接池和超时配置，默认值可通过 LLM_POOL_* 环境变量调整"""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 5.0
+    read_timeout: float = 120.0
+    write_timeout: float = 30.0
+    pool_timeout: float = 10.0
+    http2: bool = True
+    max_retries: int = 2
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        default = cls()
+        return cls(
+            max_connections=_env_number("LLM_POOL_MAX_CONNECTIONS", default.max_connections, int),
+            max_keepalive_connections=_env_number("LLM_POOL_MAX_KEEPALIVE", default.max_keepalive_connections, int),
+            keepalive_expiry=_env_number("LLM_POOL_KEEPALIVE_EXPIRY", default.keepalive_expiry),
+            connect_timeout=_env_number("LLM_POOL_CONNECT_TIMEOUT", default.connect_timeout),
+            read_timeout=_env_number("LLM_POOL_READ_TIMEOUT", default.read_timeout),
+            write_timeout=_env_number("LLM_POOL_WRITE_TIMEOUT", default.write_timeout),
+            pool_timeout=_env_number("LLM_POOL_TIMEOUT", default.pool_timeout),
+            http2=os.getenv("LLM_POOL_HTTP2", "1") not in ("0", "false", "False"),
+            max_retries=_env_number("LLM_MAX_RETRIES", default.max_retries, int),
+        )
+
+    def with_overrides(self, **overrides) -> "PoolConfig":
+        return replace(self, **overrides)
+
+
+_lock = threading.Lock()
+_http_clients: Dict[PoolConfig, Any] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, Any]]" = \
+    weakref.WeakKeyDictionary()
+_openai_clients: Dict[Tuple, Any] = {}
+_sessions: Dict[PoolConfig, Any] = {}
+_default_pool: Optional[PoolConfig] = None
+_response_cache: Any = None
+_response_cache_loaded = False
+
+
+_env_loaded = False
+
+
+def load_env() -> None:
+    """
+    加载 .env 中的环境变量(只在第一次调用时执行，已存在的环境变量不会被覆盖)
+
+    各演示模块在创建客户端前调用，而不是在导入时调用，dotenv 也到这时才导入。
+    """
+    global _env_loaded
+    if _env_loaded:
+        return
+    from dotenv import find_dotenv, load_dotenv
+
+    load_dotenv(find_dotenv())
+    _env_loaded = True
+
+
+def default_pool_config() -> PoolConfig:
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = PoolConfig.from_env()
+    return _default_pool
+
+
+def http2_available() -> bool:
+    """HTTP/2 依赖 h2 包(pip install httpx[http2])，未安装时退回 HTTP/1.1"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _timeout(pool: PoolConfig):
+    import httpx
+
+    return httpx.Timeout(
+        connect=pool.connect_timeout,
+        read=pool.read_timeout,
+        write=pool.write_timeout,
+        pool=pool.pool_timeout,
+    )
+
+
+def _httpx_kwargs(pool: PoolConfig) -> Dict[str, Any]:
+    import httpx
+
+    return dict(
+        limits=httpx.Limits(
+            max_connections=pool.max_connections,
+            max_keepalive_connections=pool.max_keepalive_connections,
+            keepalive_expiry=pool.keepalive_expiry,
+        ),
+        timeout=_timeout(pool),
+        http2=pool.http2 and http2_available(),
+    )
+
+
+def get_http_client(pool: Optional[PoolConfig] = None):
+    """获取共享的同步 httpx.Client(保持长连接)，相同配置只创建一次"""
+    pool = pool or default_pool_config()
+    with _lock:
+        client = _http_clients.get(pool)
+        if client is None or client.is_closed:
+            import httpx
+
+            client = httpx.Client(**_httpx_kwargs(pool))
+            _http_clients[pool] = client
+            logger.debug(f"创建共享HTTP连接池: {pool}")
+        return client
+
+
+def get_async_http_client(pool: Optional[PoolConfig] = None):
+    """
+    获取当前事件循环共享的 httpx.AsyncClient
+
+    异步连接绑定在创建它的事件循环上，因此按事件循环分别缓存。
+    """
+    import asyncio
+
+    pool = pool or default_pool_config()
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(("http", pool))
+        if client is None or client.is_closed:
+            import httpx
+
+            client = httpx.AsyncClient(**_httpx_kwargs(pool))
+            clients[("http", pool)] = client
+            # 连接池更换后，基于旧连接池的 OpenAI 客户端一并失效
+            for key in [k for k in clients if k[0] == "openai" and k[-1] == pool]:
+                del clients[key]
+        return client
+
+
+def _shared_response_cache():
+    """LLM_CACHE_MODE 开启时，所有工厂客户端共用同一个磁盘响应缓存"""
+    global _response_cache, _response_cache_loaded
+    if not _response_cache_loaded:
+        from LLM.ResponseCache import ResponseCache
+
+        _response_cache = ResponseCache.from_env()
+        _response_cache_loaded = True
+        if _response_cache is not None:
+            logger.info(f"响应缓存已开启 - 模式: {_response_cache.mode}, 路径: {_response_cache.path}")
+    return _response_cache
+
+
+def _rate_limit_enabled() -> bool:
+    from LLM.RateLimiter import rate_limit_enabled
+
+    return rate_limit_enabled()
+
+
+def _apply_middlewares(client, provider: str, is_async: bool):
+    """
+    按环境配置给客户端挂载中间件，调用顺序为 追踪 -> 响应缓存 -> 限流重试 -> 原始请求
+
+    缓存在限流外层，命中时不占用限流配额；追踪在最外层，span 时延就是调用方实际感受到的时延。
+    """
+    if _rate_limit_enabled():
+        from LLM.RateLimiter import get_rate_limiter
+
+        limiter = get_rate_limiter()
+        client = limiter.wrap_async(client, provider) if is_async else limiter.wrap(client, provider)
+    cache = _shared_response_cache()
+    if cache is not None:
+        client = cache.wrap_async(client) if is_async else cache.wrap(client)
+    from LangfuseCourse.Tracing import get_tracer
+
+    tracer = get_tracer()
+    if tracer is not None:
+        client = tracer.wrap_async(client) if is_async else tracer.wrap(client)
+    return client
+
+
+def _max_retries(pool: PoolConfig) -> int:
+    # 开启限流时由 RateLimiter 统一负责退避重试，避免和 SDK 内置重试叠加
+    return 0 if _rate_limit_enabled() else pool.max_retries
+
+
+def _resolve(provider: str, api_key: Optional[str], base_url: Optional[str]) -> Tuple[str, Optional[str]]:
+    config = get_provider(provider)
+    return api_key or config.api_key, base_url or config.base_url
+
+
+def get_openai_client(provider: str,
+                      api_key: Optional[str] = None,
+                      base_url: Optional[str] = None,
+                      pool: Optional[PoolConfig] = None):
+    """
+    获取指定提供方的同步 OpenAI 客户端
+
+    所有客户端共用同一个连接池，避免每个脚本/实例各自建立 TCP+TLS 连接。
+    """
+    from openai import OpenAI
+
+    pool = pool or default_pool_config()
+    api_key, base_url = _resolve(provider, api_key, base_url)
+    key = ("sync", provider, api_key, base_url, pool)
+    with _lock:
+        client = _openai_clients.get(key)
+    if client is None:
+        client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=_timeout(pool),
+            max_retries=_max_retries(pool),
+            http_client=get_http_client(pool),
+        )
+        client = _apply_middlewares(client, provider, is_async=False)
+        with _lock:
+            client = _openai_clients.setdefault(key, client)
+        logger.info(f"OpenAI客户端初始化完成 - 提供方: {provider}, 地址: {base_url}")
+    return client
+
+
+def get_async_openai_client(provider: str,
+                            api_key: Optional[str] = None,
+                            base_url: Optional[str] = None,
+                            pool: Optional[PoolConfig] = None):
+    """获取指定提供方的异步 OpenAI 客户端，连接池按事件循环共享"""
+    import asyncio
+    from openai import AsyncOpenAI
+
+    pool = pool or default_pool_config()
+    api_key, base_url = _resolve(provider, api_key, base_url)
+    http_client = get_async_http_client(pool)
+    key = ("openai", provider, api_key, base_url, pool)
+    with _lock:
+        clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+        client = clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=_timeout(pool),
+                max_retries=_max_retries(pool),
+                http_client=http_client,
+            )
+            client = _apply_middlewares(client, provider, is_async=True)
+            clients[key] = client
+    return client
+
+
+def get_requests_session(pool: Optional[PoolConfig] = None):
+    """获取共享的 requests.Session，用于直接调用 HTTP 接口的脚本(如 One-API 测试)"""
+    pool = pool or default_pool_config()
+    with _lock:
+        session = _sessions.get(pool)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=max(1, pool.max_keepalive_connections),
+                pool_maxsize=pool.max_connections,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[pool] = session
+        return session
+
+
+def close_all() -> None:
+    """关闭所有同步连接池(异步连接池随事件循环一起释放)"""
+    with _lock:
+        for client in _http_clients.values():
+            client.close()
+        for session in _sessions.values():
+            session.close()
+        _http_clients.clear()
+        _sessions.clear()
+        _openai_clients.clear()
+
+
+class _CompletionsProxy:
+    def __init__(self, completions, create):
+        self._completions = completions
+        self.create = create
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+
+class _ChatProxy:
+    def __init__(self, chat, create):
+        self._chat = chat
+        self.completions = _CompletionsProxy(chat.completions, create)
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+
+class ClientProxy:
+    """
+    OpenAI 客户端代理：只替换 chat.completions.create，其余属性全部透传给原客户端
+
+    缓存、限流、追踪等中间件都通过它挂到 create 调用链上。
+    """
+
+    def __init__(self, client, create):
+        self._client = client
+        self.chat = _ChatProxy(client.chat, create)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def wrap_chat_create(client, middleware):
+    """
+    用 middleware(original_create, **params) 包装客户端的 chat.completions.create
+
+    middleware 为 async 函数时可直接用于 AsyncOpenAI 客户端。
+    中间件返回的流式响应包装需遵守与 SDK 流相同的关闭约定：
+    - close() 关闭内层流并返回内层 close() 的结果(包装 openai.AsyncStream 时是需要 await 的协程)
+    - aclose() 是协程，通过 aclose_stream() 关闭内层流；__aexit__ 调用 aclose()
+    """
+    original = client.chat.completions.create
+
+    def create(**params):
+        return middleware(original, **params)
+
+    return ClientProxy(client, create)
+
+
+async def aclose_stream(stream) -> None:
+    """
+    关闭中间件链上的异步流式响应
+
+    各中间件的流包装和 openai.AsyncStream 都提供 aclose()；只有 close() 的对象在其返回可等待对象时等待它。
+    """
+    aclose = getattr(stream, "aclose", None)
+    result = aclose() if callable(aclose) else stream.close()
+    if inspect.isawaitable(result):
+        await result
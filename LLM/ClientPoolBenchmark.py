@@ -0,0 +1,129 @@
+"""
+连接池收益基准测试：对本地桩服务器比较每次新建连接与共享连接池的单请求时延
+
+在仓库根目录运行: python -m LLM.ClientPoolBenchmark
+注意：本地回环没有 TLS 握手和网络往返，真实环境中的差距会明显更大。
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List
+
+from LLM.ClientFactory import PoolConfig, get_async_openai_client, get_openai_client, get_requests_session
+from LLM.StreamMetrics import percentile
+
+STUB_RESPONSE = json.dumps({
+    "id": "chatcmpl-stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "stub-model",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "pong"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}).encode("utf-8")
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive
+    disable_nagle_algorithm = True  # 头和正文分两次写出，避免 Nagle 与延迟 ACK 叠加出 40ms 停顿
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(STUB_RESPONSE)))
+        self.end_headers()
+        self.wfile.write(STUB_RESPONSE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_stub_server() -> ThreadingHTTPServer:
+    server = _StubServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(func: Callable[[], None], requests_count: int) -> List[float]:
+    func()  # 预热
+    latencies = []
+    for _ in range(requests_count):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name: str, latencies: List[float]) -> None:
+    latencies = sorted(latencies)
+    print(f"{name:<32} 平均={statistics.mean(latencies) * 1000:7.3f}ms "
+          f"p50={percentile(latencies, 50) * 1000:7.3f}ms p99={percentile(latencies, 99) * 1000:7.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="共享连接池基准测试")
+    parser.add_argument("--requests", type=int, default=300, help="每种方式的请求数")
+    parser.add_argument("--concurrency", type=int, default=32, help="异步测试的并发数")
+    args = parser.parse_args()
+
+    import requests
+    from openai import OpenAI
+
+    server = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    url = base_url + "/chat/completions"
+    body = {"model": "stub-model", "messages": [{"role": "user", "content": "ping"}]}
+    pool = PoolConfig(http2=False, max_retries=0)
+
+    print(f"桩服务器: {base_url}, 每种方式 {args.requests} 个顺序请求\n")
+
+    report("requests.post (每次新连接)", measure(
+        lambda: requests.post(url, json=body).content, args.requests))
+
+    session = get_requests_session(pool)
+    report("共享 requests.Session", measure(
+        lambda: session.post(url, json=body).content, args.requests))
+
+    def new_client_per_request():
+        with OpenAI(api_key="stub", base_url=base_url, max_retries=0) as client:
+            client.chat.completions.create(**body)
+
+    report("每次新建 OpenAI 客户端", measure(new_client_per_request, args.requests))
+
+    shared = get_openai_client("openrouter", api_key="stub", base_url=base_url, pool=pool)
+    report("共享 OpenAI 客户端(连接池)", measure(
+        lambda: shared.chat.completions.create(**body), args.requests))
+
+    async def run_async():
+        client = get_async_openai_client("openrouter", api_key="stub", base_url=base_url, pool=pool)
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                await client.chat.completions.create(**body)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - start
+        report(f"共享 AsyncOpenAI (并发{args.concurrency})", latencies)
+        print(f"{'':<32} 吞吐={args.requests / elapsed:.0f} req/s")
+
+    asyncio.run(run_async())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
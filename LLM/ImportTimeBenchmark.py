@@ -0,0 +1,95 @@
+"""
+冷启动导入耗时检查
+
+每个模块在全新的子进程中用 python -X importtime 导入，统计该模块的累计导入耗时(多次取最小值)，
+并检查导入过程是否:
+- 引入了应当延迟导入的重量级依赖(openai、ragflow_sdk、dotenv 等)
+- 向标准输出打印内容(说明导入时执行了演示代码)
+
+任一模块超出耗时预算或违反上述规则时以非零状态退出，可以放进 CI 捕获回归。
+
+在仓库根目录运行:
+    python -m LLM.ImportTimeBenchmark
+    python -m LLM.ImportTimeBenchmark --modules LLM.OpenRouterDemo --budget-ms 50 --runs 5
+"""
+import os
+import sys
+import argparse
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_MODULES = [
+    "LLM.ClientFactory",
+    "LLM.LLMDemo",
+    "LLM.OpenRouterDemo",
+    "Protocol.FuctionCall.FunctionCallDemo001",
+    "RAG.RAGFlowCourse.RAGFlowDemo001",
+]
+
+# 这些依赖只能在真正创建客户端时导入
+HEAVY_MODULES = ["openai", "ragflow_sdk", "dotenv", "httpx", "requests", "numpy", "tiktoken"]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """解析 -X importtime 输出，返回 模块名 -> 累计耗时(微秒)"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, _, total_us, name = [part.strip() for part in line.replace("import time:", "|", 1).split("|")]
+        cumulative[name] = int(total_us)
+    return cumulative
+
+
+def measure(module: str) -> Tuple[Optional[int], Dict[str, int], str, str]:
+    """在子进程中导入一次，返回 (模块累计耗时, 全部模块耗时, 标准输出, 错误信息)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=ROOT)
+    timings = parse_importtime(result.stderr)
+    error = "" if result.returncode == 0 else result.stderr.strip().splitlines()[-1]
+    return timings.get(module), timings, result.stdout, error
+
+
+def check(modules: List[str], runs: int, budget_ms: float, heavy: List[str]) -> bool:
+    ok = True
+    print(f"{'模块':<44}{'导入耗时':>10}  问题")
+    for module in modules:
+        best: Optional[int] = None
+        problems = []
+        for _ in range(runs):
+            total, timings, stdout, error = measure(module)
+            if error:
+                problems.append(f"导入失败: {error}")
+                break
+            best = total if best is None else min(best, total)
+            pulled = [name for name in heavy if name in timings]
+            if pulled:
+                problems.append(f"导入了 {', '.join(pulled)}")
+            if stdout.strip():
+                problems.append(f"导入时有输出: {stdout.strip()[:60]!r}")
+        problems = list(dict.fromkeys(problems))
+        if best is not None and best / 1000 > budget_ms:
+            problems.append(f"超过预算 {budget_ms:.0f}ms")
+        ok = ok and not problems
+        elapsed = f"{best / 1000:.1f}ms" if best is not None else "-"
+        print(f"{module:<44}{elapsed:>10}  {'; '.join(problems) or 'OK'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动导入耗时检查")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=3, help="每个模块导入次数，取最小值")
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="单个模块累计导入耗时上限")
+    parser.add_argument("--allow", nargs="*", default=[], help="允许导入的重量级依赖")
+    args = parser.parse_args()
+
+    heavy = [name for name in HEAVY_MODULES if name not in args.allow]
+    if not check(args.modules, args.runs, args.budget_ms, heavy):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
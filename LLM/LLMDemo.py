@@ -1,54 +1,79 @@
-from openai import OpenAI
+"""
+通过 OpenAI 兼容接口调用 Gemini
+
+导入本模块不会创建客户端，也不会发起请求；运行:
+    python -m LLM.LLMDemo
+    python -m LLM.LLMDemo --model gemini-2.5-flash --prompt "..."
+"""
 import os
+import argparse
+
+# 依赖仓库内的其他模块，请在仓库根目录运行: python -m LLM.LLMDemo
+from LLM.ClientFactory import get_openai_client, load_env
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+DEFAULT_SYSTEM_PROMPT = "你是一位资深的嵌入式C语言架构师。"
+DEFAULT_PROMPT = "请用C语言写一个简单的 LED 闪烁程序片段，用于STM32F4系列微控制器。"
+
+
+def get_client():
+    """
+    获取 Gemini 客户端(首次调用时创建，之后复用 ClientFactory 中缓存的实例)
+
+    核心：将 base_url 设置为 Gemini 兼容的 API 接口(见 ClientFactory.PROVIDERS，可用 GEMINI_BASE_URL 覆盖)
+    注意：此 URL 适用于 Google Generative AI API（非 Vertex AI）
+    """
+    load_env()
+    # 1. 配置 Gemini API Key
+    # 建议通过环境变量设置，而不是硬编码在代码中
+    # 确保你已经从 Google AI Studio 获取了你的 GEMINI_API_KEY
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        # ⚠️ 风险提示：硬编码 API Key 存在安全风险，仅用于快速测试。
+        print("⚠️ 警告：请设置 GEMINI_API_KEY 环境变量以提高安全性。")
+    # 2. 客户端来自共享工厂，复用长连接池
+    return get_openai_client("gemini", api_key=api_key)
+
 
-# 1. 配置 Gemini API Key
-# 建议通过环境变量设置，而不是硬编码在代码中
-# 确保你已经从 Google AI Studio 获取了你的 GEMINI_API_KEY
-# 假设环境变量名为 GEMINI_API_KEY
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-
-if not GEMINI_API_KEY:
-    # ⚠️ 风险提示：硬编码 API Key 存在安全风险，仅用于快速测试。
-    # 建议使用 os.environ.get("GEMINI_API_KEY")
-    print("⚠️ 警告：请设置 GEMINI_API_KEY 环境变量以提高安全性。")
-    # 替换为你的实际 Gemini API 密钥
-    # GEMINI_API_KEY = "YOUR_GEMINI_API_KEY_HERE"
-    # 如果没有设置环境变量且未在此处硬编码，代码将无法运行。
-    pass
-
-# 2. 初始化 OpenAI Client
-# 核心：将 base_url 设置为 Gemini 兼容的 API 接口
-# 注意：此 URL 适用于 Google Generative AI API（非 Vertex AI）
-client = OpenAI(
-    api_key=GEMINI_API_KEY,
-    base_url="https://api.gemini.dev/v1",
-)
-
-# 3. 进行 API 调用
-try:
-    # 使用 Gemini 模型名称，例如 gemini-2.5-flash
-    model_name = "gemini-2.5-flash"
-
-    print(f"🚀 正在调用 Gemini 模型: {model_name}...")
-
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=[
-            {"role": "system", "content": "你是一位资深的嵌入式C语言架构师。"},
-            {"role": "user", "content": "请用C语言写一个简单的 LED 闪烁程序片段，用于STM32F4系列微控制器。"}
-        ],
-        temperature=0.7,
-        max_tokens=500
-    )
-
-    # 4. 打印结果
-    # 响应结构与 OpenAI 的 API 响应结构保持一致
-    if response.choices:
-        print("\n--- 智源的回答（通过 OpenAI 接口获取） ---")
-        print(response.choices[0].message.content)
-        print("-------------------------------------------\n")
-    else:
+def run_demo(model: str = DEFAULT_MODEL, prompt: str = DEFAULT_PROMPT, max_tokens: int = 500) -> bool:
+    """发起一次对话请求并打印回答，返回是否成功"""
+    try:
+        # 3. 进行 API 调用，使用 Gemini 模型名称，例如 gemini-2.5-flash
+        print(f"🚀 正在调用 Gemini 模型: {model}...")
+
+        response = get_client().chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": DEFAULT_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=max_tokens
+        )
+
+        # 4. 打印结果
+        # 响应结构与 OpenAI 的 API 响应结构保持一致
+        if response.choices:
+            print("\n--- 智源的回答（通过 OpenAI 接口获取） ---")
+            print(response.choices[0].message.content)
+            print("-------------------------------------------\n")
+            return True
         print("未收到有效的模型响应。")
+        return False
+
+    except Exception as e:
+        print(f"❌ 调用失败：{e}")
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="通过 OpenAI 兼容接口调用 Gemini")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT)
+    parser.add_argument("--max-tokens", type=int, default=500)
+    args = parser.parse_args()
+    run_demo(args.model, args.prompt, args.max_tokens)
+
 
-except Exception as e:
-    print(f"❌ 调用失败：{e}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
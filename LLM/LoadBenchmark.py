@@ -0,0 +1,138 @@
+"""
+基于本地模拟服务器的压测工具
+
+以固定 RPS(开环，按计划时间发出请求，排队时间计入时延，避免协调遗漏)驱动:
+    weather    - WeatherAssistant.chat 多轮工具调用
+    oneapi     - One-API 流式请求 + SSEDecoder 解析
+    openrouter - OpenRouterDemo 中的简单聊天和流式输出测试
+报告吞吐、成功率以及 p50/p99 时延。
+
+在仓库根目录运行:
+    python -m LLM.LoadBenchmark --targets weather oneapi openrouter --rps 50 --duration 10 --latency 0.05
+"""
+import argparse
+import contextlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from LLM.MockServer import MockLLMConfig, MockLLMServer
+from LLM.StreamMetrics import percentile
+
+WEATHER_QUERY = "我今天要去上海，明天要去长沙，后天要去北京，大后天去广州，该怎么穿衣服？"
+
+
+def configure_env(server: MockLLMServer) -> None:
+    """让所有入口(通过 ClientFactory 解析地址)都指向模拟服务器，必须在导入演示模块之前调用"""
+    for prefix in ("DEEPSEEK", "OPENROUTER", "GEMINI"):
+        os.environ[f"{prefix}_BASE_URL"] = server.base_url
+        os.environ[f"{prefix}_API_KEY"] = "mock-key"
+    os.environ["ONE_API_BASE_URL"] = server.chat_completions_url
+    os.environ["ONE_API_KEY"] = "mock-key"
+    os.environ["ONE_API_MODEL"] = "mock-model"
+
+
+def build_targets() -> Dict[str, Callable[[], bool]]:
+    """构造各压测目标，返回值表示单次调用是否成功"""
+    from LLM import OpenRouterDemo
+    from LLM.ClientFactory import get_provider, get_requests_session
+    from LLM.SSEDecoder import iter_delta_content
+    from Protocol.FuctionCall.FunctionCallDemo001 import WeatherAssistant
+
+    assistant = WeatherAssistant()
+    oneapi = get_provider("oneapi")
+    session = get_requests_session()
+
+    def weather() -> bool:
+        answer = assistant.chat(WEATHER_QUERY)
+        return not answer.startswith("抱歉")
+
+    def oneapi_stream() -> bool:
+        data = {
+            "model": oneapi.model,
+            "messages": [
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": "你好，分析当前模型哪家供应商最强"},
+            ],
+            "stream": True,
+        }
+        headers = {"Authorization": "Bearer " + oneapi.api_key}
+        with session.post(oneapi.chat_completions_url, json=data, headers=headers, stream=True) as response:
+            if response.status_code != 200:
+                return False
+            return bool("".join(iter_delta_content(response.iter_content(chunk_size=1024))))
+
+    def openrouter() -> bool:
+        return OpenRouterDemo.test_simple_chat() and OpenRouterDemo.test_streaming_chat()
+
+    return {"weather": weather, "oneapi": oneapi_stream, "openrouter": openrouter}
+
+
+def run_fixed_rps(func: Callable[[], bool], rps: float, duration: float,
+                  max_workers: int) -> Tuple[List[float], int, int, float]:
+    """按固定速率发出请求，返回 (时延列表, 成功数, 失败数, 实际耗时)"""
+    latencies: List[float] = []
+    counts = {"ok": 0, "failed": 0}
+    lock = threading.Lock()
+
+    def one(scheduled_at: float) -> None:
+        try:
+            ok = func()
+        except Exception as e:
+            logging.getLogger(__name__).debug(f"请求异常: {e}")
+            ok = False
+        latency = time.perf_counter() - scheduled_at
+        with lock:
+            latencies.append(latency)
+            counts["ok" if ok else "failed"] += 1
+
+    total = int(rps * duration)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for i in range(total):
+            scheduled_at = start + i / rps
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(one, scheduled_at)
+    elapsed = time.perf_counter() - start
+    return latencies, counts["ok"], counts["failed"], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基于本地模拟服务器的压测")
+    parser.add_argument("--targets", nargs="+", default=["weather", "oneapi", "openrouter"],
+                        choices=["weather", "oneapi", "openrouter"])
+    parser.add_argument("--rps", type=float, default=20, help="每秒发出的请求数")
+    parser.add_argument("--duration", type=float, default=5, help="每个目标的压测时长(秒)")
+    parser.add_argument("--workers", type=int, default=256, help="客户端线程数上限")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟服务器首包时延(秒)")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="模拟服务器 token 速率")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务器错误注入概率")
+    args = parser.parse_args()
+
+    config = MockLLMConfig(latency=args.latency, token_rate=args.token_rate,
+                           error_rate=args.error_rate, seed=42)
+    with MockLLMServer(config) as server:
+        configure_env(server)
+        targets = build_targets()
+        logging.getLogger().setLevel(logging.WARNING)
+
+        print(f"模拟服务器: {server.base_url}, 目标 RPS={args.rps}, 时长={args.duration}s\n")
+        print(f"{'目标':<12} {'请求数':>6} {'成功':>6} {'吞吐(req/s)':>12} {'p50':>10} {'p99':>10}")
+        for name in args.targets:
+            # 演示函数会大量打印，压测期间丢弃标准输出(redirect_stdout 是进程级的，不能在工作线程里切换)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                latencies, ok, failed, elapsed = run_fixed_rps(targets[name], args.rps, args.duration, args.workers)
+            latencies.sort()
+            completed = ok + failed
+            print(f"{name:<12} {completed:>6} {ok:>6} {completed / elapsed:>12.1f} "
+                  f"{percentile(latencies, 50) * 1000:>8.1f}ms {percentile(latencies, 99) * 1000:>8.1f}ms")
+        print(f"\n模拟服务器统计: {server.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+本地 OpenAI 兼容模拟服务器
+
+实现 /v1/chat/completions 的非流式、SSE 流式和 tool_calls 响应，
+可配置首包时延、token 生成速率和错误注入(429/5xx + Retry-After)，
+用于在没有网络和费用的情况下测量客户端开销和进行压测。
+
+独立运行: python -m LLM.MockServer --port 8000 --latency 0.2 --token-rate 50
+在代码中使用:
+    with MockLLMServer(MockLLMConfig(latency=0.05)) as server:
+        client = OpenAI(api_key="mock", base_url=server.base_url)
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+KNOWN_CITIES = ["北京", "上海", "广州", "长沙", "深圳", "杭州"]
+
+
+@dataclass
+class MockLLMConfig:
+    """模拟服务器行为配置"""
+    latency: float = 0.0          # 首个数据块(或非流式响应)之前的等待时间(秒)
+    token_rate: float = 0.0       # 每秒生成的 token 数，0 表示不限速
+    error_rate: float = 0.0       # 按概率注入错误
+    error_status: int = 429       # 注入错误的状态码
+    retry_after: Optional[float] = 1.0  # 注入错误时返回的 Retry-After(秒)
+    reply_text: str = "这是来自本地模拟服务器的回答。"
+    tool_arg_pieces: int = 3      # 流式 tool_call 参数被拆成的片段数
+    seed: Optional[int] = None
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _tokenize(text: str) -> List[str]:
+    """把回答切成近似 token 的片段：英文按单词，中文按字"""
+    return re.findall(r"\s*[A-Za-z0-9_']+|\s*[^\sA-Za-z0-9_']", text) or [text]
+
+
+def _tool_names(tools: Optional[List[Dict[str, Any]]]) -> List[str]:
+    return [t.get("function", {}).get("name") for t in tools or [] if t.get("type") == "function"]
+
+
+def plan_tool_calls(messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    模拟模型的工具调用决策，返回本轮要发出的 tool_calls(为空表示直接回答)
+
+    针对 WeatherAssistant 的两个工具：先为用户提到的每个城市调用 get_weather，
+    拿到天气后再为每个天气结果调用 dress_advice，最后给出文字回答。
+    """
+    names = _tool_names(tools)
+    if not names:
+        return []
+
+    user_text = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    # 工具消息不一定带 name 字段，通过 tool_call_id 反查工具名
+    call_names = {
+        call.get("id"): call.get("function", {}).get("name")
+        for m in messages if m.get("role") == "assistant"
+        for call in m.get("tool_calls") or []
+    }
+    tool_messages = [dict(m, name=m.get("name") or call_names.get(m.get("tool_call_id")))
+                     for m in messages if m.get("role") == "tool"]
+    called = {m.get("name") for m in tool_messages}
+
+    calls = []
+    if "get_weather" in names and "get_weather" not in called:
+        for city in [c for c in KNOWN_CITIES if c in user_text]:
+            calls.append(("get_weather", {"city": city}))
+    elif "dress_advice" in names and "dress_advice" not in called:
+        for message in tool_messages:
+            if message.get("name") != "get_weather":
+                continue
+            try:
+                weather = json.loads(message.get("content") or '""')
+            except json.JSONDecodeError:
+                weather = message.get("content")
+            calls.append(("dress_advice", {"weather": weather}))
+
+    return [
+        {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps(args, ensure_ascii=False)},
+        }
+        for name, args in calls
+    ]
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "_MockHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _write_event(self, body: Any) -> None:
+        data = body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)
+        self._write_chunk(f"data: {data}\n\n".encode("utf-8"))
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock-model", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": f"未知路径: {self.path}"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"未知路径: {self.path}"}})
+            return
+        try:
+            request = json.loads(raw or b"{}")
+        except json.JSONDecodeError as e:
+            self._send_json(400, {"error": {"message": f"请求体不是合法JSON: {e}"}})
+            return
+
+        server = self.server
+        config = server.config
+        server.record_request()
+
+        if config.error_rate and server.random() < config.error_rate:
+            server.record_error()
+            headers = {}
+            if config.retry_after is not None:
+                headers["Retry-After"] = f"{config.retry_after:g}"
+            self._send_json(config.error_status, {
+                "error": {"message": "模拟错误注入", "type": "mock_error", "code": config.error_status}
+            }, headers)
+            return
+
+        messages = request.get("messages") or []
+        tool_calls = plan_tool_calls(messages, request.get("tools"))
+        prompt_tokens = sum(_estimate_tokens(json.dumps(m, ensure_ascii=False)) for m in messages)
+
+        if config.latency:
+            time.sleep(config.latency)
+
+        if request.get("stream"):
+            self._stream_response(request, tool_calls, prompt_tokens)
+        else:
+            self._complete_response(request, tool_calls, prompt_tokens)
+
+    def _base(self, request: Dict[str, Any], obj: str) -> Dict[str, Any]:
+        return {
+            "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+            "object": obj,
+            "created": int(time.time()),
+            "model": request.get("model") or "mock-model",
+        }
+
+    def _complete_response(self, request: Dict[str, Any], tool_calls: List[Dict[str, Any]],
+                           prompt_tokens: int) -> None:
+        config = self.server.config
+        if tool_calls:
+            message = {"role": "assistant", "content": None, "tool_calls": tool_calls}
+            completion_tokens = sum(_estimate_tokens(c["function"]["arguments"]) + 5 for c in tool_calls)
+            finish_reason = "tool_calls"
+        else:
+            message = {"role": "assistant", "content": config.reply_text}
+            completion_tokens = len(_tokenize(config.reply_text))
+            finish_reason = "stop"
+
+        if config.token_rate:
+            time.sleep(completion_tokens / config.token_rate)
+
+        body = self._base(request, "chat.completion")
+        body["choices"] = [{"index": 0, "message": message, "finish_reason": finish_reason}]
+        body["usage"] = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        self._send_json(200, body)
+
+    def _stream_response(self, request: Dict[str, Any], tool_calls: List[Dict[str, Any]],
+                         prompt_tokens: int) -> None:
+        config = self.server.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        base = self._base(request, "chat.completion.chunk")
+        interval = 1.0 / config.token_rate if config.token_rate else 0.0
+        completion_tokens = 0
+
+        def emit(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> None:
+            self._write_event(dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}]))
+
+        try:
+            emit({"role": "assistant", "content": "" if not tool_calls else None})
+            if tool_calls:
+                for index, call in enumerate(tool_calls):
+                    arguments = call["function"]["arguments"]
+                    pieces = max(1, config.tool_arg_pieces)
+                    step = max(1, -(-len(arguments) // pieces))
+                    emit({"tool_calls": [{"index": index, "id": call["id"], "type": "function",
+                                          "function": {"name": call["function"]["name"], "arguments": ""}}]})
+                    for start in range(0, len(arguments), step):
+                        if interval:
+                            time.sleep(interval)
+                        emit({"tool_calls": [{"index": index,
+                                              "function": {"arguments": arguments[start:start + step]}}]})
+                        completion_tokens += 1
+                emit({}, "tool_calls")
+            else:
+                for token in _tokenize(config.reply_text):
+                    if interval:
+                        time.sleep(interval)
+                    emit({"content": token})
+                    completion_tokens += 1
+                emit({}, "stop")
+
+            if (request.get("stream_options") or {}).get("include_usage"):
+                self._write_event(dict(base, choices=[], usage={
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                }))
+            self._write_event("[DONE]")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前断开(例如对冲请求被取消)
+            self.close_connection = True
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, config: MockLLMConfig):
+        super().__init__(address, _MockHandler)
+        self.config = config
+        self._random = random.Random(config.seed)
+        self._stats_lock = threading.Lock()
+        self.request_count = 0
+        self.error_count = 0
+
+    def handle_error(self, request, client_address):
+        # 客户端关闭长连接时的连接重置属于正常现象，不打印堆栈
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+    def random(self) -> float:
+        with self._stats_lock:
+            return self._random.random()
+
+    def record_request(self) -> None:
+        with self._stats_lock:
+            self.request_count += 1
+
+    def record_error(self) -> None:
+        with self._stats_lock:
+            self.error_count += 1
+
+
+class MockLLMServer:
+    """在后台线程运行的模拟服务器，port=0 时自动选择空闲端口"""
+
+    def __init__(self, config: Optional[MockLLMConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockLLMConfig()
+        self._server = _MockHTTPServer((host, port), self.config)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def chat_completions_url(self) -> str:
+        return self.base_url + "/chat/completions"
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self._server.request_count, "errors": self._server.error_count}
+
+    def start(self) -> "MockLLMServer":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, name="mock-llm", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread = None
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容模拟服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="首包时延(秒)")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="每秒生成 token 数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="错误注入概率")
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args()
+
+    config = MockLLMConfig(latency=args.latency, token_rate=args.token_rate, error_rate=args.error_rate,
+                           error_status=args.error_status, retry_after=args.retry_after)
+    server = MockLLMServer(config, args.host, args.port)
+    print(f"模拟服务器已启动: {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+OpenRouterDemo 测试场景的异步批量运行器
+
+把 简单聊天/流式输出/推理聊天 三类场景按 N个场景 × M个模型 并发执行，
+由全局并发上限控制同时在途的请求数，最后输出与 OpenRouterDemo 相同风格的汇总表。
+场景数可以放大到数百个，兼作提供方吞吐探测。
+
+启用共享限流器(LLM_RATE_LIMIT，默认开启)时，每个 提供方/模型 的 AIMD 并发上限初始为 16，
+会同时限制实际在途的请求数；命令行入口因此在创建客户端之前把 --concurrency 写入
+LLM_RATE_LIMIT_<PROVIDER>_CONCURRENCY(已显式设置时以环境变量为准)。
+作为库调用 run_batch 时不会改动共享限流器，需要更高的起步并发请自行设置该环境变量。
+
+在仓库根目录运行:
+    python -m LLM.OpenRouterBatchRunner --models x-ai/grok-4.1-fast openai/gpt-4o-mini --repeat 50 --concurrency 32
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from LLM.ClientFactory import get_async_openai_client, get_provider, load_env
+from LLM.RateLimiter import RateLimitConfig
+from LLM.StreamMetrics import StreamAccumulator, percentile
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScenarioResult:
+    """单次场景执行结果"""
+    scenario: str
+    model: str
+    success: bool
+    latency: float
+    ttft: Optional[float] = None
+    total_tokens: Optional[int] = None
+    error: Optional[str] = None
+
+
+def _describe_error(e: Exception) -> str:
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    prefix = f"HTTP {status} " if status else ""
+    return f"{prefix}{type(e).__name__}: {e}"
+
+
+async def simple_chat(client, model: str) -> Dict:
+    """对应 test_simple_chat"""
+    response = await client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": "Hello! Please introduce yourself briefly."}],
+        temperature=0.7,
+    )
+    return {"total_tokens": response.usage.total_tokens if response.usage else None}
+
+
+async def streaming_chat(client, model: str) -> Dict:
+    """对应 test_streaming_chat，额外记录 TTFT"""
+    accumulator = StreamAccumulator().start()
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": "Tell me a short story about AI in 3 sentences."}],
+        stream=True,
+        stream_options={"include_usage": True},
+        temperature=0.7,
+    )
+    async for chunk in stream:
+        accumulator.add(chunk)
+    result = accumulator.result()
+    total_tokens = (result.usage or {}).get("total_tokens")
+    return {"ttft": result.ttft, "total_tokens": total_tokens}
+
+
+async def reasoning_chat(client, model: str) -> Dict:
+    """对应 test_reasoning_chat：两轮对话，保留推理详情"""
+    question = "How many r's are in the word 'strawberry'?"
+    response = await client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": question}],
+    )
+    assistant_msg = response.choices[0].message
+    messages = [
+        {"role": "user", "content": question},
+        {"role": "assistant", "content": assistant_msg.content},
+        {"role": "user", "content": "Are you sure? Think carefully."},
+    ]
+    reasoning_details = getattr(assistant_msg, "reasoning_details", None)
+    if reasoning_details:
+        messages[1]["reasoning_details"] = reasoning_details
+
+    response2 = await client.chat.completions.create(model=model, messages=messages)
+    return {"total_tokens": response2.usage.total_tokens if response2.usage else None}
+
+
+SCENARIOS: Dict[str, Callable[..., Awaitable[Dict]]] = {
+    "简单聊天": simple_chat,
+    "流式输出": streaming_chat,
+    "推理聊天": reasoning_chat,
+}
+
+
+async def run_one(client, semaphore: asyncio.Semaphore, scenario: str, model: str) -> ScenarioResult:
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            metrics = await SCENARIOS[scenario](client, model)
+            return ScenarioResult(scenario, model, True, time.perf_counter() - start, **metrics)
+        except Exception as e:
+            error = _describe_error(e)
+            logger.error(f"❌ {scenario} [{model}] 失败: {error}")
+            return ScenarioResult(scenario, model, False, time.perf_counter() - start, error=error)
+
+
+async def run_batch(models: List[str],
+                    scenarios: List[str],
+                    repeat: int = 1,
+                    concurrency: int = 16,
+                    provider: str = "openrouter") -> List[ScenarioResult]:
+    """并发运行 scenarios × models × repeat 个任务，同时在途的请求数不超过 concurrency"""
+    client = get_async_openai_client(provider)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [
+        run_one(client, semaphore, scenario, model)
+        for _ in range(repeat)
+        for model in models
+        for scenario in scenarios
+    ]
+    return await asyncio.gather(*tasks)
+
+
+def print_summary(results: List[ScenarioResult], wall_time: float) -> None:
+    """输出汇总表：按 场景×模型 统计成功率和时延分布"""
+    groups: Dict[tuple, List[ScenarioResult]] = defaultdict(list)
+    for result in results:
+        groups[(result.scenario, result.model)].append(result)
+
+    print("\n" + "=" * 100)
+    print("【测试结果汇总】")
+    print("=" * 100)
+    print(f"{'场景':<8} {'模型':<32} {'成功':>9} {'p50':>9} {'p95':>9} {'TTFT p50':>9} {'平均tokens':>10}")
+    for (scenario, model), items in sorted(groups.items()):
+        ok = [r for r in items if r.success]
+        latencies = sorted(r.latency for r in ok)
+        ttfts = sorted(r.ttft for r in ok if r.ttft is not None)
+        tokens = [r.total_tokens for r in ok if r.total_tokens]
+
+        def ms(values, q):
+            value = percentile(values, q)
+            return "N/A" if value is None else f"{value * 1000:.0f}ms"
+
+        avg_tokens = f"{sum(tokens) / len(tokens):.0f}" if tokens else "N/A"
+        print(f"{scenario:<8} {model:<32} {len(ok):>4}/{len(items):<4} {ms(latencies, 50):>9} "
+              f"{ms(latencies, 95):>9} {ms(ttfts, 50):>9} {avg_tokens:>10}")
+
+    success_count = sum(r.success for r in results)
+    total_count = len(results)
+    success_rate = (success_count / total_count) * 100 if total_count else 0.0
+    print(f"\n成功率: {success_count}/{total_count} ({success_rate:.1f}%)")
+    print(f"总耗时: {wall_time:.2f}s, 吞吐: {total_count / wall_time:.1f} 场景/s")
+    logger.info(f"批量运行完成 - 成功率: {success_rate:.1f}%, 耗时: {wall_time:.2f}s")
+
+
+def main():
+    """主函数 - 并发运行所有场景"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    load_env()
+
+    parser = argparse.ArgumentParser(description="OpenRouter 场景异步批量运行器")
+    parser.add_argument("--models", nargs="+", default=[get_provider("openrouter").model],
+                        help="要测试的模型列表")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS),
+                        help="要运行的场景")
+    parser.add_argument("--repeat", type=int, default=1, help="每个 场景×模型 组合重复的次数")
+    parser.add_argument("--concurrency", type=int, default=16, help="全局并发上限")
+    parser.add_argument("--provider", default="openrouter", help="ClientFactory 中的提供方名称")
+    args = parser.parse_args()
+    # 在共享限流器创建之前设置，让 AIMD 从 --concurrency 起步，否则并发会先被压在默认的 16
+    os.environ.setdefault(f"LLM_RATE_LIMIT_{args.provider.upper()}_CONCURRENCY",
+                          str(min(args.concurrency, RateLimitConfig.max_concurrency)))
+
+    total = len(args.models) * len(args.scenarios) * args.repeat
+    print(f"共 {total} 个场景, 并发上限 {args.concurrency}")
+
+    start = time.perf_counter()
+    results = asyncio.run(run_batch(args.models, args.scenarios, args.repeat, args.concurrency, args.provider))
+    print_summary(results, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,30 @@
+"""
+OpenRouter 接口测试：简单聊天、推理聊天、流式输出
+
+导入本模块没有副作用(不加载 .env、不配置日志、不创建客户端)，测试函数可以被压测脚本直接复用。
+运行:
+    python -m LLM.OpenRouterDemo
+    python -m LLM.OpenRouterDemo --tests simple stream
+"""
 import os
 import logging
-from openai import OpenAI
-from dotenv import find_dotenv, load_dotenv
+import argparse
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# 依赖仓库内的其他模块，请在仓库根目录运行: python -m LLM.OpenRouterDemo
+from LLM.ClientFactory import get_openai_client, get_provider, load_env
+from LLM.StreamMetrics import StreamAccumulator
 
-# 加载环境变量(如果使用.env文件)
-load_dotenv(find_dotenv())
+logger = logging.getLogger(__name__)
 
 # OpenRouter配置
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", os.getenv('OPENROUTER_API_KEY'))
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 OPENROUTER_MODEL = "x-ai/grok-4.1-fast"  # 使用可用的模型
 
-# 初始化OpenAI客户端,使用OpenRouter配置
-client = OpenAI(
-    base_url=OPENROUTER_BASE_URL,
-    api_key=OPENROUTER_API_KEY,
-)
 
-logger.info(f"OpenRouter客户端初始化完成 - Model: {OPENROUTER_MODEL}")
+def get_client():
+    """首次调用时加载 .env 并创建 OpenRouter 客户端，之后复用 ClientFactory 中缓存的实例(共享连接池)"""
+    load_env()
+    return get_openai_client("openrouter", api_key=os.getenv("OPENROUTER_API_KEY"),
+                             base_url=get_provider("openrouter").base_url)
 
 
 def test_simple_chat():
@@ -41,7 +41,7 @@ def test_simple_chat():
     
     try:
         # 发送API请求
-        response = client.chat.completions.create(
+        response = get_client().chat.completions.create(
             model=OPENROUTER_MODEL,
             messages=[
                 {
@@ -99,7 +99,7 @@ def test_reasoning_chat():
     try:
         # 第一次API调用 - 带推理
         logger.info("发送第一次推理请求")
-        response = client.chat.completions.create(
+        response = get_client().chat.completions.create(
             model="openai/o1-mini",  # 使用支持推理的模型
             messages=[
                 {
@@ -137,7 +137,7 @@ def test_reasoning_chat():
         if hasattr(assistant_msg, 'reasoning_details') and assistant_msg.reasoning_details:
             messages[1]["reasoning_details"] = assistant_msg.reasoning_details
         
-        response2 = client.chat.completions.create(
+        response2 = get_client().chat.completions.create(
             model="openai/o1-mini",
             messages=messages,
             # extra_body={"reasoning": {"enabled": True}}
@@ -188,8 +188,9 @@ def test_streaming_chat():
     print("="*50)
     
     try:
-        # 发送流式请求
-        response = client.chat.completions.create(
+        # 发送流式请求(计时从发起请求开始，TTFT 包含首包等待时间)
+        accumulator = StreamAccumulator().start()
+        response = get_client().chat.completions.create(
             model=OPENROUTER_MODEL,
             messages=[
                 {
@@ -198,6 +199,7 @@ def test_streaming_chat():
                 }
             ],
             stream=True,  # 启用流式输出
+            stream_options={"include_usage": True},  # 最后一个数据块携带 usage
             temperature=0.7
         )
         
@@ -205,21 +207,15 @@ def test_streaming_chat():
         print("\n✅ 流式请求成功!")
         print("Assistant: ", end="", flush=True)
         
-        # 接收流式数据
-        full_content = ""
-        chunk_count = 0
-        
-        for chunk in response:
-            chunk_count += 1
-            if chunk.choices[0].delta.content is not None:
-                content = chunk.choices[0].delta.content
-                full_content += content
-                print(content, end="", flush=True)
+        # 接收流式数据并记录时延指标
+        result = accumulator.consume(response, on_delta=lambda content: print(content, end="", flush=True))
         
         print()  # 换行
-        logger.info(f"流式输出完成 - 共接收 {chunk_count} 个数据块,总长度: {len(full_content)} 字符")
-        print(f"\n总字符数: {len(full_content)}")
-        print(f"数据块数: {chunk_count}")
+        logger.info(f"流式输出完成 - 共接收 {result.chunk_count} 个数据块,总长度: {len(result.content)} 字符")
+        logger.info(f"流式时延指标 - {result.summary()}")
+        print(f"\n总字符数: {len(result.content)}")
+        print(f"数据块数: {result.chunk_count}")
+        print(f"时延指标: {result.summary()}")
         
         return True
         
@@ -243,21 +239,34 @@ def test_streaming_chat():
         return False
 
 
+TESTS = {
+    "simple": ("简单聊天", test_simple_chat),
+    "stream": ("流式输出", test_streaming_chat),
+    "reasoning": ("推理聊天", test_reasoning_chat),
+}
+
+
 def main():
     """主函数 - 运行所有测试"""
+    parser = argparse.ArgumentParser(description="OpenRouter API 测试演示")
+    parser.add_argument("--tests", nargs="+", choices=list(TESTS), default=list(TESTS))
+    args = parser.parse_args()
+
+    # 配置日志
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    load_env()
     logger.info("OpenRouter演示程序启动")
     print("\n" + "#"*50)
     print("# OpenRouter API 测试演示")
     print("#"*50)
-    print(f"\nAPI地址: {OPENROUTER_BASE_URL}")
+    print(f"\nAPI地址: {get_provider('openrouter').base_url}")
     print(f"默认模型: {OPENROUTER_MODEL}")
     
     # 运行所有测试
-    results = {
-        "简单聊天": test_simple_chat(),
-        "流式输出": test_streaming_chat(),
-        "推理聊天": test_reasoning_chat(),
-    }
+    results = {TESTS[name][0]: TESTS[name][1]() for name in args.tests}
     
     # 总结测试结果
     print("\n" + "="*50)
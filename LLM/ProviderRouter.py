@@ -0,0 +1,359 @@
+"""
+延迟感知的多提供方路由器
+
+为每个 提供方/模型 维护滑动窗口时延和错误率，每次请求发往当前最快的健康后端；
+对尾延迟敏感的请求，如果首个后端超过其 p95 仍未返回，就向次优后端发出对冲请求，
+先返回者胜出，另一个被取消。
+
+用法:
+    router = ProviderRouter([Backend("deepseek", "deepseek-chat"), Backend("openrouter", "x-ai/grok-4.1-fast")])
+    response = router.create(messages=[...], hedge=True)
+    response = await router.acreate(messages=[...])
+"""
+import time
+import asyncio
+import logging
+import threading
+import weakref
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional
+
+from LLM.ClientFactory import (aclose_stream, default_pool_config, get_async_http_client, get_http_client,
+                               get_provider, load_env)
+from LLM.RateLimiter import RetryPolicy, get_rate_limiter, rate_limit_enabled
+from LLM.StreamMetrics import percentile
+
+logger = logging.getLogger(__name__)
+
+# 路由器自己负责对冲和故障转移，限流器不再重试
+NO_RETRY = RetryPolicy(max_retries=0)
+
+
+def _build_client(provider: str, http_client, is_async: bool):
+    """
+    路由器专用的客户端：SDK 和限流器都不重试，也不经过响应缓存
+
+    隐藏的重试(429/5xx 时退避数秒)和缓存命中会混进时延样本和错误率，
+    对冲阈值、摘除和故障转移看到的就不是后端的真实表现。仍共享限流器的 RPM/TPM/并发状态，并接入追踪。
+    """
+    from openai import AsyncOpenAI, OpenAI
+    from LangfuseCourse.Tracing import get_tracer
+
+    config = get_provider(provider)
+    client = (AsyncOpenAI if is_async else OpenAI)(api_key=config.api_key, base_url=config.base_url,
+                                                   max_retries=0, http_client=http_client)
+    if rate_limit_enabled():
+        limiter = get_rate_limiter()
+        wrap = limiter.wrap_async if is_async else limiter.wrap
+        client = wrap(client, provider, NO_RETRY)
+    tracer = get_tracer()
+    if tracer is not None:
+        client = tracer.wrap_async(client) if is_async else tracer.wrap(client)
+    return client
+
+
+@dataclass(frozen=True)
+class Backend:
+    """一个可路由的后端：ClientFactory 中的提供方名称 + 模型"""
+    provider: str
+    model: str
+
+    def __str__(self) -> str:
+        return f"{self.provider}/{self.model}"
+
+
+class BackendStats:
+    """单个后端的滑动窗口统计和熔断状态"""
+
+    def __init__(self, window: int = 200, alpha: float = 0.2,
+                 eject_after: int = 3, eject_seconds: float = 30.0):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.latency_ewma: Optional[float] = None
+        self.error_rate = 0.0
+        self.alpha = alpha
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.hedges_won = 0
+        self._sorted: Optional[List[float]] = None
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, success: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.error_rate = (1 - self.alpha) * self.error_rate + self.alpha * (0.0 if success else 1.0)
+            if success:
+                self.latencies.append(latency)
+                self._sorted = None
+                self._update_ewma(latency)
+                self.consecutive_failures = 0
+            else:
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= self.eject_after:
+                    # 连续失败的后端暂时摘除，冷却结束后重新参与路由
+                    self.ejected_until = time.monotonic() + self.eject_seconds
+                    self.consecutive_failures = 0
+
+    def _update_ewma(self, latency: float) -> None:
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma = (1 - self.alpha) * self.latency_ewma + self.alpha * latency
+
+    def record_cancelled(self, elapsed: float) -> None:
+        """对冲落败被取消的请求：真实时延至少为 elapsed，作为删失样本计入 EWMA"""
+        with self._lock:
+            if self.latency_ewma is None or elapsed > self.latency_ewma:
+                self._update_ewma(elapsed)
+
+    def record_hedge_win(self) -> None:
+        with self._lock:
+            self.hedges_won += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if self._sorted is None:
+                self._sorted = sorted(self.latencies)
+            return percentile(self._sorted, q)
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def score(self) -> float:
+        """
+        越小越好：时延 EWMA 按错误率加权；没有样本的后端得分为0，优先探测
+
+        排序用 EWMA 而不是窗口 p50，后端变慢时几次请求内就会被换下；窗口分位数只用于对冲阈值。
+        """
+        if self.latency_ewma is None:
+            return 0.0
+        return self.latency_ewma * (1.0 + 4.0 * self.error_rate)
+
+
+class ProviderRouter:
+    """按实时时延/错误率选择后端，并支持对冲请求"""
+
+    def __init__(self,
+                 backends: List[Backend],
+                 hedge: bool = True,
+                 hedge_quantile: float = 95,
+                 min_hedge_delay: float = 0.05,
+                 default_hedge_delay: float = 2.0,
+                 max_workers: int = 64):
+        """
+        Args:
+            backends: 候选后端列表
+            hedge: 默认是否启用对冲请求
+            hedge_quantile: 首个请求超过该分位时延仍未返回时发出对冲请求
+            min_hedge_delay: 对冲等待时间下限，防止样本很少时过早对冲
+            default_hedge_delay: 还没有时延样本时使用的对冲等待时间
+            max_workers: 同步接口使用的线程池大小
+        """
+        if not backends:
+            raise ValueError("至少需要一个后端")
+        # 没有独立的命令行入口，创建路由器时加载 .env，各后端的 API Key 才能从 .env 读到
+        load_env()
+        self.backends = list(backends)
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.min_hedge_delay = min_hedge_delay
+        self.default_hedge_delay = default_hedge_delay
+        self.stats: Dict[Backend, BackendStats] = {b: BackendStats() for b in self.backends}
+        self.hedges_sent = 0
+        self._stats_lock = threading.Lock()
+        self._clients: Dict[str, Any] = {}
+        # 异步连接池绑定事件循环，客户端也按事件循环分别缓存
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = \
+            weakref.WeakKeyDictionary()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="router")
+
+    def rank(self) -> List[Backend]:
+        """按得分排序的后端列表，健康后端在前"""
+        return sorted(self.backends, key=lambda b: (not self.stats[b].healthy, self.stats[b].score()))
+
+    def hedge_delay(self, backend: Backend) -> float:
+        p = self.stats[backend].quantile(self.hedge_quantile)
+        if p is None:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, p)
+
+    def _count_hedge(self) -> None:
+        # 同步接口在多个线程中调用，+= 不是原子操作
+        with self._stats_lock:
+            self.hedges_sent += 1
+
+    def _record(self, backend: Backend, started_at: float, success: bool) -> None:
+        self.stats[backend].record(time.perf_counter() - started_at, success)
+
+    def _client(self, provider: str):
+        with self._stats_lock:
+            client = self._clients.get(provider)
+            if client is None:
+                client = self._clients[provider] = _build_client(
+                    provider, get_http_client(default_pool_config()), is_async=False)
+            return client
+
+    def _async_client(self, provider: str):
+        loop = asyncio.get_running_loop()
+        clients = self._async_clients.setdefault(loop, {})
+        client = clients.get(provider)
+        if client is None:
+            client = clients[provider] = _build_client(
+                provider, get_async_http_client(default_pool_config()), is_async=True)
+        return client
+
+    # ---------------- 同步接口 ----------------
+
+    def _call(self, backend: Backend, params: Dict[str, Any]) -> Any:
+        client = self._client(backend.provider)
+        started_at = time.perf_counter()
+        try:
+            response = client.chat.completions.create(**dict(params, model=backend.model))
+        except Exception:
+            self._record(backend, started_at, False)
+            raise
+        self._record(backend, started_at, True)
+        return response
+
+    @staticmethod
+    def _discard(future: Future) -> None:
+        """对冲失败的一方：尚未开始的直接取消，已返回的流式响应关闭连接"""
+        if future.cancel():
+            return
+
+        def close(f: Future) -> None:
+            if f.exception() is None and hasattr(f.result(), "close"):
+                f.result().close()
+
+        future.add_done_callback(close)
+
+    def create(self, hedge: Optional[bool] = None, **params) -> Any:
+        """
+        同步发送请求(params 不需要包含 model，由路由结果决定)
+
+        同步客户端无法中断已经发出的 HTTP 请求，落败的一方会在后台完成后被丢弃。
+        """
+        hedge = self.hedge if hedge is None else hedge
+        ranked = self.rank()
+        pending: Dict[Future, Backend] = {}
+        primary = ranked[0]
+        pending[self._executor.submit(self._call, primary, params)] = primary
+        remaining = ranked[1:]
+        last_error: Optional[Exception] = None
+
+        timeout = self.hedge_delay(primary) if hedge and remaining else None
+        while pending:
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # 首个请求超过 p95 仍未返回，向次优后端发出对冲请求
+                backend = remaining.pop(0)
+                self._count_hedge()
+                logger.info(f"{primary} 超过 {timeout * 1000:.0f}ms 未返回，向 {backend} 发出对冲请求")
+                pending[self._executor.submit(self._call, backend, params)] = backend
+                timeout = None
+                continue
+
+            for future in done:
+                backend = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    if backend is not primary:
+                        self.stats[backend].record_hedge_win()
+                    for loser in pending:
+                        self._discard(loser)
+                    return future.result()
+                last_error = error
+                logger.warning(f"{backend} 请求失败: {type(error).__name__}: {error}")
+
+            if not pending and remaining:
+                # 全部在途请求都失败了，故障转移到下一个后端
+                backend = remaining.pop(0)
+                pending[self._executor.submit(self._call, backend, params)] = backend
+                timeout = self.hedge_delay(backend) if hedge and remaining else None
+
+        raise last_error
+
+    # ---------------- 异步接口 ----------------
+
+    async def _acall(self, backend: Backend, params: Dict[str, Any]) -> Any:
+        client = self._async_client(backend.provider)
+        started_at = time.perf_counter()
+        try:
+            response = await client.chat.completions.create(**dict(params, model=backend.model))
+        except asyncio.CancelledError:
+            self.stats[backend].record_cancelled(time.perf_counter() - started_at)
+            raise
+        except Exception:
+            self._record(backend, started_at, False)
+            raise
+        self._record(backend, started_at, True)
+        return response
+
+    async def acreate(self, hedge: Optional[bool] = None, **params) -> Any:
+        """异步发送请求，落败的对冲请求会被真正取消(关闭连接)"""
+        hedge = self.hedge if hedge is None else hedge
+        ranked = self.rank()
+        primary = ranked[0]
+        remaining = ranked[1:]
+        pending: Dict[asyncio.Task, Backend] = {asyncio.ensure_future(self._acall(primary, params)): primary}
+        last_error: Optional[BaseException] = None
+        timeout = self.hedge_delay(primary) if hedge and remaining else None
+
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    backend = remaining.pop(0)
+                    self._count_hedge()
+                    logger.info(f"{primary} 超过 {timeout * 1000:.0f}ms 未返回，向 {backend} 发出对冲请求")
+                    pending[asyncio.ensure_future(self._acall(backend, params))] = backend
+                    timeout = None
+                    continue
+
+                for task in done:
+                    backend = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if backend is not primary:
+                            self.stats[backend].record_hedge_win()
+                        return task.result()
+                    last_error = error
+                    logger.warning(f"{backend} 请求失败: {type(error).__name__}: {error}")
+
+                if not pending and remaining:
+                    backend = remaining.pop(0)
+                    pending[asyncio.ensure_future(self._acall(backend, params))] = backend
+                    timeout = self.hedge_delay(backend) if hedge and remaining else None
+        finally:
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None and hasattr(task.result(), "close"):
+                    # 与胜出者在同一轮完成的另一个请求：关闭它的流式响应，释放连接和限流名额
+                    await aclose_stream(task.result())
+
+        raise last_error
+
+    def summary(self) -> Dict[str, Any]:
+        """各后端的统计快照"""
+        result = {}
+        for backend in self.backends:
+            stats = self.stats[backend]
+            p50, p95 = stats.quantile(50), stats.quantile(95)
+            result[str(backend)] = {
+                "requests": stats.requests,
+                "p50_ms": None if p50 is None else round(p50 * 1000, 1),
+                "p95_ms": None if p95 is None else round(p95 * 1000, 1),
+                "ewma_ms": None if stats.latency_ewma is None else round(stats.latency_ewma * 1000, 1),
+                "error_rate": round(stats.error_rate, 3),
+                "healthy": stats.healthy,
+                "hedges_won": stats.hedges_won,
+            }
+        with self._stats_lock:
+            result["hedges_sent"] = self.hedges_sent
+        return result
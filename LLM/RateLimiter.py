@@ -0,0 +1,516 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from LLM.ClientFactory import aclose_stream, wrap_chat_create
+
+logger = logging.getLogger(__name__)
+
+# 需要退避重试的状态码；其中 429/503 同时视为过载信号
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+OVERLOAD_STATUS = {429, 503}
+
+
+class TokenBucket:
+    """
+    令牌桶：capacity 为突发上限，refill_per_second 为补充速率
+
+    reserve() 立即扣减令牌(余额可以为负，表示预支)，返回调用方需要等待的秒数，
+    这样多个等待者会按到达顺序自然排队，而不会在令牌补充时一拥而上。
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+        self._updated_at = now
+
+    def reserve(self, amount: float) -> float:
+        """预订 amount 个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= min(amount, self.capacity)
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.refill_per_second
+
+    def adjust(self, delta: float) -> None:
+        """用实际用量修正预估值，delta>0 表示多扣，<0 表示退还"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+
+class AIMDLimiter:
+    """
+    AIMD 自适应并发限制
+
+    每次成功把上限加 1/limit(约等于每轮往返 +1)，遇到 429/5xx 过载时乘以 decrease_factor，
+    使并发在提供方的承载上限附近振荡，而不是固定一个保守值。
+
+    一次突发过载会让同一批在途请求几乎同时失败，如果每个失败都减半，上限会被连续乘上几十次 0.5。
+    因此每个窗口最多减一次：距离上次缩减不足一个平滑往返时间(srtt)的过载信号、
+    以及缩减之前就已发出的请求报告的过载(它们反映的是缩减前的并发)都直接忽略。
+    decrease_factor 默认 0.9 而不是 TCP 的 0.5：限流错误里总有一部分与本地并发无关，
+    每个往返减半会让上限长期停在 1/错误率 附近。
+    """
+
+    def __init__(self, initial: int = 16, minimum: int = 1, maximum: int = 256,
+                 decrease_factor: float = 0.9, initial_rtt: float = 0.1):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.inflight = 0
+        self.srtt = initial_rtt
+        self.decreases = 0
+        self._last_decrease = float("-inf")
+        self._cond = threading.Condition()
+        # 等待名额的协程，按到达顺序排队，由 release() 直接唤醒
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if not self._waiters and self.inflight < int(self.limit):
+                self.inflight += 1
+                return True
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            # 已经排队的协程优先，线程不插队
+            while self._waiters or self.inflight >= int(self.limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.inflight += 1
+            return True
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if not self._waiters and self.inflight < int(self.limit):
+                self.inflight += 1
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._cond:
+                try:
+                    self._waiters.remove(waiter)
+                    granted = False
+                except ValueError:
+                    granted = True
+            if granted:
+                # 名额已经分配给这个协程，取消时要还回去
+                self.release(success=False)
+            raise
+
+    def _wake_waiters(self) -> None:
+        """在持有 _cond 时调用：按 FIFO 把空出来的名额直接交给排队的协程"""
+        while self._waiters and self.inflight < int(self.limit):
+            loop, future = self._waiters.popleft()
+            self.inflight += 1
+            try:
+                loop.call_soon_threadsafe(_grant, future)
+            except RuntimeError:
+                # 事件循环已关闭，名额无人领取
+                self.inflight -= 1
+        if not self._waiters:
+            self._cond.notify_all()
+
+    def release(self, overloaded: bool = False, success: bool = True,
+                started_at: Optional[float] = None) -> None:
+        """
+        归还名额并调整上限
+
+        Args:
+            overloaded: 本次请求收到过载信号(429/503/5xx/连接错误)
+            success: 本次请求成功
+            started_at: 请求发出的时间(time.monotonic())，用于判断过载信号是否早于上一次缩减
+        """
+        now = time.monotonic()
+        with self._cond:
+            self.inflight -= 1
+            if overloaded:
+                stale = now - self._last_decrease < self.srtt
+                if started_at is not None:
+                    stale = stale or started_at <= self._last_decrease
+                if not stale:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self.decreases += 1
+            elif success:
+                if started_at is not None:
+                    self.srtt += 0.125 * ((now - started_at) - self.srtt)
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._wake_waiters()
+
+
+def _grant(future: asyncio.Future) -> None:
+    if future.cancelled():
+        # 唤醒回调执行前协程已被取消，acquire_async 中已经把名额还回
+        return
+    future.set_result(None)
+
+
+@dataclass(frozen=True)
+class RateLimitConfig:
+    """单个 提供方/模型 的限流配置，rpm/tpm 为 None 表示不限制"""
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
+    initial_concurrency: int = 16
+    min_concurrency: int = 1
+    max_concurrency: int = 256
+    decrease_factor: float = 0.9
+
+    @classmethod
+    def from_env(cls, provider: str) -> "RateLimitConfig":
+        """读取 LLM_RATE_LIMIT_<PROVIDER>_RPM / _TPM / _CONCURRENCY 环境变量"""
+        prefix = f"LLM_RATE_LIMIT_{provider.upper()}_"
+
+        def number(name: str, cast=float):
+            value = os.getenv(prefix + name)
+            return cast(value) if value else None
+
+        concurrency = number("CONCURRENCY", int)
+        return cls(rpm=number("RPM"), tpm=number("TPM"),
+                   initial_concurrency=concurrency or cls.initial_concurrency)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """带抖动的指数退避重试策略"""
+    max_retries: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+
+    def backoff(self, attempt: int) -> float:
+        # full jitter：在 [0, base*2^attempt] 内均匀取值，避免大量请求同时重试
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def parse_retry_after(error: Exception) -> Optional[float]:
+    """从错误响应的 Retry-After / retry-after-ms 头中解析等待秒数"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def classify_error(error: Exception) -> Tuple[bool, bool]:
+    """返回 (是否可重试, 是否为过载信号)"""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS, status in OVERLOAD_STATUS or status >= 500
+    # 没有状态码的连接错误/超时也值得重试，并视为过载信号
+    name = type(error).__name__
+    retryable = name in ("APIConnectionError", "APITimeoutError") or isinstance(error, (ConnectionError, TimeoutError))
+    return retryable, retryable
+
+
+def estimate_tokens(params: Dict[str, Any]) -> int:
+    """粗略估计一次请求消耗的 token(约4字符1个token)，用于 TPM 预扣"""
+    size = 0
+    for message in params.get("messages") or []:
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+        size += len(content) if isinstance(content, str) else 64
+    completion = params.get("max_tokens") or params.get("max_completion_tokens") or 256
+    return size // 4 + completion
+
+
+class _Slot:
+    """一次请求占用的限流资源，负责用实际 usage 修正 TPM 并归还并发名额"""
+
+    def __init__(self, limiter: "ProviderLimiter", estimated_tokens: int):
+        self.limiter = limiter
+        self.estimated_tokens = estimated_tokens
+        self.started_at = time.monotonic()
+        self._released = False
+
+    def release(self, overloaded: bool = False, success: bool = True, usage: Any = None) -> None:
+        if self._released:
+            return
+        self._released = True
+        total_tokens = getattr(usage, "total_tokens", None) if usage is not None else None
+        if total_tokens is not None and self.limiter.tpm_bucket is not None:
+            self.limiter.tpm_bucket.adjust(total_tokens - self.estimated_tokens)
+        self.limiter.concurrency.release(overloaded=overloaded, success=success, started_at=self.started_at)
+
+
+class ProviderLimiter:
+    """单个 提供方/模型 的组合限流器：RPM 令牌桶 + TPM 令牌桶 + AIMD 并发 + 429 冷却"""
+
+    def __init__(self, config: RateLimitConfig):
+        self.config = config
+        self.rpm_bucket = TokenBucket(config.rpm, config.rpm / 60.0) if config.rpm else None
+        self.tpm_bucket = TokenBucket(config.tpm, config.tpm / 60.0) if config.tpm else None
+        self.concurrency = AIMDLimiter(config.initial_concurrency, config.min_concurrency,
+                                       config.max_concurrency, config.decrease_factor)
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def cooldown(self, seconds: float) -> None:
+        """收到 Retry-After 后，该 提供方/模型 的所有调用方都暂停到指定时间"""
+        with self._lock:
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + seconds)
+
+    def _wait_time(self, estimated_tokens: int) -> float:
+        wait = max(0.0, self._cooldown_until - time.monotonic())
+        if self.rpm_bucket is not None:
+            wait = max(wait, self.rpm_bucket.reserve(1))
+        if self.tpm_bucket is not None:
+            wait = max(wait, self.tpm_bucket.reserve(estimated_tokens))
+        return wait
+
+    def acquire(self, estimated_tokens: int) -> _Slot:
+        wait = self._wait_time(estimated_tokens)
+        if wait > 0:
+            time.sleep(wait)
+        self.concurrency.acquire()
+        return _Slot(self, estimated_tokens)
+
+    async def acquire_async(self, estimated_tokens: int) -> _Slot:
+        wait = self._wait_time(estimated_tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        await self.concurrency.acquire_async()
+        return _Slot(self, estimated_tokens)
+
+
+class _LimitedStream:
+    """
+    流式响应在完整消费、提前退出或关闭后归还并发名额
+
+    提前 break 时迭代器一被释放，事件循环的 asyncgen 钩子就会 aclose 它(不需要等 GC)，
+    finally 中先同步归还名额，再关闭内层流释放 HTTP 连接。
+    """
+
+    def __init__(self, stream, slot: _Slot):
+        self._stream = stream
+        self._slot = slot
+
+    def __iter__(self):
+        usage = None
+        completed = False
+        try:
+            for chunk in self._stream:
+                usage = getattr(chunk, "usage", None) or usage
+                yield chunk
+            completed = True
+        finally:
+            self._slot.release(usage=usage)
+            if not completed:
+                self._stream.close()
+
+    async def __aiter__(self):
+        usage = None
+        completed = False
+        try:
+            async for chunk in self._stream:
+                usage = getattr(chunk, "usage", None) or usage
+                yield chunk
+            completed = True
+        finally:
+            self._slot.release(usage=usage)
+            if not completed:
+                await aclose_stream(self._stream)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def close(self) -> Any:
+        """与内层流一致：包装异步流时返回需要 await 的协程"""
+        self._slot.release()
+        return self._stream.close()
+
+    async def aclose(self) -> None:
+        self._slot.release()
+        await aclose_stream(self._stream)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class RateLimiter:
+    """
+    所有 chat 调用共享的限流器，按 (提供方, 模型) 分别维护状态
+
+    请求前等待 RPM/TPM 令牌和并发名额；遇到 429/5xx 时按 Retry-After(没有则按抖动指数退避)重试，
+    同时缩小并发上限；成功后逐步放大，从而在突发流量下贴近提供方配额而不是直接失败。
+    """
+
+    def __init__(self, retry: Optional[RetryPolicy] = None,
+                 configs: Optional[Dict[str, RateLimitConfig]] = None):
+        self.retry = retry or RetryPolicy()
+        self.configs = configs or {}
+        self._limiters: Dict[Tuple[str, str], ProviderLimiter] = {}
+        self._lock = threading.Lock()
+        self.retries = 0
+
+    def limiter_for(self, provider: str, model: Optional[str]) -> ProviderLimiter:
+        key = (provider, model or "")
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                config = self.configs.get(provider) or RateLimitConfig.from_env(provider)
+                limiter = ProviderLimiter(config)
+                self._limiters[key] = limiter
+            return limiter
+
+    def _on_error(self, limiter: ProviderLimiter, slot: _Slot, error: Exception, attempt: int,
+                  retry: RetryPolicy) -> float:
+        """归还名额并返回重试前需要等待的秒数，不可重试时重新抛出异常"""
+        retryable, overloaded = classify_error(error)
+        slot.release(overloaded=overloaded, success=False)
+        if not retryable or attempt >= retry.max_retries:
+            raise error
+        retry_after = parse_retry_after(error)
+        if retry_after is not None:
+            limiter.cooldown(retry_after)
+            delay = retry_after
+        else:
+            delay = retry.backoff(attempt)
+        with self._lock:
+            self.retries += 1
+        logger.warning(f"请求失败将在 {delay:.2f}s 后重试(第{attempt + 1}次): "
+                       f"{type(error).__name__} 状态码={_status_code(error)}, "
+                       f"当前并发上限={limiter.concurrency.limit:.1f}")
+        return delay
+
+    def create(self, provider: str, original_create: Callable[..., Any],
+               retry: Optional[RetryPolicy] = None, **params) -> Any:
+        """retry 为 None 时使用 self.retry"""
+        retry = retry or self.retry
+        limiter = self.limiter_for(provider, params.get("model"))
+        estimated = estimate_tokens(params)
+        attempt = 0
+        while True:
+            slot = limiter.acquire(estimated)
+            try:
+                response = original_create(**params)
+            except Exception as e:
+                time.sleep(self._on_error(limiter, slot, e, attempt, retry))
+                attempt += 1
+                continue
+            if params.get("stream"):
+                return _LimitedStream(response, slot)
+            slot.release(usage=getattr(response, "usage", None))
+            return response
+
+    async def acreate(self, provider: str, original_create: Callable[..., Any],
+                      retry: Optional[RetryPolicy] = None, **params) -> Any:
+        retry = retry or self.retry
+        limiter = self.limiter_for(provider, params.get("model"))
+        estimated = estimate_tokens(params)
+        attempt = 0
+        while True:
+            slot = await limiter.acquire_async(estimated)
+            try:
+                response = await original_create(**params)
+            except asyncio.CancelledError:
+                slot.release(success=False)
+                raise
+            except Exception as e:
+                await asyncio.sleep(self._on_error(limiter, slot, e, attempt, retry))
+                attempt += 1
+                continue
+            if params.get("stream"):
+                return _LimitedStream(response, slot)
+            slot.release(usage=getattr(response, "usage", None))
+            return response
+
+    def wrap(self, client, provider: str, retry: Optional[RetryPolicy] = None):
+        """
+        返回经过限流的客户端代理
+
+        retry 只对这个客户端生效，例如自己负责故障转移的调用方可以传 RetryPolicy(max_retries=0)，
+        仍然共享同一 提供方/模型 的 RPM/TPM 和并发状态。
+        """
+        return wrap_chat_create(client, lambda original, **params: self.create(provider, original, retry, **params))
+
+    def wrap_async(self, client, provider: str, retry: Optional[RetryPolicy] = None):
+        """返回经过限流的异步客户端代理，retry 的含义同 wrap()"""
+        return wrap_chat_create(client, lambda original, **params: self.acreate(provider, original, retry, **params))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "retries": self.retries,
+                "limiters": {
+                    f"{provider}/{model}": {
+                        "concurrency_limit": round(limiter.concurrency.limit, 2),
+                        "decreases": limiter.concurrency.decreases,
+                        "inflight": limiter.concurrency.inflight,
+                    }
+                    for (provider, model), limiter in self._limiters.items()
+                },
+            }
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """进程内共享的限流器"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
+
+
+def rate_limit_enabled() -> bool:
+    """LLM_RATE_LIMIT=0 时关闭限流，退回 SDK 自带的重试"""
+    return os.getenv("LLM_RATE_LIMIT", "1") not in ("0", "false", "False")
@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from LLM.ClientFactory import aclose_stream, wrap_chat_create
+from LLM.Serialization import to_jsonable
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("off", "auto", "record", "replay")
+
+# 不影响模型输出的参数不参与缓存键计算
+_IGNORED_PARAMS = {"timeout", "extra_headers", "extra_query", "stream_options", "user"}
+
+
+class CacheMissError(LookupError):
+    """replay 模式下请求未命中缓存"""
+
+
+class _ReplayStream:
+    """按数据块回放缓存的流式响应，同时支持同步和异步迭代"""
+
+    def __init__(self, chunks: List[Any]):
+        self._chunks = chunks
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._chunks)
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            yield chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+
+class _RecordingStream:
+    """
+    透传真实的流式响应，内层流完整结束后把所有数据块写入缓存
+
+    提前 break、出错或中途关闭的流不写入缓存，并关闭内层流释放连接；写缓存失败只记录警告，不影响调用方。
+    """
+
+    def __init__(self, stream, on_complete: Callable[[List[str]], None]):
+        self._stream = stream
+        self._on_complete = on_complete
+
+    def _save(self, lines: List[str]) -> None:
+        try:
+            self._on_complete(lines)
+        except Exception as e:
+            logger.warning(f"流式响应写入缓存失败: {e}")
+
+    def __iter__(self) -> Iterator[Any]:
+        lines = []
+        completed = False
+        try:
+            for chunk in self._stream:
+                lines.append(chunk.model_dump_json())
+                yield chunk
+            completed = True
+        finally:
+            if completed:
+                self._save(lines)
+            else:
+                self._stream.close()
+
+    async def __aiter__(self):
+        lines = []
+        completed = False
+        try:
+            async for chunk in self._stream:
+                lines.append(chunk.model_dump_json())
+                yield chunk
+            completed = True
+        finally:
+            if completed:
+                self._save(lines)
+            else:
+                await aclose_stream(self._stream)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def close(self) -> Any:
+        """与内层流一致：包装异步流时返回需要 await 的协程"""
+        return self._stream.close()
+
+    async def aclose(self) -> None:
+        await aclose_stream(self._stream)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class ResponseCache:
+    """
+    chat.completions 的磁盘响应缓存(SQLite)
+
+    缓存键是 model、messages、tools 和采样参数的规范化 JSON 的 SHA-256。
+    模式:
+        auto   - 命中则直接返回，未命中时请求接口并写入缓存
+        record - 总是请求接口，并覆盖写入缓存
+        replay - 只读缓存，未命中抛出 CacheMissError，可完全离线运行
+        off    - 不使用缓存
+    流式响应按数据块保存，命中时逐块回放；只有完整消费完的流才会被写入缓存。
+    """
+
+    def __init__(self, path: str = ".llm_cache.sqlite", mode: str = "auto"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"未知的缓存模式: {mode}，可选: {', '.join(CACHE_MODES)}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, kind TEXT NOT NULL, model TEXT, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """根据 LLM_CACHE_MODE / LLM_CACHE_PATH 环境变量创建缓存，未开启时返回 None"""
+        mode = os.getenv("LLM_CACHE_MODE", "off").lower()
+        if mode == "off":
+            return None
+        return cls(os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite"), mode)
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        """计算请求参数的规范化哈希"""
+        canonical = {k: v for k, v in params.items() if k not in _IGNORED_PARAMS and v is not None}
+        canonical["stream"] = bool(params.get("stream"))
+        text = json.dumps(canonical, sort_keys=True, ensure_ascii=False,
+                          separators=(",", ":"), default=to_jsonable)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT kind, payload FROM responses WHERE key = ?", (key,)).fetchone()
+        return row
+
+    def put(self, key: str, kind: str, model: Optional[str], payload: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, kind, model, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, model, payload, time.time()),
+            )
+            self.writes += 1
+
+    def _lookup(self, params: Dict[str, Any]) -> Tuple[str, Any]:
+        """返回 (key, 命中的响应对象或 None)"""
+        key = self.make_key(params)
+        if self.mode == "record":
+            return key, None
+
+        row = self.get(key)
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            if self.mode == "replay":
+                raise CacheMissError(f"replay 模式下未命中缓存: model={params.get('model')}, key={key[:12]}")
+            return key, None
+
+        with self._lock:
+            self.hits += 1
+        kind, payload = row
+        return key, self._decode(kind, payload)
+
+    @staticmethod
+    def _decode(kind: str, payload: str) -> Any:
+        from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+        if kind == "stream":
+            return _ReplayStream([ChatCompletionChunk.model_validate_json(line)
+                                  for line in payload.split("\n") if line])
+        return ChatCompletion.model_validate_json(payload)
+
+    def _record_stream(self, key: str, model: Optional[str], stream) -> _RecordingStream:
+        return _RecordingStream(stream, lambda lines: self.put(key, "stream", model, "\n".join(lines)))
+
+    def create(self, original_create: Callable[..., Any], **params) -> Any:
+        """带缓存的 chat.completions.create"""
+        if self.mode == "off":
+            return original_create(**params)
+        key, cached = self._lookup(params)
+        if cached is not None:
+            return cached
+
+        response = original_create(**params)
+        model = params.get("model")
+        if params.get("stream"):
+            return self._record_stream(key, model, response)
+        self.put(key, "completion", model, response.model_dump_json())
+        return response
+
+    async def acreate(self, original_create: Callable[..., Any], **params) -> Any:
+        """异步版本，用于 AsyncOpenAI 客户端"""
+        if self.mode == "off":
+            return await original_create(**params)
+        key, cached = self._lookup(params)
+        if cached is not None:
+            return cached
+
+        response = await original_create(**params)
+        model = params.get("model")
+        if params.get("stream"):
+            return self._record_stream(key, model, response)
+        self.put(key, "completion", model, response.model_dump_json())
+        return response
+
+    def wrap(self, client):
+        """返回挂载了缓存的客户端代理"""
+        return wrap_chat_create(client, self.create)
+
+    def wrap_async(self, client):
+        """返回挂载了缓存的异步客户端代理"""
+        return wrap_chat_create(client, self.acreate)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "mode": self.mode,
+                "size": size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
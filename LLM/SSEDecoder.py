@@ -0,0 +1,167 @@
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SSEEvent(NamedTuple):
+    """一条完整的 Server-Sent Event"""
+    event: str
+    data: str
+    id: Optional[str] = None
+
+
+class SSEDecoder:
+    """
+    增量式 SSE 解码器
+
+    原始实现每收到一个数据块就执行 buffer += chunk 和 buffer.split(b"\\n", 1)，
+    每次都会复制剩余缓冲区，数据块较大时总复制量为 O(n²)。
+    这里改为在 bytearray 上维护读游标，按 memoryview 切片解析每一行：
+    - 已处理的字节只在超过缓冲区一半时才整体丢弃，摊还后每个字节最多移动一次
+    - 未完成的行记录已扫描位置，下次从断点继续查找换行符
+    - 只对完整的行做 UTF-8 解码，跨数据块被截断的多字节字符自然被正确拼接
+    - 多个 data: 行按 SSE 规范以 "\\n" 拼接，遇到空行才派发事件
+    - feed()/close() 调用时立即写入缓冲区并解析，返回事件列表；调用方不遍历返回值也不会丢失数据
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0
+        self._scan = 0
+        self._event = ""
+        self._data_lines: List[str] = []
+        self._last_id: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        """送入一个数据块，返回其中已完整的事件"""
+        events: List[SSEEvent] = []
+        if not chunk:
+            return events
+        buf = self._buf
+        buf += chunk
+
+        while True:
+            end = buf.find(b"\n", self._scan)
+            if end < 0:
+                self._scan = len(buf)
+                break
+            line_end = end
+            if line_end > self._pos and buf[line_end - 1] == 0x0D:  # \r\n
+                line_end -= 1
+            event = self._process_line(self._pos, line_end)
+            self._pos = self._scan = end + 1
+            if event is not None:
+                events.append(event)
+
+        self._compact()
+        return events
+
+    def close(self) -> List[SSEEvent]:
+        """流结束时调用，派发末尾没有空行结尾的事件"""
+        events: List[SSEEvent] = []
+        if self._pos < len(self._buf):
+            line_end = len(self._buf)
+            if self._buf[line_end - 1] == 0x0D:
+                line_end -= 1
+            event = self._process_line(self._pos, line_end)
+            self._pos = self._scan = len(self._buf)
+            if event is not None:
+                events.append(event)
+        event = self._dispatch()
+        if event is not None:
+            events.append(event)
+        self._compact()
+        return events
+
+    def _compact(self) -> None:
+        """丢弃已处理的字节；只有已处理部分超过一半时才移动数据"""
+        if self._pos == 0:
+            return
+        if self._pos == len(self._buf):
+            self._buf.clear()
+            self._pos = self._scan = 0
+        elif self._pos * 2 >= len(self._buf):
+            del self._buf[:self._pos]
+            self._scan -= self._pos
+            self._pos = 0
+
+    def _process_line(self, start: int, end: int) -> Optional[SSEEvent]:
+        if start == end:
+            return self._dispatch()
+
+        buf = self._buf
+        # 快速路径：绝大多数行是 "data: {...}"
+        if buf.startswith(b"data: ", start, end):
+            with memoryview(buf) as view:
+                self._data_lines.append(str(view[start + 6:end], "utf-8", "replace"))
+            return None
+
+        with memoryview(buf) as view:
+            line = view[start:end]
+            if line[0] == 0x3A:  # ":" 开头的注释行，常用于心跳
+                return None
+
+            colon = self._buf.find(b":", start, end)
+            if colon < 0:
+                field = str(line, "utf-8", "replace")
+                value = ""
+            else:
+                field = str(view[start:colon], "utf-8", "replace")
+                value_start = colon + 1
+                if value_start < end and self._buf[value_start] == 0x20:
+                    value_start += 1
+                value = str(view[value_start:end], "utf-8", "replace")
+
+        if field == "data":
+            self._data_lines.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id":
+            self._last_id = value
+        return None
+
+    def _dispatch(self) -> Optional[SSEEvent]:
+        if not self._data_lines:
+            self._event = ""
+            return None
+        event = SSEEvent(self._event or "message", "\n".join(self._data_lines), self._last_id)
+        self._event = ""
+        self._data_lines = []
+        return event
+
+
+def iter_sse_events(chunks: Iterable[bytes]) -> Iterator[SSEEvent]:
+    """将字节块流解码为 SSE 事件"""
+    decoder = SSEDecoder()
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    yield from decoder.close()
+
+
+def iter_sse_json(chunks: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """
+    解码 OpenAI 兼容的流式响应，逐条返回 JSON 数据块，遇到 [DONE] 结束
+
+    无法解析的事件会记录警告后跳过，而不是被静默吞掉。
+    """
+    for event in iter_sse_events(chunks):
+        data = event.data
+        if data == "[DONE]":
+            return
+        try:
+            yield json.loads(data)
+        except json.JSONDecodeError as e:
+            logger.warning(f"跳过无法解析的SSE事件: {e} - {data[:200]!r}")
+
+
+def iter_delta_content(chunks: Iterable[bytes]) -> Iterator[str]:
+    """只返回 choices[0].delta.content 中的增量文本"""
+    for chunk_json in iter_sse_json(chunks):
+        choices = chunk_json.get("choices") or []
+        if not choices:
+            continue
+        content = (choices[0].get("delta") or {}).get("content")
+        if content:
+            yield content
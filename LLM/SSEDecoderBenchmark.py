@@ -0,0 +1,91 @@
+"""
+SSE 解析性能对比：OneAPI测试.py 中原有的 buffer 拼接/切分循环 vs SSEDecoder
+
+在仓库根目录运行: python -m LLM.SSEDecoderBenchmark
+"""
+import argparse
+import json
+import time
+from typing import Callable, Iterable, List, Tuple
+
+from LLM.SSEDecoder import iter_delta_content
+
+
+def legacy_parse(chunks: Iterable[bytes]) -> List[str]:
+    """原实现的解析逻辑(去掉打印)，用作对照组"""
+    contents = []
+    buffer = b""
+    for chunk in chunks:
+        if chunk:
+            buffer += chunk
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                line = line.strip()
+                if line.startswith(b"data: "):
+                    line_data = line[len(b"data: "):].strip()
+                    if line_data == b"[DONE]":
+                        break
+                    try:
+                        chunk_json = json.loads(line_data.decode("utf-8"))
+                        content = chunk_json["choices"][0]["delta"].get("content")
+                        if content:
+                            contents.append(content)
+                    except Exception:
+                        continue
+    return contents
+
+
+def decoder_parse(chunks: Iterable[bytes]) -> List[str]:
+    return list(iter_delta_content(chunks))
+
+
+def build_stream(total_bytes: int) -> bytes:
+    """构造一个约 total_bytes 大小的 OpenAI 兼容 SSE 流，内容包含中文多字节字符"""
+    events = []
+    size = 0
+    i = 0
+    while size < total_bytes:
+        payload = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "choices": [{"index": 0, "delta": {"content": f"第{i}个token "}, "finish_reason": None}],
+        }
+        event = b"data: " + json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n\n"
+        events.append(event)
+        size += len(event)
+        i += 1
+    events.append(b"data: [DONE]\n\n")
+    return b"".join(events)
+
+
+def split_chunks(data: bytes, chunk_size: int) -> List[bytes]:
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+
+def timeit(func: Callable[[List[bytes]], List[str]], chunks: List[bytes]) -> Tuple[float, int]:
+    start = time.perf_counter()
+    result = func(chunks)
+    return time.perf_counter() - start, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE 解析性能对比")
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[1024, 65536, 1 << 20])
+    args = parser.parse_args()
+
+    print(f"{'流大小':>8} {'块大小':>10} {'原实现(s)':>12} {'SSEDecoder(s)':>14} {'加速比':>8}")
+    print("-" * 60)
+    for size_mb in args.sizes_mb:
+        data = build_stream(int(size_mb * 1024 * 1024))
+        for chunk_size in args.chunk_sizes:
+            chunks = split_chunks(data, chunk_size)
+            legacy_time, legacy_count = timeit(legacy_parse, chunks)
+            decoder_time, decoder_count = timeit(decoder_parse, chunks)
+            assert legacy_count == decoder_count, "两种实现解析出的token数不一致"
+            print(f"{size_mb:>6.1f}MB {chunk_size:>10} {legacy_time:>12.3f} "
+                  f"{decoder_time:>14.3f} {legacy_time / decoder_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+"""把 openai SDK 对象等非内置类型转为可以 json.dumps 的结构，供缓存键、检查点和 token 计数共用"""
+from typing import Any
+
+
+def to_jsonable(obj: Any) -> Any:
+    """json.dumps 的 default：把 openai SDK 的 pydantic 对象(例如消息历史中的 tool_calls)转为可序列化结构"""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json", exclude_none=True)
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
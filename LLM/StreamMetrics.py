@@ -0,0 +1,174 @@
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """最近秩法计算分位数，sorted_values 需已排序"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _get(obj: Any, name: str, default: Any = None) -> Any:
+    """同时兼容 openai SDK 的对象和 SSEDecoder 解析出的 dict"""
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def _usage_to_dict(usage: Any) -> Optional[Dict[str, Any]]:
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage
+    if hasattr(usage, "model_dump"):
+        return usage.model_dump()
+    return dict(vars(usage))
+
+
+@dataclass
+class StreamResult:
+    """一次流式请求的完整结果和时延指标(时间单位均为秒)"""
+    content: str
+    chunk_count: int
+    content_chunk_count: int
+    total_time: float
+    ttft: Optional[float]
+    gap_p50: Optional[float]
+    gap_p95: Optional[float]
+    gap_max: Optional[float]
+    completion_tokens: int
+    tokens_estimated: bool
+    tokens_per_second: Optional[float]
+    usage: Optional[Dict[str, Any]] = None
+    usage_history: List[Dict[str, Any]] = field(default_factory=list)
+    model: Optional[str] = None
+    finish_reason: Optional[str] = None
+
+    def summary(self) -> str:
+        """格式化为一行便于日志输出的摘要"""
+        def ms(value: Optional[float]) -> str:
+            return "N/A" if value is None else f"{value * 1000:.0f}ms"
+
+        tps = "N/A" if self.tokens_per_second is None else f"{self.tokens_per_second:.1f}"
+        approx = "≈" if self.tokens_estimated else ""
+        return (f"TTFT={ms(self.ttft)}, 块间隔 p50={ms(self.gap_p50)} p95={ms(self.gap_p95)} "
+                f"max={ms(self.gap_max)}, 总耗时={ms(self.total_time)}, "
+                f"tokens={approx}{self.completion_tokens}, 速度={approx}{tps} tokens/s")
+
+
+class StreamAccumulator:
+    """
+    流式响应收集器
+
+    增量文本存入列表，结束时一次性 join，避免 full_content += content 的反复拷贝；
+    同时记录首 token 时延(TTFT)、块间隔分布、吞吐和各数据块携带的 usage。
+
+    用法:
+        acc = StreamAccumulator()
+        acc.start()                  # 在发起请求前调用，TTFT 才包含请求排队和首包时间
+        stream = client.chat.completions.create(..., stream=True)
+        result = acc.consume(stream, on_delta=lambda text: print(text, end=""))
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self._clock = clock
+        self._started_at: Optional[float] = None
+        self._parts: List[str] = []
+        self._chunk_count = 0
+        self._first_token_at: Optional[float] = None
+        self._last_token_at: Optional[float] = None
+        self._gaps: List[float] = []
+        self._usage: Optional[Dict[str, Any]] = None
+        self._usage_history: List[Dict[str, Any]] = []
+        self._model: Optional[str] = None
+        self._finish_reason: Optional[str] = None
+
+    def start(self) -> "StreamAccumulator":
+        """标记请求开始时间"""
+        self._started_at = self._clock()
+        return self
+
+    def add(self, chunk: Any) -> Optional[str]:
+        """处理一个数据块，返回其中的增量文本(没有则返回 None)"""
+        now = self._clock()
+        if self._started_at is None:
+            self._started_at = now
+        self._chunk_count += 1
+
+        if self._model is None:
+            self._model = _get(chunk, "model")
+
+        usage = _usage_to_dict(_get(chunk, "usage"))
+        if usage:
+            self._usage = usage
+            self._usage_history.append(usage)
+
+        choices = _get(chunk, "choices") or []
+        if not choices:
+            return None
+        choice = choices[0]
+        finish_reason = _get(choice, "finish_reason")
+        if finish_reason:
+            self._finish_reason = finish_reason
+
+        content = _get(_get(choice, "delta"), "content")
+        if not content:
+            return None
+
+        if self._first_token_at is None:
+            self._first_token_at = now
+        else:
+            self._gaps.append(now - self._last_token_at)
+        self._last_token_at = now
+        self._parts.append(content)
+        return content
+
+    def consume(self, stream: Iterable[Any], on_delta: Optional[Callable[[str], None]] = None) -> StreamResult:
+        """消费整个流并返回结果"""
+        for chunk in stream:
+            content = self.add(chunk)
+            if content and on_delta is not None:
+                on_delta(content)
+        return self.result()
+
+    def result(self) -> StreamResult:
+        """根据已收到的数据块生成结果"""
+        end = self._clock()
+        started_at = self._started_at if self._started_at is not None else end
+        gaps = sorted(self._gaps)
+
+        completion_tokens = (self._usage or {}).get("completion_tokens")
+        tokens_estimated = completion_tokens is None
+        if tokens_estimated:
+            # 没有 usage 时按内容块数近似 token 数，多数提供方每块约一个 token
+            completion_tokens = len(self._parts)
+
+        tokens_per_second = None
+        if self._first_token_at is not None and completion_tokens:
+            generation_time = (self._last_token_at - self._first_token_at) or (end - started_at)
+            if generation_time > 0:
+                tokens_per_second = completion_tokens / generation_time
+
+        return StreamResult(
+            content="".join(self._parts),
+            chunk_count=self._chunk_count,
+            content_chunk_count=len(self._parts),
+            total_time=end - started_at,
+            ttft=None if self._first_token_at is None else self._first_token_at - started_at,
+            gap_p50=percentile(gaps, 50),
+            gap_p95=percentile(gaps, 95),
+            gap_max=gaps[-1] if gaps else None,
+            completion_tokens=completion_tokens,
+            tokens_estimated=tokens_estimated,
+            tokens_per_second=tokens_per_second,
+            usage=self._usage,
+            usage_history=self._usage_history,
+            model=self._model,
+            finish_reason=self._finish_reason,
+        )
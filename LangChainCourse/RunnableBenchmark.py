@@ -0,0 +1,110 @@
+"""
+Runnable 管线与手写顺序脚本的对比(使用本地模拟服务器，不消耗 API 额度)
+
+- 顺序脚本：for 循环里 拼提示词 -> 调用模型 -> 解析，和仓库里各个 Demo 的写法一样
+- chain.batch：线程池并发，chain.abatch：异步客户端并发
+- chain.stream：解析器边收 token 边输出，对比第一条解析结果的到达时间和完整响应时间
+- 检索步骤：逐条 search 与 RetrieverRunnable.batch(一次矩阵乘法)
+
+在仓库根目录运行: python -m LangChainCourse.RunnableBenchmark --requests 64 --concurrency 16
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+
+from LLM.MockServer import MockLLMConfig, MockLLMServer
+
+CITIES = ["北京", "上海", "广州", "长沙", "深圳", "杭州"]
+REPLY = "1. 轻薄长袖\n2. 防晒霜\n3. 折叠雨伞\n4. 舒适运动鞋\n5. 薄外套"
+
+
+def timed(label: str, func, count: int):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {elapsed * 1000:8.0f}ms  {count / elapsed:8.1f} 次/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runnable 管线压测")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟服务器首包时延(秒)")
+    parser.add_argument("--token-rate", type=float, default=300, help="模拟服务器每秒 token 数")
+    args = parser.parse_args()
+
+    server = MockLLMServer(MockLLMConfig(latency=args.latency, token_rate=args.token_rate, reply_text=REPLY)).start()
+    os.environ["DEEPSEEK_BASE_URL"] = server.base_url
+    os.environ["DEEPSEEK_API_KEY"] = "mock-key"
+
+    from LLM.ClientFactory import get_openai_client
+    from LangChainCourse.Runnables import (ChatModel, LineListOutputParser, PromptTemplate, RetrieverRunnable,
+                                           RunnablePassthrough, format_docs)
+
+    template = "我要去{city}，请列出需要准备的衣物，每行一项"
+    inputs = [{"city": CITIES[i % len(CITIES)]} for i in range(args.requests)]
+    chain = PromptTemplate(template) | ChatModel("deepseek") | LineListOutputParser()
+
+    def sequential():
+        client = get_openai_client("deepseek")
+        results = []
+        for item in inputs:
+            response = client.chat.completions.create(
+                model="deepseek-chat", messages=[{"role": "user", "content": template.format(**item)}])
+            text = response.choices[0].message.content
+            results.append([line.split(". ", 1)[-1] for line in text.splitlines() if line.strip()])
+        return results
+
+    print(f"[模型调用] {args.requests} 次请求，首包 {args.latency * 1000:.0f}ms，{args.token_rate:.0f} token/s")
+    expected = timed("顺序脚本", sequential, args.requests)
+    batched = timed(f"chain.batch(并发 {args.concurrency})",
+                    lambda: chain.batch(inputs, max_concurrency=args.concurrency), args.requests)
+    abatched = timed(f"chain.abatch(并发 {args.concurrency})",
+                     lambda: asyncio.run(chain.abatch(inputs, max_concurrency=args.concurrency)), args.requests)
+    assert batched == expected == abatched, "三种方式的解析结果不一致"
+
+    start = time.perf_counter()
+    first_item = None
+    items = []
+    for piece in chain.stream(inputs[0]):
+        if first_item is None:
+            first_item = time.perf_counter() - start
+        items.extend(piece)
+    total = time.perf_counter() - start
+    start = time.perf_counter()
+    chain.invoke(inputs[0])
+    invoke_time = time.perf_counter() - start
+    print(f"[流式] 第一项 {first_item * 1000:.0f}ms 到达，全部 {len(items)} 项 {total * 1000:.0f}ms，"
+          f"invoke 需等待 {invoke_time * 1000:.0f}ms")
+
+    from RAG.LocalRAG.Embedders import HashingEmbedder
+    from RAG.LocalRAG.Retriever import LocalRetriever
+
+    with tempfile.TemporaryDirectory() as path:
+        retriever = LocalRetriever(path, HashingEmbedder())
+        retriever.add_documents((f"doc{i}", f"{city}第{i}天：{REPLY}", {"city": city})
+                                for i, city in enumerate(CITIES * 2000))
+        queries = [f"{item['city']}穿衣" for item in inputs] * 8
+        retrieve = RetrieverRunnable(retriever, k=4)
+        print(f"[检索] {len(queries)} 条查询，{len(retriever.store)} 个片段")
+        loop_hits = timed("逐条 search", lambda: [retriever.search(q, 4) for q in queries], len(queries))
+        batch_hits = timed("RetrieverRunnable.batch", lambda: retrieve.batch(queries), len(queries))
+        # 文档内容高度相似，分数相同的片段先后顺序可能不同，因此比较分数
+        assert all(abs(a.score - b.score) < 1e-4 for x, y in zip(loop_hits, batch_hits) for a, b in zip(x, y))
+
+        rag = ({"context": retrieve | format_docs, "question": RunnablePassthrough()}
+               | PromptTemplate("根据资料回答：\n{context}\n\n问题：{question}")
+               | ChatModel("deepseek") | LineListOutputParser())
+        questions = [f"{item['city']}需要带什么" for item in inputs]
+        timed(f"RAG chain.batch(并发 {args.concurrency})",
+              lambda: rag.batch(questions, max_concurrency=args.concurrency), len(questions))
+        retriever.close()
+
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
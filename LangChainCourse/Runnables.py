@@ -0,0 +1,581 @@
+"""
+简化版的 Runnable 组合接口(参考 LangChain 的 LCEL)
+
+每个组件都支持:
+- invoke / ainvoke: 单条输入
+- batch / abatch: 多条输入，max_concurrency 限制并发；检索器等组件有原生的批量实现
+- stream / astream: 增量输出
+- transform / atransform: 输入本身是增量的(上游的流)，边收边处理
+
+用 | 组合成 RunnableSequence 后，stream 会把每一步的 transform 串起来：
+模型每产出一个 token，解析器就能立即输出已完整的部分(一行、一个 JSON 字段)。
+
+用法:
+    chain = PromptTemplate("用一句话介绍{city}的天气特点") | ChatModel("deepseek") | StrOutputParser()
+    print(chain.invoke({"city": "北京"}))
+    answers = chain.batch([{"city": c} for c in cities], max_concurrency=8)
+    for token in chain.stream({"city": "上海"}):
+        print(token, end="", flush=True)
+"""
+import json
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from string import Formatter
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# 依赖仓库内的其他模块，请在仓库根目录运行
+from LLM.ClientFactory import get_async_openai_client, get_openai_client, get_provider
+
+logger = logging.getLogger(__name__)
+
+
+def _combine(chunks: List[Any]) -> Any:
+    """把增量输入合并为完整输入：字符串拼接，字典合并，列表连接，其他取最后一个"""
+    if not chunks:
+        return None
+    if len(chunks) == 1:
+        return chunks[0]
+    if all(isinstance(c, str) for c in chunks):
+        return "".join(chunks)
+    if all(isinstance(c, dict) for c in chunks):
+        merged: Dict[str, Any] = {}
+        for chunk in chunks:
+            merged.update(chunk)
+        return merged
+    if all(isinstance(c, list) for c in chunks):
+        return [item for chunk in chunks for item in chunk]
+    return chunks[-1]
+
+
+def _run_bounded(func: Callable[[Any], Any], inputs: List[Any], max_concurrency: int,
+                 return_exceptions: bool) -> List[Any]:
+    def call(item: Any) -> Any:
+        try:
+            return func(item)
+        except Exception as e:
+            if return_exceptions:
+                return e
+            raise
+
+    if len(inputs) <= 1 or max_concurrency <= 1:
+        return [call(item) for item in inputs]
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(inputs)),
+                            thread_name_prefix="runnable-batch") as executor:
+        return list(executor.map(call, inputs))
+
+
+async def _arun_bounded(func: Callable[[Any], Any], inputs: List[Any], max_concurrency: int,
+                        return_exceptions: bool) -> List[Any]:
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def call(item: Any) -> Any:
+        async with semaphore:
+            return await func(item)
+
+    return list(await asyncio.gather(*(call(item) for item in inputs), return_exceptions=return_exceptions))
+
+
+class Runnable:
+    """所有组件的基类，子类至少实现 invoke"""
+
+    def invoke(self, input: Any) -> Any:
+        raise NotImplementedError
+
+    async def ainvoke(self, input: Any) -> Any:
+        # 没有原生异步实现的组件放到线程中执行，不阻塞事件循环
+        return await asyncio.to_thread(self.invoke, input)
+
+    def batch(self, inputs: Sequence[Any], max_concurrency: int = 8,
+              return_exceptions: bool = False) -> List[Any]:
+        return _run_bounded(self.invoke, list(inputs), max_concurrency, return_exceptions)
+
+    async def abatch(self, inputs: Sequence[Any], max_concurrency: int = 8,
+                     return_exceptions: bool = False) -> List[Any]:
+        return await _arun_bounded(self.ainvoke, list(inputs), max_concurrency, return_exceptions)
+
+    def stream(self, input: Any) -> Iterator[Any]:
+        yield self.invoke(input)
+
+    async def astream(self, input: Any) -> AsyncIterator[Any]:
+        yield await self.ainvoke(input)
+
+    def transform(self, inputs: Iterator[Any]) -> Iterator[Any]:
+        """默认实现：收齐上游输出后再处理；能增量处理的组件应覆盖此方法"""
+        yield from self.stream(_combine(list(inputs)))
+
+    async def atransform(self, inputs: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        chunks = [chunk async for chunk in inputs]
+        async for output in self.astream(_combine(chunks)):
+            yield output
+
+    def __or__(self, other: Any) -> "RunnableSequence":
+        return RunnableSequence(self, coerce(other))
+
+    def __ror__(self, other: Any) -> "RunnableSequence":
+        return RunnableSequence(coerce(other), self)
+
+
+def coerce(value: Any) -> Runnable:
+    """函数转为 RunnableLambda，dict 转为 RunnableParallel"""
+    if isinstance(value, Runnable):
+        return value
+    if isinstance(value, dict):
+        return RunnableParallel(value)
+    if callable(value):
+        return RunnableLambda(value)
+    raise TypeError(f"无法转换为 Runnable: {type(value).__name__}")
+
+
+class RunnableLambda(Runnable):
+    def __init__(self, func: Callable[[Any], Any], afunc: Optional[Callable[[Any], Any]] = None):
+        self.func = func
+        self.afunc = afunc
+
+    def invoke(self, input: Any) -> Any:
+        return self.func(input)
+
+    async def ainvoke(self, input: Any) -> Any:
+        if self.afunc is not None:
+            return await self.afunc(input)
+        # 轻量的同步函数直接调用，比切换线程更快
+        return self.func(input)
+
+    def __repr__(self) -> str:
+        return f"RunnableLambda({getattr(self.func, '__name__', self.func)!r})"
+
+
+class RunnablePassthrough(Runnable):
+    def invoke(self, input: Any) -> Any:
+        return input
+
+    async def ainvoke(self, input: Any) -> Any:
+        return input
+
+    def transform(self, inputs: Iterator[Any]) -> Iterator[Any]:
+        yield from inputs
+
+
+class RunnableParallel(Runnable):
+    """同一输入并发交给多个分支，输出 {键: 分支结果}"""
+
+    def __init__(self, steps: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        self.steps = {key: coerce(step) for key, step in {**(steps or {}), **kwargs}.items()}
+
+    def invoke(self, input: Any) -> Dict[str, Any]:
+        keys = list(self.steps)
+        results = _run_bounded(lambda key: self.steps[key].invoke(input), keys, len(keys), False)
+        return dict(zip(keys, results))
+
+    async def ainvoke(self, input: Any) -> Dict[str, Any]:
+        results = await asyncio.gather(*(step.ainvoke(input) for step in self.steps.values()))
+        return dict(zip(self.steps, results))
+
+    def batch(self, inputs: Sequence[Any], max_concurrency: int = 8,
+              return_exceptions: bool = False) -> List[Any]:
+        # 每个分支各自批量执行，检索器之类的组件可以用上原生批量接口
+        inputs = list(inputs)
+        columns = {key: step.batch(inputs, max_concurrency, return_exceptions) for key, step in self.steps.items()}
+        return [self._row(columns, i, return_exceptions) for i in range(len(inputs))]
+
+    async def abatch(self, inputs: Sequence[Any], max_concurrency: int = 8,
+                     return_exceptions: bool = False) -> List[Any]:
+        inputs = list(inputs)
+        results = await asyncio.gather(*(step.abatch(inputs, max_concurrency, return_exceptions)
+                                         for step in self.steps.values()))
+        columns = dict(zip(self.steps, results))
+        return [self._row(columns, i, return_exceptions) for i in range(len(inputs))]
+
+    @staticmethod
+    def _row(columns: Dict[str, List[Any]], index: int, return_exceptions: bool) -> Any:
+        row = {key: values[index] for key, values in columns.items()}
+        if return_exceptions:
+            error = next((v for v in row.values() if isinstance(v, Exception)), None)
+            if error is not None:
+                return error
+        return row
+
+
+class RunnableSequence(Runnable):
+    def __init__(self, *steps: Runnable):
+        flat: List[Runnable] = []
+        for step in steps:
+            flat.extend(step.steps if isinstance(step, RunnableSequence) else [step])
+        self.steps = flat
+
+    def __or__(self, other: Any) -> "RunnableSequence":
+        return RunnableSequence(*self.steps, coerce(other))
+
+    def __ror__(self, other: Any) -> "RunnableSequence":
+        return RunnableSequence(coerce(other), *self.steps)
+
+    def invoke(self, input: Any) -> Any:
+        for step in self.steps:
+            input = step.invoke(input)
+        return input
+
+    async def ainvoke(self, input: Any) -> Any:
+        for step in self.steps:
+            input = await step.ainvoke(input)
+        return input
+
+    def batch(self, inputs: Sequence[Any], max_concurrency: int = 8,
+              return_exceptions: bool = False) -> List[Any]:
+        """逐步批量执行；return_exceptions 时失败的条目不再进入后续步骤"""
+        results: List[Any] = list(inputs)
+        alive = list(range(len(results)))
+        for step in self.steps:
+            outputs = step.batch([results[i] for i in alive], max_concurrency, return_exceptions)
+            for i, output in zip(alive, outputs):
+                results[i] = output
+            alive = [i for i in alive if not isinstance(results[i], Exception)]
+        return results
+
+    async def abatch(self, inputs: Sequence[Any], max_concurrency: int = 8,
+                     return_exceptions: bool = False) -> List[Any]:
+        results: List[Any] = list(inputs)
+        alive = list(range(len(results)))
+        for step in self.steps:
+            outputs = await step.abatch([results[i] for i in alive], max_concurrency, return_exceptions)
+            for i, output in zip(alive, outputs):
+                results[i] = output
+            alive = [i for i in alive if not isinstance(results[i], Exception)]
+        return results
+
+    def stream(self, input: Any) -> Iterator[Any]:
+        iterator = self.steps[0].stream(input)
+        for step in self.steps[1:]:
+            iterator = step.transform(iterator)
+        yield from iterator
+
+    def transform(self, inputs: Iterator[Any]) -> Iterator[Any]:
+        iterator = inputs
+        for step in self.steps:
+            iterator = step.transform(iterator)
+        yield from iterator
+
+    async def astream(self, input: Any) -> AsyncIterator[Any]:
+        iterator = self.steps[0].astream(input)
+        for step in self.steps[1:]:
+            iterator = step.atransform(iterator)
+        async for output in iterator:
+            yield output
+
+    async def atransform(self, inputs: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        iterator = inputs
+        for step in self.steps:
+            iterator = step.atransform(iterator)
+        async for output in iterator:
+            yield output
+
+
+# ---------------- 提示词模板 ----------------
+
+def _variables(template: str) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(name for _, name, _, _ in Formatter().parse(template) if name))
+
+
+class PromptTemplate(Runnable):
+    """str.format 风格的模板，输入为 dict(单变量模板也可以直接传字符串)，输出字符串"""
+
+    def __init__(self, template: str):
+        self.template = template
+        self.variables = _variables(template)
+
+    def _values(self, input: Any) -> Dict[str, Any]:
+        if not isinstance(input, dict):
+            if len(self.variables) != 1:
+                raise ValueError(f"模板需要变量 {self.variables}，输入应为 dict")
+            return {self.variables[0]: input}
+        missing = [name for name in self.variables if name not in input]
+        if missing:
+            raise KeyError(f"缺少模板变量: {missing}")
+        return input
+
+    def invoke(self, input: Any) -> str:
+        return self.template.format_map(self._values(input))
+
+    async def ainvoke(self, input: Any) -> str:
+        return self.invoke(input)
+
+    def batch(self, inputs: Sequence[Any], max_concurrency: int = 8,
+              return_exceptions: bool = False) -> List[Any]:
+        # 纯字符串格式化，放到线程池反而更慢
+        return _run_bounded(self.invoke, list(inputs), 1, return_exceptions)
+
+    async def abatch(self, inputs: Sequence[Any], max_concurrency: int = 8,
+                     return_exceptions: bool = False) -> List[Any]:
+        return self.batch(inputs, max_concurrency, return_exceptions)
+
+
+class ChatPromptTemplate(PromptTemplate):
+    """由 (role, 模板) 列表生成 messages"""
+
+    def __init__(self, messages: List[Tuple[str, str]]):
+        self.messages = list(messages)
+        self.variables = tuple(dict.fromkeys(v for _, text in self.messages for v in _variables(text)))
+
+    def invoke(self, input: Any) -> List[Dict[str, str]]:
+        values = self._values(input)
+        return [{"role": role, "content": text.format_map(values)} for role, text in self.messages]
+
+
+# ---------------- 模型 ----------------
+
+class ChatModel(Runnable):
+    """
+    通过 ClientFactory 的共享客户端调用 OpenAI 兼容接口，输出回答文本
+
+    输入为字符串(作为 user 消息)或 messages 列表；stream 按 token 产出文本片段。
+    abatch 使用异步客户端，在一个事件循环里以 max_concurrency 并发发出请求。
+    """
+
+    def __init__(self, provider: str = "deepseek", model: Optional[str] = None, **params: Any):
+        self.provider = provider
+        self.model = model or get_provider(provider).model
+        self.params = params
+
+    @staticmethod
+    def _messages(input: Any) -> List[Dict[str, Any]]:
+        if isinstance(input, str):
+            return [{"role": "user", "content": input}]
+        return list(input)
+
+    def _request(self, input: Any, **extra: Any) -> Dict[str, Any]:
+        return {"model": self.model, "messages": self._messages(input), **self.params, **extra}
+
+    def invoke(self, input: Any) -> str:
+        response = get_openai_client(self.provider).chat.completions.create(**self._request(input))
+        return response.choices[0].message.content or ""
+
+    async def ainvoke(self, input: Any) -> str:
+        client = get_async_openai_client(self.provider)
+        response = await client.chat.completions.create(**self._request(input))
+        return response.choices[0].message.content or ""
+
+    def stream(self, input: Any) -> Iterator[str]:
+        stream = get_openai_client(self.provider).chat.completions.create(**self._request(input, stream=True))
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def astream(self, input: Any) -> AsyncIterator[str]:
+        client = get_async_openai_client(self.provider)
+        stream = await client.chat.completions.create(**self._request(input, stream=True))
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+# ---------------- 输出解析器 ----------------
+
+class BaseTransformParser(Runnable):
+    """
+    增量解析器：子类实现 _feed(缓冲区, 新片段) 和 _finish(缓冲区)，返回可以输出的结果列表
+
+    invoke、stream、transform 以及对应的异步版本都基于这两个方法，行为保持一致。
+    """
+
+    def _new_buffer(self) -> Dict[str, Any]:
+        return {"text": ""}
+
+    def _feed(self, buffer: Dict[str, Any], chunk: str) -> List[Any]:
+        raise NotImplementedError
+
+    def _finish(self, buffer: Dict[str, Any]) -> List[Any]:
+        return []
+
+    def invoke(self, input: Any) -> Any:
+        return _combine(list(self.transform(iter([input]))))
+
+    async def ainvoke(self, input: Any) -> Any:
+        return self.invoke(input)
+
+    def batch(self, inputs: Sequence[Any], max_concurrency: int = 8,
+              return_exceptions: bool = False) -> List[Any]:
+        return _run_bounded(self.invoke, list(inputs), 1, return_exceptions)
+
+    async def abatch(self, inputs: Sequence[Any], max_concurrency: int = 8,
+                     return_exceptions: bool = False) -> List[Any]:
+        return self.batch(inputs, max_concurrency, return_exceptions)
+
+    def stream(self, input: Any) -> Iterator[Any]:
+        return self.transform(iter([input]))
+
+    async def astream(self, input: Any) -> AsyncIterator[Any]:
+        for output in self.stream(input):
+            yield output
+
+    def transform(self, inputs: Iterator[Any]) -> Iterator[Any]:
+        buffer = self._new_buffer()
+        for chunk in inputs:
+            yield from self._feed(buffer, chunk)
+        yield from self._finish(buffer)
+
+    async def atransform(self, inputs: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        buffer = self._new_buffer()
+        async for chunk in inputs:
+            for output in self._feed(buffer, chunk):
+                yield output
+        for output in self._finish(buffer):
+            yield output
+
+
+class StrOutputParser(BaseTransformParser):
+    """原样输出文本片段"""
+
+    def _feed(self, buffer: Dict[str, Any], chunk: str) -> List[str]:
+        return [chunk] if chunk else []
+
+
+class LineListOutputParser(BaseTransformParser):
+    """
+    按行拆成列表，每收到一整行就输出一项(去掉 "1." "-" 等列表前缀和空行)
+
+    invoke 返回完整列表，stream 逐项产出 [项]，合并后与 invoke 结果相同。
+    """
+
+    _PREFIXES = ("- ", "* ", "• ")
+
+    def _clean(self, line: str) -> Optional[str]:
+        line = line.strip()
+        for prefix in self._PREFIXES:
+            if line.startswith(prefix):
+                line = line[len(prefix):]
+        head, dot, rest = line.partition(". ")
+        if dot and head.isdigit():
+            line = rest
+        return line.strip() or None
+
+    def _feed(self, buffer: Dict[str, Any], chunk: str) -> List[List[str]]:
+        buffer["text"] += chunk
+        *lines, buffer["text"] = buffer["text"].split("\n")
+        return [[item] for item in map(self._clean, lines) if item]
+
+    def _finish(self, buffer: Dict[str, Any]) -> List[List[str]]:
+        item = self._clean(buffer["text"])
+        return [[item]] if item else []
+
+
+def _strip_code_fence(text: str) -> str:
+    """去掉模型常加的 ```json ... ``` 包裹"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0] if text.rstrip().endswith("```") else text
+    return text
+
+
+def parse_partial_json(text: str) -> Any:
+    """
+    解析可能被截断的 JSON：补全未闭合的字符串和括号，丢弃末尾不完整的键值
+
+    无法得到有效结果时返回 None。
+    """
+    text = _strip_code_fence(text)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    stack: List[str] = []
+    # 可以安全截断的位置及当时的括号栈：逗号之前、左括号之后
+    cuts: List[Tuple[int, Tuple[str, ...]]] = []
+    in_string = escape = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+            cuts.append((index + 1, tuple(stack)))
+        elif char in "}]":
+            if stack:
+                stack.pop()
+        elif char == ",":
+            cuts.append((index, tuple(stack)))
+
+    candidate = text[:-1] if escape else text
+    if in_string:
+        candidate += '"'
+    attempts = [(candidate, tuple(stack))] + [(text[:pos], cut_stack) for pos, cut_stack in reversed(cuts[-8:])]
+    for prefix, open_stack in attempts:
+        try:
+            return json.loads(prefix + "".join(reversed(open_stack)))
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+class JsonOutputParser(BaseTransformParser):
+    """
+    解析模型输出的 JSON，stream 时每当已解析出的内容有变化就输出一次当前的(部分)对象
+
+    补全截断内容只用于 stream 的中间结果；输入结束时完整文本必须是合法 JSON，
+    否则(例如被 max_tokens 截断)invoke 和 stream 都抛出 ValueError，而不是返回补全后的对象。
+    """
+
+    def _new_buffer(self) -> Dict[str, Any]:
+        return {"text": "", "last": None}
+
+    def _feed(self, buffer: Dict[str, Any], chunk: str) -> List[Any]:
+        buffer["text"] += chunk
+        parsed = parse_partial_json(buffer["text"])
+        if parsed is None or parsed == buffer["last"]:
+            return []
+        buffer["last"] = parsed
+        return [parsed]
+
+    def _finish(self, buffer: Dict[str, Any]) -> List[Any]:
+        text = buffer["text"]
+        if not text.strip():
+            return []
+        try:
+            parsed = json.loads(_strip_code_fence(text))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"无法解析为 JSON({e}): {text[:200]}") from e
+        if parsed == buffer["last"]:
+            return []
+        buffer["last"] = parsed
+        return [parsed]
+
+    def invoke(self, input: Any) -> Any:
+        outputs = list(self.transform(iter([input])))
+        return outputs[-1] if outputs else None
+
+
+# ---------------- 检索器 ----------------
+
+class RetrieverRunnable(Runnable):
+    """
+    包装 RAG/LocalRAG 的 LocalRetriever，输入查询字符串，输出 SearchResult 列表
+
+    batch 直接调用 search_batch，多条查询合并为一次矩阵乘法。
+    """
+
+    def __init__(self, retriever, k: int = 5):
+        self.retriever = retriever
+        self.k = k
+
+    def invoke(self, input: str) -> List[Any]:
+        return self.retriever.search(input, self.k)
+
+    def batch(self, inputs: Sequence[Any], max_concurrency: int = 8,
+              return_exceptions: bool = False) -> List[Any]:
+        return self.retriever.search_batch(list(inputs), self.k)
+
+    async def abatch(self, inputs: Sequence[Any], max_concurrency: int = 8,
+                     return_exceptions: bool = False) -> List[Any]:
+        return await asyncio.to_thread(self.batch, inputs)
+
+
+def format_docs(results: Iterable[Any]) -> str:
+    """把检索结果拼成提示词中的上下文"""
+    return "\n\n".join(f"[{i}] {r.text}" for i, r in enumerate(results, 1))
@@ -0,0 +1,379 @@
+"""
+简化版的状态图(StateGraph)运行时，按 LangGraph 的思路把智能体流程表示为节点和边
+
+- 状态是一个 dict；节点函数 node(state) 返回要更新的键，按 reducer 合并(默认覆盖)
+- 按超步(superstep)执行：同一步中的节点互不依赖，在线程池中并发运行，
+  全部完成后按固定顺序合并更新，再根据边计算下一步要运行的节点
+- 条件边的路由函数可以返回节点名、节点名列表，或 Send 列表(同一节点以不同输入并行运行多份)
+- add_edge(["a", "b"], "c") 表示 c 要等 a、b 都完成后才运行
+- 检查点：每个节点完成后立即把它的更新写入 SQLite(只记录更新的键)，每步结束记录下一步的节点。
+  运行中断或节点异常后，用同一个 thread_id 再次调用 invoke(None, ...) 即从上次的位置继续，
+  已完成的节点(包括失败那一步里已经成功的并行节点)不会重新执行
+
+用法:
+    graph = StateGraph(reducers={"messages": append})
+    graph.add_node("model", call_model)
+    graph.add_node("tool", run_tool)
+    graph.add_edge(START, "model")
+    graph.add_conditional_edges("model", route)
+    graph.add_edge("tool", "model")
+    app = graph.compile(checkpointer=SqliteCheckpointer("graph.sqlite"))
+    state = app.invoke({"messages": [...]}, thread_id="user-1")
+"""
+import json
+import time
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Generator, List, Optional, Sequence, Tuple, Union
+
+from LLM.Serialization import to_jsonable
+
+logger = logging.getLogger(__name__)
+
+START = "__start__"
+END = "__end__"
+INPUT = "__input__"
+
+State = Dict[str, Any]
+Node = Callable[[State], Optional[State]]
+Reducer = Callable[[Any, Any], Any]
+
+
+def append(old: Optional[list], new: Any) -> list:
+    """列表追加 reducer：new 为列表时逐个追加"""
+    return (old or []) + (list(new) if isinstance(new, (list, tuple)) else [new])
+
+
+def add(old: Optional[float], new: float) -> float:
+    """数值累加 reducer"""
+    return (old or 0) + new
+
+
+@dataclass(frozen=True)
+class Send:
+    """把 arg 合并到状态副本后运行 node，用于按数据扇出(例如每个 tool_call 一个任务)"""
+    node: str
+    arg: Dict[str, Any] = field(default_factory=dict)
+
+
+class GraphRecursionError(RuntimeError):
+    """超过最大步数仍未结束"""
+
+
+class NodeError(RuntimeError):
+    """节点执行失败；同一步中已成功的节点更新已写入检查点"""
+
+    def __init__(self, node: str, step: int, cause: BaseException):
+        super().__init__(f"节点 {node} 在第 {step} 步失败: {type(cause).__name__}: {cause}")
+        self.node = node
+        self.step = step
+        self.cause = cause
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=to_jsonable, separators=(",", ":"))
+
+
+# 一个待执行任务: (任务名, 节点名, Send 参数)，任务名在同一步内唯一
+PendingTask = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+@dataclass
+class Checkpoint:
+    thread_id: str
+    step: int
+    next: List[PendingTask]
+    joins: Dict[str, List[str]]
+    # 已完成步骤的全部更新，按 (步, 任务顺序) 排列，依次重放即可得到状态
+    writes: List[Tuple[int, str, Dict[str, Any]]]
+    # 下一步中已经完成的任务的更新(中断前写入)
+    pending_writes: Dict[str, Dict[str, Any]]
+
+    @property
+    def done(self) -> bool:
+        return not self.next
+
+
+class SqliteCheckpointer:
+    """
+    SQLite 检查点
+
+    writes 表保存每个任务对状态的更新(只含它返回的键)，checkpoints 表保存每一步结束后待运行的任务。
+    恢复时按顺序重放更新，不需要在每一步保存完整状态。
+    """
+
+    def __init__(self, path: str = ".graph_checkpoints.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                step INTEGER NOT NULL,
+                next TEXT NOT NULL,
+                joins TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (thread_id, step)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                step INTEGER NOT NULL,
+                task TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                updates TEXT NOT NULL,
+                PRIMARY KEY (thread_id, step, task)
+            );
+        """)
+
+    def put_writes(self, thread_id: str, step: int, task: str, idx: int, updates: Dict[str, Any]) -> None:
+        """idx 为任务在该步中的顺序，重放时按 (step, idx) 合并"""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?)",
+                               (thread_id, step, task, idx, _dumps(updates)))
+
+    def put_checkpoint(self, thread_id: str, step: int, next_tasks: List[PendingTask],
+                       joins: Dict[str, List[str]]) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?)",
+                               (thread_id, step, _dumps(next_tasks), _dumps(joins), time.time()))
+
+    def get(self, thread_id: str) -> Optional[Checkpoint]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT step, next, joins FROM checkpoints WHERE thread_id = ? ORDER BY step DESC LIMIT 1",
+                (thread_id,)).fetchone()
+            if row is None:
+                return None
+            step, next_json, joins_json = row
+            next_tasks = [tuple(t) for t in json.loads(next_json)]
+            rows = self._conn.execute(
+                "SELECT step, task, updates FROM writes WHERE thread_id = ? AND step <= ? ORDER BY step, idx",
+                (thread_id, step + 1)).fetchall()
+
+        names = {task[0] for task in next_tasks}
+        writes, pending = [], {}
+        for write_step, task, updates in rows:
+            if write_step == step + 1:
+                if task in names:
+                    pending[task] = json.loads(updates)
+            else:
+                writes.append((write_step, task, json.loads(updates)))
+        return Checkpoint(thread_id, step, next_tasks, json.loads(joins_json), writes, pending)
+
+    def delete(self, thread_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            threads, checkpoints = self._conn.execute(
+                "SELECT COUNT(DISTINCT thread_id), COUNT(*) FROM checkpoints").fetchone()
+            writes, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(updates)), 0) FROM writes").fetchone()
+        return {"threads": threads, "checkpoints": checkpoints, "writes": writes, "write_bytes": size}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class StateGraph:
+    def __init__(self, reducers: Optional[Dict[str, Reducer]] = None):
+        self.reducers = dict(reducers or {})
+        self.nodes: Dict[str, Node] = {}
+        self.edges: Dict[str, List[str]] = {}
+        self.joins: List[Tuple[Tuple[str, ...], str]] = []
+        self.routers: Dict[str, Callable[[State], Any]] = {}
+
+    def add_node(self, name: str, func: Node) -> "StateGraph":
+        if name in (START, END) or name in self.nodes:
+            raise ValueError(f"节点名无效或重复: {name}")
+        self.nodes[name] = func
+        return self
+
+    def add_edge(self, source: Union[str, Sequence[str]], target: str) -> "StateGraph":
+        if isinstance(source, str):
+            self.edges.setdefault(source, []).append(target)
+        else:
+            self.joins.append((tuple(source), target))
+        return self
+
+    def add_conditional_edges(self, source: str, router: Callable[[State], Any]) -> "StateGraph":
+        """router(state) 返回节点名 / END / 节点名列表 / Send 列表"""
+        self.routers[source] = router
+        return self
+
+    def compile(self, checkpointer: Optional[SqliteCheckpointer] = None, max_workers: int = 8,
+                max_steps: int = 50) -> "CompiledGraph":
+        known = set(self.nodes) | {START, END}
+        for source, targets in self.edges.items():
+            for name in [source, *targets]:
+                if name not in known:
+                    raise ValueError(f"边引用了不存在的节点: {name}")
+        for sources, target in self.joins:
+            for name in [*sources, target]:
+                if name not in known:
+                    raise ValueError(f"边引用了不存在的节点: {name}")
+        if START not in self.edges and START not in self.routers:
+            raise ValueError("缺少从 START 出发的边")
+        return CompiledGraph(self, checkpointer, max_workers, max_steps)
+
+
+class CompiledGraph:
+    def __init__(self, graph: StateGraph, checkpointer: Optional[SqliteCheckpointer],
+                 max_workers: int, max_steps: int):
+        self.graph = graph
+        self.checkpointer = checkpointer
+        self.max_steps = max_steps
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="graph-node")
+
+    # ---------------- 状态合并与路由 ----------------
+
+    def _apply(self, state: State, updates: Optional[State]) -> None:
+        for key, value in (updates or {}).items():
+            reducer = self.graph.reducers.get(key)
+            state[key] = reducer(state.get(key), value) if reducer else value
+
+    def _successors(self, node: str, state: State) -> List[Union[str, Send]]:
+        targets: List[Union[str, Send]] = list(self.graph.edges.get(node, []))
+        router = self.graph.routers.get(node)
+        if router is not None:
+            routed = router(state)
+            targets.extend(routed if isinstance(routed, (list, tuple)) else [routed])
+        return targets
+
+    def _plan(self, finished: List[str], state: State,
+              joins: Dict[str, List[str]]) -> List[PendingTask]:
+        """根据本步完成的节点计算下一步的任务；等待中的汇合边记录在 joins 里"""
+        tasks: List[PendingTask] = []
+        seen = set()
+
+        def schedule(target: Union[str, Send]) -> None:
+            if isinstance(target, Send):
+                name = f"{target.node}#{sum(1 for t in tasks if t[1] == target.node)}"
+                tasks.append((name, target.node, dict(target.arg)))
+                return
+            if target == END or target in seen:
+                return
+            if target not in self.graph.nodes:
+                raise ValueError(f"路由到不存在的节点: {target}")
+            seen.add(target)
+            tasks.append((target, target, None))
+
+        for node in finished:
+            for target in self._successors(node, state):
+                schedule(target)
+
+        done_nodes = set(finished)
+        for index, (sources, target) in enumerate(self.graph.joins):
+            key = str(index)
+            arrived = set(joins.get(key, [])) | (done_nodes & set(sources))
+            if arrived >= set(sources):
+                joins.pop(key, None)
+                schedule(target)
+            elif arrived:
+                joins[key] = sorted(arrived)
+        return tasks
+
+    def _run_task(self, task: PendingTask, state: State) -> Optional[State]:
+        _, node, arg = task
+        view = dict(state)
+        if arg:
+            view.update(arg)
+        return self.graph.nodes[node](view)
+
+    # ---------------- 执行 ----------------
+
+    def _restore(self, thread_id: str) -> Optional[Tuple[State, Checkpoint]]:
+        checkpoint = self.checkpointer.get(thread_id) if self.checkpointer else None
+        if checkpoint is None:
+            return None
+        state: State = {}
+        for _, _, updates in checkpoint.writes:
+            self._apply(state, updates)
+        return state, checkpoint
+
+    def stream(self, input: Optional[State] = None,
+               thread_id: Optional[str] = None) -> Generator[Tuple[int, str, State], None, State]:
+        """
+        逐个产出 (步号, 任务名, 更新)，生成器的返回值是最终状态
+
+        input 为 None 且存在 thread_id 的检查点时从检查点继续；传入 input 时开始新的运行(覆盖旧检查点)。
+        """
+        checkpointer = self.checkpointer if thread_id is not None else None
+        restored = self._restore(thread_id) if checkpointer and input is None else None
+
+        if restored is not None:
+            state, checkpoint = restored
+            step, tasks, joins = checkpoint.step, checkpoint.next, checkpoint.joins
+            done_writes = checkpoint.pending_writes
+            logger.info(f"从检查点恢复 {thread_id}: 第 {step} 步，待运行 {[t[0] for t in tasks]}，"
+                        f"其中 {len(done_writes)} 个已完成")
+        else:
+            if input is None:
+                raise ValueError(f"没有可恢复的检查点: {thread_id}")
+            if checkpointer:
+                checkpointer.delete(thread_id)
+            state, step, joins, done_writes = {}, 0, {}, {}
+            self._apply(state, input)
+            tasks = self._plan([START], state, joins)
+            if checkpointer:
+                checkpointer.put_writes(thread_id, 0, INPUT, 0, input)
+                checkpointer.put_checkpoint(thread_id, 0, tasks, joins)
+            yield 0, INPUT, input
+
+        while tasks:
+            if step >= self.max_steps:
+                raise GraphRecursionError(f"超过最大步数 {self.max_steps}")
+            step += 1
+            results: Dict[str, Optional[State]] = {}
+            for name, updates in done_writes.items():
+                results[name] = updates
+            done_writes = {}
+
+            futures = {self._executor.submit(self._run_task, task, state): (idx, task[0])
+                       for idx, task in enumerate(tasks) if task[0] not in results}
+            error: Optional[NodeError] = None
+            # 按完成顺序立即写入检查点：慢任务失败或进程中断时，已完成的任务不必重跑
+            for future in as_completed(futures):
+                idx, name = futures[future]
+                try:
+                    updates = future.result()
+                except Exception as e:
+                    error = error or NodeError(name, step, e)
+                    continue
+                results[name] = updates
+                if checkpointer:
+                    checkpointer.put_writes(thread_id, step, name, idx, updates or {})
+            if error is not None:
+                raise error
+
+            # 按任务顺序而不是完成顺序合并，保证结果确定、重放一致
+            for name, _, _ in tasks:
+                self._apply(state, results[name])
+                yield step, name, results[name] or {}
+            tasks = self._plan([node for _, node, _ in tasks], state, joins)
+            if checkpointer:
+                checkpointer.put_checkpoint(thread_id, step, tasks, joins)
+        return state
+
+    def invoke(self, input: Optional[State] = None, thread_id: Optional[str] = None) -> State:
+        events = self.stream(input, thread_id)
+        while True:
+            try:
+                next(events)
+            except StopIteration as stop:
+                return stop.value
+
+    def get_state(self, thread_id: str) -> Optional[State]:
+        restored = self._restore(thread_id)
+        return restored[0] if restored else None
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
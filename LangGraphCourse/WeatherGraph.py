@@ -0,0 +1,180 @@
+"""
+用 StateGraph 重写 WeatherAssistant.chat 的工具调用循环
+
+    START -> model --(有 tool_calls)--> tool x N (每个 tool_call 一个并行任务) -> model
+                   --(没有 tool_calls)--> finish -> END
+
+每次模型调用和工具调用的结果都写入 SQLite 检查点，运行中途失败(例如模型接口报错、进程被杀)后，
+resume(thread_id) 从失败的那一步继续，之前已经完成的模型调用不会重新付费。
+
+运行(在仓库根目录):
+    python -m LangGraphCourse.WeatherGraph            # 调用 DeepSeek，需要 DEEPSEEK_API_KEY
+    python -m LangGraphCourse.WeatherGraph --mock     # 使用本地模拟服务器，并演示失败后恢复
+"""
+import os
+import json
+import logging
+import argparse
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+# 依赖仓库内的其他模块，请在仓库根目录运行: python -m LangGraphCourse.WeatherGraph
+from LangGraphCourse.StateGraph import (END, START, CompiledGraph, Send, SqliteCheckpointer, StateGraph,
+                                        add, append)
+from Protocol.FuctionCall.TokenBudget import TokenBudgetContext
+
+logger = logging.getLogger(__name__)
+
+MAX_ITERATIONS_REPLY = "抱歉，对话轮次过多，请重新开始。"
+
+
+def _assistant_message(msg) -> Dict[str, Any]:
+    message = {"role": "assistant", "content": msg.content}
+    if msg.tool_calls:
+        message["tool_calls"] = [call.model_dump(mode="json", exclude_none=True) for call in msg.tool_calls]
+    return message
+
+
+class WeatherGraph:
+    """与 WeatherAssistant 共用客户端、工具和工具缓存，只把控制流换成状态图"""
+
+    def __init__(self, assistant, checkpointer: Optional[SqliteCheckpointer] = None,
+                 max_iterations: int = 10, model: str = "deepseek-chat"):
+        self.assistant = assistant
+        self.max_iterations = max_iterations
+        self.model = model
+        self.app = self._build(checkpointer)
+
+    # ---------------- 节点 ----------------
+
+    def _model(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        # 检查点里保存完整消息历史，发送前再按 token 预算压缩旧的工具结果
+        context = TokenBudgetContext(max_tokens=self.assistant.context_token_budget, prefix_size=2)
+        context.extend(state["messages"])
+        resp = self.assistant.client.chat.completions.create(
+            model=self.model,
+            messages=context.messages,
+            tools=self.assistant.tools,
+            tool_choice="auto",
+            temperature=0.7
+        )
+        return {"messages": [_assistant_message(resp.choices[0].message)], "iterations": 1}
+
+    def _tool(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        call = state["tool_call"]
+        # _execute_tool_call 需要 SDK 对象的属性访问方式
+        wrapped = SimpleNamespace(id=call["id"], function=SimpleNamespace(**call["function"]))
+        result = self.assistant._execute_tool_call(wrapped)
+        return {"messages": [{
+            "role": "tool",
+            "tool_call_id": call["id"],
+            "name": call["function"]["name"],
+            "content": json.dumps(result, ensure_ascii=False)
+        }]}
+
+    def _finish(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        last = state["messages"][-1]
+        if last.get("tool_calls"):
+            return {"answer": MAX_ITERATIONS_REPLY}
+        return {"answer": last.get("content") or ""}
+
+    def _route(self, state: Dict[str, Any]):
+        tool_calls = state["messages"][-1].get("tool_calls")
+        if not tool_calls or state.get("iterations", 0) >= self.max_iterations:
+            return "finish"
+        # 同一轮的工具调用各自作为一个任务并行执行，结果按 tool_call 顺序合并
+        return [Send("tool", {"tool_call": call}) for call in tool_calls]
+
+    def _build(self, checkpointer: Optional[SqliteCheckpointer]) -> CompiledGraph:
+        graph = StateGraph(reducers={"messages": append, "iterations": add})
+        graph.add_node("model", self._model)
+        graph.add_node("tool", self._tool)
+        graph.add_node("finish", self._finish)
+        graph.add_edge(START, "model")
+        graph.add_conditional_edges("model", self._route)
+        graph.add_edge("tool", "model")
+        graph.add_edge("finish", END)
+        return graph.compile(checkpointer=checkpointer, max_workers=self.assistant.max_tool_workers,
+                             max_steps=self.max_iterations * 2 + 2)
+
+    # ---------------- 对外接口 ----------------
+
+    def chat(self, user_message: str, thread_id: Optional[str] = None) -> str:
+        """开始一次新的对话；传入 thread_id 时记录检查点"""
+        state = self.app.invoke({
+            "messages": [
+                {"role": "system", "content": self.assistant.SYSTEM_PROMPT},
+                {"role": "user", "content": user_message}
+            ],
+            "iterations": 0
+        }, thread_id=thread_id)
+        return state["answer"]
+
+    def resume(self, thread_id: str) -> str:
+        """从检查点继续未完成的对话；已完成的对话直接返回答案"""
+        return self.app.invoke(None, thread_id=thread_id)["answer"]
+
+
+class _FlakyCreate:
+    """第 fail_on 次调用时抛出一次异常，模拟运行到一半时模型接口失败"""
+
+    def __init__(self, create, fail_on: int):
+        self.create = create
+        self.fail_on = fail_on
+        self.calls = 0
+
+    def __call__(self, **params):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise ConnectionError("模拟的模型接口故障")
+        return self.create(**params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="状态图版本的天气助手")
+    parser.add_argument("--mock", action="store_true", help="使用本地模拟服务器并演示失败后恢复")
+    parser.add_argument("--db", default=".weather_graph.sqlite", help="检查点数据库路径")
+    parser.add_argument("--thread-id", default="demo")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    server = None
+    if args.mock:
+        from LLM.MockServer import MockLLMServer
+
+        server = MockLLMServer().start()
+        os.environ["DEEPSEEK_BASE_URL"] = server.base_url
+        os.environ.setdefault("DEEPSEEK_API_KEY", "mock-key")
+
+    from LangGraphCourse.StateGraph import NodeError
+    from Protocol.FuctionCall.FunctionCallDemo001 import WeatherAssistant
+
+    user_query = "我今天要去上海，明天要去长沙，后天要去北京，大后天去广州，该怎么穿衣服？"
+    checkpointer = SqliteCheckpointer(args.db)
+    try:
+        with WeatherAssistant() as assistant:
+            graph = WeatherGraph(assistant, checkpointer)
+            print(f"用户问题: {user_query}")
+            if args.mock:
+                # 第 3 次模型调用失败：前两次模型调用和全部工具结果已经在检查点里
+                flaky = _FlakyCreate(assistant.client.chat.completions.create, fail_on=3)
+                assistant.client.chat.completions.create = flaky
+                try:
+                    graph.chat(user_query, thread_id=args.thread_id)
+                except NodeError as e:
+                    print(f"运行中断: {e}")
+                answer = graph.resume(args.thread_id)
+                print(f"恢复后完成，模型共调用 {flaky.calls} 次(含失败的 1 次)，"
+                      f"检查点统计: {checkpointer.stats()}")
+            else:
+                answer = graph.chat(user_query, thread_id=args.thread_id)
+            print("\n" + "=" * 50)
+            print(f"助手回复: {answer}")
+    finally:
+        checkpointer.close()
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
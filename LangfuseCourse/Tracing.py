@@ -0,0 +1,438 @@
+"""
+非阻塞追踪：为每次 LLM 调用、流式输出和工具执行记录 span
+
+热路径上只做计时和一次 deque.append(有界，满了就丢弃并计数)，
+序列化和导出全部由后台线程批量完成，可导出到本地 JSONL 文件或 Langfuse 兼容的 ingestion 接口。
+
+通过环境变量开启(ClientFactory 创建的客户端和 WeatherAssistant 会自动接入):
+    TRACE_JSONL_PATH=traces.jsonl
+    或 LANGFUSE_HOST / LANGFUSE_PUBLIC_KEY / LANGFUSE_SECRET_KEY
+"""
+import os
+import json
+import time
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from collections import deque
+from datetime import datetime, timezone
+from itertools import count
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_span_ids = count(1)
+_id_prefix = f"{random.getrandbits(32):08x}"
+
+
+def _usage_dict(usage: Any) -> Optional[Dict[str, Any]]:
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "total_tokens": getattr(usage, "total_tokens", None),
+    }
+
+
+def _observe_chunk(span: "Span", chunk: Any) -> None:
+    """首个内容或工具调用增量记为首 token 时间；带 usage 的数据块记录用量"""
+    choices = getattr(chunk, "choices", None)
+    if choices and span.ttft is None:
+        delta = choices[0].delta
+        if getattr(delta, "content", None) or getattr(delta, "tool_calls", None):
+            span.mark_first_token()
+    usage = getattr(chunk, "usage", None)
+    if usage is not None:
+        span.usage = _usage_dict(usage)
+
+
+class Span:
+    """一次被追踪的操作；使用 __slots__ 减少热路径上的分配开销"""
+
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "kind", "start_time",
+                 "_start", "duration", "model", "usage", "ttft", "error", "attributes", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, kind: str, attributes: Dict[str, Any]):
+        parent = _current_span.get()
+        self.tracer = tracer
+        self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = f"{_id_prefix}{next(_span_ids):08x}"
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.model = attributes.pop("model", None)
+        self.usage = None
+        self.ttft = None
+        self.error = None
+        self.duration = None
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self._token = None
+
+    def set(self, **attributes) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def mark_first_token(self) -> None:
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self._start
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.tracer._enqueue(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+        self.end(exc)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "end_time": self.start_time + (self.duration or 0.0),
+            "duration_ms": None if self.duration is None else self.duration * 1000,
+            "model": self.model,
+            "usage": self.usage,
+            "ttft_ms": None if self.ttft is None else self.ttft * 1000,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """追踪关闭时使用的空 span，所有操作都是空操作"""
+
+    def set(self, **attributes) -> "_NoopSpan":
+        return self
+
+    def mark_first_token(self) -> None:
+        pass
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class JsonlExporter:
+    """把 span 逐行追加到本地 JSONL 文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n" for s in spans))
+
+
+class LangfuseExporter:
+    """批量发送到 Langfuse 兼容的 /api/public/ingestion 接口"""
+
+    def __init__(self, host: str, public_key: str, secret_key: str, timeout: float = 10.0):
+        self.url = host.rstrip("/") + "/api/public/ingestion"
+        self.auth = (public_key, secret_key)
+        self.timeout = timeout
+
+    @staticmethod
+    def _iso(ts: float) -> str:
+        return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+    def _events(self, span: Span) -> List[Dict[str, Any]]:
+        data = span.to_dict()
+        timestamp = self._iso(data["start_time"])
+        events = []
+        if span.parent_id is None:
+            events.append({
+                "id": f"trace-{span.trace_id}", "type": "trace-create", "timestamp": timestamp,
+                "body": {"id": span.trace_id, "name": span.name, "timestamp": timestamp},
+            })
+        body = {
+            "id": span.span_id,
+            "traceId": span.trace_id,
+            "parentObservationId": span.parent_id,
+            "name": span.name,
+            "startTime": timestamp,
+            "endTime": self._iso(data["end_time"]),
+            "metadata": dict(span.attributes, kind=span.kind),
+        }
+        if span.error:
+            body["level"] = "ERROR"
+            body["statusMessage"] = span.error
+        if span.kind in ("llm", "stream"):
+            event_type = "generation-create"
+            body["model"] = span.model
+            if span.usage:
+                body["usage"] = {
+                    "input": span.usage.get("prompt_tokens"),
+                    "output": span.usage.get("completion_tokens"),
+                    "total": span.usage.get("total_tokens"),
+                }
+            if span.ttft is not None:
+                body["completionStartTime"] = self._iso(data["start_time"] + span.ttft)
+        else:
+            event_type = "span-create"
+        events.append({"id": f"evt-{span.span_id}", "type": event_type, "timestamp": timestamp, "body": body})
+        return events
+
+    def export(self, spans: List[Span]) -> None:
+        from LLM.ClientFactory import get_requests_session
+
+        batch = [event for span in spans for event in self._events(span)]
+        response = get_requests_session().post(self.url, json={"batch": batch}, auth=self.auth,
+                                               timeout=self.timeout)
+        if response.status_code >= 400:
+            raise RuntimeError(f"Langfuse ingestion 返回 {response.status_code}: {response.text[:200]}")
+
+
+class _TracedStream:
+    """
+    流式响应的包装：迭代时记录 TTFT/用量，流结束、提前关闭或出错时结束 span
+
+    保留 SDK 流对象的接口：支持 with / async with、close()/aclose()，其他属性(例如 .response)转发给原始流。
+    调用方提前 break 或关闭流属于正常结束，不记为错误。
+    """
+
+    def __init__(self, stream, span: Span):
+        self._stream = stream
+        self._span = span
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                _observe_chunk(self._span, chunk)
+                yield chunk
+        except GeneratorExit:
+            raise
+        except BaseException as e:
+            self._span.end(e)
+            raise
+        finally:
+            self._span.end()
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                _observe_chunk(self._span, chunk)
+                yield chunk
+        except GeneratorExit:
+            raise
+        except BaseException as e:
+            self._span.end(e)
+            raise
+        finally:
+            self._span.end()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def close(self) -> Any:
+        """与内层流一致：包装异步流时返回需要 await 的协程"""
+        self._span.end()
+        return self._stream.close()
+
+    async def aclose(self) -> None:
+        from LLM.ClientFactory import aclose_stream
+
+        self._span.end()
+        await aclose_stream(self._stream)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class Tracer:
+    """
+    追踪器：span 进入有界队列，由后台线程按批次(batch_size 或 flush_interval)导出
+
+    队列满时直接丢弃新 span 并计数，绝不阻塞业务线程。
+    """
+
+    def __init__(self, exporter: Any, max_queue: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 1.0):
+        self.exporter = exporter
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.exported = 0
+        self.export_errors = 0
+        self._queue: Deque[Span] = deque()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._idle = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tracer-flush", daemon=True)
+        self._thread.start()
+
+    def span(self, name: str, kind: str = "span", **attributes) -> Span:
+        """创建 span，配合 with 使用时自动成为后续 span 的父节点"""
+        return Span(self, name, kind, attributes)
+
+    def _enqueue(self, span: Span) -> None:
+        # deque.append 在 GIL 下是原子的，不需要额外加锁
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def _drain(self) -> None:
+        queue = self._queue
+        while queue:
+            batch = []
+            while queue and len(batch) < self.batch_size:
+                batch.append(queue.popleft())
+            try:
+                self.exporter.export(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.export_errors += 1
+                logger.warning(f"导出 {len(batch)} 个 span 失败: {e}")
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._idle.clear()
+            self._drain()
+            self._idle.set()
+        self._drain()
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """等待当前队列中的 span 全部导出"""
+        deadline = time.monotonic() + timeout
+        while self._queue and time.monotonic() < deadline:
+            self._wakeup.set()
+            time.sleep(0.005)
+        self._idle.wait(max(0.0, deadline - time.monotonic()))
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": len(self._queue), "exported": self.exported,
+                "dropped": self.dropped, "export_errors": self.export_errors}
+
+    # ---------------- 自动埋点 ----------------
+
+    def _llm_span(self, params: Dict[str, Any]) -> Span:
+        stream = bool(params.get("stream"))
+        return self.span("chat.completions.create", "stream" if stream else "llm",
+                         model=params.get("model"), messages=len(params.get("messages") or []),
+                         tools=len(params.get("tools") or []))
+
+    def traced_create(self, original_create: Callable[..., Any], **params) -> Any:
+        span = self._llm_span(params)
+        try:
+            response = original_create(**params)
+        except BaseException as e:
+            span.end(e)
+            raise
+        if params.get("stream"):
+            return _TracedStream(response, span)
+        span.usage = _usage_dict(getattr(response, "usage", None))
+        span.end()
+        return response
+
+    async def atraced_create(self, original_create: Callable[..., Any], **params) -> Any:
+        span = self._llm_span(params)
+        try:
+            response = await original_create(**params)
+        except BaseException as e:
+            span.end(e)
+            raise
+        if params.get("stream"):
+            return _TracedStream(response, span)
+        span.usage = _usage_dict(getattr(response, "usage", None))
+        span.end()
+        return response
+
+    def wrap(self, client):
+        from LLM.ClientFactory import wrap_chat_create
+
+        return wrap_chat_create(client, self.traced_create)
+
+    def wrap_async(self, client):
+        from LLM.ClientFactory import wrap_chat_create
+
+        return wrap_chat_create(client, self.atraced_create)
+
+
+_tracer: Optional[Tracer] = None
+_tracer_loaded = False
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Optional[Tracer]:
+    """按环境变量创建进程内共享的追踪器，未配置时返回 None"""
+    global _tracer, _tracer_loaded
+    if _tracer_loaded:
+        return _tracer
+    with _tracer_lock:
+        if not _tracer_loaded:
+            exporter = None
+            if os.getenv("LANGFUSE_HOST") and os.getenv("LANGFUSE_PUBLIC_KEY"):
+                exporter = LangfuseExporter(os.environ["LANGFUSE_HOST"], os.environ["LANGFUSE_PUBLIC_KEY"],
+                                            os.getenv("LANGFUSE_SECRET_KEY", ""))
+            elif os.getenv("TRACE_JSONL_PATH"):
+                exporter = JsonlExporter(os.environ["TRACE_JSONL_PATH"])
+            if exporter is not None:
+                _tracer = Tracer(exporter)
+                atexit.register(_tracer.shutdown)
+            _tracer_loaded = True
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    """显式指定共享追踪器(例如在代码中直接配置导出目标)"""
+    global _tracer, _tracer_loaded
+    with _tracer_lock:
+        _tracer = tracer
+        _tracer_loaded = True
+
+
+def span(name: str, kind: str = "span", **attributes):
+    """追踪关闭时返回空 span，调用方无需判断"""
+    tracer = get_tracer()
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.span(name, kind, **attributes)
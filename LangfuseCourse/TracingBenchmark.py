@@ -0,0 +1,110 @@
+"""
+追踪开销测试：关闭追踪 / 开启追踪(内存导出) / 开启追踪(JSONL 导出) 下单个 span 与单次 LLM 调用的额外耗时
+
+在仓库根目录运行: python -m LangfuseCourse.TracingBenchmark
+"""
+import os
+import time
+import argparse
+import tempfile
+from types import SimpleNamespace
+from typing import Callable, List
+
+from LangfuseCourse.Tracing import NOOP_SPAN, JsonlExporter, Span, Tracer
+
+
+class CountingExporter:
+    """只计数不落盘，用于测量热路径本身的开销"""
+
+    def __init__(self):
+        self.count = 0
+
+    def export(self, spans: List[Span]) -> None:
+        self.count += len(spans)
+
+
+def _fake_response():
+    usage = SimpleNamespace(prompt_tokens=120, completion_tokens=30, total_tokens=150)
+    return SimpleNamespace(usage=usage, choices=[])
+
+
+def _fake_stream(n: int):
+    delta = SimpleNamespace(content="字")
+    chunk = SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+    for _ in range(n):
+        yield chunk
+
+
+def measure(fn: Callable[[], None], n: int) -> float:
+    """返回每次调用的平均耗时(微秒)"""
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def run(n: int, stream_chunks: int) -> None:
+    response = _fake_response()
+
+    def create(**params):
+        if params.get("stream"):
+            return _fake_stream(stream_chunks)
+        return response
+
+    params = {"model": "deepseek-chat", "messages": [{"role": "user", "content": "hi"}]}
+
+    def noop_span():
+        with NOOP_SPAN:
+            pass
+
+    baseline_call = measure(lambda: create(**params), n)
+    baseline_stream = measure(lambda: sum(1 for _ in create(stream=True, **params)), n // 10)
+    print(f"基线: 空 span {measure(noop_span, n):.2f}µs, 直接调用 {baseline_call:.2f}µs, "
+          f"流式 {stream_chunks} 块 {baseline_stream:.2f}µs")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exporters = {
+            "内存计数": CountingExporter(),
+            "JSONL": JsonlExporter(os.path.join(tmp, "traces.jsonl")),
+        }
+        for label, exporter in exporters.items():
+            # 队列足够大，保证测量期间不丢弃，测到的是完整的入队开销
+            tracer = Tracer(exporter, max_queue=n * 3, flush_interval=0.2)
+
+            def traced_span():
+                with tracer.span("bench", "span", step=1):
+                    pass
+
+            per_span = measure(traced_span, n)
+            per_call = measure(lambda: tracer.traced_create(create, **params), n) - baseline_call
+            per_stream = measure(lambda: sum(1 for _ in tracer.traced_create(create, stream=True, **params)),
+                                 n // 10) - baseline_stream
+
+            start = time.perf_counter()
+            tracer.flush(timeout=60)
+            drain = time.perf_counter() - start
+            tracer.shutdown()
+            stats = tracer.stats()
+            print(f"[{label}] span {per_span:.2f}µs, LLM 调用额外 {per_call:.2f}µs, "
+                  f"流式调用额外 {per_stream:.2f}µs, 后台导出剩余队列 {drain * 1000:.0f}ms, "
+                  f"已导出 {stats['exported']}, 丢弃 {stats['dropped']}")
+
+    # 队列很小时，业务线程不会被阻塞，只是丢弃并计数
+    tracer = Tracer(CountingExporter(), max_queue=100, flush_interval=10)
+    for _ in range(1000):
+        with tracer.span("overflow"):
+            pass
+    print(f"[小队列] 1000 个 span 中丢弃 {tracer.stats()['dropped']} 个")
+    tracer.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="追踪开销测试")
+    parser.add_argument("-n", type=int, default=100000, help="每项测量的调用次数")
+    parser.add_argument("--stream-chunks", type=int, default=50, help="模拟流式响应的数据块数")
+    args = parser.parse_args()
+    run(args.n, args.stream_chunks)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
-import json
 import os
-import requests
 
 from dotenv import load_dotenv, find_dotenv
 
+from LLM.ClientFactory import get_requests_session
+from LLM.SSEDecoder import iter_delta_content
+
 load_dotenv(find_dotenv())
 
 # One-API 地址
@@ -30,30 +31,17 @@ data = {
 
 print(str(data))
 
-with requests.post(ONEAPI_URL, json=data, headers=HEADERS, stream=True) as response:
+# 使用共享的 Session，复用长连接
+session = get_requests_session()
+
+with session.post(ONEAPI_URL, json=data, headers=HEADERS, stream=True) as response:
     print(response)
     if response.status_code != 200:
         print("请求失败，状态码：", response.status_code)
         print("返回内容：", response.text)
     else:
         print("Assistant:", end="", flush=True)
-        buffer = b""
-        for chunk in response.iter_content(chunk_size=1024):
-            if chunk:
-                buffer += chunk
-                while b"\n" in buffer:
-                    line, buffer = buffer.split(b"\n", 1)
-                    line = line.strip()
-                    if line.startswith(b"data: "):
-                        line_data = line[len(b"data: ") :].strip()
-                        if line_data == b"[DONE]":
-                            break
-                        try:
-                            # 使用 UTF-8 解码
-                            chunk_json = json.loads(line_data.decode("utf-8"))
-                            content = chunk_json["choices"][0]["delta"].get("content")
-                            if content:
-                                print(content, end="", flush=True)
-                        except Exception:
-                            continue
-        print()
\ No newline at end of file
+        # 增量解析SSE流，避免反复拼接/切分缓冲区
+        for content in iter_delta_content(response.iter_content(chunk_size=1024)):
+            print(content, end="", flush=True)
+        print()
@@ -0,0 +1,150 @@
+"""
+A2A 调度器压测：用进程内的模拟智能体测量 tasks/s，并检查优先级、取消和流式中间结果
+
+- 空任务：调度器本身的开销
+- I/O 密集(sleep)：线程后端随工作线程数扩展
+- CPU 密集：线程后端受 GIL 限制，进程后端随核数扩展
+- 多进程服务：启动多个 A2A 服务子进程，由本地协调调度器经 remote_agent 轮询分派
+
+在仓库根目录运行: python -m Protocol.A2A.A2ABenchmark --tasks 2000 --servers 2
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+from typing import Any, Dict, List
+
+from LLM.StreamMetrics import percentile
+from Protocol.A2A.Agents import AGENTS
+from Protocol.A2A.Client import A2AClient, remote_agent
+from Protocol.A2A.TaskScheduler import CANCELED, COMPLETED, TaskScheduler
+
+CITIES = ["北京", "上海", "广州", "长沙", "深圳", "杭州"]
+
+
+def run_batch(scheduler: TaskScheduler, agent: str, payload: Dict[str, Any], tasks: int) -> float:
+    start = time.perf_counter()
+    submitted = [scheduler.submit(agent, payload) for _ in range(tasks)]
+    for task in submitted:
+        task.wait()
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for task in submitted if task.state != COMPLETED)
+    if failed:
+        print(f"    !! {failed} 个任务未完成")
+    return tasks / elapsed
+
+
+def bench_throughput(tasks: int) -> None:
+    print("[吞吐]")
+    with TaskScheduler(AGENTS, workers=8) as scheduler:
+        rate = run_batch(scheduler, "dress", {"weather": "晴，28°C"}, tasks * 5)
+        print(f"  空任务        线程x8   : {rate:9.0f} tasks/s")
+
+    for workers in (1, 16, 64):
+        count = min(tasks, 100 * workers)
+        with TaskScheduler(AGENTS, workers=workers) as scheduler:
+            rate = run_batch(scheduler, "weather", {"city": "北京", "latency": 0.01}, count)
+        print(f"  I/O 10ms      线程x{workers:<3}: {rate:9.0f} tasks/s (理论上限 {workers * 100})")
+
+    cores = os.cpu_count() or 1
+    cpu_tasks = max(cores * 20, 40)
+    payload = {"cpu_work": 200000}
+    for backend in ("thread", "process"):
+        with TaskScheduler(AGENTS, workers=cores, backend=backend) as scheduler:
+            scheduler.wait(scheduler.submit("cpu", {"cpu_work": 1}).id)  # 等工作进程启动完成
+            rate = run_batch(scheduler, "cpu", payload, cpu_tasks)
+        print(f"  CPU 密集      {backend:<7} x{cores:<2}: {rate:9.1f} tasks/s")
+
+
+def check_priority() -> None:
+    with TaskScheduler(AGENTS, workers=4) as scheduler:
+        low = [scheduler.submit("dress", {"weather": "阴，25°C", "latency": 0.005}) for _ in range(400)]
+        time.sleep(0.02)
+        high = [scheduler.submit("dress", {"weather": "晴，30°C", "latency": 0.005}, priority=10)
+                for _ in range(20)]
+        for task in low + high:
+            task.wait()
+
+    def waits(tasks) -> List[float]:
+        return sorted(task.started_at - task.created_at for task in tasks)
+
+    print(f"[优先级] 400 个普通任务排队时插入 20 个高优先级任务: "
+          f"高优先级 p99 等待 {percentile(waits(high), 99) * 1000:.1f}ms, "
+          f"普通任务 p50 等待 {percentile(waits(low), 50) * 1000:.1f}ms")
+
+
+def check_cancel_and_stream() -> None:
+    with TaskScheduler(AGENTS, workers=2) as scheduler:
+        cities = CITIES * 20
+        task = scheduler.submit("weather", {"cities": cities, "latency": 0.01})
+        events = scheduler.stream(task.id)
+        first = next(e for e in events if e["type"] == "artifact")
+        scheduler.cancel(task.id)
+        final = [e for e in events if e["type"] == "status"][-1]
+        print(f"[取消] 首个中间结果 {first['data']}，取消后状态 {final['state']}，"
+              f"产生 {len(task.artifacts)}/{len(cities)} 个中间结果")
+        assert final["state"] == CANCELED
+
+        queued = [scheduler.submit("weather", {"city": "上海", "latency": 0.05}) for _ in range(10)]
+        for t in queued[2:]:
+            scheduler.cancel(t.id)
+        for t in queued:
+            t.wait()
+        print(f"[取消] 排队中的任务: {sum(t.state == CANCELED for t in queued)}/8 已取消，"
+              f"统计 {scheduler.stats()}")
+
+
+def bench_servers(servers: int, tasks: int, base_port: int) -> None:
+    urls = [f"http://127.0.0.1:{base_port + i}" for i in range(servers)]
+    processes = [subprocess.Popen([sys.executable, "-m", "Protocol.A2A.Server", "--port", str(base_port + i),
+                                   "--workers", "64"], stdout=subprocess.DEVNULL)
+                 for i in range(servers)]
+    try:
+        for url in urls:
+            for _ in range(100):
+                try:
+                    A2AClient(url).agent_card()
+                    break
+                except Exception:
+                    time.sleep(0.1)
+
+        print(f"[多进程] {servers} 个 A2A 服务进程，协调调度器经 SSE 转发")
+        agents = {"weather": remote_agent(urls, "weather"), "dress": remote_agent(urls, "dress")}
+        for latency in (0.0, 0.01):
+            with TaskScheduler(agents, workers=64) as coordinator:
+                rate = run_batch(coordinator, "weather", {"cities": CITIES[:2], "latency": latency}, tasks)
+            print(f"  每城市 I/O {latency * 1000:>3.0f}ms : {rate:9.0f} tasks/s")
+
+        # 流水线：天气智能体的中间结果一到，立即提交穿衣建议任务
+        with TaskScheduler(agents, workers=16) as coordinator:
+            start = time.perf_counter()
+            weather = coordinator.submit("weather", {"cities": CITIES, "latency": 0.05})
+            advice = [coordinator.submit("dress", event["data"])
+                      for event in coordinator.stream(weather.id) if event["type"] == "artifact"]
+            results = [coordinator.wait(task.id).result for task in advice]
+            elapsed = time.perf_counter() - start
+        print(f"  流水线 weather -> dress: {len(results)} 个城市 {elapsed * 1000:.0f}ms，"
+              f"例: {results[0]['city']} {results[0]['advice']}")
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A2A 任务调度器压测")
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--servers", type=int, default=2, help="多进程测试启动的 A2A 服务数，0 表示跳过")
+    parser.add_argument("--base-port", type=int, default=9100)
+    args = parser.parse_args()
+
+    bench_throughput(args.tasks)
+    check_priority()
+    check_cancel_and_stream()
+    if args.servers:
+        bench_servers(args.servers, args.tasks, args.base_port)
+
+
+if __name__ == "__main__":
+    main()
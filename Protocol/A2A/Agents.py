@@ -0,0 +1,70 @@
+"""
+A2A 演示用的智能体，拆分自 WeatherAssistant 的两项能力
+
+- weather_agent: 查询一个或多个城市的天气，每个城市产生一个中间结果
+- dress_agent: 根据天气给出穿衣建议
+- assistant_agent: 直接调用 WeatherAssistant(需要大模型 API)
+
+latency / cpu_work 参数用于模拟智能体的 I/O 等待和计算量，方便压测调度器。
+所有智能体都是模块级函数，可以在进程池后端中使用。
+"""
+import time
+from typing import Any, Dict, Iterator, List
+
+from Protocol.FuctionCall.WeatherTools import dress_advice, get_weather
+
+
+def _simulate(payload: Dict[str, Any]) -> None:
+    latency = payload.get("latency", 0)
+    if latency:
+        time.sleep(latency)
+    work = payload.get("cpu_work", 0)
+    if work:
+        burn(work)
+
+
+def burn(iterations: int) -> int:
+    """纯 Python 计算，持有 GIL，用于模拟 CPU 密集的智能体"""
+    total = 0
+    for i in range(iterations):
+        total = (total + i * i) % 1000003
+    return total
+
+
+def weather_agent(payload: Dict[str, Any]) -> Iterator[Dict[str, str]]:
+    """输入 {"cities": [...]} 或 {"city": "..."}，逐个城市产出 {"city", "weather"}"""
+    cities: List[str] = payload.get("cities") or [payload["city"]]
+    results = {}
+    for city in cities:
+        _simulate(payload)
+        results[city] = get_weather(city)
+        yield {"city": city, "weather": results[city]}
+    return results
+
+
+def dress_agent(payload: Dict[str, Any]) -> Dict[str, str]:
+    """输入 {"weather": "晴，28°C"}，可带 city 原样返回"""
+    _simulate(payload)
+    return {"city": payload.get("city", ""), "weather": payload["weather"],
+            "advice": dress_advice(payload["weather"])}
+
+
+def assistant_agent(payload: Dict[str, Any]) -> str:
+    """输入 {"message": "..."}，由 WeatherAssistant 完成完整的 Function Calling 流程"""
+    from Protocol.FuctionCall.FunctionCallDemo001 import WeatherAssistant
+
+    with WeatherAssistant() as assistant:
+        return assistant.chat(payload["message"])
+
+
+def cpu_agent(payload: Dict[str, Any]) -> int:
+    """输入 {"cpu_work": 迭代次数}"""
+    return burn(payload.get("cpu_work", 100000))
+
+
+AGENTS = {
+    "weather": weather_agent,
+    "dress": dress_agent,
+    "assistant": assistant_agent,
+    "cpu": cpu_agent,
+}
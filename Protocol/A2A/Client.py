@@ -0,0 +1,122 @@
+"""
+A2A 客户端，复用 ClientFactory 的共享 requests 连接池
+
+- A2AClient: 调用单个 A2A 服务的 tasks/send、tasks/get、tasks/cancel、tasks/sendSubscribe
+- remote_agent: 把若干个本机/远程 A2A 服务包装成一个智能体函数(轮询分发)，
+  可以注册到本地 TaskScheduler 中，由一个协调进程把任务分派给多个服务进程
+
+用法:
+    client = A2AClient("http://127.0.0.1:9000")
+    for event in client.send_subscribe("weather", {"cities": ["北京", "上海"]}):
+        print(event)
+"""
+import json
+import time
+import uuid
+import itertools
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# 依赖仓库内的其他模块，请在仓库根目录运行
+from LLM.ClientFactory import PoolConfig, get_requests_session
+from Protocol.A2A.TaskScheduler import FINAL_STATES
+
+
+class A2AClientError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(f"[{code}] {message}")
+        self.code = code
+        self.message = message
+
+
+class A2AClient:
+    def __init__(self, base_url: str, pool: Optional[PoolConfig] = None, timeout: float = 60.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = get_requests_session(pool)
+        self._ids = itertools.count(1)
+
+    def agent_card(self) -> Dict[str, Any]:
+        response = self.session.get(f"{self.base_url}/.well-known/agent.json", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _params(skill: str, payload: Dict[str, Any], priority: int, task_id: Optional[str]) -> Dict[str, Any]:
+        return {
+            "id": task_id or uuid.uuid4().hex,
+            "message": {"role": "user", "parts": [{"type": "data", "data": payload}]},
+            "metadata": {"skill": skill, "priority": priority},
+        }
+
+    def _call(self, method: str, params: Dict[str, Any]) -> Any:
+        body = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+        response = self.session.post(f"{self.base_url}/", json=body, timeout=self.timeout)
+        message = response.json()
+        if "error" in message:
+            raise A2AClientError(message["error"].get("code", -1), message["error"].get("message", ""))
+        return message["result"]
+
+    def send(self, skill: str, payload: Dict[str, Any], priority: int = 0,
+             task_id: Optional[str] = None) -> Dict[str, Any]:
+        return self._call("tasks/send", self._params(skill, payload, priority, task_id))
+
+    def get(self, task_id: str) -> Dict[str, Any]:
+        return self._call("tasks/get", {"id": task_id})
+
+    def cancel(self, task_id: str) -> Dict[str, Any]:
+        return self._call("tasks/cancel", {"id": task_id})
+
+    def wait(self, task_id: str, timeout: Optional[float] = None, interval: float = 0.05) -> Dict[str, Any]:
+        """轮询直到任务结束；需要及时拿到中间结果时用 send_subscribe"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            task = self.get(task_id)
+            if task["status"]["state"] in FINAL_STATES:
+                return task
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"等待任务 {task_id} 超时")
+            time.sleep(interval)
+
+    def send_subscribe(self, skill: str, payload: Dict[str, Any], priority: int = 0,
+                       task_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """提交任务并逐条返回事件(与 TaskScheduler.stream 的事件格式相同)"""
+        body = {"jsonrpc": "2.0", "id": next(self._ids), "method": "tasks/sendSubscribe",
+                "params": self._params(skill, payload, priority, task_id)}
+        with self.session.post(f"{self.base_url}/", json=body, stream=True, timeout=self.timeout) as response:
+            if not response.headers.get("content-type", "").startswith("text/event-stream"):
+                message = response.json()
+                error = message.get("error") or {}
+                raise A2AClientError(error.get("code", response.status_code), error.get("message", response.text))
+            for line in response.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                event = json.loads(line[5:])["result"]
+                yield event
+                if event["type"] == "status" and event["final"]:
+                    return
+
+
+def remote_agent(urls: List[str], skill: str, pool: Optional[PoolConfig] = None) -> Callable[[Dict[str, Any]], Any]:
+    """
+    把多个 A2A 服务的同一个 skill 包装成本地智能体，按轮询分派，中间结果原样转发
+
+    返回的是闭包，只能用于线程后端的 TaskScheduler。
+    """
+    clients = [A2AClient(url, pool) for url in urls]
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def agent(payload: Dict[str, Any]):
+        with lock:
+            client = clients[next(counter) % len(clients)]
+        for event in client.send_subscribe(skill, payload):
+            if event["type"] == "artifact":
+                yield event["data"]
+            elif event["final"]:
+                if event["state"] != "completed":
+                    raise RuntimeError(f"远程任务{event['state']}: {event.get('error', '')}")
+                return event.get("result")
+
+    agent.__doc__ = f"转发到 {', '.join(urls)} 的 {skill}"
+    return agent
@@ -0,0 +1,172 @@
+"""
+A2A 协议的 HTTP 服务端：把 TaskScheduler 中的智能体以 JSON-RPC 接口发布
+
+- GET  /.well-known/agent.json  智能体名片(Agent Card)，skills 为可用的智能体
+- POST /  JSON-RPC 方法:
+    tasks/send           提交任务，立即返回当前任务状态(不等待完成)
+    tasks/get            查询任务状态和已产生的中间结果
+    tasks/cancel         取消任务
+    tasks/sendSubscribe  提交任务并以 SSE 推送状态和中间结果，直到最终状态
+
+任务参数: {"id": 可选任务 id, "message": {"parts": [{"type": "data", "data": {...}}]},
+          "metadata": {"skill": 智能体名称, "priority": 优先级}}
+
+启动多个本机进程即可横向扩展，例如:
+    python -m Protocol.A2A.Server --port 9001 --backend process
+    python -m Protocol.A2A.Server --port 9002 --backend thread --workers 64
+"""
+import json
+import asyncio
+import logging
+import argparse
+from typing import Any, AsyncIterator, Dict, Optional
+
+# 依赖仓库内的其他模块，请在仓库根目录运行: python -m Protocol.A2A.Server
+from Protocol.AsyncHttpServer import AsyncHttpServer, HttpRequest, HttpResponse, Router, json_response, sse_response
+from Protocol.A2A.TaskScheduler import SchedulerFullError, TaskScheduler
+
+logger = logging.getLogger(__name__)
+
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+TASK_NOT_FOUND = -32001
+SERVER_BUSY = -32000
+
+
+class A2AError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _message_input(params: Dict[str, Any]) -> Dict[str, Any]:
+    """把 message.parts 合并为智能体输入：data 部分合并字典，text 部分拼成 text 字段"""
+    payload: Dict[str, Any] = {}
+    texts = []
+    for part in (params.get("message") or {}).get("parts", []):
+        if part.get("type") == "data":
+            payload.update(part.get("data") or {})
+        elif part.get("type") == "text":
+            texts.append(part.get("text", ""))
+    if texts:
+        payload.setdefault("message", "\n".join(texts))
+    return payload
+
+
+class A2AServer:
+    def __init__(self, scheduler: TaskScheduler, name: str = "weather-agents", url: str = ""):
+        self.scheduler = scheduler
+        self.name = name
+        self.url = url
+
+    def agent_card(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "url": self.url,
+            "version": "1.0.0",
+            "capabilities": {"streaming": True},
+            "skills": [{"id": name, "name": name, "description": (func.__doc__ or "").strip()}
+                       for name, func in self.scheduler.agents.items()],
+        }
+
+    def _submit(self, params: Dict[str, Any]):
+        metadata = params.get("metadata") or {}
+        skill = metadata.get("skill")
+        if skill not in self.scheduler.agents:
+            raise A2AError(INVALID_PARAMS, f"未知 skill: {skill}")
+        try:
+            return self.scheduler.submit(skill, _message_input(params), int(metadata.get("priority", 0)),
+                                         params.get("id"))
+        except SchedulerFullError as e:
+            raise A2AError(SERVER_BUSY, str(e))
+
+    def _task(self, params: Dict[str, Any]):
+        task = self.scheduler.get(params.get("id", ""))
+        if task is None:
+            raise A2AError(TASK_NOT_FOUND, f"任务不存在: {params.get('id')}")
+        return task
+
+    def handle(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "tasks/send":
+            return self._submit(params).to_dict()
+        if method == "tasks/get":
+            return self._task(params).to_dict()
+        if method == "tasks/cancel":
+            task = self._task(params)
+            self.scheduler.cancel(task.id)
+            return task.to_dict()
+        raise A2AError(METHOD_NOT_FOUND, f"不支持的方法: {method}")
+
+    async def _subscribe(self, request_id: Any, task) -> AsyncIterator[Dict[str, Any]]:
+        """调度器线程产生的事件经 call_soon_threadsafe 转入事件循环的队列"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        task.subscribe(lambda event: loop.call_soon_threadsafe(queue.put_nowait, event))
+        while True:
+            event = await queue.get()
+            yield {"jsonrpc": "2.0", "id": request_id, "result": event}
+            if event["type"] == "status" and event["final"]:
+                return
+
+    def http_router(self) -> Router:
+        router = Router()
+
+        async def card(request: HttpRequest) -> HttpResponse:
+            return json_response(self.agent_card())
+
+        async def rpc(request: HttpRequest) -> HttpResponse:
+            try:
+                message = request.json()
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                return json_response({"jsonrpc": "2.0", "id": None,
+                                      "error": {"code": -32700, "message": f"JSON 解析失败: {e}"}}, 400)
+            request_id = message.get("id") if isinstance(message, dict) else None
+            try:
+                if not isinstance(message, dict) or "method" not in message:
+                    raise A2AError(INVALID_REQUEST, "无效的 JSON-RPC 请求")
+                params = message.get("params") or {}
+                if message["method"] == "tasks/sendSubscribe":
+                    return sse_response(self._subscribe(request_id, self._submit(params)))
+                # 调度器的方法只做内存操作，直接在事件循环中调用
+                result = self.handle(message["method"], params)
+                return json_response({"jsonrpc": "2.0", "id": request_id, "result": result})
+            except A2AError as e:
+                status = 429 if e.code == SERVER_BUSY else 200
+                return json_response({"jsonrpc": "2.0", "id": request_id,
+                                      "error": {"code": e.code, "message": e.message}}, status)
+
+        router.add("GET", r"/\.well-known/agent\.json", card)
+        router.add("POST", r"/", rpc)
+        return router
+
+
+def serve(host: str = "127.0.0.1", port: int = 9000, backend: str = "thread",
+          workers: Optional[int] = None) -> None:
+    from Protocol.A2A.Agents import AGENTS
+
+    scheduler = TaskScheduler(AGENTS, workers=workers, backend=backend)
+    http = AsyncHttpServer(None, host, port)
+    server = A2AServer(scheduler, url=http.base_url)
+    http.handler = server.http_router()
+    print(f"A2A 服务: {http.base_url} (后端 {backend}, {scheduler.workers} 个工作者)")
+    try:
+        asyncio.run(http.serve_forever())
+    finally:
+        scheduler.shutdown(wait=False, cancel_pending=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A2A 智能体任务服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--backend", choices=["thread", "process"], default="thread")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    serve(args.host, args.port, args.backend, args.workers)
+
+
+if __name__ == "__main__":
+    main()
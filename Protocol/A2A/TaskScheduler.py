@@ -0,0 +1,467 @@
+"""
+A2A 任务调度器：提交任务、查询状态、订阅流式的中间结果，按优先级在线程池或进程池中执行
+
+智能体(agent)是一个普通函数 agent(input: dict)：
+- 返回普通值：该值就是任务结果
+- 是生成器：每次 yield 产生一个中间结果(对应 A2A 的 artifact)，return 的值为最终结果，
+  没有 return 值时以最后一个中间结果作为最终结果；两次 yield 之间检查取消标记(协作式取消)
+
+两种执行后端:
+- thread: 工作线程直接执行，适合 I/O 密集的智能体(调用大模型、HTTP 接口)
+- process: 每个工作进程串行执行任务，中间结果经管道送回，适合 CPU 密集的智能体，可以用满多核。
+  智能体必须是可 import 的模块级函数
+
+调度器在本进程内维护优先级队列，只在工作者空闲时才派发任务，因此后端为进程池时优先级同样生效。
+
+用法:
+    scheduler = TaskScheduler({"weather": weather_agent}, workers=8)
+    task = scheduler.submit("weather", {"cities": ["北京", "上海"]}, priority=5)
+    for event in scheduler.stream(task.id):
+        print(event)
+    scheduler.shutdown()
+"""
+import os
+import time
+import uuid
+import heapq
+import inspect
+import logging
+import itertools
+import threading
+import traceback
+import multiprocessing
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# A2A 协议中的任务状态
+SUBMITTED = "submitted"
+WORKING = "working"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELED = "canceled"
+FINAL_STATES = (COMPLETED, FAILED, CANCELED)
+
+Agent = Callable[[Dict[str, Any]], Any]
+Listener = Callable[[Dict[str, Any]], None]
+
+
+class SchedulerFullError(RuntimeError):
+    """排队任务数达到上限"""
+
+
+class TaskCanceled(Exception):
+    """智能体在两次 yield 之间发现任务已被取消"""
+
+
+@dataclass
+class Task:
+    id: str
+    agent: str
+    input: Dict[str, Any]
+    priority: int = 0
+    state: str = SUBMITTED
+    artifacts: List[Any] = field(default_factory=list)
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_requested: bool = False
+    seq: int = 0
+    _cond: threading.Condition = field(default_factory=threading.Condition, repr=False)
+    _listeners: List[Listener] = field(default_factory=list, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.state in FINAL_STATES
+
+    def _status_event(self) -> Dict[str, Any]:
+        event = {"type": "status", "id": self.id, "state": self.state, "final": self.done}
+        if self.done:
+            event["result"] = self.result
+            if self.error:
+                event["error"] = self.error
+        return event
+
+    def _notify(self, event: Dict[str, Any]) -> None:
+        """调用方需持有 _cond"""
+        self._cond.notify_all()
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                logger.exception(f"任务 {self.id} 的监听器异常")
+        if self.done:
+            self._listeners.clear()
+
+    def _set_state(self, state: str, result: Any = None, error: Optional[str] = None) -> bool:
+        with self._cond:
+            if self.done:
+                return False
+            self.state = state
+            if state == WORKING:
+                self.started_at = time.time()
+            else:
+                self.result = result
+                self.error = error
+                self.finished_at = time.time()
+            self._notify(self._status_event())
+            return True
+
+    def _add_artifact(self, data: Any) -> None:
+        with self._cond:
+            if self.done:
+                return
+            self.artifacts.append(data)
+            self._notify({"type": "artifact", "id": self.id, "index": len(self.artifacts) - 1, "data": data})
+
+    def subscribe(self, listener: Listener) -> None:
+        """
+        注册事件回调：先按顺序补发已产生的中间结果和当前状态，之后的事件实时回调
+
+        回调在产生事件的线程中执行，不能阻塞；跨线程转发到事件循环请用 call_soon_threadsafe。
+        """
+        with self._cond:
+            for index, data in enumerate(self.artifacts):
+                listener({"type": "artifact", "id": self.id, "index": index, "data": data})
+            listener(self._status_event())
+            if not self.done:
+                self._listeners.append(listener)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self.done, timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """A2A 风格的任务表示"""
+        with self._cond:
+            data = {
+                "id": self.id,
+                "status": {"state": self.state, "timestamp": self.finished_at or self.started_at or self.created_at},
+                "artifacts": [{"index": i, "parts": [{"type": "data", "data": a}]}
+                              for i, a in enumerate(self.artifacts)],
+                "metadata": {"agent": self.agent, "priority": self.priority},
+            }
+            if self.done:
+                data["result"] = self.result
+            if self.error:
+                data["status"]["message"] = self.error
+            return data
+
+
+def _run_agent(agent: Agent, payload: Dict[str, Any], emit: Callable[[Any], None],
+               canceled: Callable[[], bool]) -> Any:
+    """执行智能体，生成器的每次 yield 通过 emit 送出；返回最终结果"""
+    output = agent(payload)
+    if not inspect.isgenerator(output):
+        return output
+    last = None
+    try:
+        while True:
+            if canceled():
+                output.close()
+                raise TaskCanceled()
+            last = next(output)
+            emit(last)
+    except StopIteration as stop:
+        return stop.value if stop.value is not None else last
+
+
+# ---------------- 进程后端 ----------------
+
+def _process_main(agents: Dict[str, Agent], inbox, outbox, cancel_seq) -> None:
+    """
+    工作进程：从 inbox 逐个取任务执行，向 outbox 发送 (seq, 类型, 数据)
+
+    父进程把要取消的任务序号写入共享变量 cancel_seq，按序号比较，不会误伤后续任务。
+    """
+    while True:
+        item = inbox.get()
+        if item is None:
+            return
+        seq, name, payload = item
+        try:
+            result = _run_agent(agents[name], payload,
+                                lambda data: outbox.put((seq, "artifact", data)),
+                                lambda: cancel_seq.value == seq)
+            outbox.put((seq, COMPLETED, result))
+        except TaskCanceled:
+            outbox.put((seq, CANCELED, None))
+        except Exception as e:
+            outbox.put((seq, FAILED, f"{type(e).__name__}: {e}"))
+
+
+class _ProcessWorker:
+    def __init__(self, ctx, agents: Dict[str, Agent], outbox, index: int):
+        self.ctx = ctx
+        self.agents = agents
+        self.outbox = outbox
+        self.index = index
+        self.start()
+
+    def start(self) -> None:
+        self.inbox = self.ctx.Queue()
+        self.cancel_seq = self.ctx.Value("q", -1, lock=False)
+        self.process = self.ctx.Process(target=_process_main, name=f"a2a-worker-{self.index}",
+                                        args=(self.agents, self.inbox, self.outbox, self.cancel_seq), daemon=True)
+        self.process.start()
+
+    def stop(self) -> None:
+        if self.process.is_alive():
+            self.inbox.put(None)
+            self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class TaskScheduler:
+    """按优先级派发任务的调度器，priority 越大越先执行，同优先级先进先出"""
+
+    def __init__(self,
+                 agents: Dict[str, Agent],
+                 workers: Optional[int] = None,
+                 backend: str = "thread",
+                 max_queue: int = 100000,
+                 max_finished: int = 10000,
+                 mp_context: str = "spawn"):
+        """
+        Args:
+            agents: 智能体名称 -> 函数
+            workers: 工作线程/进程数，默认线程后端 32、进程后端为 CPU 核数
+            backend: "thread" 或 "process"
+            max_queue: 排队任务上限，超过后 submit 抛出 SchedulerFullError
+            max_finished: 保留已结束任务的数量上限，超过后淘汰最早结束的
+            mp_context: 进程后端的启动方式，默认 spawn(父进程已有多个线程，fork 不安全)
+        """
+        if backend not in ("thread", "process"):
+            raise ValueError(f"不支持的后端: {backend}")
+        self.agents = dict(agents)
+        self.backend = backend
+        self.workers = workers or ((os.cpu_count() or 1) if backend == "process" else 32)
+        self.max_queue = max_queue
+        self.max_finished = max_finished
+
+        self._heap: List[Any] = []
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._tasks: Dict[str, Task] = {}
+        self._by_seq: Dict[int, Task] = {}
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._closed = False
+        self.counters = {"submitted": 0, COMPLETED: 0, FAILED: 0, CANCELED: 0, "rejected": 0}
+
+        self._process_workers: List[_ProcessWorker] = []
+        self._outbox = None
+        if backend == "process":
+            ctx = multiprocessing.get_context(mp_context)
+            self._outbox = ctx.Queue()
+            self._process_workers = [_ProcessWorker(ctx, self.agents, self._outbox, i)
+                                     for i in range(self.workers)]
+            self._collector = threading.Thread(target=self._collect, name="a2a-collector", daemon=True)
+            self._collector.start()
+
+        target = self._thread_loop if backend == "thread" else self._feeder_loop
+        self._threads = [threading.Thread(target=target, args=(i,), name=f"a2a-{backend}-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    # ---------------- 对外接口 ----------------
+
+    def submit(self, agent: str, payload: Optional[Dict[str, Any]] = None, priority: int = 0,
+               task_id: Optional[str] = None) -> Task:
+        if agent not in self.agents:
+            raise ValueError(f"未知智能体: {agent}")
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("调度器已关闭")
+            if task_id is not None and task_id in self._tasks:
+                return self._tasks[task_id]
+            if len(self._heap) >= self.max_queue:
+                self.counters["rejected"] += 1
+                raise SchedulerFullError(f"排队任务已达上限 {self.max_queue}")
+            seq = next(self._seq)
+            task = Task(task_id or uuid.uuid4().hex, agent, payload or {}, priority, seq=seq)
+            self._tasks[task.id] = task
+            self._by_seq[seq] = task
+            heapq.heappush(self._heap, (-priority, seq, task))
+            self.counters["submitted"] += 1
+            self._cond.notify()
+        return task
+
+    def get(self, task_id: str) -> Optional[Task]:
+        return self._tasks.get(task_id)
+
+    def cancel(self, task_id: str) -> bool:
+        """排队中的任务立即取消；执行中的任务在下一次 yield 时停止，普通函数型智能体无法中断"""
+        task = self._tasks.get(task_id)
+        if task is None or task.done:
+            return False
+        task.cancel_requested = True
+        with self._cond:
+            worker = self._running.get(task_id)
+        if worker is None:
+            # 还在队列里：直接置为取消，出队时跳过
+            if task._set_state(CANCELED):
+                self._on_finished(task)
+            return True
+        if self.backend == "process":
+            self._process_workers[worker].cancel_seq.value = task.seq
+        return True
+
+    def wait(self, task_id: str, timeout: Optional[float] = None) -> Task:
+        task = self._tasks[task_id]
+        task.wait(timeout)
+        return task
+
+    def stream(self, task_id: str, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """同步迭代任务事件，直到收到最终状态"""
+        task = self._tasks[task_id]
+        events: List[Dict[str, Any]] = []
+        ready = threading.Condition()
+
+        def on_event(event: Dict[str, Any]) -> None:
+            with ready:
+                events.append(event)
+                ready.notify()
+
+        task.subscribe(on_event)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        index = 0
+        while True:
+            with ready:
+                while index >= len(events):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"等待任务 {task_id} 超时")
+                    ready.wait(remaining)
+                event = events[index]
+            index += 1
+            yield event
+            if event["type"] == "status" and event["final"]:
+                return
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            queued = sum(1 for _, _, task in self._heap if not task.done)
+            return dict(self.counters, queued=queued, running=len(self._running), workers=self.workers)
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False) -> None:
+        with self._cond:
+            self._closed = True
+            pending = [task for _, _, task in self._heap] if cancel_pending else []
+            self._cond.notify_all()
+        for task in pending:
+            self.cancel(task.id)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        for worker in self._process_workers:
+            worker.stop()
+        if self._outbox is not None:
+            self._outbox.put(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    # ---------------- 调度 ----------------
+
+    def _next_task(self, worker: int) -> Optional[Task]:
+        """取优先级最高且未被取消的任务；调度器关闭且队列清空后返回 None"""
+        with self._cond:
+            while True:
+                while self._heap:
+                    _, _, task = heapq.heappop(self._heap)
+                    if task.done:
+                        continue
+                    self._running[task.id] = worker
+                    return task
+                if self._closed:
+                    return None
+                self._cond.wait()
+
+    def _on_finished(self, task: Task) -> None:
+        with self._cond:
+            self._running.pop(task.id, None)
+            self._by_seq.pop(task.seq, None)
+            self.counters[task.state] += 1
+            self._finished[task.id] = None
+            while len(self._finished) > self.max_finished:
+                old_id, _ = self._finished.popitem(last=False)
+                self._tasks.pop(old_id, None)
+
+    def _finish(self, task: Task, state: str, result: Any = None, error: Optional[str] = None) -> None:
+        if task._set_state(state, result, error):
+            self._on_finished(task)
+        else:
+            # 执行期间已被置为最终状态(取消)，只需清理执行记录
+            with self._cond:
+                self._running.pop(task.id, None)
+
+    def _start(self, task: Task) -> bool:
+        if task._set_state(WORKING):
+            return True
+        # 出队与取消同时发生，任务已是最终状态
+        with self._cond:
+            self._running.pop(task.id, None)
+        return False
+
+    def _thread_loop(self, worker: int) -> None:
+        while True:
+            task = self._next_task(worker)
+            if task is None:
+                return
+            if not self._start(task):
+                continue
+            try:
+                result = _run_agent(self.agents[task.agent], task.input, task._add_artifact,
+                                    lambda: task.cancel_requested)
+                self._finish(task, COMPLETED, result)
+            except TaskCanceled:
+                self._finish(task, CANCELED)
+            except Exception as e:
+                logger.debug(traceback.format_exc())
+                self._finish(task, FAILED, error=f"{type(e).__name__}: {e}")
+
+    def _feeder_loop(self, worker: int) -> None:
+        """进程后端：每个工作进程对应一个派发线程，进程空闲时才发送下一个任务"""
+        process_worker = self._process_workers[worker]
+        while True:
+            task = self._next_task(worker)
+            if task is None:
+                return
+            if not self._start(task):
+                continue
+            process_worker.inbox.put((task.seq, task.agent, task.input))
+            while not task.wait(1.0):
+                if not process_worker.process.is_alive():
+                    logger.warning(f"工作进程 {worker} 异常退出，重新启动")
+                    self._finish(task, FAILED, error="工作进程异常退出")
+                    process_worker.start()
+                    break
+            with self._cond:
+                self._running.pop(task.id, None)
+
+    def _collect(self) -> None:
+        """进程后端：汇总所有工作进程发回的中间结果和最终状态"""
+        while True:
+            message = self._outbox.get()
+            if message is None:
+                return
+            seq, kind, data = message
+            task = self._by_seq.get(seq)
+            if task is None:
+                continue
+            if kind == "artifact":
+                task._add_artifact(data)
+            elif kind == FAILED:
+                self._finish(task, FAILED, error=data)
+            else:
+                self._finish(task, kind, data)
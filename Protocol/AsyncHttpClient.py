@@ -0,0 +1,150 @@
+"""
+基于 asyncio 的 HTTP/1.1 流水线客户端连接，与 AsyncHttpServer 配套
+
+同一条 TCP 连接上连续发送请求而不等待前一个响应，响应按发送顺序依次匹配。
+大量小请求(如 JSON-RPC 调用)只需要一条长连接，既没有建连开销，也不受连接池调度的影响。
+
+用法:
+    conn = PipelinedHttpConnection("http://127.0.0.1:8765")
+    status, headers, body = await conn.request("POST", "/mcp", b"{...}", {"Content-Type": "application/json"})
+"""
+import socket
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+class PipelinedHttpConnection:
+    """单条长连接，支持并发请求(流水线)和断线后自动重连"""
+
+    def __init__(self, base_url: str, max_in_flight: int = 1024, timeout: float = 60.0):
+        url = urlsplit(base_url)
+        if url.scheme != "http":
+            raise ValueError("仅支持 http://")
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.timeout = timeout
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self._max_in_flight = max_in_flight
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def _ensure_connected(self) -> Deque[asyncio.Future]:
+        """返回当前连接的等待队列，连接已断开时先重新建立；每条连接有自己的等待队列"""
+        if self.connected:
+            return self._waiters
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if not self.connected:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                sock = writer.get_extra_info("socket")
+                if sock is not None:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self._reader, self._writer, self._waiters = reader, writer, deque()
+                self._reader_task = asyncio.create_task(self._read_loop(reader, writer, self._waiters))
+        return self._waiters
+
+    @staticmethod
+    def _fail_all(writer: asyncio.StreamWriter, waiters: Deque[asyncio.Future], error: BaseException) -> None:
+        """关闭连接，已发出但没有收到响应的请求全部失败，由调用方决定是否重试"""
+        writer.close()
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(error)
+
+    async def _read_body(self, reader: asyncio.StreamReader, headers: Dict[str, str]) -> bytes:
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            parts = []
+            async for chunk in self._iter_chunks(reader):
+                parts.append(chunk)
+            return b"".join(parts)
+        length = int(headers.get("content-length") or 0)
+        return await reader.readexactly(length) if length else b""
+
+    @staticmethod
+    async def _iter_chunks(reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+        while True:
+            size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                await reader.readline()
+                return
+            chunk = await reader.readexactly(size)
+            await reader.readline()
+            yield chunk
+
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                         waiters: Deque[asyncio.Future]) -> None:
+        error: BaseException = ConnectionError("连接已关闭")
+        try:
+            while True:
+                status_line = await reader.readline()
+                if not status_line:
+                    break
+                status = int(status_line.split(b" ", 2)[1])
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await self._read_body(reader, headers)
+                if waiters:
+                    waiter = waiters.popleft()
+                    if not waiter.done():
+                        waiter.set_result((status, headers, body))
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except Exception as e:
+            error = ConnectionError(f"连接异常: {e}")
+        finally:
+            # 只关闭本连接：重连后 self._writer 已经是新连接
+            self._fail_all(writer, waiters, error)
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      headers: Optional[Dict[str, str]] = None) -> Response:
+        if self._in_flight is None:
+            self._in_flight = asyncio.Semaphore(self._max_in_flight)
+        async with self._in_flight:
+            # 拿到名额之后再确认连接：等待名额期间连接可能已断开，不能把请求登记到失效的连接上
+            waiters = await self._ensure_connected()
+            writer = self._writer
+            lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                     f"Content-Length: {len(body)}"]
+            lines.extend(f"{k}: {v}" for k, v in (headers or {}).items())
+            waiter = asyncio.get_running_loop().create_future()
+            # 写入与登记等待者之间没有 await，保证响应顺序与登记顺序一致
+            waiters.append(waiter)
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+            try:
+                await writer.drain()
+            except ConnectionError as e:
+                # 写入时发现连接已断，读循环可能还没读到 EOF，这里直接让本连接上的请求全部失败
+                self._fail_all(writer, waiters, ConnectionError(f"连接异常: {e}"))
+            return await asyncio.wait_for(waiter, self.timeout)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+        self._writer = None
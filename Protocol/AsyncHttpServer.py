@@ -0,0 +1,306 @@
+"""
+轻量的 asyncio HTTP/1.1 服务器，供 MCP、A2A 等协议演示共用
+
+只依赖标准库：支持 keep-alive 和 HTTP/1.1 流水线(同一连接上的请求并发处理、按序响应)、
+Content-Length 请求体、分块(chunked)流式响应(SSE)、简单的正则路由，
+以及在后台线程中运行(方便同步代码和基准测试调用)。
+
+用法:
+    router = Router()
+
+    @router.route("POST", r"/mcp")
+    async def handle(request):
+        return json_response({"ok": True})
+
+    server = AsyncHttpServer(router, port=8000)
+    asyncio.run(server.serve_forever())
+"""
+import re
+import json
+import socket
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Pattern, Set, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+REASONS = {
+    200: "OK", 202: "Accepted", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 408: "Request Timeout", 409: "Conflict", 413: "Payload Too Large",
+    429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+@dataclass
+class HttpRequest:
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]
+    body: bytes = b""
+    path_params: Dict[str, str] = field(default_factory=dict)
+
+    def json(self) -> Any:
+        return json.loads(self.body) if self.body else None
+
+
+@dataclass
+class HttpResponse:
+    """body 为 bytes 时按 Content-Length 发送；为异步迭代器时按 chunked 逐块发送"""
+    status: int = 200
+    body: Union[bytes, AsyncIterator[bytes]] = b""
+    content_type: str = "application/json"
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+Handler = Callable[[HttpRequest], Awaitable[HttpResponse]]
+
+
+def json_response(data: Any, status: int = 200, headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return HttpResponse(status, body, "application/json", headers or {})
+
+
+def sse_response(events: AsyncIterator[Any], headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+    """把异步迭代器产出的对象编码为 SSE 的 data 行(dict 会序列化为 JSON)"""
+
+    async def encode() -> AsyncIterator[bytes]:
+        async for event in events:
+            data = event if isinstance(event, str) else json.dumps(event, ensure_ascii=False, separators=(",", ":"))
+            yield f"data: {data}\n\n".encode("utf-8")
+
+    merged = {"Cache-Control": "no-cache"}
+    merged.update(headers or {})
+    return HttpResponse(200, encode(), "text/event-stream", merged)
+
+
+class Router:
+    """按 (方法, 路径正则) 分发请求，正则中的命名分组写入 request.path_params"""
+
+    def __init__(self):
+        self._routes: List[Tuple[str, Pattern, Handler]] = []
+
+    def add(self, method: str, pattern: str, handler: Handler) -> None:
+        self._routes.append((method.upper(), re.compile(pattern + r"\Z"), handler))
+
+    def route(self, method: str, pattern: str) -> Callable[[Handler], Handler]:
+        def decorator(handler: Handler) -> Handler:
+            self.add(method, pattern, handler)
+            return handler
+        return decorator
+
+    async def __call__(self, request: HttpRequest) -> HttpResponse:
+        allowed = False
+        for method, pattern, handler in self._routes:
+            match = pattern.match(request.path)
+            if match is None:
+                continue
+            if method != request.method:
+                allowed = True
+                continue
+            request.path_params = match.groupdict()
+            return await handler(request)
+        if allowed:
+            return json_response({"error": "method not allowed"}, 405)
+        return json_response({"error": f"not found: {request.path}"}, 404)
+
+
+class AsyncHttpServer:
+    """基于 asyncio.start_server 的 HTTP/1.1 服务器"""
+
+    def __init__(self, handler: Handler, host: str = "127.0.0.1", port: int = 0,
+                 max_body: int = 16 * 1024 * 1024, keepalive_timeout: float = 75.0, backlog: int = 1024,
+                 max_pipeline: int = 256):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.max_body = max_body
+        self.keepalive_timeout = keepalive_timeout
+        self.backlog = backlog
+        self.max_pipeline = max_pipeline
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+        self._connection_tasks: Set[asyncio.Task] = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                  backlog=self.backlog)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"HTTP 服务已启动: {self.base_url}")
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        # 关闭仍处于 keep-alive 等待中的连接，连接处理协程读到 EOF 后自然退出
+        for writer in list(self._connections):
+            writer.close()
+        if self._connection_tasks:
+            await asyncio.wait(list(self._connection_tasks), timeout=1.0)
+
+    # ---------------- 后台线程运行 ----------------
+
+    def start_in_thread(self) -> "AsyncHttpServer":
+        """在独立线程的事件循环中运行，返回时端口已绑定"""
+        ready = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.close())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="async-http-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    # ---------------- 连接处理 ----------------
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[HttpRequest]:
+        line = await asyncio.wait_for(reader.readline(), self.keepalive_timeout)
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+        except ValueError:
+            raise ValueError(f"无效的请求行: {line!r}")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length") or 0)
+        if length > self.max_body:
+            raise OverflowError(length)
+        body = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive":
+            headers.setdefault("connection", "close")
+        return HttpRequest(method.upper(), url.path, query, headers, body)
+
+    @staticmethod
+    async def _write_response(writer: asyncio.StreamWriter, response: HttpResponse, keep_alive: bool) -> None:
+        head = [f"HTTP/1.1 {response.status} {REASONS.get(response.status, 'Unknown')}",
+                f"Content-Type: {response.content_type}"]
+        head.extend(f"{k}: {v}" for k, v in response.headers.items())
+        head.append("Connection: keep-alive" if keep_alive else "Connection: close")
+
+        if isinstance(response.body, (bytes, bytearray)):
+            head.append(f"Content-Length: {len(response.body)}")
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.body)
+            await writer.drain()
+            return
+
+        head.append("Transfer-Encoding: chunked")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        async for chunk in response.body:
+            if chunk:
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                # 每块都 drain：流式响应的意义就是尽快送达，同时给慢客户端施加背压
+                await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _respond(self, request: HttpRequest) -> HttpResponse:
+        try:
+            return await self.handler(request)
+        except Exception as e:
+            logger.exception(f"处理请求失败: {request.method} {request.path}")
+            return json_response({"error": f"{type(e).__name__}: {e}"}, 500)
+
+    async def _write_loop(self, writer: asyncio.StreamWriter, queue: asyncio.Queue) -> None:
+        """按请求到达的顺序等待处理结果并写回，保证流水线请求的响应顺序"""
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                pending, keep_alive = item
+                await self._write_response(writer, await pending, keep_alive)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            # 连接已断开，丢弃尚未写回的请求
+            while not queue.empty():
+                item = queue.get_nowait()
+                if item is not None:
+                    item[0].cancel()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        支持 HTTP/1.1 流水线：同一连接上连续到达的请求并发处理，响应仍按请求顺序写回
+
+        每个连接最多 max_pipeline 个在途请求，超过后暂停读取，由 TCP 流控向客户端施加背压。
+        """
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        task = asyncio.current_task()
+        self._connections.add(writer)
+        self._connection_tasks.add(task)
+        queue: asyncio.Queue = asyncio.Queue(self.max_pipeline)
+        writer_task = asyncio.create_task(self._write_loop(writer, queue))
+        loop = asyncio.get_running_loop()
+
+        def immediate(response: HttpResponse) -> asyncio.Future:
+            future = loop.create_future()
+            future.set_result(response)
+            return future
+
+        try:
+            while not writer_task.done():
+                try:
+                    request = await self._read_request(reader)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except OverflowError:
+                    await queue.put((immediate(json_response({"error": "payload too large"}, 413)), False))
+                    break
+                except ValueError as e:
+                    await queue.put((immediate(json_response({"error": str(e)}, 400)), False))
+                    break
+                if request is None:
+                    break
+
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await queue.put((asyncio.ensure_future(self._respond(request)), keep_alive))
+                if not keep_alive:
+                    break
+        finally:
+            if not writer_task.done():
+                await queue.put(None)
+            await asyncio.gather(writer_task, return_exceptions=True)
+            self._connections.discard(writer)
+            self._connection_tasks.discard(task)
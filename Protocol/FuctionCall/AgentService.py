@@ -0,0 +1,537 @@
+"""
+多会话天气助手 HTTP 服务
+
+WeatherAssistant 每次 chat() 都是一段新对话，并且只能通过 main() 跑一个问题；
+这里把同样的工具调用循环改写为 asyncio 版本，对外以 HTTP 接口服务大量并发用户:
+
+- 所有会话共享一个带连接池的 AsyncOpenAI 客户端(ClientFactory)、一个工具结果缓存和一个工具线程池
+- 会话历史保存在 SessionStore 中：按 LRU 淘汰，超出会话数或内存上限时写入磁盘(可选)，超过 TTL 的会话丢弃
+- 同一会话的请求按到达顺序排队(每个会话一把 asyncio.Lock)，不同会话并行处理
+- 在途请求超过 max_inflight 时直接返回 429
+
+接口:
+    POST   /chat                 {"session_id": 可选, "message": "..."} -> {"session_id", "reply", "turn", ...}
+    GET    /sessions/<id>        会话历史
+    DELETE /sessions/<id>        删除会话
+    GET    /stats                会话存储、工具缓存和请求统计
+
+运行:
+    python -m Protocol.FuctionCall.AgentService --port 8080
+    python -m Protocol.FuctionCall.AgentService --mock --spill-dir .agent_sessions   # 使用本地模拟模型服务器
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import argparse
+import contextlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# 依赖仓库内的其他模块，请在仓库根目录运行: python -m Protocol.FuctionCall.AgentService
+from Protocol.AsyncHttpServer import AsyncHttpServer, HttpRequest, HttpResponse, Router, json_response
+from Protocol.FuctionCall.FunctionCallDemo001 import WeatherAssistant
+from Protocol.FuctionCall.TokenBudget import TokenBudgetContext
+from Protocol.FuctionCall.ToolCache import ToolResultCache
+from Protocol.FuctionCall.ToolRegistry import ToolArgumentError, ToolRegistry
+from Protocol.FuctionCall.WeatherTools import WEATHER_TOOLS
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = WeatherAssistant.SYSTEM_PROMPT
+
+
+@dataclass
+class Session:
+    """一个会话的对话历史(不含系统提示词)"""
+    session_id: str
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    turns: int = 0
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    size: int = 0  # 历史序列化后的字节数，用于内存上限统计
+
+    def measure(self) -> int:
+        self.size = len(json.dumps(self.messages, ensure_ascii=False).encode("utf-8"))
+        return self.size
+
+
+class SessionStore:
+    """
+    会话存储
+
+    - 内存中按 LRU 顺序保存，会话数超过 max_sessions 或总字节数超过 max_bytes 时淘汰最久未使用的会话；
+      设置了 spill_dir 时被淘汰的会话写入磁盘，下次访问时再读回内存
+    - updated_at 超过 ttl 的会话视为过期，内存和磁盘中的都会被丢弃
+    - async with store.session(id) 在会话锁内取出会话：同一会话的请求按到达顺序串行执行，
+      正在使用的会话不会被淘汰
+    """
+
+    def __init__(self,
+                 max_sessions: int = 10000,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 ttl: Optional[float] = 3600.0,
+                 spill_dir: Optional[str] = None):
+        self.max_sessions = max(1, max_sessions)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill_dir = spill_dir
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.created = 0
+        self.disk_loads = 0
+        self.spills = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, updated_at: float, now: Optional[float] = None) -> bool:
+        return self.ttl is not None and (now or time.time()) - updated_at > self.ttl
+
+    def _spill_path(self, session_id: str) -> str:
+        digest = hashlib.sha1(session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, f"{digest}.json")
+
+    # ---------------- 磁盘读写(在线程池中执行) ----------------
+
+    def _write_spill(self, session: Session) -> None:
+        path = self._spill_path(session.session_id)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(asdict(session), f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _read_spill(self, session_id: str) -> Optional[Session]:
+        path = self._spill_path(session_id)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        os.remove(path)
+        return Session(**data)
+
+    # ---------------- 会话访问 ----------------
+
+    def _acquire_ref(self, session_id: str) -> asyncio.Lock:
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = asyncio.Lock()
+        self._users[session_id] = self._users.get(session_id, 0) + 1
+        return lock
+
+    def _release_ref(self, session_id: str) -> None:
+        self._users[session_id] -= 1
+        if not self._users[session_id]:
+            del self._users[session_id]
+            del self._locks[session_id]
+
+    @contextlib.asynccontextmanager
+    async def session(self, session_id: str) -> AsyncIterator[Session]:
+        lock = self._acquire_ref(session_id)
+        try:
+            async with lock:
+                session = await self._load(session_id)
+                try:
+                    yield session
+                finally:
+                    session.updated_at = time.time()
+                    self._put(session)
+        finally:
+            self._release_ref(session_id)
+        await self._evict()
+
+    async def _load(self, session_id: str, create: bool = True) -> Optional[Session]:
+        """从内存或磁盘取出会话；都没有(或已过期)时 create=True 新建，否则返回 None"""
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self.total_bytes -= session.size
+            if not self._expired(session.updated_at):
+                self.hits += 1
+                return session
+            self.expirations += 1
+        elif self.spill_dir:
+            session = await asyncio.to_thread(self._read_spill, session_id)
+            if session is not None:
+                if not self._expired(session.updated_at):
+                    self.disk_loads += 1
+                    return session
+                self.expirations += 1
+        if not create:
+            return None
+        self.created += 1
+        return Session(session_id)
+
+    def _put(self, session: Session) -> None:
+        session.measure()
+        self._sessions[session.session_id] = session
+        self.total_bytes += session.size
+
+    async def _evict(self) -> None:
+        """淘汰过期会话，以及超出数量/内存上限的最久未使用会话(跳过正在使用的会话)"""
+        now = time.time()
+        victims: List[Session] = []
+        for session_id, session in list(self._sessions.items()):
+            over_limit = len(self._sessions) > self.max_sessions or self.total_bytes > self.max_bytes
+            expired = self._expired(session.updated_at, now)
+            if not over_limit and not expired:
+                break
+            if session_id in self._users:
+                continue
+            del self._sessions[session_id]
+            self.total_bytes -= session.size
+            if expired:
+                self.expirations += 1
+            else:
+                self.evictions += 1
+                if self.spill_dir:
+                    # 写盘期间持有会话锁，同一会话的新请求会等文件写完再从磁盘读回；
+                    # 新建的锁没有竞争者，acquire 不会让出事件循环
+                    lock = self._acquire_ref(session_id)
+                    await lock.acquire()
+                    victims.append(session)
+
+        if victims:
+            await asyncio.gather(*(self._spill(session) for session in victims))
+
+    async def _spill(self, session: Session) -> None:
+        try:
+            await asyncio.to_thread(self._write_spill, session)
+            self.spills += 1
+        except OSError as e:
+            logger.warning(f"会话 {session.session_id} 写入磁盘失败，已丢弃: {e}")
+        finally:
+            self._locks[session.session_id].release()
+            self._release_ref(session.session_id)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """只读查询内存中的会话，不改变 LRU 顺序"""
+        return self._sessions.get(session_id)
+
+    async def fetch(self, session_id: str) -> Optional[Session]:
+        """读取会话，已换出到磁盘的会话和 /chat 一样读回内存；不存在或已过期时返回 None，不新建会话"""
+        lock = self._acquire_ref(session_id)
+        try:
+            async with lock:
+                session = await self._load(session_id, create=False)
+                if session is not None:
+                    self._put(session)
+        finally:
+            self._release_ref(session_id)
+        await self._evict()
+        return session
+
+    async def delete(self, session_id: str) -> bool:
+        """删除内存和磁盘中的会话；会等待该会话正在处理的请求完成"""
+        lock = self._acquire_ref(session_id)
+        try:
+            async with lock:
+                removed = self._sessions.pop(session_id, None)
+                if removed is not None:
+                    self.total_bytes -= removed.size
+                elif self.spill_dir:
+                    removed = await asyncio.to_thread(self._read_spill, session_id)
+                return removed is not None
+        finally:
+            self._release_ref(session_id)
+
+    async def sweep(self) -> int:
+        """清理过期会话，包括磁盘上过期的文件，返回清理的磁盘文件数"""
+        await self._evict()
+        if not self.spill_dir or self.ttl is None:
+            return 0
+
+        def sweep_disk() -> int:
+            removed = 0
+            cutoff = time.time() - self.ttl
+            for entry in os.scandir(self.spill_dir):
+                if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            return removed
+
+        removed = await asyncio.to_thread(sweep_disk)
+        self.expirations += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "active": len(self._users),
+            "hits": self.hits,
+            "created": self.created,
+            "disk_loads": self.disk_loads,
+            "spills": self.spills,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def _tool_call_dict(call: Any) -> Dict[str, Any]:
+    if isinstance(call, dict):
+        return call
+    return {"id": call.id, "type": "function",
+            "function": {"name": call.function.name, "arguments": call.function.arguments}}
+
+
+class AsyncWeatherAgent:
+    """
+    WeatherAssistant 工具调用循环的 asyncio 版本
+
+    chat() 接收会话历史和新问题，返回回答以及本轮新增的消息(由调用方写回会话)。
+    同步工具在共享线程池中并发执行，结果经过共享的 ToolResultCache。
+    """
+
+    def __init__(self,
+                 provider: str = "deepseek",
+                 model: str = "deepseek-chat",
+                 tool_registry: Optional[ToolRegistry] = None,
+                 tool_cache: Optional[ToolResultCache] = None,
+                 tool_workers: int = 32,
+                 tool_timeout: float = 10.0,
+                 context_token_budget: int = 8000,
+                 max_iterations: int = 10):
+        self.provider = provider
+        self.model = model
+        self.tool_registry = tool_registry or WEATHER_TOOLS
+        self.tool_cache = tool_cache
+        self.tool_map = self.tool_registry.functions
+        if tool_cache is not None:
+            self.tool_map = tool_cache.wrap_map(self.tool_map)
+        self.tool_timeout = tool_timeout
+        self.context_token_budget = context_token_budget
+        self.max_iterations = max_iterations
+        self._executor = ThreadPoolExecutor(max_workers=tool_workers, thread_name_prefix="agent-tool")
+
+    @property
+    def client(self):
+        # ClientFactory 按事件循环缓存异步客户端，所有会话共享同一个连接池
+        from LLM.ClientFactory import get_async_openai_client
+
+        return get_async_openai_client(self.provider)
+
+    async def _run_tool(self, call: Any) -> str:
+        name = call.function.name
+        if name not in self.tool_map:
+            return f"未知工具：{name}"
+        try:
+            args = self.tool_registry.parse_arguments(name, call.function.arguments)
+            loop = asyncio.get_running_loop()
+            return await asyncio.wait_for(
+                loop.run_in_executor(self._executor, lambda: self.tool_map[name](**args)), self.tool_timeout)
+        except ToolArgumentError as e:
+            return f"工具参数错误: {e}"
+        except asyncio.TimeoutError:
+            return f"工具调用超时: {name} 超过 {self.tool_timeout} 秒未返回"
+        except Exception as e:
+            logger.error(f"工具调用异常: {name}: {e}")
+            return f"工具调用异常: {e}"
+
+    async def chat(self, history: List[Dict[str, Any]], user_message: str) -> Tuple[str, List[Dict[str, Any]]]:
+        context = TokenBudgetContext(max_tokens=self.context_token_budget, prefix_size=1)
+        context.append({"role": "system", "content": SYSTEM_PROMPT})
+        context.extend(history)
+        new_messages: List[Dict[str, Any]] = [{"role": "user", "content": user_message}]
+        context.append(new_messages[0])
+        client = self.client
+
+        for _ in range(self.max_iterations):
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=context.messages,
+                tools=self.tool_registry.tools,
+                tool_choice="auto",
+                temperature=0.7,
+            )
+            msg = response.choices[0].message
+            if not msg.tool_calls:
+                reply = msg.content or ""
+                new_messages.append({"role": "assistant", "content": reply})
+                return reply, new_messages
+
+            assistant = {"role": "assistant", "content": msg.content,
+                         "tool_calls": [_tool_call_dict(call) for call in msg.tool_calls]}
+            context.append(assistant)
+            new_messages.append(assistant)
+            results = await asyncio.gather(*(self._run_tool(call) for call in msg.tool_calls))
+            for call, result in zip(msg.tool_calls, results):
+                tool_message = {"role": "tool", "tool_call_id": call.id, "name": call.function.name,
+                                "content": json.dumps(result, ensure_ascii=False)}
+                context.append(tool_message)
+                new_messages.append(tool_message)
+
+        reply = "抱歉，对话轮次过多，请重新开始。"
+        new_messages.append({"role": "assistant", "content": reply})
+        return reply, new_messages
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+class AgentService:
+    """把 AsyncWeatherAgent 和 SessionStore 组合为 HTTP 服务"""
+
+    def __init__(self, agent: AsyncWeatherAgent, store: SessionStore, max_inflight: int = 4096,
+                 sweep_interval: float = 60.0):
+        self.agent = agent
+        self.store = store
+        self.max_inflight = max_inflight
+        self.sweep_interval = sweep_interval
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._last_sweep = time.monotonic()
+        self._sweeping = False
+
+    async def chat(self, session_id: str, message: str) -> Dict[str, Any]:
+        async with self.store.session(session_id) as session:
+            start = time.perf_counter()
+            reply, new_messages = await self.agent.chat(session.messages, message)
+            # 只有成功的轮次写回历史，失败时会话保持原样
+            session.messages.extend(new_messages)
+            session.turns += 1
+            return {"session_id": session_id, "reply": reply, "turn": session.turns,
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    async def _sweep(self) -> None:
+        try:
+            await self.store.sweep()
+        except OSError as e:
+            logger.warning(f"清理过期会话失败: {e}")
+        finally:
+            self._sweeping = False
+
+    def _maybe_sweep(self) -> None:
+        """距上次清理超过 sweep_interval 时，在后台清理一次过期会话(由请求触发，不常驻后台任务)"""
+        now = time.monotonic()
+        if self.sweep_interval > 0 and not self._sweeping and now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            self._sweeping = True
+            asyncio.get_running_loop().create_task(self._sweep())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inflight": self.inflight,
+            "peak_inflight": self.peak_inflight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "sessions": self.store.stats(),
+            "tool_cache": self.agent.tool_cache.stats() if self.agent.tool_cache else None,
+        }
+
+    def http_router(self) -> Router:
+        router = Router()
+
+        @router.route("POST", r"/chat")
+        async def post_chat(request: HttpRequest) -> HttpResponse:
+            self._maybe_sweep()
+            try:
+                body = request.json() or {}
+            except ValueError:
+                return json_response({"error": "请求体不是合法的 JSON"}, 400)
+            message = body.get("message")
+            if not isinstance(message, str) or not message:
+                return json_response({"error": "message 必须是非空字符串"}, 400)
+            if self.inflight >= self.max_inflight:
+                self.rejected += 1
+                return json_response({"error": "服务繁忙，请稍后重试"}, 429, {"Retry-After": "1"})
+
+            session_id = str(body.get("session_id") or uuid.uuid4().hex)
+            self.inflight += 1
+            self.peak_inflight = max(self.peak_inflight, self.inflight)
+            try:
+                result = await self.chat(session_id, message)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"会话 {session_id} 处理失败: {e}")
+                return json_response({"session_id": session_id, "error": f"{type(e).__name__}: {e}"}, 503)
+            finally:
+                self.inflight -= 1
+            self.completed += 1
+            return json_response(result)
+
+        @router.route("GET", r"/sessions/(?P<session_id>[^/]+)")
+        async def get_session(request: HttpRequest) -> HttpResponse:
+            session = await self.store.fetch(request.path_params["session_id"])
+            if session is None:
+                return json_response({"error": "会话不存在或已过期"}, 404)
+            return json_response(asdict(session))
+
+        @router.route("DELETE", r"/sessions/(?P<session_id>[^/]+)")
+        async def delete_session(request: HttpRequest) -> HttpResponse:
+            existed = await self.store.delete(request.path_params["session_id"])
+            return json_response({"deleted": existed})
+
+        @router.route("GET", r"/stats")
+        async def get_stats(request: HttpRequest) -> HttpResponse:
+            return json_response(self.stats())
+
+        return router
+
+
+def create_service(max_sessions: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl: Optional[float] = 3600.0,
+                   spill_dir: Optional[str] = None, max_inflight: int = 4096, provider: str = "deepseek",
+                   model: str = "deepseek-chat") -> AgentService:
+    tool_cache = ToolResultCache(max_entries=4096, tool_ttls={"get_weather": 600, "dress_advice": 3600})
+    agent = AsyncWeatherAgent(provider, model, tool_cache=tool_cache)
+    store = SessionStore(max_sessions, max_bytes, ttl, spill_dir)
+    return AgentService(agent, store, max_inflight)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8080, **kwargs) -> None:
+    service = create_service(**kwargs)
+    http = AsyncHttpServer(service.http_router(), host, port)
+    print(f"天气助手服务: {http.base_url}")
+    try:
+        asyncio.run(http.serve_forever())
+    finally:
+        service.agent.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多会话天气助手 HTTP 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-sessions", type=int, default=10000, help="内存中最多保留的会话数")
+    parser.add_argument("--max-mb", type=float, default=64, help="内存中会话历史的总大小上限(MB)")
+    parser.add_argument("--ttl", type=float, default=3600, help="会话空闲多久后过期(秒)")
+    parser.add_argument("--spill-dir", help="被淘汰的会话写入该目录，不设置则直接丢弃")
+    parser.add_argument("--max-inflight", type=int, default=4096)
+    parser.add_argument("--mock", action="store_true", help="启动本地模拟模型服务器")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.mock:
+        from LLM.MockServer import MockLLMConfig, MockLLMServer
+
+        mock = MockLLMServer(MockLLMConfig(latency=0.05)).start()
+        os.environ["DEEPSEEK_BASE_URL"] = mock.base_url
+        os.environ["DEEPSEEK_API_KEY"] = "mock-key"
+        print(f"模拟模型服务器: {mock.base_url}")
+    else:
+        from LLM.ClientFactory import load_env
+
+        load_env()
+    serve(args.host, args.port, max_sessions=args.max_sessions, max_bytes=int(args.max_mb * 1024 * 1024),
+          ttl=args.ttl, spill_dir=args.spill_dir, max_inflight=args.max_inflight)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+AgentService 多会话压测(使用本地模拟模型服务器，不消耗 API 额度)
+
+- users 个用户各自使用一条长连接，每个用户把 turns 轮对话一次性流水线发出，
+  检查同一会话的回复轮次严格按发送顺序递增(会话内串行)
+- 所有用户同时进行，统计吞吐和单轮时延；max_sessions 设得比用户数小时会触发 LRU 淘汰和磁盘换出，
+  之后每个用户再问一轮，检查换出到磁盘的会话能读回并延续轮次
+- 对比：同样的请求量用同步 WeatherAssistant.chat 逐个处理所需的时间
+
+在仓库根目录运行: python -m Protocol.FuctionCall.AgentServiceBenchmark --users 200 --turns 3 --max-sessions 50
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from typing import List, Tuple
+
+from LLM.MockServer import MockLLMConfig, MockLLMServer
+from LLM.StreamMetrics import percentile
+
+QUESTIONS = ["我今天要去上海，该怎么穿衣服？", "明天去北京呢？", "后天去广州和深圳，需要带什么？"]
+
+
+async def run_user(base_url: str, user: int, turns: int, first_turn: int = 0) -> Tuple[List[float], List[int], int]:
+    from Protocol.AsyncHttpClient import PipelinedHttpConnection
+
+    conn = PipelinedHttpConnection(base_url, timeout=120)
+    session_id = f"user-{user}"
+
+    async def send(turn: int):
+        body = json.dumps({"session_id": session_id, "message": QUESTIONS[turn % len(QUESTIONS)]},
+                          ensure_ascii=False).encode("utf-8")
+        start = time.perf_counter()
+        status, _, payload = await conn.request("POST", "/chat", body, {"Content-Type": "application/json"})
+        return time.perf_counter() - start, status, json.loads(payload)
+
+    try:
+        results = await asyncio.gather(*(send(turn) for turn in range(first_turn, first_turn + turns)))
+    finally:
+        await conn.close()
+    latencies = [latency for latency, status, _ in results if status == 200]
+    order = [payload.get("turn", -1) for _, status, payload in results if status == 200]
+    failures = sum(status != 200 for _, status, _ in results)
+    return latencies, order, failures
+
+
+async def run_users(base_url: str, users: int, turns: int, first_turn: int = 0):
+    return await asyncio.gather(*(run_user(base_url, user, turns, first_turn) for user in range(users)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgentService 多会话压测")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3, help="每个用户的对话轮数")
+    parser.add_argument("--max-sessions", type=int, default=50, help="内存中保留的会话数上限")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟模型服务器的响应时延(秒)")
+    parser.add_argument("--sync-sample", type=int, default=20, help="同步对照组处理的请求数")
+    args = parser.parse_args()
+
+    mock = MockLLMServer(MockLLMConfig(latency=args.latency)).start()
+    os.environ["DEEPSEEK_BASE_URL"] = mock.base_url
+    os.environ["DEEPSEEK_API_KEY"] = "mock-key"
+
+    from Protocol.AsyncHttpServer import AsyncHttpServer
+    from Protocol.FuctionCall.AgentService import create_service
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        service = create_service(max_sessions=args.max_sessions, spill_dir=spill_dir)
+        http = AsyncHttpServer(service.http_router()).start_in_thread()
+
+        total = args.users * args.turns
+        print(f"{args.users} 个会话 × {args.turns} 轮，模型时延 {args.latency * 1000:.0f}ms，"
+              f"内存会话上限 {args.max_sessions}")
+        start = time.perf_counter()
+        results = asyncio.run(run_users(http.base_url, args.users, args.turns))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for user_latencies, _, _ in results for latency in user_latencies)
+        failures = sum(failed for _, _, failed in results)
+        in_order = all(order == list(range(1, args.turns + 1)) for _, order, _ in results)
+        p50, p99 = percentile(latencies, 50), percentile(latencies, 99)
+        print(f"[AgentService] {total} 轮用时 {elapsed:.2f}s，吞吐 {total / elapsed:.1f} 轮/s，"
+              f"p50 {p50 * 1000:.0f}ms，p99 {p99 * 1000:.0f}ms，失败 {failures}")
+        print(f"  会话内轮次按发送顺序递增: {in_order}")
+
+        # 所有用户再各问一轮：大部分会话已被淘汰到磁盘，需要读回后继续对话
+        start = time.perf_counter()
+        again = asyncio.run(run_users(http.base_url, args.users, 1, args.turns))
+        elapsed = time.perf_counter() - start
+        resumed = all(order == [args.turns + 1] for _, order, _ in again)
+        print(f"[回访] {args.users} 轮用时 {elapsed:.2f}s，历史完整延续: {resumed}")
+        print(f"  统计: {json.dumps(service.stats(), ensure_ascii=False)}")
+        http.stop()
+        service.agent.close()
+
+    from Protocol.FuctionCall.FunctionCallDemo001 import WeatherAssistant
+
+    with WeatherAssistant(max_tool_workers=1) as assistant:
+        start = time.perf_counter()
+        for i in range(args.sync_sample):
+            assistant.chat(QUESTIONS[i % len(QUESTIONS)])
+    per_turn = (time.perf_counter() - start) / args.sync_sample
+    print(f"[同步 WeatherAssistant.chat] 每轮 {per_turn * 1000:.0f}ms，"
+          f"处理 {total} 轮预计 {per_turn * total:.1f}s")
+    mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,203 +1,386 @@
 import json
 import os
+import time
 import logging
-from typing import Dict, Any, Callable
+import argparse
+import threading
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Dict, Any, Callable, List, Optional, Tuple
 
-from openai import OpenAI
-from dotenv import find_dotenv, load_dotenv
+# 依赖仓库内的其他模块，请在仓库根目录运行: python -m Protocol.FuctionCall.FunctionCallDemo001
+from LangfuseCourse.Tracing import span as trace_span
+from LLM.ClientFactory import get_openai_client, load_env
+from Protocol.FuctionCall.StreamingToolCalls import StreamedToolCall, ToolCallAssembler
+from Protocol.FuctionCall.TokenBudget import TokenBudgetContext
+from Protocol.FuctionCall.ToolCache import ToolResultCache
+from Protocol.FuctionCall.ToolRegistry import ToolArgumentError, ToolRegistry
+from Protocol.FuctionCall.WeatherTools import WEATHER_TOOLS, dress_advice, get_weather
+
+if TYPE_CHECKING:
+    # SemanticCache 依赖 numpy，只在调用方传入缓存时才需要导入
+    from Protocol.FuctionCall.SemanticCache import SemanticCache
 
-# 配置日志
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-load_dotenv(find_dotenv())
 
 class WeatherAssistant:
-    """智能天气助手类"""
+    """
+    智能天气助手类
+
+    工具调用在实例自带的线程池中执行，用完后调用 close() 或使用 with 语句释放线程:
+        with WeatherAssistant() as assistant:
+            assistant.chat("...")
+    """
+
+    SYSTEM_PROMPT = "你是一个智能天气助手，能够根据用户需求调用工具完成任务。请提供准确、实用的建议。"
     
-    def __init__(self):
-        """初始化助手"""
+    def __init__(self,
+                 max_tool_workers: int = 8,
+                 tool_timeout: float = 10.0,
+                 tool_timeouts: Optional[Dict[str, float]] = None,
+                 tool_cache: Optional[ToolResultCache] = None,
+                 context_token_budget: int = 8000,
+                 tool_registry: Optional[ToolRegistry] = None,
+                 semantic_cache: Optional["SemanticCache"] = None):
+        """
+        初始化助手
+
+        Args:
+            max_tool_workers: 同一轮工具调用的最大并发数，设为1时退化为串行执行
+            tool_timeout: 单个工具调用的默认超时时间(秒)
+            tool_timeouts: 按工具名覆盖的超时时间，例如 {"get_weather": 3.0}
+            tool_cache: 工具结果缓存，可在多个助手实例(多个用户)之间共享
+            context_token_budget: 多轮工具调用时发送给模型的上下文 token 上限，超出后压缩旧的工具结果
+            tool_registry: 工具注册表，默认为 WeatherTools.WEATHER_TOOLS
+            semantic_cache: 语义回答缓存，换一种说法的相同问题直接返回之前的最终回答，可在多个实例之间共享
+        """
         self.client = self._init_client()
-        self.tool_map = {
-            "get_weather": self.get_weather,
-            "dress_advice": self.dress_advice
-        }
+        self.tool_registry = tool_registry or WEATHER_TOOLS
+        self.tool_map = self.tool_registry.functions
+        self.tool_cache = tool_cache
+        if tool_cache is not None:
+            self.tool_map = tool_cache.wrap_map(self.tool_map)
         self.tools = self._define_tools()
+        self.semantic_cache = semantic_cache
+        self.max_tool_workers = max(1, max_tool_workers)
+        self.tool_timeout = tool_timeout
+        self.tool_timeouts = tool_timeouts or {}
+        self.context_token_budget = context_token_budget
+        self._tool_executor = ThreadPoolExecutor(
+            max_workers=self.max_tool_workers,
+            thread_name_prefix="tool-call"
+        ) if self.max_tool_workers > 1 else None
+
+    def close(self) -> None:
+        """关闭工具线程池，尚未开始的工具调用被取消，已超时仍在运行的工具不等待"""
+        if self._tool_executor is not None:
+            self._tool_executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self) -> "WeatherAssistant":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
         
-    def _init_client(self) -> OpenAI:
-        """初始化OpenAI客户端"""
+    def _init_client(self):
+        """初始化OpenAI客户端(首次调用时加载 .env)"""
+        load_env()
         api_key = os.getenv("DEEPSEEK_API_KEY")
         if not api_key:
             raise ValueError("请设置DEEPSEEK_API_KEY环境变量")
         
-        return OpenAI(
-            api_key=api_key, 
-            base_url="https://api.deepseek.com"
-        )
+        # 多个助手实例共享同一个连接池
+        return get_openai_client("deepseek", api_key=api_key)
     
     def _define_tools(self) -> list:
-        """定义工具配置"""
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_weather",
-                    "description": "根据城市名称返回模拟天气情况",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "city": {"type": "string", "description": "城市名，例如：北京、上海"}
-                        },
-                        "required": ["city"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "dress_advice",
-                    "description": "根据天气情况给出穿衣建议",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "weather": {"type": "string", "description": "天气信息，例如：晴，28°C"}
-                        },
-                        "required": ["weather"]
-                    }
-                }
-            }
-        ]
-    
-    @staticmethod
-    def get_weather(city: str) -> str:
-        """获取天气信息（模拟数据）"""
-        dummy_weather = {
-            "北京": "晴，28°C",
-            "上海": "多云，22°C",
-            "广州": "小雨，19°C",
-            "长沙": "阴，25°C",
-            "深圳": "晴，30°C",
-            "杭州": "多云，24°C"
-        }
-        result = dummy_weather.get(city, f"抱歉，暂无{city}的天气信息")
-        logger.info(f"获取{city}天气: {result}")
-        return result
-    
-    @staticmethod
-    def dress_advice(weather: str) -> str:
-        """根据天气给出穿衣建议"""
-        advice_map = {
-            "雨": "记得带伞，穿防水外套和防滑鞋。",
-            "晴": "适合轻便服装，注意防晒，可穿短袖。",
-            "多云": "建议穿长袖薄衫，可准备薄外套。",
-            "阴": "适合春秋装，建议穿薄外套或卫衣。"
-        }
-        
-        # 根据天气关键词匹配建议
-        for keyword, advice in advice_map.items():
-            if keyword in weather:
-                # 根据温度调整建议
-                if "30" in weather or "3" in weather.split("°")[0][-1:]:
-                    if "晴" in weather:
-                        advice += " 温度较高，多补充水分。"
-                elif "1" in weather.split("°")[0] or "2" in weather.split("°")[0][:2]:
-                    advice += " 温度适中，注意保暖。"
-                
-                logger.info(f"天气'{weather}'的穿衣建议: {advice}")
-                return advice
-        
-        return "根据当前体感和个人喜好选择合适的服装。"
-    
+        """工具配置：注册表缓存的 tools 列表，所有实例共享同一个对象，不要原地修改"""
+        return self.tool_registry.tools
+
+    # 工具实现在 WeatherTools 中，与 MCP 服务器共用
+    get_weather = staticmethod(get_weather)
+    dress_advice = staticmethod(dress_advice)
+
     def _execute_tool_call(self, call) -> str:
-        """执行工具调用"""
+        """执行工具调用，开启追踪时每次调用记录一个 tool span"""
+        with trace_span(f"tool.{call.function.name}", "tool", arguments=call.function.arguments) as span:
+            result = self._invoke_tool(call)
+            span.set(result=result)
+            return result
+
+    def _submit_tool(self, call) -> Tuple[Future, float]:
+        """
+        提交工具调用，返回 (future, 截止时间)；截止时间从提交时刻开始计算
+
+        串行模式没有线程池，每个调用使用一个独立的守护线程：超时后仍在运行的工具不会挡住下一个工具。
+        """
+        deadline = time.monotonic() + self.tool_timeouts.get(call.function.name, self.tool_timeout)
+        # 在当前上下文副本中执行，工作线程里的 tool span 才能挂到当前对话的 trace 下
+        context = contextvars.copy_context()
+        if self._tool_executor is not None:
+            return self._tool_executor.submit(context.run, self._execute_tool_call, call), deadline
+
+        future: Future = Future()
+        future.set_running_or_notify_cancel()
+
+        def run():
+            try:
+                future.set_result(context.run(self._execute_tool_call, call))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="tool-call", daemon=True).start()
+        return future, deadline
+
+    def _invoke_tool(self, call) -> str:
         try:
             name = call.function.name
-            args = json.loads(call.function.arguments or "{}")
-            
             if name not in self.tool_map:
                 error_msg = f"未知工具：{name}"
                 logger.error(error_msg)
                 return error_msg
-            
+
+            # 参数在调用前按 schema 校验，错误信息返回给模型以便它修正参数
+            args = self.tool_registry.parse_arguments(name, call.function.arguments)
             result = self.tool_map[name](**args)
             logger.info(f"工具调用成功: {name}({args}) -> {result}")
             return result
-            
-        except json.JSONDecodeError as e:
-            error_msg = f"解析工具参数失败: {e}"
+
+        except ToolArgumentError as e:
+            error_msg = f"工具参数错误: {e}"
             logger.error(error_msg)
             return error_msg
         except Exception as e:
             error_msg = f"工具调用异常: {e}"
             logger.error(error_msg)
             return error_msg
-    
+
+    def _execute_tool_calls(self, calls: list) -> List[str]:
+        """
+        并发执行同一轮的所有工具调用
+
+        结果列表与 calls 一一对应，保证按原始 tool_call_id 顺序写回消息历史。
+        max_tool_workers=1 时逐个提交执行，每个工具仍有各自的超时。
+        超时的工具返回错误信息，但其工作线程无法被强制中断，会在后台自然结束。
+        """
+        if self._tool_executor is None:
+            return [self._collect_tool_results([call], [self._submit_tool(call)])[0] for call in calls]
+        return self._collect_tool_results(calls, [self._submit_tool(call) for call in calls])
+
+    def _collect_tool_results(self, calls: list, submitted: List[Tuple[Future, float]]) -> List[str]:
+        """
+        等待所有工具结果，超过截止时间的工具返回错误信息
+
+        所有工具同时等待，总等待时间不超过最晚的截止时间，而不是各自超时时间之和。
+        """
+        pending = {future: deadline for future, deadline in submitted}
+        while pending:
+            now = time.monotonic()
+            # 已过截止时间的不再等待
+            pending = {future: deadline for future, deadline in pending.items()
+                       if not future.done() and deadline > now}
+            if not pending:
+                break
+            wait(pending, timeout=min(pending.values()) - now, return_when=FIRST_COMPLETED)
+
+        results = []
+        for call, (future, _) in zip(calls, submitted):
+            if future.done() and not future.cancelled():
+                results.append(future.result())
+                continue
+            future.cancel()
+            name = call.function.name
+            timeout = self.tool_timeouts.get(name, self.tool_timeout)
+            error_msg = f"工具调用超时: {name} 超过 {timeout} 秒未返回"
+            logger.error(error_msg)
+            results.append(error_msg)
+        return results
+
+    def _cached_answer(self, user_message: str) -> Optional[str]:
+        if self.semantic_cache is None:
+            return None
+        hit = self.semantic_cache.lookup(user_message)
+        if hit is None:
+            return None
+        logger.info(f"语义缓存命中(相似度 {hit.score:.2f}): {hit.query}")
+        return hit.answer
+
+    def _remember_answer(self, user_message: str, answer: Optional[str]) -> None:
+        # 只缓存模型给出的最终回答，出错或轮次超限时的提示语不缓存
+        if self.semantic_cache is not None and answer:
+            self.semantic_cache.put(user_message, answer)
+
     def chat(self, user_message: str, max_iterations: int = 10) -> str:
         """与助手对话"""
-        messages = [
-            {"role": "system", "content": "你是一个智能天气助手，能够根据用户需求调用工具完成任务。请提供准确、实用的建议。"},
-            {"role": "user", "content": user_message}
-        ]
+        with trace_span("WeatherAssistant.chat", "agent", input=user_message):
+            cached = self._cached_answer(user_message)
+            if cached is not None:
+                return cached
+            context = self._new_context(user_message)
         
-        iteration = 0
+            iteration = 0
         
-        while iteration < max_iterations:
-            try:
-                # 向模型发起请求
-                resp = self.client.chat.completions.create(
-                    model="deepseek-chat",
-                    messages=messages,
-                    tools=self.tools,
-                    tool_choice="auto",
-                    temperature=0.7
-                )
+            while iteration < max_iterations:
+                try:
+                    # 向模型发起请求
+                    resp = self.client.chat.completions.create(
+                        model="deepseek-chat",
+                        messages=context.messages,
+                        tools=self.tools,
+                        tool_choice="auto",
+                        temperature=0.7
+                    )
                 
-                msg = resp.choices[0].message
+                    msg = resp.choices[0].message
                 
-                # 如果没有调用工具，说明得到最终回答
-                if not msg.tool_calls:
-                    logger.info("对话完成，返回最终答案")
-                    return msg.content
+                    # 如果没有调用工具，说明得到最终回答
+                    if not msg.tool_calls:
+                        logger.info("对话完成，返回最终答案")
+                        self._remember_answer(user_message, msg.content)
+                        return msg.content
                 
-                # 添加助手消息到历史
-                messages.append({"role": "assistant", "tool_calls": msg.tool_calls})
+                    # 添加助手消息到历史
+                    context.append({"role": "assistant", "tool_calls": msg.tool_calls})
                 
-                # 处理所有工具调用
-                for call in msg.tool_calls:
-                    result = self._execute_tool_call(call)
-                    
-                    # 将工具调用结果添加到消息历史
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": call.id,
-                        "name": call.function.name,
-                        "content": json.dumps(result, ensure_ascii=False)
-                    })
+                    # 并发处理所有工具调用，结果按原始顺序返回
+                    results = self._execute_tool_calls(msg.tool_calls)
+                    for call, result in zip(msg.tool_calls, results):
+                        # 将工具调用结果添加到消息历史
+                        context.append({
+                            "role": "tool",
+                            "tool_call_id": call.id,
+                            "name": call.function.name,
+                            "content": json.dumps(result, ensure_ascii=False)
+                        })
                 
-                iteration += 1
+                    iteration += 1
                 
-            except Exception as e:
-                error_msg = f"API调用失败: {e}"
-                logger.error(error_msg)
-                return f"抱歉，服务暂时不可用：{error_msg}"
+                except Exception as e:
+                    error_msg = f"API调用失败: {e}"
+                    logger.error(error_msg)
+                    return f"抱歉，服务暂时不可用：{error_msg}"
         
-        return "抱歉，对话轮次过多，请重新开始。"
+            return "抱歉，对话轮次过多，请重新开始。"
+
+    def _new_context(self, user_message: str) -> TokenBudgetContext:
+        # 系统提示词和用户问题作为稳定前缀，超出预算时只压缩之后的旧工具结果
+        context = TokenBudgetContext(max_tokens=self.context_token_budget, prefix_size=2)
+        context.extend([
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": user_message}
+        ])
+        return context
+
+    def _submit_speculative(self, call: StreamedToolCall) -> Optional[Tuple[Future, float]]:
+        """参数完整的工具调用立即提交执行；串行模式下不提前执行，返回 None"""
+        if self._tool_executor is not None:
+            return self._submit_tool(call)
+        return None
+
+    def chat_stream(self, user_message: str, max_iterations: int = 10,
+                    on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """
+        流式版本的对话：边接收模型输出边执行工具
+
+        每个 tool_call 的参数 JSON 一完整就提交到线程池执行，与模型生成后续调用重叠；
+        工具结果仍按 tool_call 的顺序写回消息历史。on_delta 用于接收最终回答的增量文本。
+        """
+        with trace_span("WeatherAssistant.chat_stream", "agent", input=user_message):
+            cached = self._cached_answer(user_message)
+            if cached is not None:
+                if on_delta is not None:
+                    on_delta(cached)
+                return cached
+            context = self._new_context(user_message)
+
+            for _ in range(max_iterations):
+                try:
+                    futures: Dict[int, Optional[Tuple[Future, float]]] = {}
+                    assembler = ToolCallAssembler(
+                        on_complete=lambda call: futures.__setitem__(call.index, self._submit_speculative(call))
+                    )
+                    content_parts = []
+
+                    stream = self.client.chat.completions.create(
+                        model="deepseek-chat",
+                        messages=context.messages,
+                        tools=self.tools,
+                        tool_choice="auto",
+                        temperature=0.7,
+                        stream=True
+                    )
+                    for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+                        if delta.tool_calls:
+                            assembler.feed(delta.tool_calls)
+                        if delta.content:
+                            content_parts.append(delta.content)
+                            if on_delta is not None:
+                                on_delta(delta.content)
+
+                    calls = assembler.finish()
+                    if not calls:
+                        logger.info("对话完成，返回最终答案")
+                        answer = "".join(content_parts)
+                        self._remember_answer(user_message, answer)
+                        return answer
+
+                    speculative = sum(1 for item in futures.values()
+                                      if item is not None and (item[0].done() or item[0].running()))
+                    logger.info(f"流结束时已有 {speculative}/{len(calls)} 个工具调用开始或完成执行")
+
+                    context.append({"role": "assistant", "tool_calls": [call.to_message() for call in calls]})
+
+                    if self._tool_executor is None:
+                        results = self._execute_tool_calls(calls)
+                    else:
+                        submitted = [futures.get(call.index) or self._submit_tool(call) for call in calls]
+                        results = self._collect_tool_results(calls, submitted)
+                    for call, result in zip(calls, results):
+                        context.append({
+                            "role": "tool",
+                            "tool_call_id": call.id,
+                            "name": call.function.name,
+                            "content": json.dumps(result, ensure_ascii=False)
+                        })
+
+                except Exception as e:
+                    error_msg = f"API调用失败: {e}"
+                    logger.error(error_msg)
+                    return f"抱歉，服务暂时不可用：{error_msg}"
+
+            return "抱歉，对话轮次过多，请重新开始。"
 
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="天气助手 Function Calling 演示")
+    parser.add_argument("--query", default="我今天要去上海，明天要去长沙，后天要去北京，大后天去广州，该怎么穿衣服？")
+    parser.add_argument("--stream", action="store_true", help="流式输出，工具调用参数一完整就提前执行")
+    args = parser.parse_args()
+
+    # 配置日志
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     try:
-        assistant = WeatherAssistant()
-        
-        # 示例对话
-        user_query = "我今天要去上海，明天要去长沙，后天要去北京，大后天去广州，该怎么穿衣服？"
-        
-        print(f"用户问题: {user_query}")
-        print("\n" + "="*50)
-        
-        result = assistant.chat(user_query)
+        # 工具结果缓存可在多个助手实例之间共享
+        tool_cache = ToolResultCache(max_entries=1024, tool_ttls={"get_weather": 600, "dress_advice": 3600})
+        with WeatherAssistant(tool_cache=tool_cache) as assistant:
+            # 示例对话
+            user_query = args.query
+
+            print(f"用户问题: {user_query}")
+            print("\n" + "="*50)
+
+            if args.stream:
+                result = assistant.chat_stream(user_query, on_delta=lambda text: print(text, end="", flush=True))
+                print()
+            else:
+                result = assistant.chat(user_query)
         
         print(f"\n最终回答: {result}")
+        print(f"工具缓存统计: {tool_cache.stats()}")
         
     except Exception as e:
         logger.error(f"程序运行失败: {e}")
@@ -0,0 +1,255 @@
+"""
+语义回答缓存：用户问题换一种说法也能命中
+
+"上海今天穿什么" 和 "今天去上海该怎么穿" 精确匹配缓存都会错过，每一句都要完整走一遍多轮工具调用。
+这里在本地把问题向量化(默认 HashingEmbedder，不需要网络)，在预分配的 NumPy 矩阵中做一次矩阵-向量乘法
+找到最相似的历史问题，相似度不低于 threshold 时直接返回当时的最终回答。
+
+- 容量固定：向量矩阵在创建时按 capacity 预分配，写满后淘汰已过期或最久未使用的条目，
+  内存占用和每次查询的计算量都不随运行时间增长
+- 新鲜度：每个条目有 TTL，过期条目不会被命中；invalidate() 可按问题或全部清除
+- key_fn：从问题中提取必须完全一致的部分(例如城市名)，只有 key 相同的条目才参与比较；
+  词面相似的 "上海今天穿什么" / "北京今天穿什么" 因此不会互相命中。key_fn 返回 None 表示
+  无法判断，该问题绕过缓存
+- 统计命中率，以及通过 report_false_hit() 反馈的错误命中数
+
+用法:
+    cache = SemanticCache(threshold=0.5, ttl=600, key_fn=weather_query_key)
+    assistant = WeatherAssistant(semantic_cache=cache)
+"""
+import re
+import time
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+
+# 依赖仓库内的其他模块，请在仓库根目录运行: python -m Protocol.FuctionCall.SemanticCacheBenchmark
+from RAG.LocalRAG.Embedders import Embedder, HashingEmbedder
+
+_DAY_WORDS = ("大后天", "后天", "明天", "今天", "周末")
+# 天气/穿衣问题里常见的非地名词，按长度从长到短匹配；去掉它们和日期词后剩下的连续汉字串视为地名
+_FILLER_WORDS = (
+    "怎么样", "穿什么", "穿衣服", "该怎么", "请问", "出门", "天气", "怎么", "什么", "衣服", "需要",
+    "合适", "适合", "一下", "帮我", "查查", "查询", "建议", "应该", "可以", "打算", "准备",
+    "我", "要", "去", "到", "在", "回", "该", "穿", "的", "呢", "吗", "啊", "和", "跟", "与", "带", "好", "想",
+)
+_KEY_SPLIT = re.compile("|".join(_DAY_WORDS + _FILLER_WORDS) + r"|[^\u4e00-\u9fff]+")
+_DAY_PATTERN = re.compile("|".join(_DAY_WORDS))
+
+
+def weather_query_key(text: str) -> Optional[Hashable]:
+    """
+    天气问题的 key：提到的地点和日期词都相同才允许复用回答
+
+    地点不限于 DUMMY_WEATHER 中的城市：去掉日期词和常见的非地名词后，剩下的每段连续汉字都算作地点，
+    所以 "重庆今天穿什么" 和 "西安今天穿什么" 的 key 不同。识别不出任何地点时返回 None，
+    SemanticCache 对这类问题既不查询也不写入。
+    """
+    places = frozenset(part for part in _KEY_SPLIT.split(text) if len(part) >= 2)
+    if not places:
+        return None
+    # 先匹配长词，避免 "大后天" 同时被算作 "后天"
+    days = frozenset(_DAY_PATTERN.findall(text))
+    return places, days
+
+
+@dataclass
+class SemanticHit:
+    """一次命中：返回的回答、相似度以及被命中的历史问题"""
+    answer: str
+    score: float
+    query: str
+    slot: int
+    created_at: float
+
+
+class SemanticCache:
+    """基于本地向量相似度的问答缓存(线程安全)"""
+
+    def __init__(self,
+                 embedder: Optional[Embedder] = None,
+                 threshold: float = 0.85,
+                 capacity: int = 4096,
+                 ttl: Optional[float] = 600.0,
+                 key_fn: Optional[Callable[[str], Hashable]] = None,
+                 duplicate_threshold: float = 0.98):
+        """
+        Args:
+            embedder: 向量化器，默认 HashingEmbedder
+            threshold: 命中所需的最低余弦相似度
+            capacity: 最多缓存的问题数，决定预分配矩阵的行数
+            ttl: 条目有效期(秒)，None 表示不过期
+            key_fn: 提取问题中必须完全一致的部分，None 表示所有条目都参与比较；
+                key_fn 对某个问题返回 None 时，该问题不查询也不写入缓存
+            duplicate_threshold: 写入时与已有条目相似度超过该值则覆盖已有条目，而不是新增一行
+        """
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.capacity = max(1, capacity)
+        self.ttl = ttl
+        self.key_fn = key_fn
+        self.duplicate_threshold = duplicate_threshold
+
+        self._vectors = np.zeros((self.capacity, self.embedder.dim), dtype=np.float32)
+        self._expires_at = np.full(self.capacity, np.inf)
+        self._last_used = np.zeros(self.capacity)
+        self._key_ids = np.full(self.capacity, -1, dtype=np.int64)
+        self._valid = np.zeros(self.capacity, dtype=bool)
+        self._queries: List[Optional[str]] = [None] * self.capacity
+        self._answers: List[Optional[str]] = [None] * self.capacity
+        self._created_at = np.zeros(self.capacity)
+        self._key_table: Dict[Hashable, int] = {}
+        self._next_key_id = 1
+        self._size = 0  # 曾经使用过的行数，只扫描 [0, _size)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.false_hits = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lookup_seconds = 0.0
+
+    def _key_id(self, text: str) -> Optional[int]:
+        """返回 key 对应的编号，key_fn 返回 None 时返回 None(绕过缓存)"""
+        if self.key_fn is None:
+            return 0
+        key = self.key_fn(text)
+        if key is None:
+            return None
+        key_id = self._key_table.get(key)
+        if key_id is None:
+            if len(self._key_table) >= 4 * self.capacity:
+                # 只保留仍被有效条目引用的 key，防止 key 表无限增长
+                live = set(self._key_ids[:self._size][self._valid[:self._size]].tolist())
+                self._key_table = {k: v for k, v in self._key_table.items() if v in live}
+            key_id = self._key_table[key] = self._next_key_id
+            self._next_key_id += 1
+        return key_id
+
+    def _best(self, vector: np.ndarray, key_id: int, now: float):
+        """返回 (行号, 相似度)，没有候选时行号为 -1"""
+        n = self._size
+        if not n:
+            return -1, -1.0
+        scores = self._vectors[:n] @ vector
+        candidates = self._valid[:n] & (self._key_ids[:n] == key_id)
+        if self.ttl is not None:
+            expired = self._valid[:n] & (self._expires_at[:n] <= now)
+            if expired.any():
+                self._valid[:n][expired] = False
+                self.expirations += int(expired.sum())
+                candidates &= ~expired
+        if not candidates.any():
+            return -1, -1.0
+        scores = np.where(candidates, scores, -np.inf)
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
+
+    def lookup(self, query: str) -> Optional[SemanticHit]:
+        """查找语义相近的历史问题，命中时返回 SemanticHit"""
+        start = time.perf_counter()
+        with self._lock:
+            key_id = self._key_id(query)
+            if key_id is None:
+                self.bypassed += 1
+                return None
+        vector = self.embedder.embed([query])[0]
+        now = time.time()
+        with self._lock:
+            slot, score = self._best(vector, key_id, now)
+            if slot >= 0 and score >= self.threshold:
+                self.hits += 1
+                self._last_used[slot] = now
+                hit = SemanticHit(self._answers[slot], score, self._queries[slot], slot,
+                                  float(self._created_at[slot]))
+            else:
+                self.misses += 1
+                hit = None
+            self.lookup_seconds += time.perf_counter() - start
+        return hit
+
+    def _free_slot(self, now: float) -> int:
+        if self._size < self.capacity:
+            self._size += 1
+            return self._size - 1
+        invalid = np.flatnonzero(~self._valid)
+        if invalid.size:
+            return int(invalid[0])
+        if self.ttl is not None:
+            expired = np.flatnonzero(self._expires_at <= now)
+            if expired.size:
+                self.expirations += 1
+                return int(expired[0])
+        self.evictions += 1
+        return int(np.argmin(self._last_used))
+
+    def put(self, query: str, answer: str, ttl: Optional[float] = None) -> None:
+        """写入一条问答；ttl 覆盖默认有效期"""
+        with self._lock:
+            if self._key_id(query) is None:
+                return
+        vector = self.embedder.embed([query])[0]
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            key_id = self._key_id(query)
+            slot, score = self._best(vector, key_id, now)
+            if slot < 0 or score < self.duplicate_threshold:
+                slot = self._free_slot(now)
+            self._vectors[slot] = vector
+            self._expires_at[slot] = np.inf if ttl is None else now + ttl
+            self._last_used[slot] = now
+            self._created_at[slot] = now
+            self._key_ids[slot] = key_id
+            self._valid[slot] = True
+            self._queries[slot] = query
+            self._answers[slot] = answer
+
+    def report_false_hit(self, hit: SemanticHit, invalidate: bool = True) -> None:
+        """反馈一次错误命中(例如用户指出回答不对)；默认同时删除该条目"""
+        with self._lock:
+            self.false_hits += 1
+            if invalidate and self._queries[hit.slot] == hit.query:
+                self._valid[hit.slot] = False
+
+    def invalidate(self, query: Optional[str] = None) -> int:
+        """清除与 query 完全相同的问题，不指定时清空缓存，返回清除的条目数"""
+        with self._lock:
+            n = self._size
+            if query is None:
+                removed = int(self._valid[:n].sum())
+                self._valid[:n] = False
+                return removed
+            removed = 0
+            for slot in range(n):
+                if self._valid[slot] and self._queries[slot] == query:
+                    self._valid[slot] = False
+                    removed += 1
+            return removed
+
+    def __len__(self) -> int:
+        return int(self._valid[:self._size].sum())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": int(self._valid[:self._size].sum()),
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "false_hits": self.false_hits,
+                "false_hit_rate": round(self.false_hits / self.hits, 3) if self.hits else 0.0,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "avg_lookup_ms": round(self.lookup_seconds / lookups * 1000, 3) if lookups else 0.0,
+                "memory_bytes": int(self._vectors.nbytes + self._expires_at.nbytes + self._last_used.nbytes
+                                    + self._key_ids.nbytes + self._valid.nbytes + self._created_at.nbytes),
+            }
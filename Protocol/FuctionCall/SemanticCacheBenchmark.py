@@ -0,0 +1,106 @@
+"""
+SemanticCache 命中率、错误命中率和查询开销
+
+- 用模板生成 城市 × 日期 × 说法 的问题流，每个问题带真实意图标签(城市, 日期)；
+  命中但标签不同即为错误命中。对比不同 threshold，以及是否使用 weather_query_key。
+  城市里有一半不在 DUMMY_WEATHER 中，检查 key 对未知城市同样有效
+- 容量从 1k 到 16k 时单次查询的耗时和内存占用
+- 端到端：WeatherAssistant 处理同一批问题，有无语义缓存的耗时(本地模拟服务器)
+
+在仓库根目录运行: python -m Protocol.FuctionCall.SemanticCacheBenchmark
+"""
+import os
+import time
+import random
+import argparse
+
+from LLM.MockServer import MockLLMConfig, MockLLMServer
+from Protocol.FuctionCall.SemanticCache import SemanticCache, weather_query_key
+from Protocol.FuctionCall.WeatherTools import DUMMY_WEATHER
+
+# 后一半城市不在 DUMMY_WEATHER 中
+CITIES = list(DUMMY_WEATHER) + ["成都", "重庆", "西安", "武汉", "南京", "天津"]
+DAYS = ["今天", "明天", "后天"]
+TEMPLATES = [
+    "{city}{day}穿什么",
+    "{day}去{city}该怎么穿",
+    "{day}要去{city}，该怎么穿衣服？",
+    "{city}{day}天气怎么样，穿什么合适",
+    "去{city}{day}该穿什么衣服",
+    "请问{day}在{city}出门穿什么好",
+]
+
+
+def make_queries(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        city, day = rng.choice(CITIES), rng.choice(DAYS)
+        queries.append((rng.choice(TEMPLATES).format(city=city, day=day), (city, day)))
+    return queries
+
+
+def evaluate(queries, threshold: float, key_fn):
+    cache = SemanticCache(threshold=threshold, ttl=None, key_fn=key_fn)
+    for query, label in queries:
+        hit = cache.lookup(query)
+        if hit is None:
+            cache.put(query, repr(label))
+        elif hit.answer != repr(label):
+            cache.report_false_hit(hit)
+    return cache.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SemanticCache 基准测试")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.4, 0.5, 0.6, 0.7, 0.85])
+    parser.add_argument("--e2e", type=int, default=60, help="端到端测试的问题数")
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries)
+    distinct = len({label for _, label in queries})
+    print(f"[命中率] {args.queries} 个问题，{distinct} 种真实意图，{len(TEMPLATES)} 种说法")
+    print(f"  {'threshold':>9} {'key_fn':>8} {'命中率':>8} {'错误命中率':>10} {'条目数':>8}")
+    for threshold in args.thresholds:
+        for key_fn in (None, weather_query_key):
+            stats = evaluate(queries, threshold, key_fn)
+            print(f"  {threshold:>9.2f} {'城市+日期' if key_fn else '无':>8} {stats['hit_rate']:>8.1%} "
+                  f"{stats['false_hit_rate']:>10.1%} {stats['size']:>8}")
+
+    print("[查询开销] 缓存写满后的单次查询(含向量化)")
+    for capacity in (1024, 4096, 16384):
+        cache = SemanticCache(threshold=0.99, capacity=capacity, ttl=None)
+        rng = random.Random(capacity)
+        for i in range(capacity + 100):
+            # 加几个随机词，保证每个问题都占一行而不是覆盖相似的旧条目
+            noise = " ".join(f"w{rng.getrandbits(32):x}" for _ in range(5))
+            cache.put(f"{noise} {queries[i % len(queries)][0]}", "answer")
+        cache.lookup_seconds, cache.hits, cache.misses = 0.0, 0, 0
+        for query, _ in queries[:500]:
+            cache.lookup(query)
+        stats = cache.stats()
+        print(f"  容量 {capacity:>6}: 平均 {stats['avg_lookup_ms']:.3f}ms，内存 {stats['memory_bytes'] / 1e6:.1f}MB，"
+              f"淘汰 {stats['evictions']}")
+
+    mock = MockLLMServer(MockLLMConfig(latency=0.05)).start()
+    os.environ["DEEPSEEK_BASE_URL"] = mock.base_url
+    os.environ["DEEPSEEK_API_KEY"] = "mock-key"
+    from Protocol.FuctionCall.FunctionCallDemo001 import WeatherAssistant
+
+    sample = [query for query, _ in make_queries(args.e2e, seed=1)]
+    print(f"[端到端] WeatherAssistant 处理 {len(sample)} 个问题")
+    for label, cache in (("无语义缓存", None),
+                         ("语义缓存(0.5 + 城市/日期 key)", SemanticCache(threshold=0.5, key_fn=weather_query_key))):
+        with WeatherAssistant(semantic_cache=cache) as assistant:
+            start = time.perf_counter()
+            for query in sample:
+                assistant.chat(query)
+            elapsed = time.perf_counter() - start
+        extra = f"，命中率 {cache.stats()['hit_rate']:.0%}" if cache else ""
+        print(f"  {label:<28} {elapsed:6.2f}s{extra}")
+    mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JsonCompletionScanner:
+    """
+    增量判断 JSON 文本是否已经完整
+
+    只跟踪括号深度和字符串/转义状态，每个字符只扫描一次，
+    避免对不断增长的参数串反复 json.loads。
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.complete = False
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> bool:
+        """送入一段文本，返回 JSON 是否已完整"""
+        if self.complete:
+            return True
+        for ch in text:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self.depth += 1
+                self.started = True
+            elif ch in "}]":
+                self.depth -= 1
+                if self.started and self.depth == 0:
+                    self.complete = True
+                    break
+        return self.complete
+
+
+@dataclass
+class StreamedFunction:
+    name: str = ""
+    arguments: str = ""
+
+
+@dataclass
+class StreamedToolCall:
+    """由流式增量拼装出的工具调用，属性结构与 SDK 的 tool_call 对象一致"""
+    index: int
+    id: str = ""
+    type: str = "function"
+    function: StreamedFunction = field(default_factory=StreamedFunction)
+    complete: bool = False
+    _parts: List[str] = field(default_factory=list, repr=False)
+    _scanner: JsonCompletionScanner = field(default_factory=JsonCompletionScanner, repr=False)
+
+    def to_message(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "type": self.type,
+            "function": {"name": self.function.name, "arguments": self.function.arguments},
+        }
+
+
+def _get(obj: Any, name: str) -> Any:
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+class ToolCallAssembler:
+    """
+    拼装 tool_calls[i].function.arguments 的流式增量
+
+    每个工具调用的参数 JSON 一旦完整就立即回调 on_complete，调用方可以在模型
+    还在生成后续调用时就开始执行该工具。出现更大的 index 时，之前的调用也视为完整。
+    """
+
+    def __init__(self, on_complete: Optional[Callable[[StreamedToolCall], None]] = None):
+        self.on_complete = on_complete
+        self._calls: Dict[int, StreamedToolCall] = {}
+
+    @property
+    def calls(self) -> List[StreamedToolCall]:
+        return [self._calls[i] for i in sorted(self._calls)]
+
+    def _mark_complete(self, call: StreamedToolCall) -> None:
+        if call.complete:
+            return
+        call.function.arguments = "".join(call._parts)
+        call.complete = True
+        logger.debug(f"工具调用参数已完整: #{call.index} {call.function.name}({call.function.arguments})")
+        if self.on_complete is not None:
+            self.on_complete(call)
+
+    def feed(self, tool_call_deltas: Optional[List[Any]]) -> None:
+        """处理一个数据块中的 delta.tool_calls"""
+        for delta in tool_call_deltas or []:
+            index = _get(delta, "index") or 0
+            call = self._calls.get(index)
+            if call is None:
+                # 新的调用开始，之前尚未判定完整的调用都已结束
+                for previous in self.calls:
+                    if previous.index < index:
+                        self._mark_complete(previous)
+                call = StreamedToolCall(index=index)
+                self._calls[index] = call
+
+            if _get(delta, "id"):
+                call.id = _get(delta, "id")
+            function = _get(delta, "function")
+            if _get(function, "name"):
+                call.function.name += _get(function, "name")
+            arguments = _get(function, "arguments")
+            if arguments and not call.complete:
+                call._parts.append(arguments)
+                if call._scanner.feed(arguments):
+                    self._mark_complete(call)
+
+    def finish(self) -> List[StreamedToolCall]:
+        """流结束时调用，把剩余调用全部标记为完整并返回所有调用"""
+        for call in self.calls:
+            self._mark_complete(call)
+        return self.calls
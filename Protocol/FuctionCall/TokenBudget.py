@@ -0,0 +1,147 @@
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from LLM.Serialization import to_jsonable
+
+logger = logging.getLogger(__name__)
+
+# 每条消息的角色、分隔符等固定开销(与 OpenAI 的计数规则近似)
+MESSAGE_OVERHEAD_TOKENS = 4
+COMPACTED_PREFIX = "[已压缩] "
+
+
+@lru_cache(maxsize=1)
+def _tiktoken_encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    """
+    统计文本 token 数
+
+    安装了 tiktoken 时精确计数；否则按 中日韩字符约1个token、其他字符约4个一token 估算。
+    """
+    if not text:
+        return 0
+    encoding = _tiktoken_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    cjk = sum(1 for ch in text if "一" <= ch <= "鿿")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def message_tokens(message: Dict[str, Any], counter: Callable[[str], int] = count_tokens) -> int:
+    """统计单条消息的 token 数(包含 tool_calls)"""
+    tokens = MESSAGE_OVERHEAD_TOKENS
+    content = message.get("content")
+    if isinstance(content, str):
+        tokens += counter(content)
+    elif content is not None:
+        tokens += counter(json.dumps(content, ensure_ascii=False, default=to_jsonable))
+    if message.get("tool_calls"):
+        tokens += counter(json.dumps(message["tool_calls"], ensure_ascii=False, default=to_jsonable))
+    if message.get("name"):
+        tokens += counter(message["name"])
+    return tokens
+
+
+def truncate_summary(content: str, max_chars: int = 60) -> str:
+    """默认的压缩方式：只保留工具结果开头的一小段"""
+    if len(content) <= max_chars:
+        return COMPACTED_PREFIX + content
+    return f"{COMPACTED_PREFIX}{content[:max_chars]}…(原文{len(content)}字符)"
+
+
+class TokenBudgetContext:
+    """
+    带 token 预算的对话上下文
+
+    - 每条消息只在加入时计数一次，总量增量维护，不会每轮重新分词整个历史
+    - 前 prefix_size 条消息(系统提示词和用户问题)永不修改，与固定的 tools 一起构成稳定前缀，
+      便于提供方的前缀缓存命中
+    - 超出 max_tokens 时从最旧的工具结果开始压缩，一直压到 max_tokens * target_ratio 以下；
+      留出余量可以让压缩很少发生，避免每轮都改动历史导致前缀缓存失效
+    - 最近 keep_recent 条消息不压缩；assistant 的 tool_calls 消息保留，保证每个 tool_call_id 都有对应结果
+    """
+
+    def __init__(self,
+                 max_tokens: int = 8000,
+                 prefix_size: int = 2,
+                 keep_recent: int = 4,
+                 target_ratio: float = 0.75,
+                 summarizer: Optional[Callable[[str], str]] = None,
+                 counter: Callable[[str], int] = count_tokens):
+        self.max_tokens = max_tokens
+        self.prefix_size = prefix_size
+        self.keep_recent = keep_recent
+        self.target_ratio = target_ratio
+        self.summarizer = summarizer or truncate_summary
+        self.counter = counter
+
+        self._messages: List[Dict[str, Any]] = []
+        self._tokens: List[int] = []
+        self._compacted: List[bool] = []
+        self._next_candidate = 0
+        self.total_tokens = 0
+        self.compactions = 0
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def append(self, message: Dict[str, Any]) -> None:
+        tokens = message_tokens(message, self.counter)
+        self._messages.append(message)
+        self._tokens.append(tokens)
+        self._compacted.append(False)
+        self.total_tokens += tokens
+
+    def extend(self, messages: List[Dict[str, Any]]) -> None:
+        for message in messages:
+            self.append(message)
+
+    @property
+    def messages(self) -> List[Dict[str, Any]]:
+        """返回满足预算的消息列表，可直接作为 messages 参数发送"""
+        if self.total_tokens > self.max_tokens:
+            self.compact()
+        return self._messages
+
+    def compact(self) -> int:
+        """压缩旧的工具结果，返回节省的 token 数"""
+        target = int(self.max_tokens * self.target_ratio)
+        start = max(self._next_candidate, self.prefix_size)
+        end = len(self._messages) - self.keep_recent
+        saved = 0
+
+        for index in range(start, end):
+            if self.total_tokens <= target:
+                break
+            message = self._messages[index]
+            if self._compacted[index] or message.get("role") != "tool":
+                continue
+            content = message.get("content") or ""
+            summary = self.summarizer(content)
+            if len(summary) >= len(content):
+                self._compacted[index] = True
+                continue
+            compacted = dict(message, content=summary)
+            tokens = message_tokens(compacted, self.counter)
+            self._messages[index] = compacted
+            self._compacted[index] = True
+            saved += self._tokens[index] - tokens
+            self.total_tokens -= self._tokens[index] - tokens
+            self._tokens[index] = tokens
+            self._next_candidate = index + 1
+
+        if saved:
+            self.compactions += 1
+            logger.info(f"上下文压缩: 节省 {saved} tokens, 当前 {self.total_tokens}/{self.max_tokens}")
+        if self.total_tokens > self.max_tokens:
+            logger.warning(f"上下文压缩后仍超出预算: {self.total_tokens}/{self.max_tokens} tokens")
+        return saved
@@ -0,0 +1,142 @@
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ToolResultCache:
+    """
+    工具调用结果缓存
+
+    - 以 "工具名 + 规范化后的JSON参数" 作为缓存键
+    - 支持按工具配置TTL，过期条目在读取时淘汰
+    - 条目数量有上限，超过后按LRU淘汰最久未使用的结果
+    - single-flight：并发的相同调用只真正执行一次，其余调用等待并共享结果
+    """
+
+    def __init__(self,
+                 max_entries: int = 1024,
+                 default_ttl: Optional[float] = 300.0,
+                 tool_ttls: Optional[Dict[str, Optional[float]]] = None):
+        """
+        Args:
+            max_entries: 最多缓存的结果条数
+            default_ttl: 默认过期时间(秒)，None 表示永不过期
+            tool_ttls: 按工具名覆盖的过期时间，设为0表示该工具不缓存
+        """
+        self.max_entries = max(1, max_entries)
+        self.default_ttl = default_ttl
+        self.tool_ttls = tool_ttls or {}
+
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(name: str, args: Dict[str, Any]) -> Tuple[str, str]:
+        """生成缓存键，参数按键名排序后序列化，保证等价参数得到相同的键"""
+        return name, json.dumps(args, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+    def _ttl_for(self, name: str) -> Optional[float]:
+        return self.tool_ttls.get(name, self.default_ttl)
+
+    def call(self, name: str, func: Callable[..., Any], args: Dict[str, Any]) -> Any:
+        """通过缓存执行工具调用，异常不会被缓存"""
+        ttl = self._ttl_for(name)
+        if ttl is not None and ttl <= 0:
+            return func(**args)
+
+        key = self.make_key(name, args)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.shared += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = Future()
+                self._inflight[key] = future
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = func(**args)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            expires_at = None if ttl is None else time.monotonic() + ttl
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        future.set_result(value)
+        return value
+
+    def wrap(self, name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        """将工具函数包装为带缓存的版本，调用方式保持 func(**args) 不变"""
+        def cached(**kwargs):
+            return self.call(name, func, kwargs)
+
+        cached.__name__ = getattr(func, "__name__", name)
+        cached.__doc__ = getattr(func, "__doc__", None)
+        cached.__wrapped__ = func
+        return cached
+
+    def wrap_map(self, tool_map: Dict[str, Callable[..., Any]]) -> Dict[str, Callable[..., Any]]:
+        """包装整个工具映射表"""
+        return {name: self.wrap(name, func) for name, func in tool_map.items()}
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """清除缓存，指定 name 时只清除该工具的结果"""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == name]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计，用于评估缓存容量是否合适"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.shared
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits + self.shared) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,319 @@
+"""
+基于装饰器的工具注册表
+
+注册时(通常是模块导入时)根据函数的类型注解和文档字符串生成一次 JSON schema，
+并为每个工具预编译参数校验函数。之后:
+- registry.tools 始终返回同一个 OpenAI tools 列表对象，多个助手实例共享，不再逐个构建
+- registry.tools_json 是序列化好的 tools 字节串，只有直接拼 HTTP 请求体的脚本才能原样复用；
+  经 OpenAI SDK 发出的请求会由 SDK 重新序列化 tools，应传 registry.tools
+- registry.parse_arguments() 解析模型给出的参数并校验，错误在调用工具之前就以 ToolArgumentError 抛出
+
+用法:
+    registry = ToolRegistry()
+
+    @registry.tool
+    def get_weather(city: str, unit: Literal["c", "f"] = "c") -> str:
+        '''
+        根据城市名称返回天气情况
+
+        Args:
+            city: 城市名，例如：北京、上海
+            unit: 温度单位
+        '''
+
+文档字符串的第一段作为工具描述，Args 段中 "参数名: 说明" 作为参数描述。
+"""
+import inspect
+import json
+import re
+import typing
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Literal, Optional, Tuple, Union
+
+Validator = Callable[[Any], Any]
+
+_ARG_LINE = re.compile(r"^\s*(\*{0,2}\w+)\s*(?:\([^)]*\))?\s*[:：]\s*(.*)$")
+_ARGS_HEADERS = ("Args", "Arguments", "参数")
+_OTHER_HEADERS = ("Returns", "Return", "Raises", "Yields", "Examples", "返回")
+
+
+class ToolArgumentError(ValueError):
+    """工具参数不符合 schema"""
+
+
+@dataclass(frozen=True)
+class Tool:
+    """一个已注册的工具：函数、schema 和预编译的参数校验函数"""
+    name: str
+    func: Callable[..., Any]
+    description: str
+    parameters: Dict[str, Any]
+    validate: Callable[[Dict[str, Any]], Dict[str, Any]]
+
+    @property
+    def openai_schema(self) -> Dict[str, Any]:
+        return {"type": "function",
+                "function": {"name": self.name, "description": self.description, "parameters": self.parameters}}
+
+    @property
+    def mcp_schema(self) -> Dict[str, Any]:
+        return {"name": self.name, "description": self.description, "inputSchema": self.parameters}
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+
+def parse_docstring(doc: Optional[str]) -> Tuple[str, Dict[str, str]]:
+    """解析 Google 风格的文档字符串，返回 (描述, 参数名 -> 说明)"""
+    description: List[str] = []
+    params: Dict[str, str] = {}
+    section = "description"
+    current: Optional[str] = None
+    arg_indent: Optional[int] = None
+    for line in inspect.cleandoc(doc or "").splitlines():
+        stripped = line.strip()
+        header = stripped.rstrip(":：")
+        if header in _ARGS_HEADERS:
+            section, current, arg_indent = "args", None, None
+            continue
+        if header in _OTHER_HEADERS:
+            section, current = "other", None
+            continue
+        if section == "description":
+            if stripped:
+                description.append(stripped)
+            elif description:
+                section = "other"
+        elif section == "args" and stripped:
+            # 参数行的缩进以第一个参数为准，缩进更深的行是上一个参数说明的续行
+            if arg_indent is None:
+                arg_indent = _indent(line)
+            match = _ARG_LINE.match(line)
+            if match and _indent(line) == arg_indent:
+                current = match.group(1).lstrip("*")
+                params[current] = match.group(2).strip()
+            elif current:
+                params[current] = (params[current] + " " + stripped).strip()
+    return " ".join(description), params
+
+
+def _unwrap_optional(annotation: Any) -> Tuple[Any, bool]:
+    if typing.get_origin(annotation) is Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) < len(typing.get_args(annotation)):
+            return (args[0] if len(args) == 1 else Union[tuple(args)]), True
+    return annotation, False
+
+
+def _compile(annotation: Any, path: str) -> Tuple[Dict[str, Any], Validator]:
+    """根据类型注解生成 (JSON schema, 校验函数)，校验函数返回规范化后的值，不合法时抛出 ToolArgumentError"""
+    annotation, nullable = _unwrap_optional(annotation)
+    schema, check = _compile_required(annotation, path)
+    if not nullable:
+        return schema, check
+
+    def check_optional(value):
+        return None if value is None else check(value)
+
+    return schema, check_optional
+
+
+def _compile_required(annotation: Any, path: str) -> Tuple[Dict[str, Any], Validator]:
+    origin = typing.get_origin(annotation)
+    if annotation is inspect.Parameter.empty or annotation is Any:
+        return {}, lambda value: value
+
+    if origin is Literal:
+        choices = list(typing.get_args(annotation))
+        allowed = frozenset(choices)
+        schema = {"enum": choices}
+        if all(isinstance(choice, str) for choice in choices):
+            schema = {"type": "string", "enum": choices}
+
+        def check_enum(value):
+            if value not in allowed:
+                raise ToolArgumentError(f"{path} 必须是 {choices} 之一，实际为 {value!r}")
+            return value
+
+        return schema, check_enum
+
+    if annotation is bool:
+        def check_bool(value):
+            if not isinstance(value, bool):
+                raise ToolArgumentError(f"{path} 必须是布尔值，实际为 {type(value).__name__}")
+            return value
+
+        return {"type": "boolean"}, check_bool
+
+    if annotation is int:
+        def check_int(value):
+            if isinstance(value, bool) or not isinstance(value, (int, float)) \
+                    or (isinstance(value, float) and not value.is_integer()):
+                raise ToolArgumentError(f"{path} 必须是整数，实际为 {value!r}")
+            return int(value)
+
+        return {"type": "integer"}, check_int
+
+    if annotation is float:
+        def check_number(value):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ToolArgumentError(f"{path} 必须是数字，实际为 {value!r}")
+            return float(value)
+
+        return {"type": "number"}, check_number
+
+    if annotation is str:
+        def check_str(value):
+            if not isinstance(value, str):
+                raise ToolArgumentError(f"{path} 必须是字符串，实际为 {type(value).__name__}")
+            return value
+
+        return {"type": "string"}, check_str
+
+    if annotation in (list, tuple) or origin in (list, tuple, List, typing.Sequence):
+        args = typing.get_args(annotation)
+        item_schema, check_item = _compile(args[0], f"{path}[]") if args else ({}, lambda value: value)
+        schema = {"type": "array", "items": item_schema} if item_schema else {"type": "array"}
+
+        def check_list(value):
+            if not isinstance(value, list):
+                raise ToolArgumentError(f"{path} 必须是数组，实际为 {type(value).__name__}")
+            return [check_item(item) for item in value]
+
+        return schema, check_list
+
+    if annotation is dict or origin is dict:
+        def check_dict(value):
+            if not isinstance(value, dict):
+                raise ToolArgumentError(f"{path} 必须是对象，实际为 {type(value).__name__}")
+            return value
+
+        return {"type": "object"}, check_dict
+
+    raise TypeError(f"{path}: 不支持的参数类型注解 {annotation!r}")
+
+
+def build_tool(func: Callable[..., Any], name: Optional[str] = None, description: Optional[str] = None) -> Tool:
+    """从函数签名和文档字符串生成 Tool"""
+    doc_description, doc_params = parse_docstring(func.__doc__)
+    hints = typing.get_type_hints(func)
+    properties: Dict[str, Any] = {}
+    required: List[str] = []
+    checks: Dict[str, Validator] = {}
+    for param in inspect.signature(func).parameters.values():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        schema, check = _compile(hints.get(param.name, param.annotation), param.name)
+        schema = dict(schema)
+        if param.name in doc_params:
+            schema["description"] = doc_params[param.name]
+        if param.default is param.empty:
+            required.append(param.name)
+        elif param.default is not None:
+            schema["default"] = param.default
+        properties[param.name] = schema
+        checks[param.name] = check
+
+    parameters: Dict[str, Any] = {"type": "object", "properties": properties}
+    if required:
+        parameters["required"] = required
+    tool_name = name or func.__name__
+    check_items = tuple(checks.items())
+    required_names = tuple(required)
+    known = frozenset(checks)
+
+    def validate(arguments: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(arguments, dict):
+            raise ToolArgumentError(f"{tool_name} 的参数必须是 JSON 对象")
+        missing = [key for key in required_names if key not in arguments]
+        if missing:
+            raise ToolArgumentError(f"{tool_name} 缺少必填参数: {', '.join(missing)}")
+        unknown = arguments.keys() - known
+        if unknown:
+            raise ToolArgumentError(f"{tool_name} 不支持的参数: {', '.join(sorted(unknown))}")
+        return {key: check(arguments[key]) for key, check in check_items if key in arguments}
+
+    return Tool(tool_name, func, description or doc_description, parameters, validate)
+
+
+class ToolRegistry:
+    """工具注册表，tools / tools_json / mcp_tools 在注册变化前只生成一次"""
+
+    def __init__(self):
+        self._tools: Dict[str, Tool] = {}
+        self._openai_tools: Optional[List[Dict[str, Any]]] = None
+        self._tools_json: Optional[bytes] = None
+
+    def tool(self, func: Optional[Callable[..., Any]] = None, *, name: Optional[str] = None,
+             description: Optional[str] = None):
+        """装饰器：@registry.tool 或 @registry.tool(name=..., description=...)，返回原函数"""
+        def decorator(f: Callable[..., Any]) -> Callable[..., Any]:
+            self.register(f, name, description)
+            return f
+
+        return decorator(func) if func is not None else decorator
+
+    def register(self, func: Callable[..., Any], name: Optional[str] = None,
+                 description: Optional[str] = None) -> Tool:
+        tool = build_tool(func, name, description)
+        self._tools[tool.name] = tool
+        self._openai_tools = None
+        self._tools_json = None
+        return tool
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __getitem__(self, name: str) -> Tool:
+        return self._tools[name]
+
+    def __iter__(self) -> Iterator[Tool]:
+        return iter(self._tools.values())
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    @property
+    def functions(self) -> Dict[str, Callable[..., Any]]:
+        return {name: tool.func for name, tool in self._tools.items()}
+
+    @property
+    def tools(self) -> List[Dict[str, Any]]:
+        """OpenAI tools 参数；每次返回同一个列表对象，调用方不要修改它"""
+        if self._openai_tools is None:
+            self._openai_tools = [tool.openai_schema for tool in self._tools.values()]
+        return self._openai_tools
+
+    @property
+    def tools_json(self) -> bytes:
+        """序列化好的 tools 列表(UTF-8 JSON)，供直接拼 HTTP 请求体使用，OpenAI SDK 不会用到"""
+        if self._tools_json is None:
+            self._tools_json = json.dumps(self.tools, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return self._tools_json
+
+    def mcp_tools(self) -> List[Dict[str, Any]]:
+        """MCP tools/list 格式的定义"""
+        return [tool.mcp_schema for tool in self._tools.values()]
+
+    def validate(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        tool = self._tools.get(name)
+        if tool is None:
+            raise ToolArgumentError(f"未知工具：{name}")
+        return tool.validate(arguments)
+
+    def parse_arguments(self, name: str, raw: Union[str, bytes, Dict[str, Any], None]) -> Dict[str, Any]:
+        """解析模型给出的参数字符串并校验，返回规范化后的参数"""
+        if raw is None or raw == "" or raw == b"":
+            arguments: Any = {}
+        elif isinstance(raw, (str, bytes)):
+            try:
+                arguments = json.loads(raw)
+            except json.JSONDecodeError as e:
+                raise ToolArgumentError(f"解析工具参数失败: {e}")
+        else:
+            arguments = raw
+        return self.validate(name, arguments)
+
+    def call(self, name: str, arguments: Union[str, bytes, Dict[str, Any], None]) -> Any:
+        return self._tools[name].func(**self.parse_arguments(name, arguments))
@@ -0,0 +1,116 @@
+"""
+ToolRegistry 与手写 schema 的开销对比
+
+- 每轮请求的实际路径：tools 列表交给 OpenAI SDK(由 SDK 重新序列化)，对比每轮手写构建与共享的 registry.tools，
+  请求发往进程内的 httpx.MockTransport，不走网络
+- registry.tools_json 只对直接拼 HTTP 请求体的脚本有意义，单独列出，不代表经 SDK 的每次请求节省
+- 参数处理：只做 json.loads 与 json.loads + 预编译校验
+
+在仓库根目录运行: python -m Protocol.FuctionCall.ToolRegistryBenchmark --tools 40 --rounds 20000
+"""
+import json
+import time
+import argparse
+from typing import List, Literal, Optional
+
+from Protocol.FuctionCall.ToolRegistry import ToolRegistry
+
+
+def make_tool(index: int):
+    def tool(city: str, days: int = 3, unit: Literal["c", "f"] = "c", tags: Optional[List[str]] = None) -> str:
+        """
+        查询城市未来几天的天气
+
+        Args:
+            city: 城市名，例如：北京、上海
+            days: 查询天数
+            unit: 温度单位
+            tags: 需要额外返回的指标
+        """
+        return f"{city}:{days}{unit}"
+
+    tool.__name__ = f"weather_{index}"
+    return tool
+
+
+def hand_written_tools(count: int) -> list:
+    """与旧版 _define_tools 一样，每次调用都重新构建"""
+    return [{
+        "type": "function",
+        "function": {
+            "name": f"weather_{i}",
+            "description": "查询城市未来几天的天气",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "city": {"type": "string", "description": "城市名，例如：北京、上海"},
+                    "days": {"type": "integer", "description": "查询天数", "default": 3},
+                    "unit": {"type": "string", "enum": ["c", "f"], "description": "温度单位", "default": "c"},
+                    "tags": {"type": "array", "items": {"type": "string"}, "description": "需要额外返回的指标"},
+                },
+                "required": ["city"],
+            },
+        },
+    } for i in range(count)]
+
+
+def timed(label: str, func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    per_call = (time.perf_counter() - start) / rounds
+    print(f"  {label:<36} {per_call * 1e6:10.2f} µs/次")
+    return per_call
+
+
+def sdk_client():
+    """请求由 httpx.MockTransport 在进程内应答，只测 SDK 构建/序列化请求与解析响应的开销"""
+    import httpx
+    from openai import OpenAI
+
+    body = {
+        "id": "bench", "object": "chat.completion", "created": 0, "model": "bench",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+    }
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=body))
+    return OpenAI(api_key="bench", base_url="http://bench.local/v1", max_retries=0,
+                  http_client=httpx.Client(transport=transport))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ToolRegistry 开销对比")
+    parser.add_argument("--tools", type=int, default=40)
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    registry = ToolRegistry()
+    for i in range(args.tools):
+        registry.register(make_tool(i))
+    print(f"注册 {args.tools} 个工具(一次性): {(time.perf_counter() - start) * 1000:.1f}ms")
+    assert registry.tools[0]["function"]["parameters"] == hand_written_tools(1)[0]["function"]["parameters"]
+
+    rounds = max(1, args.rounds // 20)
+    client = sdk_client()
+    messages = [{"role": "user", "content": "北京天气"}]
+
+    def create(tools):
+        return client.chat.completions.create(model="bench", messages=messages, tools=tools)
+
+    print(f"[每轮请求经 OpenAI SDK 发出] {args.tools} 个工具")
+    build = timed("手写构建 tools + SDK 请求", lambda: create(hand_written_tools(args.tools)), rounds)
+    cached = timed("registry.tools + SDK 请求", lambda: create(registry.tools), rounds)
+    print(f"  每次请求节省 {(build - cached) * 1e6:.1f} µs({(1 - cached / build) * 100:.1f}%)")
+
+    print("[仅直接拼 HTTP 请求体时] tools 序列化")
+    timed("手写构建 + json.dumps", lambda: json.dumps(hand_written_tools(args.tools), ensure_ascii=False), rounds)
+    timed("registry.tools_json(缓存字节串)", lambda: registry.tools_json, rounds)
+
+    raw = '{"city": "北京", "days": 5, "unit": "c", "tags": ["湿度", "风力"]}'
+    print("[参数处理]")
+    timed("json.loads", lambda: json.loads(raw), args.rounds)
+    timed("parse_arguments(解析 + 校验)", lambda: registry.parse_arguments("weather_0", raw), args.rounds)
+
+
+if __name__ == "__main__":
+    main()
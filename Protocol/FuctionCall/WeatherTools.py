@@ -0,0 +1,73 @@
+"""
+天气助手的工具函数
+
+WeatherAssistant(Function Calling)和 MCP 服务器共用 WEATHER_TOOLS 注册表，
+schema 在导入时由函数签名和文档字符串生成一次。
+TOOL_FUNCTIONS 为 名称 -> 函数，TOOL_SCHEMAS 为 OpenAI tools 格式的定义，保留给旧代码使用。
+"""
+import logging
+from typing import Any, Callable, Dict, List
+
+from Protocol.FuctionCall.ToolRegistry import ToolRegistry
+
+logger = logging.getLogger(__name__)
+
+WEATHER_TOOLS = ToolRegistry()
+
+DUMMY_WEATHER = {
+    "北京": "晴，28°C",
+    "上海": "多云，22°C",
+    "广州": "小雨，19°C",
+    "长沙": "阴，25°C",
+    "深圳": "晴，30°C",
+    "杭州": "多云，24°C"
+}
+
+
+@WEATHER_TOOLS.tool
+def get_weather(city: str) -> str:
+    """
+    根据城市名称返回模拟天气情况
+
+    Args:
+        city: 城市名，例如：北京、上海
+    """
+    result = DUMMY_WEATHER.get(city, f"抱歉，暂无{city}的天气信息")
+    logger.info(f"获取{city}天气: {result}")
+    return result
+
+
+@WEATHER_TOOLS.tool
+def dress_advice(weather: str) -> str:
+    """
+    根据天气情况给出穿衣建议
+
+    Args:
+        weather: 天气信息，例如：晴，28°C
+    """
+    advice_map = {
+        "雨": "记得带伞，穿防水外套和防滑鞋。",
+        "晴": "适合轻便服装，注意防晒，可穿短袖。",
+        "多云": "建议穿长袖薄衫，可准备薄外套。",
+        "阴": "适合春秋装，建议穿薄外套或卫衣。"
+    }
+
+    # 根据天气关键词匹配建议
+    for keyword, advice in advice_map.items():
+        if keyword in weather:
+            # 根据温度调整建议
+            if "30" in weather or "3" in weather.split("°")[0][-1:]:
+                if "晴" in weather:
+                    advice += " 温度较高，多补充水分。"
+            elif "1" in weather.split("°")[0] or "2" in weather.split("°")[0][:2]:
+                advice += " 温度适中，注意保暖。"
+
+            logger.info(f"天气'{weather}'的穿衣建议: {advice}")
+            return advice
+
+    return "根据当前体感和个人喜好选择合适的服装。"
+
+
+TOOL_FUNCTIONS: Dict[str, Callable[..., Any]] = WEATHER_TOOLS.functions
+
+TOOL_SCHEMAS: List[Dict[str, Any]] = WEATHER_TOOLS.tools
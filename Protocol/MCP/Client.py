@@ -0,0 +1,257 @@
+"""
+MCP 客户端：一次握手、长连接复用、tools/list 结果缓存
+
+- McpStdioClient: 启动服务器子进程，所有并发请求复用同一对管道，按 JSON-RPC id 匹配响应
+- McpHttpClient: Streamable HTTP，所有请求复用一条流水线长连接和同一个会话 id
+
+用法:
+    async with McpStdioClient([sys.executable, "-m", "Protocol.MCP.Server"]) as client:
+        tools = await client.list_tools()
+        text = await client.call_tool_text("get_weather", {"city": "北京"})
+"""
+import sys
+import json
+import asyncio
+import logging
+import itertools
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+# 依赖仓库内的其他模块，请在仓库根目录运行
+from Protocol.AsyncHttpClient import PipelinedHttpConnection
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = "2025-03-26"
+
+
+class McpError(Exception):
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(f"[{code}] {message}")
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class _McpClientBase:
+    def __init__(self, client_name: str = "aiagentcourse-mcp-client"):
+        self.client_name = client_name
+        self.server_info: Optional[Dict[str, Any]] = None
+        self._ids = itertools.count(1)
+        self._tools: Optional[List[Dict[str, Any]]] = None
+        self._tools_lock: Optional[asyncio.Lock] = None
+
+    async def request(self, method: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        raise NotImplementedError
+
+    async def notify(self, method: str, params: Optional[Dict[str, Any]] = None) -> None:
+        raise NotImplementedError
+
+    async def initialize(self) -> Dict[str, Any]:
+        self.server_info = await self.request("initialize", {
+            "protocolVersion": PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": {"name": self.client_name, "version": "1.0.0"},
+        })
+        await self.notify("notifications/initialized")
+        return self.server_info
+
+    def _handle_notification(self, message: Dict[str, Any]) -> None:
+        if message.get("method") == "notifications/tools/list_changed":
+            self.invalidate_tools()
+
+    def invalidate_tools(self) -> None:
+        self._tools = None
+
+    async def list_tools(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        """工具列表只请求一次；并发调用时共用同一次请求"""
+        if self._tools is not None and not refresh:
+            return self._tools
+        if self._tools_lock is None:
+            self._tools_lock = asyncio.Lock()
+        async with self._tools_lock:
+            if self._tools is None or refresh:
+                result = await self.request("tools/list")
+                self._tools = result.get("tools", [])
+        return self._tools
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.request("tools/call", {"name": name, "arguments": arguments or {}})
+
+    async def call_tool_text(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> str:
+        """返回工具结果中的文本内容"""
+        result = await self.call_tool(name, arguments)
+        return "".join(item.get("text", "") for item in result.get("content", []) if item.get("type") == "text")
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self):
+        await self.initialize()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+
+def _raise_for_error(message: Dict[str, Any]) -> Any:
+    if "error" in message:
+        error = message["error"]
+        raise McpError(error.get("code", -1), error.get("message", ""), error.get("data"))
+    return message.get("result")
+
+
+class McpStdioClient(_McpClientBase):
+    """通过子进程 stdio 通信，所有请求在同一条管道上多路复用"""
+
+    def __init__(self, command: List[str], **kwargs):
+        super().__init__(**kwargs)
+        self.command = command
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._reader_task: Optional[asyncio.Task] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+
+    async def start(self) -> None:
+        self._process = await asyncio.create_subprocess_exec(
+            *self.command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            limit=16 * 1024 * 1024)
+        self._write_lock = asyncio.Lock()
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self) -> None:
+        stdout = self._process.stdout
+        try:
+            while True:
+                line = await stdout.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"忽略无法解析的服务器输出: {line[:200]!r}")
+                    continue
+                for item in message if isinstance(message, list) else [message]:
+                    future = self._pending.pop(item.get("id"), None) if "id" in item else None
+                    if future is not None:
+                        if not future.done():
+                            future.set_result(item)
+                    elif "method" in item:
+                        self._handle_notification(item)
+        finally:
+            error = ConnectionError("MCP 服务器进程已退出")
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+
+    async def _send(self, message: Dict[str, Any]) -> None:
+        data = json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        async with self._write_lock:
+            self._process.stdin.write(data)
+            await self._process.stdin.drain()
+
+    async def request(self, method: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        if self._process is None:
+            await self.start()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        await self._send(message)
+        return _raise_for_error(await future)
+
+    async def notify(self, method: str, params: Optional[Dict[str, Any]] = None) -> None:
+        if self._process is None:
+            await self.start()
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        await self._send(message)
+
+    async def close(self) -> None:
+        if self._process is None:
+            return
+        if self._process.stdin and not self._process.stdin.is_closing():
+            self._process.stdin.close()
+        try:
+            await asyncio.wait_for(self._process.wait(), 5)
+        except asyncio.TimeoutError:
+            self._process.kill()
+            await self._process.wait()
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+        self._process = None
+
+
+class McpHttpClient(_McpClientBase):
+    """
+    Streamable HTTP 客户端：所有并发请求走同一条流水线长连接，并复用 Mcp-Session-Id
+
+    没有使用 httpx 连接池：几十个并发请求时其调度开销会让吞吐降到流水线连接的十分之一以下。
+    """
+
+    def __init__(self, url: str, timeout: float = 60.0, max_in_flight: int = 1024, **kwargs):
+        super().__init__(**kwargs)
+        parts = urlsplit(url)
+        self.url = url
+        self.path = parts.path or "/"
+        self.timeout = timeout
+        self.session_id: Optional[str] = None
+        self._connection = PipelinedHttpConnection(f"{parts.scheme}://{parts.netloc}",
+                                                   max_in_flight=max_in_flight, timeout=timeout)
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json", "Accept": "application/json, text/event-stream"}
+        if self.session_id:
+            headers["Mcp-Session-Id"] = self.session_id
+        return headers
+
+    async def _post(self, message: Dict[str, Any]):
+        body = json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        status, headers, content = await self._connection.request("POST", self.path, body, self._headers())
+        if status == 429:
+            raise McpError(-32000, "服务器繁忙", {"retry_after": headers.get("retry-after")})
+        if status >= 400 and not content:
+            raise McpError(-32603, f"HTTP {status}")
+        if "mcp-session-id" in headers:
+            self.session_id = headers["mcp-session-id"]
+        return headers, content
+
+    async def request(self, method: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        message = {"jsonrpc": "2.0", "id": next(self._ids), "method": method}
+        if params is not None:
+            message["params"] = params
+        headers, content = await self._post(message)
+        if headers.get("content-type", "").startswith("text/event-stream"):
+            # 服务端选择以 SSE 返回时，取与请求 id 对应的那条消息
+            for line in content.decode("utf-8").splitlines():
+                if line.startswith("data:"):
+                    item = json.loads(line[5:])
+                    if item.get("id") == message["id"]:
+                        return _raise_for_error(item)
+                    self._handle_notification(item)
+            raise McpError(-32603, "SSE 响应中没有对应的结果")
+        return _raise_for_error(json.loads(content))
+
+    async def notify(self, method: str, params: Optional[Dict[str, Any]] = None) -> None:
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        await self._post(message)
+
+    async def close(self) -> None:
+        if self.session_id:
+            try:
+                await self._connection.request("DELETE", self.path, headers={"Mcp-Session-Id": self.session_id})
+            except Exception as e:
+                logger.debug(f"结束 MCP 会话失败: {e}")
+            self.session_id = None
+        await self._connection.close()
+
+
+def weather_server_command(*extra: str) -> List[str]:
+    """以子进程方式启动本仓库的天气 MCP 服务器的命令"""
+    return [sys.executable, "-m", "Protocol.MCP.Server", "--transport", "stdio", *extra]
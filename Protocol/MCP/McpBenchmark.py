@@ -0,0 +1,101 @@
+"""
+MCP 服务器压测：数百个并发调用方通过 stdio / Streamable HTTP 调用 tools/call，统计时延分位和吞吐，
+并对比 tools/list 缓存前后的开销
+
+在仓库根目录运行: python -m Protocol.MCP.McpBenchmark --callers 500 --calls 2000 --tool-latency 0.02
+"""
+import time
+import random
+import asyncio
+import argparse
+from typing import List
+
+from LLM.StreamMetrics import percentile
+from Protocol.AsyncHttpServer import AsyncHttpServer
+from Protocol.MCP.Client import McpHttpClient, McpStdioClient, weather_server_command
+from Protocol.MCP.Server import create_weather_server
+
+CITIES = ["北京", "上海", "广州", "长沙", "深圳", "杭州"]
+
+
+async def drive(client, callers: int, calls: int) -> None:
+    """callers 个协程共同完成 calls 次工具调用"""
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(calls))
+
+    async def caller() -> None:
+        nonlocal errors
+        for _ in remaining:
+            city = random.choice(CITIES)
+            start = time.perf_counter()
+            try:
+                weather = await client.call_tool_text("get_weather", {"city": city})
+                if not weather:
+                    errors += 1
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(callers)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50, p99 = percentile(latencies, 50), percentile(latencies, 99)
+    print(f"  并发 {callers:>4}: 吞吐 {calls / elapsed:8.0f} 次/s, "
+          f"p50 {p50 * 1000 if p50 else 0:7.1f}ms, p99 {p99 * 1000 if p99 else 0:7.1f}ms, 失败 {errors}")
+
+
+async def tools_list_cost(client, rounds: int = 200) -> None:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await client.list_tools(refresh=True)
+    uncached = (time.perf_counter() - start) / rounds
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await client.list_tools()
+    cached = (time.perf_counter() - start) / rounds
+    print(f"  tools/list: 每次请求 {uncached * 1e6:.0f}µs, 命中客户端缓存 {cached * 1e6:.2f}µs")
+
+
+async def bench_stdio(levels: List[int], calls: int, tool_latency: float) -> None:
+    print(f"[stdio] 子进程服务器，单条管道多路复用")
+    command = weather_server_command("--tool-latency", str(tool_latency))
+    async with McpStdioClient(command) as client:
+        await tools_list_cost(client)
+        for callers in levels:
+            await drive(client, callers, calls)
+
+
+async def bench_http(levels: List[int], calls: int, tool_latency: float) -> None:
+    server = create_weather_server(tool_latency)
+    http = AsyncHttpServer(server.http_router()).start_in_thread()
+    print(f"[http] {http.base_url}/mcp，单条流水线长连接")
+    try:
+        async with McpHttpClient(f"{http.base_url}/mcp") as client:
+            await tools_list_cost(client)
+            for callers in levels:
+                await drive(client, callers, calls)
+        print(f"  服务端统计: {server.stats()}")
+    finally:
+        http.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP 服务器并发压测")
+    parser.add_argument("--callers", type=int, nargs="+", default=[1, 50, 200, 500])
+    parser.add_argument("--calls", type=int, default=2000, help="每个并发级别的总调用次数")
+    parser.add_argument("--tool-latency", type=float, default=0.02, help="模拟的工具 I/O 耗时(秒)")
+    parser.add_argument("--transport", choices=["stdio", "http", "both"], default="both")
+    args = parser.parse_args()
+
+    print(f"工具模拟耗时 {args.tool_latency * 1000:.0f}ms，每级 {args.calls} 次调用")
+    if args.transport in ("stdio", "both"):
+        asyncio.run(bench_stdio(args.callers, args.calls, args.tool_latency))
+    if args.transport in ("http", "both"):
+        asyncio.run(bench_http(args.callers, args.calls, args.tool_latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+asyncio 实现的 MCP 服务器，支持 stdio 和 Streamable HTTP 两种传输
+
+- 工具来自 ToolRegistry(默认发布 WeatherTools 中的 get_weather / dress_advice)，参数在执行前用注册表预编译的校验函数检查
+- 每个请求独立成任务并发处理，同步工具放到线程池执行，异步工具直接 await
+- 背压：同时执行的 tools/call 不超过 max_concurrency；在途请求超过 max_pending 时，
+  stdio 暂停读取，HTTP 直接返回 429，避免无界排队
+- tools/list 的结果只在工具变更时重新生成
+
+运行:
+    python -m Protocol.MCP.Server --transport stdio
+    python -m Protocol.MCP.Server --transport http --port 8765
+"""
+import sys
+import json
+import time
+import uuid
+import asyncio
+import inspect
+import logging
+import argparse
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+# 依赖仓库内的其他模块，请在仓库根目录运行: python -m Protocol.MCP.Server
+from Protocol.AsyncHttpServer import AsyncHttpServer, HttpRequest, HttpResponse, Router, json_response
+from Protocol.FuctionCall.ToolRegistry import ToolArgumentError, ToolRegistry
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = "2025-03-26"
+
+# JSON-RPC 错误码
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+SERVER_OVERLOADED = -32000
+
+
+class JsonRpcError(Exception):
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+    def to_dict(self) -> Dict[str, Any]:
+        error = {"code": self.code, "message": self.message}
+        if self.data is not None:
+            error["data"] = self.data
+        return error
+
+
+def _error_response(request_id: Any, error: JsonRpcError) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": error.to_dict()}
+
+
+class McpServer:
+    """MCP 协议处理(与传输无关)"""
+
+    def __init__(self,
+                 name: str = "weather-mcp",
+                 version: str = "1.0.0",
+                 max_concurrency: int = 256,
+                 max_pending: int = 4096,
+                 tool_workers: int = 32,
+                 call_timeout: float = 30.0):
+        """
+        Args:
+            max_concurrency: 同时执行的工具调用上限
+            max_pending: 在途请求(执行中+等待执行)上限，超过后触发背压
+            tool_workers: 执行同步工具的线程数
+            call_timeout: 单次工具调用超时(秒)
+        """
+        self.name = name
+        self.version = version
+        self.max_pending = max_pending
+        self.call_timeout = call_timeout
+        self._tools: Dict[str, Dict[str, Any]] = {}
+        self._functions: Dict[str, Callable[..., Any]] = {}
+        self._validators: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+        self._signatures: Dict[str, Optional[inspect.Signature]] = {}
+        self._tools_result: Optional[Dict[str, Any]] = None
+        self._concurrency = max_concurrency
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._executor = ThreadPoolExecutor(max_workers=tool_workers, thread_name_prefix="mcp-tool")
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    # ---------------- 工具注册 ----------------
+
+    def add_tool(self, name: str, func: Callable[..., Any], description: str = "",
+                 input_schema: Optional[Dict[str, Any]] = None,
+                 validator: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> None:
+        """validator 接收 arguments，返回校验后的参数，不合法时抛出 ToolArgumentError"""
+        self._tools[name] = {
+            "name": name,
+            "description": description or (func.__doc__ or "").strip(),
+            "inputSchema": input_schema or {"type": "object", "properties": {}},
+        }
+        self._functions[name] = func
+        try:
+            self._signatures[name] = inspect.signature(func)
+        except (TypeError, ValueError):
+            # 部分内置函数没有可读的签名，只能跳过绑定检查
+            self._signatures[name] = None
+        if validator is not None:
+            self._validators[name] = validator
+        else:
+            self._validators.pop(name, None)
+        self._tools_result = None
+
+    def add_registry(self, registry: ToolRegistry,
+                     functions: Optional[Dict[str, Callable[..., Any]]] = None) -> None:
+        """发布 ToolRegistry 中的全部工具，复用注册表生成的 schema 和参数校验；functions 可替换工具实现"""
+        for tool in registry:
+            func = (functions or {}).get(tool.name, tool.func)
+            self.add_tool(tool.name, func, tool.description, tool.parameters, tool.validate)
+
+    def add_openai_tools(self, schemas: List[Dict[str, Any]], functions: Dict[str, Callable[..., Any]]) -> None:
+        """从 OpenAI tools 格式的定义批量注册"""
+        for schema in schemas:
+            function = schema["function"]
+            self.add_tool(function["name"], functions[function["name"]],
+                          function.get("description", ""), function.get("parameters"))
+
+    def list_tools(self) -> Dict[str, Any]:
+        if self._tools_result is None:
+            self._tools_result = {"tools": list(self._tools.values())}
+        return self._tools_result
+
+    # ---------------- 请求处理 ----------------
+
+    @property
+    def overloaded(self) -> bool:
+        return self.pending >= self.max_pending
+
+    async def _call_tool(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        name = params.get("name")
+        func = self._functions.get(name)
+        if func is None:
+            raise JsonRpcError(INVALID_PARAMS, f"未知工具: {name}")
+        arguments = params.get("arguments") or {}
+        if not isinstance(arguments, dict):
+            raise JsonRpcError(INVALID_PARAMS, "arguments 必须是对象")
+        validator = self._validators.get(name)
+        if validator is not None:
+            try:
+                arguments = validator(arguments)
+            except ToolArgumentError as e:
+                raise JsonRpcError(INVALID_PARAMS, f"参数错误: {e}")
+        signature = self._signatures.get(name)
+        if signature is not None:
+            # 只有参数绑定失败才是调用方的错误；工具内部抛出的 TypeError 按工具错误返回
+            try:
+                signature.bind(**arguments)
+            except TypeError as e:
+                raise JsonRpcError(INVALID_PARAMS, f"参数错误: {e}")
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._concurrency)
+        async with self._slots:
+            try:
+                if inspect.iscoroutinefunction(func):
+                    result = await asyncio.wait_for(func(**arguments), self.call_timeout)
+                else:
+                    loop = asyncio.get_running_loop()
+                    result = await asyncio.wait_for(
+                        loop.run_in_executor(self._executor, functools.partial(func, **arguments)),
+                        self.call_timeout)
+            except asyncio.TimeoutError:
+                return {"content": [{"type": "text", "text": f"工具调用超时: {name}"}], "isError": True}
+            except Exception as e:
+                # 按 MCP 规范，工具自身的错误作为结果返回，让模型能看到错误信息
+                return {"content": [{"type": "text", "text": f"工具调用异常: {e}"}], "isError": True}
+
+        text = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False)
+        return {"content": [{"type": "text", "text": text}], "isError": False}
+
+    async def _dispatch(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "tools/call":
+            return await self._call_tool(params)
+        if method == "tools/list":
+            return self.list_tools()
+        if method == "initialize":
+            return {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {"tools": {"listChanged": False}},
+                "serverInfo": {"name": self.name, "version": self.version},
+            }
+        if method == "ping":
+            return {}
+        raise JsonRpcError(METHOD_NOT_FOUND, f"不支持的方法: {method}")
+
+    async def handle_message(self, message: Any) -> Optional[Dict[str, Any]]:
+        """处理单条 JSON-RPC 消息；通知(没有 id)不返回响应"""
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0" or "method" not in message:
+            return _error_response(message.get("id") if isinstance(message, dict) else None,
+                                   JsonRpcError(INVALID_REQUEST, "无效的 JSON-RPC 请求"))
+        request_id = message.get("id")
+        is_notification = "id" not in message
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            result = await self._dispatch(message["method"], message.get("params") or {})
+            if is_notification:
+                return None
+            return {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except JsonRpcError as e:
+            return None if is_notification else _error_response(request_id, e)
+        except Exception as e:
+            logger.exception(f"处理 {message.get('method')} 失败")
+            return None if is_notification else _error_response(request_id, JsonRpcError(INTERNAL_ERROR, str(e)))
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def handle_payload(self, payload: Any) -> Any:
+        """处理单条或批量(数组)消息"""
+        if isinstance(payload, list):
+            responses = await asyncio.gather(*(self.handle_message(m) for m in payload))
+            return [r for r in responses if r is not None] or None
+        return await self.handle_message(payload)
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": self.pending, "peak_pending": self.peak_pending,
+                "completed": self.completed, "rejected": self.rejected}
+
+    # ---------------- stdio 传输 ----------------
+
+    async def serve_stdio(self, reader: Optional[asyncio.StreamReader] = None,
+                          writer: Optional[asyncio.StreamWriter] = None) -> None:
+        """每行一条 JSON-RPC 消息；在途请求达到 max_pending 时暂停读取，由管道缓冲向客户端施加背压"""
+        loop = asyncio.get_running_loop()
+        if reader is None:
+            reader = asyncio.StreamReader(limit=16 * 1024 * 1024)
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin.buffer)
+        if writer is None:
+            transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout.buffer)
+            writer = asyncio.StreamWriter(transport, protocol, None, loop)
+
+        admission = asyncio.Semaphore(self.max_pending)
+        tasks = set()
+
+        async def process(line: bytes) -> None:
+            try:
+                try:
+                    payload = json.loads(line)
+                except json.JSONDecodeError as e:
+                    response = _error_response(None, JsonRpcError(PARSE_ERROR, f"JSON 解析失败: {e}"))
+                else:
+                    response = await self.handle_payload(payload)
+                if response is not None:
+                    writer.write(json.dumps(response, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+                    await writer.drain()
+            finally:
+                admission.release()
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            await admission.acquire()
+            task = asyncio.create_task(process(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ---------------- Streamable HTTP 传输 ----------------
+
+    def http_router(self, path: str = "/mcp", session_ttl: float = 1800.0, max_sessions: int = 10000) -> Router:
+        """
+        Streamable HTTP：POST 发送 JSON-RPC 消息，响应直接以 application/json 返回
+
+        initialize 时分配 Mcp-Session-Id，DELETE 结束会话；不提供服务端主动推送的 GET 流，
+        因此 initialize 声明 tools.listChanged 为 False。
+        空闲超过 session_ttl 秒的会话过期，会话数超过 max_sessions 时淘汰最久未使用的会话，
+        不调用 DELETE 的客户端不会让会话表无限增长。
+        """
+        # 按最近使用时间排序：最久未使用的在前面
+        sessions: "OrderedDict[str, float]" = OrderedDict()
+        router = Router()
+
+        def expire(now: float) -> None:
+            while sessions:
+                session_id, last_used = next(iter(sessions.items()))
+                if now - last_used <= session_ttl and len(sessions) <= max_sessions:
+                    break
+                del sessions[session_id]
+
+        async def post(request: HttpRequest) -> HttpResponse:
+            if self.overloaded:
+                self.rejected += 1
+                return json_response(_error_response(None, JsonRpcError(SERVER_OVERLOADED, "服务器繁忙")),
+                                     429, {"Retry-After": "1"})
+            try:
+                payload = request.json()
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                return json_response(_error_response(None, JsonRpcError(PARSE_ERROR, f"JSON 解析失败: {e}")), 400)
+
+            headers = {}
+            messages = payload if isinstance(payload, list) else [payload]
+            if any(isinstance(m, dict) and m.get("method") == "initialize" for m in messages):
+                session_id = uuid.uuid4().hex
+                now = time.monotonic()
+                sessions[session_id] = now
+                expire(now)
+                headers["Mcp-Session-Id"] = session_id
+            else:
+                session_id = request.headers.get("mcp-session-id")
+                if session_id:
+                    now = time.monotonic()
+                    expire(now)
+                    if session_id not in sessions:
+                        return json_response({"error": "未知会话"}, 404)
+                    sessions[session_id] = now
+                    sessions.move_to_end(session_id)
+
+            response = await self.handle_payload(payload)
+            if response is None:
+                return HttpResponse(202, b"", headers=headers)
+            return json_response(response, headers=headers)
+
+        async def delete(request: HttpRequest) -> HttpResponse:
+            sessions.pop(request.headers.get("mcp-session-id", ""), None)
+            return HttpResponse(204, b"")
+
+        router.add("POST", path, post)
+        router.add("DELETE", path, delete)
+        return router
+
+
+def create_weather_server(tool_latency: float = 0.0, **kwargs) -> McpServer:
+    """
+    发布 WeatherTools 中的工具
+
+    tool_latency > 0 时给每个工具加上模拟的 I/O 等待(异步 sleep)，用于压测并发处理能力。
+    """
+    from Protocol.FuctionCall.WeatherTools import WEATHER_TOOLS
+
+    functions = WEATHER_TOOLS.functions
+    if tool_latency > 0:
+        def slow(func: Callable[..., Any]) -> Callable[..., Any]:
+            async def wrapper(**arguments):
+                await asyncio.sleep(tool_latency)
+                return func(**arguments)
+            return wrapper
+
+        functions = {name: slow(func) for name, func in functions.items()}
+    server = McpServer(**kwargs)
+    server.add_registry(WEATHER_TOOLS, functions)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="天气工具 MCP 服务器")
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-concurrency", type=int, default=256)
+    parser.add_argument("--max-pending", type=int, default=4096)
+    parser.add_argument("--tool-latency", type=float, default=0.0, help="模拟的工具 I/O 耗时(秒)")
+    args = parser.parse_args()
+
+    # stdout 是 stdio 传输的数据通道，日志只能写到 stderr
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    server = create_weather_server(args.tool_latency, max_concurrency=args.max_concurrency,
+                                   max_pending=args.max_pending)
+    if args.transport == "stdio":
+        asyncio.run(server.serve_stdio())
+    else:
+        http = AsyncHttpServer(server.http_router(), args.host, args.port)
+        print(f"MCP Streamable HTTP 服务: {http.base_url}/mcp")
+        asyncio.run(http.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# 优先在段落、句子边界切分，实在找不到边界才按字符硬切
+DEFAULT_SEPARATORS = ("\n\n", "\n", "。", "！", "？", "；", ". ", "! ", "? ", "; ", "，", ", ", " ")
+
+
+@dataclass
+class Chunk:
+    """文档切分出的一个片段，start/end 为在原文中的字符区间"""
+    doc_id: str
+    index: int
+    text: str
+    start: int
+    end: int
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def to_metadata(self) -> Dict[str, Any]:
+        return dict(self.metadata, doc_id=self.doc_id, chunk_index=self.index,
+                    start=self.start, end=self.end, text=self.text)
+
+
+def _find_break(text: str, start: int, end: int, min_end: int, separators: Sequence[str]) -> int:
+    """在 [min_end, end] 区间内找最靠后的分隔符位置，返回切分点(分隔符之后)"""
+    for sep in separators:
+        pos = text.rfind(sep, min_end, end)
+        if pos != -1:
+            return pos + len(sep)
+    return end
+
+
+def split_text(text: str,
+               chunk_size: int = 500,
+               overlap: int = 50,
+               separators: Sequence[str] = DEFAULT_SEPARATORS) -> List[Tuple[int, int]]:
+    """
+    把文本切成不超过 chunk_size 个字符的片段，相邻片段重叠约 overlap 个字符
+
+    返回 (start, end) 区间列表；只做一次线性扫描，不会生成中间字符串。
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size 必须大于0")
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap 必须在 [0, chunk_size) 之间")
+
+    spans = []
+    length = len(text)
+    start = 0
+    while start < length:
+        end = min(start + chunk_size, length)
+        if end < length:
+            # 切分点不早于片段的一半，避免产生过碎的片段
+            end = _find_break(text, start, end, start + chunk_size // 2, separators)
+        if text[start:end].strip():
+            spans.append((start, end))
+        if end >= length:
+            break
+        start = max(end - overlap, start + 1)
+    return spans
+
+
+def chunk_documents(documents: Iterable[Tuple[str, str, Optional[Dict[str, Any]]]],
+                    chunk_size: int = 500,
+                    overlap: int = 50) -> Iterator[Chunk]:
+    """
+    逐个切分文档，documents 为 (doc_id, text, metadata) 的可迭代对象
+
+    以生成器形式产出，处理大语料时不需要一次性把所有片段放进内存。
+    """
+    for doc_id, text, metadata in documents:
+        for index, (start, end) in enumerate(split_text(text, chunk_size, overlap)):
+            yield Chunk(doc_id, index, text[start:end], start, end, dict(metadata or {}))
@@ -0,0 +1,95 @@
+import re
+import zlib
+import logging
+from functools import lru_cache
+from typing import List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z0-9_]+|[一-鿿]+")
+
+
+class Embedder(Protocol):
+    """向量化接口：返回 (len(texts), dim) 的 float32 矩阵，每行 L2 归一化"""
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """按行 L2 归一化(原地)，归一化后内积即余弦相似度"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+def _features(text: str) -> List[str]:
+    """英文/数字按词，中文按单字+二元组，适合不分词的中英文混合文本"""
+    features = []
+    for token in _WORD_RE.findall(text.lower()):
+        if "一" <= token[0] <= "鿿":
+            features.extend(token)
+            features.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            features.append(token)
+    return features
+
+
+@lru_cache(maxsize=200000)
+def _hash_feature(feature: str, dim: int) -> Tuple[int, float]:
+    # crc32 在不同进程间结果一致(内置 hash 对字符串加了随机盐)，保证向量可复现
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, 1.0 if (h >> 31) & 1 else -1.0
+
+
+class HashingEmbedder:
+    """
+    确定性的本地哈希向量化(特征哈希)
+
+    不需要模型和网络，同样的文本在任何机器上得到同样的向量，适合离线测试和基准测试；
+    语义能力有限，只反映词面重合度。
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        rows, cols, signs = [], [], []
+        for row, text in enumerate(texts):
+            for feature in _features(text):
+                col, sign = _hash_feature(feature, self.dim)
+                rows.append(row)
+                cols.append(col)
+                signs.append(sign)
+        # 用一次 bincount 累加所有特征，比逐行 np.add.at 快得多
+        flat = np.asarray(rows, dtype=np.int64) * self.dim + np.asarray(cols, dtype=np.int64)
+        counts = np.bincount(flat, weights=np.asarray(signs, dtype=np.float64), minlength=len(texts) * self.dim)
+        return normalize(counts.reshape(len(texts), self.dim).astype(np.float32))
+
+
+class OpenAIEmbedder:
+    """通过 ClientFactory 中的提供方调用 embeddings 接口"""
+
+    def __init__(self, provider: str, model: str, dim: int, batch_size: int = 64,
+                 api_key: Optional[str] = None):
+        self.provider = provider
+        self.model = model
+        self.dim = dim
+        self.batch_size = batch_size
+        self.api_key = api_key
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        from LLM.ClientFactory import get_openai_client
+
+        client = get_openai_client(self.provider, api_key=self.api_key)
+        result = np.empty((len(texts), self.dim), dtype=np.float32)
+        for offset in range(0, len(texts), self.batch_size):
+            batch = list(texts[offset:offset + self.batch_size])
+            response = client.embeddings.create(model=self.model, input=batch)
+            for item in response.data:
+                result[offset + item.index] = item.embedding
+        return normalize(result)
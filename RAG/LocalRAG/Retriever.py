@@ -0,0 +1,76 @@
+"""
+进程内检索管线：切分 -> 向量化 -> 内存映射向量库 -> 批量 top-k
+
+不依赖 RAGFlow 服务，适合离线实验:
+    retriever = LocalRetriever("./rag_store", HashingEmbedder())
+    retriever.add_documents([("doc1", "上海今天多云...", {"dataset_id": "weather"})])
+    for hit in retriever.search("上海天气", k=3):
+        print(hit.score, hit.text)
+"""
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from RAG.LocalRAG.Chunking import chunk_documents
+from RAG.LocalRAG.Embedders import Embedder
+from RAG.LocalRAG.VectorStore import MemmapVectorStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SearchResult:
+    id: int
+    score: float
+    text: str
+    metadata: Dict[str, Any]
+
+
+class LocalRetriever:
+    """组合切分、向量化和向量库的本地检索器"""
+
+    def __init__(self, path: str, embedder: Embedder,
+                 chunk_size: int = 500, overlap: int = 50, batch_size: int = 256):
+        self.embedder = embedder
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self.store = MemmapVectorStore(path, dim=embedder.dim)
+
+    def add_documents(self, documents: Iterable[Tuple[str, str, Optional[Dict[str, Any]]]]) -> int:
+        """切分并写入文档，按 batch_size 分批向量化，返回写入的片段数"""
+        added = 0
+        batch = []
+        for chunk in chunk_documents(documents, self.chunk_size, self.overlap):
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                added += self._add_batch(batch)
+                batch = []
+        if batch:
+            added += self._add_batch(batch)
+        logger.info(f"写入 {added} 个片段，向量库共 {len(self.store)} 个")
+        return added
+
+    def _add_batch(self, chunks: list) -> int:
+        vectors = self.embedder.embed([c.text for c in chunks])
+        self.store.add(vectors, [c.to_metadata() for c in chunks])
+        return len(chunks)
+
+    def search_batch(self, queries: Sequence[str], k: int = 5) -> List[List[SearchResult]]:
+        """一次矩阵乘法回答多条查询"""
+        if not queries or not len(self.store):
+            return [[] for _ in queries]
+        scores, ids = self.store.search(self.embedder.embed(queries), k)
+        results = []
+        for row_scores, row_ids in zip(scores, ids):
+            valid = [(int(i), float(s)) for i, s in zip(row_ids, row_scores) if i >= 0]
+            metadatas = self.store.get_metadata([i for i, _ in valid])
+            results.append([SearchResult(i, s, meta.get("text", ""), meta)
+                            for (i, s), meta in zip(valid, metadatas)])
+        return results
+
+    def search(self, query: str, k: int = 5) -> List[SearchResult]:
+        return self.search_batch([query], k)[0]
+
+    def close(self) -> None:
+        self.store.close()
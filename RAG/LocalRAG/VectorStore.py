@@ -0,0 +1,219 @@
+"""
+基于内存映射 .npy 文件的向量存储
+
+目录结构:
+    vectors.npy   float32 矩阵 (capacity, dim)，只有前 count 行有效
+    offsets.npy   int64 数组，第 i 个向量的元数据在 meta.jsonl 中的字节偏移
+    meta.jsonl    每行一个向量的元数据，只追加
+    store.json    count/dim/capacity
+
+向量和偏移都通过 np.memmap 访问，百万级片段也不需要整体读入内存；
+检索按行块做矩阵乘法，内存占用只与块大小和查询数有关。
+"""
+import os
+import json
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def merge_topk(scores: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    对每行取 top-k，返回按分数降序排列的 (scores, ids)
+
+    先用 argpartition 在 O(n) 内选出 k 个候选，再只对这 k 个排序。
+    """
+    if scores.shape[1] > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, part, axis=1)
+        ids = np.take_along_axis(ids, part, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+
+def blocked_topk(matrix: np.ndarray, queries: np.ndarray, k: int, block_size: int = 65536,
+                 row_ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    精确内积 top-k：按 block_size 行分块计算 queries @ block.T，并与当前结果合并
+
+    matrix 可以是 memmap，每次只会把一个块读入内存；row_ids 为每行对应的外部 id，缺省为行号。
+    结果不足 k 个时，多余位置的 id 为 -1，分数为 -inf。
+    """
+    num_queries = len(queries)
+    best_scores = np.full((num_queries, k), -np.inf, dtype=np.float32)
+    best_ids = np.full((num_queries, k), -1, dtype=np.int64)
+    for start in range(0, len(matrix), block_size):
+        block = np.asarray(matrix[start:start + block_size])
+        scores = queries @ block.T
+        if row_ids is None:
+            ids = np.arange(start, start + len(block), dtype=np.int64)
+        else:
+            ids = row_ids[start:start + len(block)]
+        ids = np.broadcast_to(ids, scores.shape)
+        best_scores, best_ids = merge_topk(np.concatenate([best_scores, scores], axis=1),
+                                           np.concatenate([best_ids, ids], axis=1), k)
+    return best_scores, best_ids
+
+
+class MemmapVectorStore:
+    """可增量追加的内存映射向量库，容量不足时按2倍扩容"""
+
+    VECTORS = "vectors.npy"
+    OFFSETS = "offsets.npy"
+    META = "meta.jsonl"
+    HEADER = "store.json"
+
+    def __init__(self, path: str, dim: Optional[int] = None, initial_capacity: int = 1024):
+        """
+        Args:
+            path: 存储目录，已存在时直接打开(只映射，不读入内存)
+            dim: 向量维度，新建时必填
+            initial_capacity: 新建时预分配的行数
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        header_path = os.path.join(path, self.HEADER)
+        if os.path.exists(header_path):
+            with open(header_path, encoding="utf-8") as f:
+                header = json.load(f)
+            if dim is not None and dim != header["dim"]:
+                raise ValueError(f"向量维度不一致: 存储为 {header['dim']}，传入 {dim}")
+            self.dim = header["dim"]
+            self.count = header["count"]
+            self._vectors = np.load(self._file(self.VECTORS), mmap_mode="r+")
+            self._offsets = np.load(self._file(self.OFFSETS), mmap_mode="r+")
+        else:
+            if dim is None:
+                raise ValueError("新建向量库时必须指定 dim")
+            self.dim = dim
+            self.count = 0
+            capacity = max(1, initial_capacity)
+            self._vectors = np.lib.format.open_memmap(self._file(self.VECTORS), mode="w+",
+                                                      dtype=np.float32, shape=(capacity, dim))
+            self._offsets = np.lib.format.open_memmap(self._file(self.OFFSETS), mode="w+",
+                                                      dtype=np.int64, shape=(capacity,))
+            self._write_header()
+        self._meta_file = open(self._file(self.META), "a+b")
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _write_header(self) -> None:
+        tmp = self._file(self.HEADER + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "count": self.count, "capacity": self.capacity}, f)
+        os.replace(tmp, self._file(self.HEADER))
+
+    @property
+    def capacity(self) -> int:
+        return len(self._vectors)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """有效向量的只读视图(memmap，不会复制)"""
+        return self._vectors[:self.count]
+
+    def _grow(self, name: str, array: np.ndarray, capacity: int) -> np.ndarray:
+        tmp = self._file(name + ".tmp")
+        grown = np.lib.format.open_memmap(tmp, mode="w+", dtype=array.dtype,
+                                          shape=(capacity,) + array.shape[1:])
+        # 分块复制，避免把旧文件整体读入内存
+        step = 65536
+        for start in range(0, self.count, step):
+            end = min(start + step, self.count)
+            grown[start:end] = array[start:end]
+        grown.flush()
+        del grown
+        if isinstance(array, np.memmap):
+            array.flush()
+        os.replace(tmp, self._file(name))
+        return np.load(self._file(name), mmap_mode="r+")
+
+    def _ensure_capacity(self, needed: int) -> None:
+        if needed <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        logger.info(f"向量库扩容: {self.capacity} -> {capacity}")
+        self._vectors = self._grow(self.VECTORS, self._vectors, capacity)
+        self._offsets = self._grow(self.OFFSETS, self._offsets, capacity)
+
+    def add(self, vectors: np.ndarray, metadatas: Optional[Sequence[Dict[str, Any]]] = None) -> np.ndarray:
+        """追加一批向量及其元数据，返回分配的 id(即行号)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"向量形状应为 (n, {self.dim})，实际为 {vectors.shape}")
+        if metadatas is not None and len(metadatas) != len(vectors):
+            raise ValueError("metadatas 数量必须与向量数量一致")
+        n = len(vectors)
+        start = self.count
+        self._ensure_capacity(start + n)
+
+        self._meta_file.seek(0, os.SEEK_END)
+        offset = self._meta_file.tell()
+        lines = []
+        offsets = np.empty(n, dtype=np.int64)
+        for i in range(n):
+            line = json.dumps(metadatas[i] if metadatas is not None else {}, ensure_ascii=False).encode("utf-8") + b"\n"
+            offsets[i] = offset
+            offset += len(line)
+            lines.append(line)
+        self._meta_file.write(b"".join(lines))
+        self._meta_file.flush()
+
+        self._vectors[start:start + n] = vectors
+        self._offsets[start:start + n] = offsets
+        self.count += n
+        self._write_header()
+        return np.arange(start, start + n, dtype=np.int64)
+
+    def get_metadata(self, ids: Sequence[int]) -> List[Optional[Dict[str, Any]]]:
+        """按 id 读取元数据，只 seek 到对应行，不加载整个元数据文件"""
+        result = []
+        for i in ids:
+            i = int(i)
+            if i < 0 or i >= self.count:
+                result.append(None)
+                continue
+            self._meta_file.seek(int(self._offsets[i]))
+            result.append(json.loads(self._meta_file.readline()))
+        return result
+
+    def iter_metadata(self) -> Iterator[Dict[str, Any]]:
+        """顺序读取全部元数据"""
+        self._meta_file.seek(0)
+        for _ in range(self.count):
+            yield json.loads(self._meta_file.readline())
+
+    def search(self, queries: np.ndarray, k: int = 5, block_size: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量精确检索，queries 为 (q, dim) 或 (dim,)，返回 (scores, ids)，形状均为 (q, k)
+
+        向量需已归一化，分数即余弦相似度。
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, self.count) or 1
+        return blocked_topk(self.vectors, queries, k, block_size)
+
+    def flush(self) -> None:
+        self._vectors.flush()
+        self._offsets.flush()
+        self._meta_file.flush()
+        self._write_header()
+
+    def close(self) -> None:
+        self.flush()
+        self._meta_file.close()
+
+    def __enter__(self) -> "MemmapVectorStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -0,0 +1,275 @@
+"""
+ragflow_sdk.RAGFlow 的封装：按页懒加载、按 id 缓存、批量操作并发执行
+
+RAGFlowDemo001.py 中的写法是一次拉取全部 chat，再对每个 id 重新 list_chats(id=...)，
+更新也是逐个串行，chat/数据集多了以后请求数和耗时都很可观。
+
+用法:
+    client = RAGFlowClient(api_key, base_url)
+    for chat in client.iter_chats():            # 按需翻页
+        ...
+    chat = client.get_chat(chat_id)             # 命中缓存时不发请求
+    client.update_chat(chat_id, {...})          # 更新后缓存自动失效
+    results = client.bulk_update_chats({id1: {...}, id2: {...}})
+    results = client.bulk_update_documents(dataset_id, {doc_id1: {...}, doc_id2: {...}})
+"""
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ragflow_sdk import RAGFlow
+from ragflow_sdk.modules.document import Document
+
+# 依赖仓库内的其他模块，请在仓库根目录运行: python -m RAG.RAGFlowCourse.RAGFlowClientDemo
+from LLM.ClientFactory import get_requests_session
+
+logger = logging.getLogger(__name__)
+
+
+class PooledRAGFlow(RAGFlow):
+    """SDK 的每个请求都直接调用 requests.get/post，没有连接复用；这里改走共享的连接池"""
+
+    def post(self, path, json=None, stream=False, files=None):
+        return get_requests_session().post(url=self.api_url + path, json=json, headers=self.authorization_header,
+                                           stream=stream, files=files)
+
+    def get(self, path, params=None, json=None):
+        return get_requests_session().get(url=self.api_url + path, params=params,
+                                          headers=self.authorization_header, json=json)
+
+    def delete(self, path, json):
+        return get_requests_session().delete(url=self.api_url + path, json=json, headers=self.authorization_header)
+
+    def put(self, path, json):
+        return get_requests_session().put(url=self.api_url + path, json=json, headers=self.authorization_header)
+
+
+@dataclass
+class BulkResult:
+    """批量操作中单项的结果，失败时 error 不为空，不影响其他项"""
+    item: Any
+    result: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class _IdCache:
+    """按 id 缓存 SDK 对象，带过期时间"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._items: Dict[str, Tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+            self._items.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._items.clear()
+            else:
+                self._items.pop(key, None)
+
+
+class RAGFlowClient:
+    """带分页迭代、id 缓存和并发批量操作的 RAGFlow 客户端"""
+
+    def __init__(self, api_key: str, base_url: str,
+                 page_size: int = 100, max_workers: int = 8, cache_ttl: float = 300.0,
+                 rag: Optional[RAGFlow] = None):
+        """
+        Args:
+            api_key: RAGFlow API Key
+            base_url: RAGFlow 服务地址(不含 /api/v1)
+            page_size: 迭代时每页拉取的数量
+            max_workers: 批量操作的最大并发数，避免压垮服务端
+            cache_ttl: id 缓存的有效期(秒)
+            rag: 自定义的 RAGFlow 实例，默认使用带连接池的 PooledRAGFlow
+        """
+        self.rag = rag or PooledRAGFlow(api_key=api_key, base_url=base_url)
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self._chats = _IdCache(cache_ttl)
+        self._datasets = _IdCache(cache_ttl)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    # ---------------- 分页迭代 ----------------
+
+    def _paginate(self, fetch: Callable[..., List[Any]], cache: Optional[_IdCache],
+                  page_size: Optional[int], **filters) -> Iterator[Any]:
+        page_size = page_size or self.page_size
+        page = 1
+        while True:
+            items = fetch(page=page, page_size=page_size, **filters)
+            for item in items:
+                if cache is not None:
+                    cache.put(item.id, item)
+                yield item
+            # 不足一页说明已经是最后一页，省掉一次空请求
+            if len(items) < page_size:
+                return
+            page += 1
+
+    def iter_chats(self, name: Optional[str] = None, page_size: Optional[int] = None, **kwargs) -> Iterator[Any]:
+        """逐页拉取 chat，只有迭代到时才请求下一页；拉取到的对象同时写入缓存"""
+        return self._paginate(self.rag.list_chats, self._chats, page_size, name=name, **kwargs)
+
+    def iter_datasets(self, name: Optional[str] = None, page_size: Optional[int] = None, **kwargs) -> Iterator[Any]:
+        return self._paginate(self.rag.list_datasets, self._datasets, page_size, name=name, **kwargs)
+
+    def iter_documents(self, dataset: Any, keywords: Optional[str] = None,
+                       page_size: Optional[int] = None, **kwargs) -> Iterator[Any]:
+        dataset = self.get_dataset(dataset) if isinstance(dataset, str) else dataset
+        return self._paginate(dataset.list_documents, None, page_size, keywords=keywords, **kwargs)
+
+    # ---------------- 按 id 读取 ----------------
+
+    def get_chat(self, chat_id: str) -> Any:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chats = self.rag.list_chats(id=chat_id)
+            if not chats:
+                raise LookupError(f"chat 不存在: {chat_id}")
+            chat = chats[0]
+            self._chats.put(chat_id, chat)
+        return chat
+
+    def get_dataset(self, dataset_id: str) -> Any:
+        dataset = self._datasets.get(dataset_id)
+        if dataset is None:
+            datasets = self.rag.list_datasets(id=dataset_id)
+            if not datasets:
+                raise LookupError(f"数据集不存在: {dataset_id}")
+            dataset = datasets[0]
+            self._datasets.put(dataset_id, dataset)
+        return dataset
+
+    def invalidate(self, chat_id: Optional[str] = None, dataset_id: Optional[str] = None) -> None:
+        """不带参数时清空全部缓存"""
+        if chat_id is None and dataset_id is None:
+            self._chats.invalidate()
+            self._datasets.invalidate()
+            return
+        if chat_id is not None:
+            self._chats.invalidate(chat_id)
+        if dataset_id is not None:
+            self._datasets.invalidate(dataset_id)
+
+    # ---------------- 单项写操作 ----------------
+
+    def update_chat(self, chat: Any, update_message: Dict[str, Any]) -> None:
+        chat = self.get_chat(chat) if isinstance(chat, str) else chat
+        try:
+            chat.update(update_message)
+        finally:
+            # SDK 的 Chat.update 不会刷新本地对象，失效后下次读取拿到服务端的最新值
+            self._chats.invalidate(chat.id)
+
+    def update_dataset(self, dataset: Any, update_message: Dict[str, Any]) -> None:
+        dataset = self.get_dataset(dataset) if isinstance(dataset, str) else dataset
+        try:
+            dataset.update(update_message)
+        finally:
+            self._datasets.invalidate(dataset.id)
+
+    def create_chat(self, name: str, **kwargs) -> Any:
+        chat = self.rag.create_chat(name=name, **kwargs)
+        self._chats.put(chat.id, chat)
+        return chat
+
+    def create_dataset(self, name: str, **kwargs) -> Any:
+        dataset = self.rag.create_dataset(name=name, **kwargs)
+        self._datasets.put(dataset.id, dataset)
+        return dataset
+
+    # ---------------- 批量操作 ----------------
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ragflow")
+            return self._executor
+
+    def _bulk(self, func: Callable[[Any], Any], items: Iterable[Any]) -> List[BulkResult]:
+        """在有界线程池中执行，结果与输入顺序一致；单项失败记录在结果中，不中断其他项"""
+        items = list(items)
+
+        def run(item: Any) -> BulkResult:
+            try:
+                return BulkResult(item, func(item))
+            except Exception as e:
+                logger.warning(f"批量操作失败: {item!r}: {e}")
+                return BulkResult(item, error=e)
+
+        if len(items) <= 1:
+            return [run(item) for item in items]
+        return list(self._get_executor().map(run, items))
+
+    def bulk_create_chats(self, specs: Iterable[Dict[str, Any]]) -> List[BulkResult]:
+        """specs 中每项为 create_chat 的关键字参数，至少包含 name"""
+        return self._bulk(lambda spec: self.create_chat(**spec), specs)
+
+    def bulk_update_chats(self, updates: Dict[str, Dict[str, Any]]) -> List[BulkResult]:
+        """updates 为 {chat_id: update_message}"""
+        return self._bulk(lambda item: self.update_chat(item[0], item[1]), updates.items())
+
+    def bulk_create_datasets(self, specs: Iterable[Dict[str, Any]]) -> List[BulkResult]:
+        return self._bulk(lambda spec: self.create_dataset(**spec), specs)
+
+    def bulk_upload_documents(self, dataset: Any, documents: List[Dict[str, Any]],
+                              batch_size: int = 8) -> List[BulkResult]:
+        """
+        documents 中每项为 {"display_name": ..., "blob": bytes}
+
+        每 batch_size 个文件合成一次 multipart 请求，各批次并发上传。
+        """
+        dataset = self.get_dataset(dataset) if isinstance(dataset, str) else dataset
+        batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+        return self._bulk(dataset.upload_documents, batches)
+
+    def bulk_update_documents(self, dataset: Any, updates: Dict[str, Dict[str, Any]]) -> List[BulkResult]:
+        """
+        updates 为 {document_id: update_message}，例如 {"name": ..., "meta_fields": {...}}
+
+        按 id 直接构造 Document 发出 PUT，不需要先逐个 list_documents(id=...) 查询；
+        每项的 result 为更新后的 Document。
+        """
+        dataset = self.get_dataset(dataset) if isinstance(dataset, str) else dataset
+
+        def update(item: Tuple[str, Dict[str, Any]]) -> Any:
+            document_id, update_message = item
+            return Document(self.rag, {"id": document_id, "dataset_id": dataset.id}).update(update_message)
+
+        return self._bulk(update, updates.items())
+
+    def cache_stats(self) -> Dict[str, int]:
+        return {
+            "chat_hits": self._chats.hits, "chat_misses": self._chats.misses,
+            "dataset_hits": self._datasets.hits, "dataset_misses": self._datasets.misses,
+        }
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,197 @@
+"""
+RAGFlowClient 演示：在本地桩服务器上对比 RAGFlowDemo001.py 的原始写法与封装后的写法
+
+桩服务器实现了 /api/v1/chats、/api/v1/datasets 及文档上传/列表/更新接口，每个请求附加固定延迟，
+不需要真实的 RAGFlow 服务。tests/test_ragflow_client.py 也使用这个桩服务器。
+
+在仓库根目录运行: python -m RAG.RAGFlowCourse.RAGFlowClientDemo --chats 300 --latency 0.01
+"""
+import re
+import json
+import time
+import argparse
+import threading
+import itertools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from ragflow_sdk import RAGFlow
+
+from RAG.RAGFlowCourse.RAGFlowClient import RAGFlowClient
+
+
+class _StubState:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.chats = {}
+        self.datasets = {}
+        self.documents = {}
+        self.requests = 0
+
+    def new_id(self, prefix: str) -> str:
+        return f"{prefix}{next(self.ids):06d}"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    state: _StubState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, data=None, code: int = 0, message: str = "") -> None:
+        body = json.dumps({"code": code, "data": data, "message": message}, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _begin(self):
+        with self.state.lock:
+            self.state.requests += 1
+        time.sleep(self.state.latency)
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        return url.path[len("/api/v1"):], query
+
+    @staticmethod
+    def _page(items, query):
+        if query.get("id"):
+            items = [item for item in items if item["id"] == query["id"]]
+        if query.get("name"):
+            items = [item for item in items if item["name"] == query["name"]]
+        page, page_size = int(query.get("page", 1)), int(query.get("page_size", 30))
+        return items[(page - 1) * page_size:page * page_size]
+
+    def do_GET(self):
+        path, query = self._begin()
+        with self.state.lock:
+            if path == "/chats":
+                return self._reply(self._page(list(self.state.chats.values()), query))
+            if path == "/datasets":
+                return self._reply(self._page(list(self.state.datasets.values()), query))
+            match = re.fullmatch(r"/datasets/(\w+)/documents", path)
+            if match:
+                docs = self._page(self.state.documents.get(match.group(1), []), query)
+                return self._reply({"docs": docs, "total": len(docs)})
+        self._reply(code=404, message=f"未知路径: {path}")
+
+    def do_POST(self):
+        path, _ = self._begin()
+        body = self._body()
+        with self.state.lock:
+            if path in ("/chats", "/datasets"):
+                payload = json.loads(body)
+                prefix = "chat" if path == "/chats" else "ds"
+                item = dict(payload, id=self.state.new_id(prefix))
+                (self.state.chats if path == "/chats" else self.state.datasets)[item["id"]] = item
+                return self._reply(item)
+            match = re.fullmatch(r"/datasets/(\w+)/documents", path)
+            if match:
+                names = re.findall(rb'filename="([^"]+)"', body)
+                docs = [{"id": self.state.new_id("doc"), "name": n.decode("utf-8"), "dataset_id": match.group(1)}
+                        for n in names]
+                self.state.documents.setdefault(match.group(1), []).extend(docs)
+                return self._reply(docs)
+        self._reply(code=404, message=f"未知路径: {path}")
+
+    def do_PUT(self):
+        path, _ = self._begin()
+        payload = json.loads(self._body() or b"{}")
+        with self.state.lock:
+            match = re.fullmatch(r"/(chats|datasets)/(\w+)", path)
+            if match:
+                store = self.state.chats if match.group(1) == "chats" else self.state.datasets
+                item = store.get(match.group(2))
+                if item is None:
+                    return self._reply(code=102, message="不存在")
+                item.update(payload)
+                return self._reply(item)
+            match = re.fullmatch(r"/datasets/(\w+)/documents/(\w+)", path)
+            if match:
+                docs = self.state.documents.get(match.group(1), [])
+                doc = next((d for d in docs if d["id"] == match.group(2)), None)
+                if doc is None:
+                    return self._reply(code=102, message=f"文档不存在: {match.group(2)}")
+                doc.update(payload)
+                return self._reply(doc)
+        self._reply(code=404, message=f"未知路径: {path}")
+
+
+def start_stub_server(latency: float):
+    state = _StubState(latency)
+    handler = type("Handler", (_StubHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def timed(label: str, state: _StubState, func):
+    before = state.requests
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<28} {time.perf_counter() - start:7.2f}s  {state.requests - before:5d} 次请求")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAGFlowClient 桩服务器演示")
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.01, help="桩服务器每个请求的延迟(秒)")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    server, state = start_stub_server(args.latency)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    client = RAGFlowClient(api_key="stub-key", base_url=base_url, max_workers=args.workers)
+    rag = RAGFlow(api_key="stub-key", base_url=base_url)
+
+    specs = [{"name": f"chat-{i}"} for i in range(args.chats)]
+    results = timed("批量创建 chat(并发)", state, lambda: client.bulk_create_chats(specs))
+    ids = [r.result.id for r in results if r.ok]
+
+    # 原始写法：一次性拉取(SDK 默认每页30个，拿不全) + 每个 id 再查一次 + 串行更新
+    def legacy():
+        rag.list_chats()
+        for chat_id in ids:
+            chat = rag.list_chats(id=chat_id)[0]
+            chat.update({"llm": {"model_name": "gpt-3.5-turbo"}})
+
+    timed("原始写法: 逐个查询+串行更新", state, legacy)
+
+    def wrapped():
+        for _ in client.iter_chats():
+            pass
+        client.bulk_update_chats({chat_id: {"llm": {"model_name": "gpt-4o-mini"}} for chat_id in ids})
+
+    timed("封装写法: 分页迭代+并发更新", state, wrapped)
+    timed("更新后再次读取(缓存已失效)", state, lambda: [client.get_chat(i) for i in ids[:20]])
+    timed("再次读取(命中缓存)", state, lambda: [client.get_chat(i) for i in ids[:20]])
+    print("更新已生效:", client.get_chat(ids[0]).llm.model_name, "| 缓存统计:", client.cache_stats())
+
+    timed("懒加载: 只取前3个 chat", state, lambda: list(itertools.islice(client.iter_chats(page_size=50), 3)))
+
+    dataset = client.create_dataset(name="weather-kb")
+    documents = [{"display_name": f"doc-{i}.txt", "blob": f"城市{i}的天气记录".encode("utf-8")} for i in range(64)]
+    uploads = timed("批量上传 64 个文档", state, lambda: client.bulk_upload_documents(dataset, documents))
+    uploaded = [doc for r in uploads if r.ok for doc in r.result]
+    listed = sum(1 for _ in client.iter_documents(dataset.id, page_size=20))
+    print(f"上传成功 {len(uploaded)} 个，分页列出 {listed} 个")
+    renames = {doc.id: {"name": f"weather-{i}.txt"} for i, doc in enumerate(uploaded)}
+    updates = timed(f"批量更新 {len(renames)} 个文档", state, lambda: client.bulk_update_documents(dataset, renames))
+    print(f"更新成功 {sum(r.ok for r in updates)} 个")
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
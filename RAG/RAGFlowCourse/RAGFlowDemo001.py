@@ -1,25 +1,61 @@
+"""
+RAGFlow SDK 基本用法：查看 chat 的模型配置、修改 chat 使用的模型
+
+导入本模块不会连接 RAGFlow，ragflow_sdk 和 dotenv 在第一次调用 get_rag() 时才导入。
+运行:
+    python -m RAG.RAGFlowCourse.RAGFlowDemo001
+    python -m RAG.RAGFlowCourse.RAGFlowDemo001 --chat-id 86936f54c47f11f097350242ac150006 --model gpt-3.5-turbo
+"""
 import os
+import argparse
+from typing import Any, Dict, Optional
+
+_rag_object = None
+
+
+def get_rag():
+    """首次调用时读取环境变量并创建 RAGFlow 客户端，之后复用"""
+    global _rag_object
+    if _rag_object is None:
+        from dotenv import find_dotenv, load_dotenv
+        from ragflow_sdk import RAGFlow
+
+        load_dotenv(find_dotenv())
+        _rag_object = RAGFlow(api_key=os.environ["RAGFLOW_API_KEY"], base_url=os.environ["RAGFLOW_BASE_URL"])
+    return _rag_object
+
+
+def show_chat_llm(index: int = 1) -> Dict[str, Any]:
+    chats = get_rag().list_chats()
+    print(chats[index].llm)  # {'frequency_penalty': 0.5, 'model_name': 'Qwen/Qwen2.5-7B-Instruct___OpenAI-API@OpenAI-API-Compatible', 'presence_penalty': 0.5, 'temperature': 0.2, 'top_p': 0.75}
+    return chats[index].llm
+
 
-from dotenv import load_dotenv, find_dotenv
-from ragflow_sdk import RAGFlow
+def update_chat_llm(chat_id: str, model_name: str = "gpt-3.5-turbo", temperature: Optional[float] = 0.5) -> None:
+    chats = get_rag().list_chats(id=chat_id)
+    chat = chats[0]
+    chat.update(update_message=dict(llm={
+        "model_name": model_name,
+        },
+        model_params={"temperature": temperature})
+    )
+    # rag_object.create_chat(name="Demo Chat", avatar="https://avatars.githubusercontent.com/u/13991007?s=200&v=4", dataset_ids=[1], llm="gpt-3.5-turbo", model_params={"temperature": 0.5})
+    # print(chat.create_session(name="Demo Session"))
 
-load_dotenv(find_dotenv())
 
-RAGFLOW_BASE_URL = os.environ["RAGFLOW_BASE_URL"]
-RAGFLOW_API_URL = os.environ["RAGFLOW_API_URL"]
-RAGFLOW_API_KEY = os.environ["RAGFLOW_API_KEY"]
+def main():
+    parser = argparse.ArgumentParser(description="RAGFlow chat 配置演示")
+    parser.add_argument("--index", type=int, default=1, help="要查看的 chat 在列表中的位置")
+    parser.add_argument("--chat-id", default="86936f54c47f11f097350242ac150006", help="要修改的 chat id")
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--temperature", type=float, default=0.5)
+    parser.add_argument("--no-update", action="store_true", help="只查看，不修改")
+    args = parser.parse_args()
 
-rag_object = RAGFlow(api_key=RAGFLOW_API_KEY, base_url=RAGFLOW_BASE_URL)
+    show_chat_llm(args.index)
+    if not args.no_update:
+        update_chat_llm(args.chat_id, args.model, args.temperature)
 
-chats = rag_object.list_chats()
-print(chats[1].llm) # {'frequency_penalty': 0.5, 'model_name': 'Qwen/Qwen2.5-7B-Instruct___OpenAI-API@OpenAI-API-Compatible', 'presence_penalty': 0.5, 'temperature': 0.2, 'top_p': 0.75}
 
-chats = rag_object.list_chats(id='86936f54c47f11f097350242ac150006')
-chat = chats[0]
-chat.update(update_message=dict(llm={
-    "model_name": "gpt-3.5-turbo",
-    },
-    model_params={"temperature": 0.5})
-)
-# rag_object.create_chat(name="Demo Chat", avatar="https://avatars.githubusercontent.com/u/13991007?s=200&v=4", dataset_ids=[1], llm="gpt-3.5-turbo", model_params={"temperature": 0.5})
-# print(chat.create_session(name="Demo Session"))
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""A2A TaskScheduler：用进程内的模拟智能体检查优先级、取消、事件补发顺序、队列上限和工作进程崩溃恢复"""
+import os
+import threading
+
+import pytest
+
+from Protocol.A2A.Agents import cpu_agent
+from Protocol.A2A.TaskScheduler import (
+    CANCELED, COMPLETED, FAILED, WORKING, SchedulerFullError, TaskScheduler,
+)
+
+
+def crash_agent(payload):
+    """模拟工作进程崩溃(进程后端要求模块级函数)"""
+    os._exit(1)
+
+
+class Gate:
+    """占住唯一的工作线程，直到 open() 之前后续任务都在排队"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def agent(self, payload):
+        self.started.set()
+        assert self.released.wait(5)
+
+    def open(self):
+        self.released.set()
+
+
+@pytest.fixture
+def gate():
+    gate = Gate()
+    yield gate
+    gate.open()
+
+
+def test_priority_order(gate):
+    order = []
+    with TaskScheduler({"gate": gate.agent, "record": lambda p: order.append(p["n"])}, workers=1) as scheduler:
+        scheduler.submit("gate")
+        assert gate.started.wait(5)
+        for n, priority in enumerate([0, 5, 1, 5, 9, 0]):
+            scheduler.submit("record", {"n": n}, priority=priority)
+        gate.open()
+    # priority 越大越先执行，同优先级先进先出
+    assert order == [4, 1, 3, 2, 0, 5]
+
+
+def test_cancel_queued_task(gate):
+    ran = []
+    with TaskScheduler({"gate": gate.agent, "record": lambda p: ran.append(p)}, workers=1) as scheduler:
+        scheduler.submit("gate")
+        assert gate.started.wait(5)
+        task = scheduler.submit("record", {"n": 1})
+        assert scheduler.cancel(task.id)
+        assert task.state == CANCELED
+        gate.open()
+    assert ran == []
+    assert scheduler.stats()[CANCELED] == 1
+
+
+def test_cancel_running_generator_task():
+    step = threading.Semaphore(0)
+    produced = threading.Event()
+
+    def ticker(payload):
+        for i in range(100):
+            yield i
+            produced.set()
+            assert step.acquire(timeout=5)
+
+    with TaskScheduler({"ticker": ticker}, workers=1) as scheduler:
+        task = scheduler.submit("ticker")
+        assert produced.wait(5)
+        assert task.state == WORKING
+        assert scheduler.cancel(task.id)
+        step.release()
+        assert task.wait(5)
+        assert task.state == CANCELED
+        # 取消时正在执行的那一步仍会产出结果，之后的 99 步不再执行
+        assert task.artifacts == [0, 1]
+
+
+def test_stream_replays_artifacts_in_order_then_live_events():
+    step = threading.Semaphore(0)
+
+    def counter(payload):
+        for i in range(5):
+            assert step.acquire(timeout=5)
+            yield i
+        return "done"
+
+    with TaskScheduler({"counter": counter}, workers=1) as scheduler:
+        task = scheduler.submit("counter")
+        step.release()
+        step.release()
+        while len(task.artifacts) < 2:
+            task.wait(0.01)
+
+        subscribed = []
+        task.subscribe(subscribed.append)
+        for _ in range(3):
+            step.release()
+        events = list(scheduler.stream(task.id, timeout=5))
+
+    expected = [("artifact", i) for i in range(5)] + [("status", COMPLETED)]
+    for received in (subscribed, events):
+        kinds = [(e["type"], e["data"] if e["type"] == "artifact" else e["state"])
+                 for e in received if e["type"] == "artifact" or e["final"]]
+        assert kinds == expected
+        assert [e["index"] for e in received if e["type"] == "artifact"] == list(range(5))
+    assert events[-1]["result"] == "done"
+
+
+def test_scheduler_full_error(gate):
+    with TaskScheduler({"gate": gate.agent, "noop": lambda p: None}, workers=1, max_queue=2) as scheduler:
+        scheduler.submit("gate")
+        assert gate.started.wait(5)
+        scheduler.submit("noop")
+        scheduler.submit("noop")
+        with pytest.raises(SchedulerFullError):
+            scheduler.submit("noop")
+        assert scheduler.stats()["rejected"] == 1
+        gate.open()
+
+
+def test_process_worker_crash_is_reported_and_worker_restarted():
+    with TaskScheduler({"crash": crash_agent, "cpu": cpu_agent}, workers=1, backend="process") as scheduler:
+        crashed = scheduler.submit("crash")
+        assert crashed.wait(30)
+        assert crashed.state == FAILED
+        assert "工作进程异常退出" in crashed.error
+
+        task = scheduler.submit("cpu", {"cpu_work": 1000})
+        assert task.wait(30)
+        assert task.state == COMPLETED
+        assert task.result == cpu_agent({"cpu_work": 1000})
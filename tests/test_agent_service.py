@@ -0,0 +1,188 @@
+"""AgentService / SessionStore：基于本地模拟模型服务器(MockLLMServer)，不访问真实 API"""
+import os
+import json
+import time
+import asyncio
+
+import pytest
+
+pytest.importorskip("openai")
+
+from LLM.MockServer import MockLLMConfig, MockLLMServer
+from Protocol.AsyncHttpClient import PipelinedHttpConnection
+from Protocol.AsyncHttpServer import AsyncHttpServer
+from Protocol.FuctionCall.AgentService import SessionStore, create_service
+
+QUESTION = "我今天要去上海，该怎么穿衣服？"
+
+
+@pytest.fixture(scope="module")
+def mock_llm():
+    with pytest.MonkeyPatch.context() as patch, MockLLMServer(MockLLMConfig(latency=0.05)) as server:
+        patch.setenv("DEEPSEEK_BASE_URL", server.base_url)
+        patch.setenv("DEEPSEEK_API_KEY", "mock-key")
+        yield server
+
+
+@pytest.fixture
+def serve(mock_llm):
+    """按参数创建服务并在后台线程运行，返回 (service, base_url)"""
+    running = []
+
+    def start(**kwargs):
+        service = create_service(**kwargs)
+        http = AsyncHttpServer(service.http_router()).start_in_thread()
+        running.append((service, http))
+        return service, http.base_url
+
+    yield start
+    for service, http in running:
+        http.stop()
+        service.agent.close()
+
+
+async def _request(conn: PipelinedHttpConnection, method: str, path: str, body=None):
+    data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else b""
+    status, headers, payload = await conn.request(method, path, data, {"Content-Type": "application/json"})
+    return status, headers, json.loads(payload)
+
+
+def call(base_url: str, method: str, path: str, body=None):
+    async def run():
+        conn = PipelinedHttpConnection(base_url, timeout=30)
+        try:
+            return await _request(conn, method, path, body)
+        finally:
+            await conn.close()
+
+    return asyncio.run(run())
+
+
+def chat(base_url: str, session_id: str, message: str = QUESTION):
+    return call(base_url, "POST", "/chat", {"session_id": session_id, "message": message})
+
+
+# ---------------- HTTP 服务 ----------------
+
+def test_pipelined_turns_of_a_session_run_in_order(serve):
+    _, base_url = serve()
+
+    async def user(index: int):
+        conn = PipelinedHttpConnection(base_url, timeout=30)
+        try:
+            results = await asyncio.gather(*(
+                _request(conn, "POST", "/chat", {"session_id": f"user-{index}", "message": f"{QUESTION} #{turn}"})
+                for turn in range(4)))
+        finally:
+            await conn.close()
+        return results
+
+    async def run():
+        return await asyncio.gather(*(user(i) for i in range(5)))
+
+    for index, results in enumerate(asyncio.run(run())):
+        assert [status for status, _, _ in results] == [200] * 4
+        assert [payload["turn"] for _, _, payload in results] == [1, 2, 3, 4]
+        status, _, session = call(base_url, "GET", f"/sessions/user-{index}")
+        assert status == 200
+        questions = [m["content"] for m in session["messages"] if m["role"] == "user"]
+        assert questions == [f"{QUESTION} #{turn}" for turn in range(4)]
+
+
+def test_requests_beyond_max_inflight_get_429(serve):
+    service, base_url = serve(max_inflight=1)
+
+    async def run():
+        conns = [PipelinedHttpConnection(base_url, timeout=30) for _ in range(4)]
+        try:
+            return await asyncio.gather(*(
+                _request(conn, "POST", "/chat", {"session_id": f"s{i}", "message": QUESTION})
+                for i, conn in enumerate(conns)))
+        finally:
+            for conn in conns:
+                await conn.close()
+
+    results = asyncio.run(run())
+    statuses = sorted(status for status, _, _ in results)
+    assert statuses[0] == 200 and statuses[-1] == 429
+    rejected = [headers for status, headers, _ in results if status == 429]
+    assert all(headers.get("retry-after") == "1" for headers in rejected)
+    assert service.stats()["rejected"] == len(rejected)
+
+
+def test_spilled_session_can_be_read_back_and_deleted(serve, tmp_path):
+    service, base_url = serve(max_sessions=1, spill_dir=str(tmp_path))
+    assert chat(base_url, "alice")[0] == 200
+    assert chat(base_url, "bob")[0] == 200
+    assert service.store.get("alice") is None
+    assert len(os.listdir(tmp_path)) == 1
+
+    # GET 会把换出的会话读回内存(同时换出 bob)
+    status, _, session = call(base_url, "GET", "/sessions/alice")
+    assert status == 200
+    assert session["turns"] == 1
+    assert service.store.get("bob") is None
+
+    status, _, body = call(base_url, "DELETE", "/sessions/bob")
+    assert status == 200 and body == {"deleted": True}
+    assert os.listdir(tmp_path) == []
+    assert call(base_url, "GET", "/sessions/bob")[0] == 404
+    assert call(base_url, "DELETE", "/sessions/bob")[2] == {"deleted": False}
+
+
+# ---------------- SessionStore ----------------
+
+async def _add_turn(store: SessionStore, session_id: str, text: str = "你好") -> int:
+    async with store.session(session_id) as session:
+        session.messages.append({"role": "user", "content": text})
+        session.turns += 1
+        return session.turns
+
+
+def test_lru_eviction_spills_and_reads_back(tmp_path):
+    store = SessionStore(max_sessions=2, spill_dir=str(tmp_path))
+
+    async def run():
+        for session_id in ("a", "b", "a", "c"):
+            await _add_turn(store, session_id)
+        # b 最久未使用，被换出到磁盘
+        assert store.get("b") is None and store.get("a") is not None
+        assert store.stats()["spills"] == 1
+        assert await _add_turn(store, "b") == 2
+
+    asyncio.run(run())
+    stats = store.stats()
+    assert stats["disk_loads"] == 1
+    assert stats["sessions"] == 2
+
+
+def test_byte_limit_evicts_least_recently_used(tmp_path):
+    store = SessionStore(max_sessions=100, max_bytes=600, spill_dir=str(tmp_path))
+
+    async def run():
+        for session_id in ("a", "b", "c"):
+            await _add_turn(store, session_id, "晴" * 60)
+        await _add_turn(store, "d", "晴" * 60)
+        assert store.total_bytes <= store.max_bytes
+        assert store.get("a") is None and store.get("d") is not None
+        # 读回后历史完整
+        assert await _add_turn(store, "a") == 2
+        assert store.stats()["disk_loads"] == 1
+
+    asyncio.run(run())
+
+
+def test_expired_sessions_are_dropped(tmp_path):
+    store = SessionStore(max_sessions=1, ttl=0.05, spill_dir=str(tmp_path))
+
+    async def run():
+        await _add_turn(store, "memory")
+        await _add_turn(store, "disk")  # memory 被换出到磁盘
+        time.sleep(0.1)
+        assert await _add_turn(store, "memory") == 1
+        assert await _add_turn(store, "disk") == 1
+        assert await store.fetch("gone") is None
+
+    asyncio.run(run())
+    assert store.stats()["expirations"] >= 2
+    assert store.stats()["created"] == 4
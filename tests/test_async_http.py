@@ -0,0 +1,193 @@
+"""AsyncHttpServer / PipelinedHttpConnection：流水线按序响应、分块响应、断线时等待中的请求立即失败"""
+import time
+import asyncio
+
+import pytest
+
+from Protocol.AsyncHttpClient import PipelinedHttpConnection
+from Protocol.AsyncHttpServer import AsyncHttpServer, HttpResponse, Router, json_response, sse_response
+
+
+def make_router() -> Router:
+    router = Router()
+
+    @router.route("GET", r"/echo/(?P<index>\d+)")
+    async def echo(request):
+        index = int(request.path_params["index"])
+        # 先发出的请求处理得更慢，响应仍须按请求顺序写回
+        await asyncio.sleep(float(request.query.get("delay", 0)) / (index + 1))
+        return json_response({"index": index})
+
+    @router.route("GET", r"/events")
+    async def events(request):
+        async def generate():
+            for i in range(3):
+                yield {"n": i}
+                await asyncio.sleep(0)
+
+        return sse_response(generate())
+
+    @router.route("POST", r"/body")
+    async def body(request):
+        return HttpResponse(200, request.body, "application/octet-stream")
+
+    return router
+
+
+def run(coro_func):
+    """启动服务器，把 base_url 交给 coro_func，结束后关闭服务器"""
+    async def main():
+        server = AsyncHttpServer(make_router())
+        await server.start()
+        try:
+            return await coro_func(server.base_url)
+        finally:
+            await server.close()
+
+    return asyncio.run(main())
+
+
+def test_pipelined_responses_match_request_order():
+    async def scenario(base_url):
+        conn = PipelinedHttpConnection(base_url, timeout=10)
+        try:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(conn.request("GET", f"/echo/{i}?delay=0.2") for i in range(20)))
+            elapsed = time.perf_counter() - start
+            writer = conn._writer
+            more = await conn.request("GET", "/echo/0")
+            # 仍然复用同一条连接
+            assert conn._writer is writer
+            return results, elapsed, more
+        finally:
+            await conn.close()
+
+    results, elapsed, more = run(scenario)
+    assert [status for status, _, _ in results] == [200] * 20
+    assert [body for _, _, body in results] == [b'{"index":%d}' % i for i in range(20)]
+    # 服务端并发处理：总耗时接近最慢的一个(0.2s)，而不是逐个相加
+    assert elapsed < 0.6
+    assert more[2] == b'{"index":0}'
+
+
+def test_chunked_sse_and_request_body():
+    async def scenario(base_url):
+        conn = PipelinedHttpConnection(base_url, timeout=10)
+        try:
+            return await asyncio.gather(conn.request("GET", "/events"),
+                                        conn.request("POST", "/body", "你好".encode("utf-8")),
+                                        conn.request("GET", "/missing"))
+        finally:
+            await conn.close()
+
+    (status, headers, body), echoed, missing = run(scenario)
+    assert status == 200
+    assert headers["transfer-encoding"] == "chunked"
+    assert headers["content-type"] == "text/event-stream"
+    assert body == b'data: {"n":0}\n\ndata: {"n":1}\n\ndata: {"n":2}\n\n'
+    assert echoed[2] == "你好".encode("utf-8")
+    assert missing[0] == 404
+
+
+def dropping_server(drop_connections: int):
+    """前 drop_connections 条连接读到请求后不响应直接断开，之后的连接对每个请求返回 200"""
+    accepted = []
+
+    async def handle(reader, writer):
+        accepted.append(writer)
+        drop = len(accepted) <= drop_connections
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                if drop:
+                    return
+                body = b"ok"
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return handle, accepted
+
+
+def test_connection_loss_fails_pending_requests():
+    async def main():
+        handle, accepted = dropping_server(1)
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        conn = PipelinedHttpConnection(f"http://127.0.0.1:{port}", timeout=10)
+        try:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(conn.request("GET", "/") for _ in range(5)),
+                                           return_exceptions=True)
+            elapsed = time.perf_counter() - start
+            # 断线后下一次请求自动重连
+            status, _, body = await conn.request("GET", "/")
+            return results, elapsed, status, body, len(accepted)
+        finally:
+            await conn.close()
+            server.close()
+            await server.wait_closed()
+
+    results, elapsed, status, body, connections = asyncio.run(main())
+    assert all(isinstance(result, ConnectionError) for result in results)
+    # 不等到 10 秒超时
+    assert elapsed < 2
+    assert (status, body, connections) == (200, b"ok", 2)
+
+
+def test_request_waiting_for_slot_reconnects_after_loss():
+    """等待在途名额时连接断开，拿到名额后的请求应重连，而不是登记到已经失效的连接上"""
+    async def main():
+        handle, accepted = dropping_server(1)
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        conn = PipelinedHttpConnection(f"http://127.0.0.1:{port}", max_in_flight=1, timeout=5)
+        try:
+            start = time.perf_counter()
+            first, second = await asyncio.gather(conn.request("GET", "/"), conn.request("GET", "/"),
+                                                 return_exceptions=True)
+            return first, second, time.perf_counter() - start, len(accepted)
+        finally:
+            await conn.close()
+            server.close()
+            await server.wait_closed()
+
+    first, second, elapsed, connections = asyncio.run(main())
+    assert isinstance(first, ConnectionError)
+    assert not isinstance(second, BaseException) and second[0] == 200
+    assert elapsed < 2
+    assert connections == 2
+
+
+def test_connection_drop_before_write_fails_request():
+    """连接在确认可用之后、写入之前断开：请求立即失败，不挂到超时"""
+    async def main():
+        handle, _ = dropping_server(0)
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        conn = PipelinedHttpConnection(f"http://127.0.0.1:{port}", timeout=5)
+        original = conn._ensure_connected
+
+        async def ensure_then_drop():
+            waiters = await original()
+            # 模拟对端在此刻断开，读循环已经收尾
+            conn._writer.transport.abort()
+            await asyncio.sleep(0.05)
+            return waiters
+
+        try:
+            await conn.request("GET", "/")
+            conn._ensure_connected = ensure_then_drop
+            start = time.perf_counter()
+            with pytest.raises(ConnectionError):
+                await conn.request("GET", "/")
+            return time.perf_counter() - start
+        finally:
+            await conn.close()
+            server.close()
+            await server.wait_closed()
+
+    assert asyncio.run(main()) < 2
@@ -0,0 +1,26 @@
+"""JsonOutputParser：stream 输出补全后的中间结果，结束时必须是完整合法的 JSON"""
+import pytest
+
+from LangChainCourse.Runnables import JsonOutputParser
+
+
+@pytest.mark.parametrize("text", ['{"a": 1, "b"', '{"a": 1, "b": [1,2', '```json\n{"a": 1'])
+def test_truncated_output_is_rejected(text):
+    with pytest.raises(ValueError):
+        JsonOutputParser().invoke(text)
+
+
+def test_code_fenced_json_is_accepted():
+    assert JsonOutputParser().invoke('```json\n{"a": [1, 2]}\n```') == {"a": [1, 2]}
+
+
+def test_stream_emits_partial_objects_then_validates():
+    parser = JsonOutputParser()
+    assert list(parser.transform(iter(['{"a": 1, ', '"b": [1', ', 2]}']))) == [
+        {"a": 1}, {"a": 1, "b": [1]}, {"a": 1, "b": [1, 2]}]
+
+    outputs = []
+    with pytest.raises(ValueError):
+        for output in parser.transform(iter(['{"a": 1, ', '"b": [1'])):
+            outputs.append(output)
+    assert outputs == [{"a": 1}, {"a": 1, "b": [1]}]
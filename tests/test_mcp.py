@@ -0,0 +1,49 @@
+"""MCP 客户端与服务器的 stdio / Streamable HTTP 往返：握手、工具列表、并发调用、参数错误"""
+import os
+import asyncio
+
+import pytest
+
+from Protocol.AsyncHttpServer import AsyncHttpServer
+from Protocol.MCP.Client import McpError, McpHttpClient, McpStdioClient, weather_server_command
+from Protocol.MCP.Server import INVALID_PARAMS, create_weather_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CITIES = ["北京", "上海", "广州", "长沙", "深圳", "杭州"] * 5
+
+
+async def round_trip(client) -> None:
+    async with client:
+        assert client.server_info["serverInfo"]["name"]
+        names = {tool["name"] for tool in await client.list_tools()}
+        assert {"get_weather", "dress_advice"} <= names
+
+        texts = await asyncio.gather(*(client.call_tool_text("get_weather", {"city": city}) for city in CITIES))
+        assert texts[:2] == ["晴，28°C", "多云，22°C"]
+        assert len(texts) == len(CITIES)
+
+        with pytest.raises(McpError) as error:
+            await client.call_tool("get_weather", {"days": 3})
+        assert error.value.code == INVALID_PARAMS
+
+
+def test_stdio_round_trip(monkeypatch):
+    # 子进程以 python -m 启动，需要在仓库根目录下运行
+    monkeypatch.chdir(ROOT)
+    asyncio.run(round_trip(McpStdioClient(weather_server_command())))
+
+
+def test_http_round_trip():
+    async def main():
+        http = AsyncHttpServer(create_weather_server(tool_latency=0.01).http_router())
+        await http.start()
+        client = McpHttpClient(f"{http.base_url}/mcp", timeout=10)
+        try:
+            await round_trip(client)
+            # 客户端关闭时 DELETE 结束会话，连接也随之关闭
+            assert client.session_id is None
+            assert not client._connection.connected
+        finally:
+            await http.close()
+
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""ProviderRouter：故障转移不经过限流器的隐藏重试，同一轮完成的多余响应会被关闭"""
+import time
+import asyncio
+
+import pytest
+
+pytest.importorskip("openai")
+
+from LLM import RateLimiter
+from LLM.MockServer import MockLLMConfig, MockLLMServer
+from LLM.ProviderRouter import Backend, ProviderRouter
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    """deepseek 总是返回 503(Retry-After 2 秒)，openrouter 正常"""
+    failing = MockLLMServer(MockLLMConfig(error_rate=1.0, error_status=503, retry_after=2.0)).start()
+    healthy = MockLLMServer(MockLLMConfig()).start()
+    for prefix, server in (("DEEPSEEK", failing), ("OPENROUTER", healthy)):
+        monkeypatch.setenv(f"{prefix}_BASE_URL", server.base_url)
+        monkeypatch.setenv(f"{prefix}_API_KEY", "mock-key")
+    monkeypatch.delenv("LLM_RATE_LIMIT", raising=False)
+    monkeypatch.setattr(RateLimiter, "_shared_limiter", None)
+    yield failing, healthy
+    failing.stop()
+    healthy.stop()
+
+
+def make_router(**kwargs) -> ProviderRouter:
+    return ProviderRouter([Backend("deepseek", "a"), Backend("openrouter", "b")], **kwargs)
+
+
+def test_failover_sees_raw_backend_errors(backends):
+    failing, healthy = backends
+    router = make_router(hedge=False)
+    start = time.perf_counter()
+    response = router.create(messages=MESSAGES)
+    assert response.choices[0].message.content
+    # 限流器会按 Retry-After 等 2 秒再重试；路由器客户端不重试，立即转到下一个后端
+    assert time.perf_counter() - start < 1.0
+    assert failing.stats()["requests"] == 1 and healthy.stats()["requests"] == 1
+    assert router.summary()["deepseek/a"]["error_rate"] > 0
+
+
+def test_async_failover_sees_raw_backend_errors(backends):
+    failing, _ = backends
+    router = make_router(hedge=False)
+    start = time.perf_counter()
+    response = asyncio.run(router.acreate(messages=MESSAGES))
+    assert response.choices[0].message.content
+    assert time.perf_counter() - start < 1.0
+    assert failing.stats()["requests"] == 1
+
+
+class FakeStream:
+    def __init__(self, name: str):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        return self.aclose()
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_acreate_closes_other_response_finished_in_same_round(backends, monkeypatch):
+    router = make_router(default_hedge_delay=0.01, min_hedge_delay=0.01)
+    streams = {}
+
+    async def main():
+        release = asyncio.Event()
+
+        async def fake_acall(backend, params):
+            await release.wait()
+            streams[backend.provider] = FakeStream(backend.provider)
+            return streams[backend.provider]
+
+        monkeypatch.setattr(router, "_acall", fake_acall)
+        # 首个请求超过对冲阈值后发出对冲请求，随后两者在同一轮事件循环中完成
+        asyncio.get_running_loop().call_later(0.05, release.set)
+        return await router.acreate(messages=MESSAGES)
+
+    winner = asyncio.run(main())
+    assert router.hedges_sent == 1
+    loser = next(stream for stream in streams.values() if stream is not winner)
+    assert loser.closed and not winner.closed
@@ -0,0 +1,123 @@
+"""RAGFlowClient：在本地桩服务器(RAGFlowClientDemo.start_stub_server)上检查分页、缓存和批量操作"""
+import itertools
+
+import pytest
+
+pytest.importorskip("ragflow_sdk")
+
+from RAG.RAGFlowCourse.RAGFlowClient import RAGFlowClient
+from RAG.RAGFlowCourse.RAGFlowClientDemo import start_stub_server
+
+
+@pytest.fixture
+def stub():
+    server, state = start_stub_server(latency=0)
+    client = RAGFlowClient(api_key="stub-key", base_url=f"http://127.0.0.1:{server.server_port}", max_workers=4)
+    yield client, state
+    client.close()
+    server.shutdown()
+
+
+class Requests:
+    """统计一段代码向桩服务器发出的请求数"""
+
+    def __init__(self, state):
+        self.state = state
+
+    def __enter__(self):
+        self.before = self.state.requests
+        return self
+
+    def __exit__(self, *exc_info):
+        self.count = self.state.requests - self.before
+
+
+def test_pagination_is_lazy(stub):
+    client, state = stub
+    assert all(r.ok for r in client.bulk_create_chats({"name": f"chat-{i}"} for i in range(120)))
+
+    with Requests(state) as first_three:
+        chats = list(itertools.islice(client.iter_chats(page_size=50), 3))
+    assert len(chats) == 3 and first_three.count == 1
+
+    iterator = client.iter_chats(page_size=50)
+    with Requests(state) as not_started:
+        pass
+    assert not_started.count == 0
+
+    with Requests(state) as all_pages:
+        names = [chat.name for chat in iterator]
+    # 50 + 50 + 20：最后一页不足一页，不再请求空的第 4 页
+    assert all_pages.count == 3
+    # 并发创建，顺序不固定，只检查每个会话恰好出现一次
+    assert sorted(names) == sorted(f"chat-{i}" for i in range(120))
+
+
+def test_cache_hits_and_invalidation_after_update_chat(stub):
+    client, state = stub
+    chat = client.create_chat(name="weather")
+
+    with Requests(state) as cached:
+        assert client.get_chat(chat.id) is chat
+    assert cached.count == 0
+
+    client.update_chat(chat.id, {"name": "weather-v2"})
+    with Requests(state) as reload:
+        assert client.get_chat(chat.id).name == "weather-v2"
+    assert reload.count == 1
+
+    with Requests(state) as cached_again:
+        client.get_chat(chat.id)
+    assert cached_again.count == 0
+    stats = client.cache_stats()
+    assert stats["chat_hits"] >= 3 and stats["chat_misses"] == 1
+
+
+def test_cache_invalidation_after_update_dataset(stub):
+    client, state = stub
+    for _ in client.iter_datasets():
+        pass
+    dataset = client.create_dataset(name="kb")
+
+    client.update_dataset(dataset.id, {"name": "kb-v2"})
+    with Requests(state) as reload:
+        assert client.get_dataset(dataset.id).name == "kb-v2"
+    assert reload.count == 1
+    with Requests(state) as cached:
+        client.get_dataset(dataset.id)
+    assert cached.count == 0
+
+
+def test_bulk_results_report_errors_per_item(stub):
+    client, _ = stub
+    chat = client.create_chat(name="ok")
+    results = client.bulk_update_chats({chat.id: {"name": "ok-v2"}, "missing": {"name": "x"}})
+    assert [r.item[0] for r in results] == [chat.id, "missing"]
+    assert results[0].ok
+    assert not results[1].ok and isinstance(results[1].error, LookupError)
+    assert client.get_chat(chat.id).name == "ok-v2"
+
+
+def test_bulk_upload_and_update_documents(stub):
+    client, state = stub
+    dataset = client.create_dataset(name="docs")
+    documents = [{"display_name": f"doc-{i}.txt", "blob": f"天气记录{i}".encode("utf-8")} for i in range(20)]
+
+    with Requests(state) as uploads:
+        results = client.bulk_upload_documents(dataset, documents, batch_size=8)
+    assert uploads.count == 3 and all(r.ok for r in results)
+    uploaded = [doc for r in results for doc in r.result]
+    assert len(uploaded) == 20
+
+    updates = {doc.id: {"name": f"renamed-{doc.name}"} for doc in uploaded[:5]}
+    updates["doc999999"] = {"name": "nope"}
+    with Requests(state) as puts:
+        results = client.bulk_update_documents(dataset.id, updates)
+    # 按 id 直接更新，不需要先查询每个文档
+    assert puts.count == len(updates)
+    assert [r.ok for r in results] == [True] * 5 + [False]
+    assert "文档不存在" in str(results[-1].error)
+    assert results[0].result.name == f"renamed-{uploaded[0].name}"
+
+    names = {doc.name for doc in client.iter_documents(dataset, page_size=7)}
+    assert {f"renamed-doc-{i}.txt" for i in range(5)} <= names
@@ -0,0 +1,47 @@
+"""SemanticCache / weather_query_key：不同城市(包括 DUMMY_WEATHER 之外的城市)不能共用回答"""
+import itertools
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from Protocol.FuctionCall.SemanticCache import SemanticCache, weather_query_key
+from Protocol.FuctionCall.WeatherTools import DUMMY_WEATHER
+
+UNKNOWN_CITIES = ["成都", "重庆", "西安", "武汉", "南京", "天津", "哈尔滨", "乌鲁木齐"]
+TEMPLATES = ["{city}今天穿什么", "今天去{city}该怎么穿", "请问今天在{city}出门穿什么好"]
+
+
+def test_unknown_cities_are_recognised():
+    for city in UNKNOWN_CITIES:
+        assert city not in DUMMY_WEATHER
+        for template in TEMPLATES:
+            places, days = weather_query_key(template.format(city=city))
+            assert places == {city}
+            assert days == {"今天"}
+
+
+def test_different_unknown_cities_never_share_an_answer():
+    cache = SemanticCache(threshold=0.5, ttl=None, key_fn=weather_query_key)
+    for first, second in itertools.permutations(UNKNOWN_CITIES, 2):
+        cache.invalidate()
+        cache.put(f"{first}今天穿什么", first)
+        for template in TEMPLATES:
+            hit = cache.lookup(template.format(city=second))
+            assert hit is None or hit.answer == second
+
+
+def test_paraphrase_of_same_city_hits():
+    cache = SemanticCache(threshold=0.5, ttl=None, key_fn=weather_query_key)
+    cache.put("成都今天穿什么", "成都")
+    hit = cache.lookup("今天去成都该怎么穿")
+    assert hit is not None and hit.answer == "成都"
+
+
+def test_question_without_place_bypasses_cache():
+    cache = SemanticCache(threshold=0.5, ttl=None, key_fn=weather_query_key)
+    assert weather_query_key("今天穿什么") is None
+    cache.put("今天穿什么", "不知道城市")
+    assert len(cache) == 0
+    assert cache.lookup("今天穿什么") is None
+    assert cache.stats()["bypassed"] == 1
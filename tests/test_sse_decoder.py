@@ -0,0 +1,26 @@
+"""SSEDecoder：feed() 立即解析，跨数据块的行和多字节字符正确拼接"""
+import json
+
+from LLM.SSEDecoder import SSEDecoder, SSEEvent, iter_delta_content
+
+
+def test_feed_buffers_even_if_result_is_ignored():
+    decoder = SSEDecoder()
+    decoder.feed(b"data: a\n")  # 返回值被丢弃，数据仍然进入缓冲区
+    assert decoder.feed(b"data: b\n\n") == [SSEEvent("message", "a\nb")]
+
+
+def test_events_split_across_chunks():
+    data = "event: delta\nid: 7\ndata: 你好\r\n\n: ping\n\ndata: tail".encode("utf-8")
+    decoder = SSEDecoder()
+    events = []
+    for i in range(len(data)):
+        events += decoder.feed(data[i:i + 1])
+    assert events == [SSEEvent("delta", "你好", "7")]
+    assert decoder.close() == [SSEEvent("message", "tail", "7")]
+
+
+def test_iter_delta_content_stops_at_done():
+    chunks = [json.dumps({"choices": [{"delta": {"content": text}}]}, ensure_ascii=False) for text in ("晴", "天")]
+    stream = "".join(f"data: {chunk}\n\n" for chunk in chunks + ["[DONE]", chunks[0]]).encode("utf-8")
+    assert "".join(iter_delta_content([stream[:10], stream[10:]])) == "晴天"
@@ -0,0 +1,147 @@
+"""ClientFactory 中间件链(追踪 -> 响应缓存 -> 限流)上的流式响应：完整消费、提前退出和关闭"""
+import gc
+import asyncio
+import warnings
+
+import pytest
+
+pytest.importorskip("openai")
+
+from LLM import ClientFactory, RateLimiter
+from LLM.MockServer import MockLLMConfig, MockLLMServer
+from LangfuseCourse import Tracing
+
+MESSAGES = [{"role": "user", "content": "今天上海天气怎么样？"}]
+
+
+@pytest.fixture
+def chain(monkeypatch, tmp_path):
+    """开启响应缓存和共享限流器，关闭追踪；每个测试使用新的缓存文件和限流器"""
+    with MockLLMServer(MockLLMConfig()) as server:
+        monkeypatch.setenv("DEEPSEEK_BASE_URL", server.base_url)
+        monkeypatch.setenv("DEEPSEEK_API_KEY", "mock-key")
+        monkeypatch.setenv("LLM_CACHE_MODE", "auto")
+        monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "cache.sqlite"))
+        monkeypatch.delenv("LLM_RATE_LIMIT", raising=False)
+        monkeypatch.setattr(ClientFactory, "_response_cache", None)
+        monkeypatch.setattr(ClientFactory, "_response_cache_loaded", False)
+        monkeypatch.setattr(RateLimiter, "_shared_limiter", None)
+        monkeypatch.setattr(Tracing, "_tracer", None)
+        monkeypatch.setattr(Tracing, "_tracer_loaded", True)
+        yield server
+        if ClientFactory._response_cache is not None:
+            ClientFactory._response_cache.close()
+
+
+def run_checked(coro):
+    """运行协程，并把 "coroutine ... was never awaited" 之类的警告当作失败"""
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        result = asyncio.run(coro)
+        gc.collect()
+    assert not [w for w in caught if issubclass(w.category, RuntimeWarning)], [str(w.message) for w in caught]
+    return result
+
+
+def inflight() -> int:
+    limiters = RateLimiter.get_rate_limiter().stats()["limiters"]
+    return sum(limiter["inflight"] for limiter in limiters.values())
+
+
+async def stream_text(break_after=None) -> str:
+    client = ClientFactory.get_async_openai_client("deepseek")
+    stream = await client.chat.completions.create(model="deepseek-chat", messages=MESSAGES, stream=True)
+    parts = []
+    async with stream:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            if break_after is not None and len(parts) >= break_after:
+                break
+    return "".join(parts)
+
+
+def test_async_stream_is_recorded_then_replayed(chain):
+    text = run_checked(stream_text())
+    assert text
+    cache = ClientFactory._response_cache
+    assert cache.stats()["writes"] == 1
+    assert inflight() == 0
+
+    requests_before = chain.stats()["requests"]
+    assert run_checked(stream_text()) == text
+    assert cache.stats()["hits"] == 1
+    assert chain.stats()["requests"] == requests_before
+
+
+def test_async_stream_closed_early_is_not_recorded(chain):
+    assert len(run_checked(stream_text(break_after=2))) > 0
+    assert ClientFactory._response_cache.stats()["writes"] == 0
+    assert inflight() == 0
+
+
+def test_slot_released_on_early_break_without_gc(chain):
+    async def main():
+        client = ClientFactory.get_async_openai_client("deepseek")
+        stream = await client.chat.completions.create(model="deepseek-chat", messages=MESSAGES, stream=True)
+        assert inflight() == 1
+        async for _ in stream:
+            break
+        # 迭代器被释放后由事件循环钩子关闭，几轮调度内就归还名额
+        for _ in range(3):
+            await asyncio.sleep(0)
+        return inflight()
+
+    gc.disable()
+    try:
+        assert run_checked(main()) == 0
+    finally:
+        gc.enable()
+
+
+@pytest.mark.parametrize("how", ["close", "aclose"])
+def test_closing_async_stream_awaits_inner_close(chain, how):
+    async def main():
+        client = ClientFactory.get_async_openai_client("deepseek")
+        stream = await client.chat.completions.create(model="deepseek-chat", messages=MESSAGES, stream=True)
+        # close() 与 openai.AsyncStream.close() 一样返回需要 await 的协程
+        await getattr(stream, how)()
+        return inflight()
+
+    assert run_checked(main()) == 0
+
+
+
+class MemoryExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+@pytest.mark.parametrize("how", ["close", "aclose", "async with"])
+def test_traced_chain_closes_async_stream(chain, monkeypatch, how):
+    exporter = MemoryExporter()
+    tracer = Tracing.Tracer(exporter)
+    monkeypatch.setattr(Tracing, "_tracer", tracer)
+
+    async def main():
+        client = ClientFactory.get_async_openai_client("deepseek")
+        stream = await client.chat.completions.create(model="deepseek-chat", messages=MESSAGES, stream=True)
+        assert stream.response.status_code == 200
+        if how == "async with":
+            async with stream:
+                async for _ in stream:
+                    break
+        else:
+            await getattr(stream, how)()
+        return inflight()
+
+    try:
+        assert run_checked(main()) == 0
+        tracer.flush()
+    finally:
+        tracer.shutdown()
+    spans = [span for span in exporter.spans if span.kind == "stream"]
+    assert len(spans) == 1 and spans[0].error is None and spans[0].duration is not None